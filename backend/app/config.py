@@ -47,6 +47,10 @@ def _entero(nombre: str, defecto: int) -> int:
 # resto del codigo trabaja con claves, no con rutas.
 STORAGE_DIR = _texto("STORAGE_DIR", "storage/pdfs")
 
+# Tamano maximo de un PDF subido. Un escaneo de 30 paginas a 300 DPI ronda
+# los 50 MB; lo que pase de aqui se rechaza sin terminar de leerlo.
+MAX_SUBIDA_MB = _entero("MAX_SUBIDA_MB", 64)
+
 
 # --------------------------------------------------------------------- red
 
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import (
-    CHAR, BigInteger, Boolean, DateTime, Enum, ForeignKey, Index, String,
+    CHAR, BigInteger, Boolean, DateTime, Enum, ForeignKey, Index, Integer, String,
     UniqueConstraint, func,
 )
 from app.models.proyecto import Base
@@ -40,11 +40,19 @@ class Archivo(Base):
         Enum(EstadoArchivo), default=EstadoArchivo.subido, nullable=True)
     creado_en: Mapped[DateTime] = mapped_column(
         DateTime, server_default=func.current_timestamp(), nullable=True)
+    # Indexado en segundo plano (app/services/ingesta.py): intentos fallidos
+    # y, tras el ultimo, cuando puede volver a probarse. Un PDF que falla
+    # una y otra vez no debe quedarse el primero de la cola.
+    intentos_indexar: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False)
+    reintentar_en: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
 
     __table_args__ = (
-        # Deduplicacion por contenido: el mismo PDF subido dos veces no crea
-        # dos archivos.
-        UniqueConstraint("hash_sha256", name="uq_archivo_hash"),
+        # Deduplicacion por contenido dentro del proyecto: el mismo PDF subido
+        # dos veces al mismo proyecto no crea dos archivos. Era global, y
+        # subir a un segundo proyecto un PDF que ya estaba en otro fallaba.
+        UniqueConstraint("proyecto_id", "hash_sha256", name="uq_archivo_proyecto_hash"),
+        Index("idx_archivo_hash", "hash_sha256"),
         Index("idx_archivo_proyecto", "proyecto_id"),
         Index("idx_archivo_estado", "estado"),
     )
@@ -22,10 +22,20 @@ class Articulo(Base):
     )
     doi: Mapped[str | None] = mapped_column(String(255), nullable=True)
     titulo: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    # Con que se generaron sus fragmentos: modelo, dimension, tamano y solape
+    # de fragmento y version del extractor. Solo se anota al terminar de indexar, de modo que si esta
+    # puesta los fragmentos estan completos. Es lo que permite copiarlos a
+    # otro articulo del mismo PDF sin volver a leerlo ni a embeberlo.
+    firma_indice: Mapped[str | None] = mapped_column(String(120), nullable=True)
+    # El sha256 del PDF del que salieron esos fragmentos. No tiene por que ser
+    # el del archivo mas reciente: al unir dos subidas por DOI, un articulo ya
+    # indexado recibe otro PDF y sus fragmentos siguen siendo los del primero.
+    hash_indice: Mapped[str | None] = mapped_column(CHAR(64), nullable=True)
     creado_en: Mapped[DateTime] = mapped_column(
         DateTime, server_default=func.current_timestamp(), nullable=True)
 
     __table_args__ = (
         UniqueConstraint("proyecto_id", "doi", name="uq_articulo_proy_doi"),
         Index("idx_articulo_proyecto", "proyecto_id"),
+        Index("idx_articulo_hash_indice", "hash_indice"),
     )
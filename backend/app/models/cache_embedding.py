@@ -0,0 +1,28 @@
+# app/models/cache_embedding.py
+"""
+Vectores ya calculados, por el texto que los produjo.
+
+El mismo texto con el mismo modelo da el mismo vector, y pedirlo otra vez
+cuesta una peticion de la cuota por minuto y una espera en el limitador. La
+consulta de recuperacion de un proyecto, por ejemplo, es identica para todos
+sus articulos y se embebia una vez por cada uno.
+
+La clave es el modelo, la dimension y el sha256 del texto normalizado
+(app/services/cache_embeddings.py). El texto no se guarda: la huella basta
+para reconocerlo y el texto de los fragmentos ya esta en `embedding_doc`.
+"""
+
+from sqlalchemy import CHAR, Column, DateTime, Integer, LargeBinary, String, func
+
+from app.models.proyecto import Base
+
+
+class CacheEmbedding(Base):
+    __tablename__ = "cache_embedding"
+
+    modelo = Column(String(64), primary_key=True)
+    dimension = Column(Integer, primary_key=True, autoincrement=False)
+    huella = Column(CHAR(64), primary_key=True)   # sha256 en hexadecimal
+    # float32 little-endian, como embedding_doc.vector.
+    vector = Column(LargeBinary, nullable=False)
+    creado_en = Column(DateTime, server_default=func.current_timestamp())
@@ -0,0 +1,33 @@
+# app/models/cache_extraccion.py
+"""
+Texto ya extraido de cada PDF, con su diagnostico.
+
+Un mismo PDF se leia cinco veces: al subirlo (titulo y DOI), al indexarlo, al
+analizarlo y en los scripts de reetiquetado e indexacion. Con pdfminer o con
+OCR cada lectura son decenas de segundos. El resultado solo depende del
+archivo, de la version del extractor y del limite de caracteres, y esa es la
+clave (app/services/cache_extraccion.py).
+
+El texto se guarda comprimido con zlib: es prosa y ocupa la cuarta parte.
+"""
+
+from sqlalchemy import CHAR, Column, DateTime, Integer, LargeBinary, String, func
+from sqlalchemy.dialects import mysql
+from sqlalchemy.dialects.mysql import JSON as MySQLJSON
+
+from app.models.proyecto import Base
+
+# Hasta 120 000 caracteres, que comprimidos pueden pasar de los 64 KB de BLOB.
+COMPRIMIDO = LargeBinary().with_variant(mysql.MEDIUMBLOB(), "mysql")
+
+
+class CacheExtraccion(Base):
+    __tablename__ = "cache_extraccion"
+
+    huella = Column(CHAR(64), primary_key=True)   # sha256 del PDF
+    version = Column(String(16), primary_key=True)
+    max_chars = Column(Integer, primary_key=True, autoincrement=False)
+    texto = Column(COMPRIMIDO, nullable=False)
+    # El resto de DiagnosticoExtraccion: paginas, metodo, cobertura, avisos...
+    diagnostico = Column(MySQLJSON, nullable=False)
+    creado_en = Column(DateTime, server_default=func.current_timestamp())
@@ -0,0 +1,24 @@
+# app/models/cache_ocr.py
+"""
+Texto que Tesseract saco de cada pagina escaneada, por la imagen renderizada.
+
+La clave es el sha256 de la imagen, no del PDF: el mismo escaneo vuelve en
+PDF distintos (otra portada del repositorio, el mismo articulo subido a otro
+proyecto) y al subir la version del extractor la cache de extracciones se
+invalida, pero el OCR de cada pagina sigue valiendo
+(app/services/ocr_fallback.py).
+"""
+
+from sqlalchemy import CHAR, Column, DateTime, Integer, String, Text, func
+
+from app.models.proyecto import Base
+
+
+class CacheOCR(Base):
+    __tablename__ = "cache_ocr"
+
+    huella = Column(CHAR(64), primary_key=True)   # sha256 de la imagen
+    idioma = Column(String(32), primary_key=True)  # "spa+eng"
+    dpi = Column(Integer, nullable=False)
+    texto = Column(Text, nullable=False)
+    creado_en = Column(DateTime, server_default=func.current_timestamp())
@@ -1,5 +1,7 @@
 # app/models/embedding_doc.py
-from sqlalchemy import CHAR, Column, DateTime, ForeignKey, Index, Integer, String, func
+from sqlalchemy import (
+    CHAR, Column, DateTime, ForeignKey, Index, Integer, LargeBinary, String, func,
+)
 from sqlalchemy.dialects.mysql import JSON as MySQLJSON
 from sqlalchemy.dialects.mysql import LONGTEXT
 
@@ -17,13 +19,33 @@ class EmbeddingDoc(Base):
     )
     chunk_orden = Column(Integer, nullable=False)
     texto = Column(LONGTEXT, nullable=False)
-    embedding = Column(MySQLJSON, nullable=False)  # lista de floats, no cadena
+    # float32 little-endian, uno detras de otro (app/services/vectores.py).
+    # Ocupa la quinta parte que la lista JSON y se lee sin interpretarla.
+    vector = Column(LargeBinary, nullable=True)
+    # El mismo vector, normalizado y cuantizado a int8 con su centro y su
+    # escala (app/services/cuantizacion.py). Lo lee la cache de vectores
+    # cuando VECTORES_INT8 esta activo, en lugar del completo.
+    vector_int8 = Column(LargeBinary, nullable=True)
+    # Formato anterior: lista JSON de floats. Solo la leen las filas que la
+    # migracion 0006 todavia no ha convertido; las nuevas ya no la escriben.
+    embedding = Column(MySQLJSON, nullable=True)
     # Sección del artículo a la que pertenece el fragmento. Permite exigir
     # cobertura de método, resultados y discusión al recuperar contexto, en
     # lugar de quedarse siempre con la introducción (M-10).
     seccion = Column(String(24), nullable=True)
     char_inicio = Column(Integer, nullable=True)  # trazabilidad hacia el PDF
     char_fin = Column(Integer, nullable=True)
+    # Terminos de contenido del fragmento, la longitud que usa BM25
+    # (app/services/indice_lexico.py). Nulo si se indexo antes de existir.
+    n_terminos = Column(Integer, nullable=True)
+    # Modelo y dimension que produjeron `vector`, y su version: "modelo/dim".
+    # La recuperacion solo usa las filas de la version activa del proyecto
+    # (proyecto.version_embeddings); un coseno entre vectores de modelos
+    # distintos no significa nada. Nulo solo en filas que la migracion 0013
+    # no pudo etiquetar.
+    modelo = Column(String(64), nullable=True)
+    dimension = Column(Integer, nullable=True)
+    version = Column(String(80), nullable=True)
     creado_en = Column(DateTime, server_default=func.current_timestamp())
 
     __table_args__ = (
@@ -39,6 +39,10 @@ class LlamadaAPI(Base):
     motivo = Column(Text, nullable=True)  # detalle cuando falla
     tokens_in = Column(Integer, default=0)
     tokens_out = Column(Integer, default=0)
+    # Solo en embeddings: bytes de texto enviados y duracion de la peticion,
+    # para afinar el tamano de los lotes (app/services/lotes_embeddings.py).
+    lote_bytes = Column(Integer, nullable=True)
+    latencia_ms = Column(Integer, nullable=True)
     creado_en = Column(DateTime, server_default=func.current_timestamp())
 
     __table_args__ = (
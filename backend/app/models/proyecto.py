@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import (
     CHAR, Boolean, DateTime, ForeignKey, Index, Integer, String, Text, func,
+    text,
 )
 
 # La base declarativa vive en app/database.py. Se reexporta aquí porque casi
@@ -32,6 +33,17 @@ class Proyecto(Base):
     sector_txt: Mapped[str | None] = mapped_column(String(150), nullable=True)
     n_articulos_objetivo: Mapped[int] = mapped_column(Integer)
     estado_arte_generado: Mapped[bool] = mapped_column(Boolean, default=False, nullable=True)
+    # Aumenta cada vez que cambian los fragmentos indexados del proyecto. Cada
+    # proceso guarda los vectores en memoria (app/services/cache_vectores.py)
+    # y compara este número para saber si su copia sigue valiendo.
+    generacion_vectores: Mapped[int] = mapped_column(
+        Integer, default=0, nullable=False, server_default=text("0"))
+    # Version de los embeddings ("modelo/dim") con la que se indexa y se
+    # busca en el proyecto. Mientras se migra a otra, `version_destino` la
+    # guarda y las consultas siguen usando esta hasta el cambio
+    # (app/services/migracion_embeddings.py).
+    version_embeddings: Mapped[str | None] = mapped_column(String(80), nullable=True)
+    version_destino: Mapped[str | None] = mapped_column(String(80), nullable=True)
     creado_en: Mapped[DateTime] = mapped_column(
         DateTime, server_default=func.current_timestamp(), nullable=True)
 
@@ -0,0 +1,45 @@
+# app/models/termino_fragmento.py
+"""
+Indice invertido de los fragmentos: en que fragmentos aparece cada termino.
+
+La busqueda por vectores acierta con el sentido pero no con los terminos
+exactos: el nombre de un metodo, una sigla o un conjunto de datos. Con esta
+tabla se puntua por BM25 (app/services/indice_lexico.py) leyendo solo las
+filas de los terminos de la consulta.
+
+La clave empieza por proyecto y termino, que es como se consulta; sigue el
+articulo para poder acotar a unos pocos sin recorrer todo el proyecto.
+"""
+
+from sqlalchemy import CHAR, Column, ForeignKey, Index, Integer, String
+from sqlalchemy.dialects import mysql
+
+from app.models.proyecto import Base
+
+# Los terminos ya llegan en minusculas y sin tildes. La comparacion debe ser
+# exacta: con la colacion por defecto, insensible a acentos, dos terminos
+# distintos podrian chocar en la clave primaria.
+TERMINO = String(64).with_variant(mysql.VARCHAR(64, collation="utf8mb4_bin"), "mysql")
+
+
+class TerminoFragmento(Base):
+    __tablename__ = "termino_fragmento"
+
+    proyecto_id = Column(
+        CHAR(36),
+        ForeignKey("proyecto.id", ondelete="CASCADE", onupdate="RESTRICT"),
+        primary_key=True,
+    )
+    termino = Column(TERMINO, primary_key=True)
+    articulo_id = Column(CHAR(36), primary_key=True)
+    embedding_id = Column(
+        CHAR(36),
+        ForeignKey("embedding_doc.id", ondelete="CASCADE", onupdate="RESTRICT"),
+        primary_key=True,
+    )
+    frecuencia = Column(Integer, nullable=False)    # apariciones en el fragmento
+
+    __table_args__ = (
+        Index("idx_termino_articulo", "articulo_id"),
+        Index("idx_termino_embedding", "embedding_id"),
+    )
@@ -0,0 +1,32 @@
+# app/models/vector_migrado.py
+"""
+Vectores de la version a la que se esta migrando un proyecto.
+
+Migrar a otro modelo de embeddings supone volver a embeber todos los
+fragmentos, y con la cuota por minuto eso lleva horas. Mientras dura, las
+consultas deben seguir usando los vectores de siempre. Los nuevos se
+guardan aqui, uno por fragmento, y pasan a `embedding_doc` todos a la vez
+cuando el proyecto esta completo (app/services/migracion_embeddings.py).
+El fragmento conserva su identificador, su texto y sus terminos.
+"""
+
+from sqlalchemy import CHAR, Column, DateTime, ForeignKey, LargeBinary, String, func
+
+from app.models.proyecto import Base
+
+
+class VectorMigrado(Base):
+    __tablename__ = "vector_migrado"
+
+    embedding_id = Column(
+        CHAR(36),
+        ForeignKey("embedding_doc.id", ondelete="CASCADE", onupdate="RESTRICT"),
+        primary_key=True,
+    )
+    version = Column(String(80), primary_key=True)
+    # Como embedding_doc.vector y embedding_doc.vector_int8. Vacio si el
+    # modelo nuevo no da vector para el texto: el fragmento cuenta como
+    # migrado y se quita al cambiar.
+    vector = Column(LargeBinary, nullable=False)
+    vector_int8 = Column(LargeBinary, nullable=True)
+    creado_en = Column(DateTime, server_default=func.current_timestamp())
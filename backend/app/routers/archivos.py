@@ -1,23 +1,18 @@
-import uuid, hashlib, re
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+import uuid
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.dependencias import proyecto_propio
 from app.models.archivo import Archivo, EstadoArchivo
 from app.models.articulo import Articulo
 from app.models.proyecto import Proyecto
-from app.services import almacenamiento
-import fitz  # PyMuPDF
-from pdfminer.high_level import extract_text as pdfminer_extract
+from app.services import almacenamiento, ingesta
 
 router = APIRouter(prefix="/proyectos", tags=["archivos"])
 
-DOI_RE = re.compile(r'10\.\d{4,9}/[-._;()/:A-Z0-9]+', re.I)
-
-def _sha256_bytes(b: bytes) -> str:
-    h = hashlib.sha256()
-    h.update(b)
-    return h.hexdigest()
+# La subida se lee por trozos de 1 MB: la memoria por subida no depende del
+# tamaño del PDF (almacenamiento.Escritura).
+TROZO_SUBIDA = 1024 * 1024
 
 def clean(v):
     if not v:
@@ -25,72 +20,42 @@ def clean(v):
     t = v.strip().lower()
     return None if t in {"", "string", "null", "undefined"} else v.strip()
 
-def extract_title_and_doi(path: str) -> tuple[str | None, str | None]:
-    title = None
-    doi = None
-
-    # 1) PyMuPDF: metadata + primeras 10 páginas
-    try:
-        with fitz.open(path) as doc:
-            meta = doc.metadata or {}
-            if meta.get("title"):
-                t = meta["title"].strip()
-                if len(t) >= 5:
-                    title = t[:500]
-
-            texts = []
-            pages_to_read = min(10, len(doc))
-            for i in range(pages_to_read):
-                texts.append(doc[i].get_text("text"))
-            joined = "\n".join(texts)
-
-            if not doi:
-                m = DOI_RE.search(joined)
-                if m:
-                    doi = m.group(0)
-
-            if not title:
-                lines = [l.strip() for l in joined.splitlines() if l.strip()]
-                for l in lines[:50]:
-                    if 15 <= len(l) <= 200:
-                        title = l[:500]
-                        break
-    except Exception:
-        pass
-
-    # 2) Fallback pdfminer: documento completo
-    if not title or not doi:
-        try:
-            txt2 = pdfminer_extract(path)
-            if not doi:
-                m2 = DOI_RE.search(txt2)
-                if m2:
-                    doi = m2.group(0)
-            if not title:
-                lines = [l.strip() for l in txt2.splitlines() if l.strip()]
-                for l in lines[:80]:
-                    if 15 <= len(l) <= 200:
-                        title = l[:500]
-                        break
-        except Exception:
-            pass
-
-    return title, doi
-
 @router.post("/{proyecto_id}/archivos")
-async def subir_pdf(
+def subir_pdf(
+    background_tasks: BackgroundTasks,
     proyecto: Proyecto = Depends(proyecto_propio),
     pdf: UploadFile = File(...),
     titulo: str | None = Form(None),
     doi: str | None = Form(None),
     db: Session = Depends(get_db),
 ):
-    proyecto_id = proyecto.id
     if not pdf.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Solo PDF")
 
-    data = await pdf.read()
-    file_hash = _sha256_bytes(data)
+    # Starlette ya sabe el tamaño de la parte: un archivo demasiado grande se
+    # rechaza sin leerlo. Si no lo sabe, se comprueba mientras se lee.
+    #
+    # Sin `async`: escribir el temporal y calcular el sha256 bloquean, y así
+    # FastAPI lo hace en su pool de hilos en vez de parar el bucle de eventos.
+    if pdf.size is not None and pdf.size > almacenamiento.MAX_SUBIDA_BYTES:
+        raise HTTPException(status_code=413, detail="El PDF pasa de %d MB."
+                            % (almacenamiento.MAX_SUBIDA_BYTES // (1024 * 1024)))
+    try:
+        with almacenamiento.Escritura() as escritura:
+            while trozo := pdf.file.read(TROZO_SUBIDA):
+                escritura.escribir(trozo)
+            return _registrar(db, proyecto, pdf.filename, escritura, titulo, doi,
+                              background_tasks)
+    except almacenamiento.ArchivoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e)) from None
+
+
+def _registrar(db: Session, proyecto: Proyecto, nombre: str,
+               escritura: "almacenamiento.Escritura", titulo, doi,
+               background_tasks: BackgroundTasks) -> dict:
+    """Da de alta el archivo recibido, o devuelve el que ya tenía ese hash."""
+    proyecto_id = proyecto.id
+    file_hash = escritura.huella
 
     # Deduplicación por hash, acotada al proyecto.
     #
@@ -116,17 +81,29 @@ async def subir_pdf(
     # valga también en el disco. Lo que se guarda en `archivo.ruta` es la
     # clave, no una ruta: así el sitio donde vive el archivo puede cambiar sin
     # tocar a quien lo lee.
+    #
+    # El archivo se pone en su sitio antes del commit, para que la cola de
+    # indexado nunca vea una fila sin su PDF; si el alta falla, se borra.
     clave = almacenamiento.nueva_clave(proyecto.usuario_id)
-    almacenamiento.guardar(clave, data)
+    escritura.confirmar(clave)
+    try:
+        return _dar_de_alta(db, proyecto_id, nombre, clave, file_hash, escritura.bytes,
+                            titulo, doi, background_tasks)
+    except BaseException:
+        db.rollback()
+        almacenamiento.borrar(clave)
+        raise
+
+
+def _dar_de_alta(db: Session, proyecto_id: str, nombre: str, clave: str, file_hash: str,
+                 n_bytes: int, titulo, doi, background_tasks: BackgroundTasks) -> dict:
     file_id = str(uuid.uuid4())
-    path = almacenamiento.ruta_local(clave)
 
-    # Limpieza y extracción
+    # Solo lo que vino en el formulario. El título y el DOI que falten los
+    # pone la ingesta (app/services/ingesta.py), que lee el PDF después de
+    # responder: leerlo aquí hacía que la subida tardara lo que el PDF.
     titulo = clean(titulo)
     doi = clean(doi)
-    auto_title, auto_doi = extract_title_and_doi(path)
-    titulo = titulo or auto_title
-    doi = doi or auto_doi
 
     # Reusar artículo si el DOI ya existe en el proyecto
     art_exist = None
@@ -149,19 +126,20 @@ async def subir_pdf(
         db.add(art)
         db.flush()
 
-    estado = EstadoArchivo.extraido if (titulo or doi) else EstadoArchivo.subido
+    estado = EstadoArchivo.subido
     arc = Archivo(
         id=file_id,
         proyecto_id=proyecto_id,
         articulo_id=art_id,
-        nombre=pdf.filename,
+        nombre=nombre,
         ruta=clave,
         hash_sha256=file_hash,
-        bytes=len(data),
+        bytes=n_bytes,
         estado=estado,
     )
     db.add(arc)
     db.commit()
+    background_tasks.add_task(ingesta.ingerir_en_segundo_plano, file_id)
 
     return {
         "articulo_id": art_id,
@@ -1,4 +1,6 @@
 # app/routers/embeddings.py
+from typing import Literal
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
@@ -28,6 +30,8 @@ def buscar(
     q: str = Query(..., description="Consulta"),
     articulo_id: list[str] | None = Query(None, description="Filtrar por uno o más artículos"),
     top_k: int = 5,
+    modo: Literal["vector", "hibrido", "lexico"] = Query(
+        "vector", description="vector (coseno), lexico (BM25) o hibrido (fusion de ambos)"),
     usuario: Usuario = Depends(usuario_actual),
     db: Session = Depends(get_db),
 ):
@@ -41,6 +45,11 @@ def buscar(
     Los identificadores que llegan por parámetro se cruzan con los del usuario
     en lugar de comprobarse uno a uno: pedir uno ajeno no da error —eso
     confirmaría que existe—, simplemente no aporta resultados.
+
+    `modo=lexico` busca los términos exactos —siglas, nombres de métodos o de
+    conjuntos de datos— sin embeber la consulta; `modo=hibrido` combina las
+    dos listas. En ambos el `score` no es un coseno: es BM25 o la puntuación
+    de la fusión.
     """
     propios = {
         a[0] for a in db.query(Articulo.id)
@@ -53,5 +62,5 @@ def buscar(
     if not ids:
         return []
 
-    hits = embed_query(db, ids, q, top_k=top_k)
+    hits = embed_query(db, ids, q, top_k=top_k, modo=modo)
     return [{"embedding_id": eid, "score": float(s), "texto": txt} for eid, s, txt in hits]
@@ -10,7 +10,7 @@ from app.models.run_item import RunItem
 from app.models.resultado_brecha import ResultadoBrecha
 from app.models.estado_arte import EstadoDelArte
 from app.models.articulo import Articulo
-from app.models.metrica import Metrica
+from app.services import escritura
 from app.services.gemini_service import synthesize_estado_arte
 from app.services.metricas import sintesis as S
 
@@ -109,6 +109,7 @@ def _medir_sintesis(db: Session, proyecto_id: str, rec: EstadoDelArte,
     ]
 
     salida: dict = {}
+    medidas = []
     for codigo, calcular in (
         ("N5.3", lambda: S.n5_3_cobertura_sintesis(rec.texto, textos)),
         ("N5.5", lambda: S.n5_5_citas_fabricadas(rec.texto, articulos)),
@@ -119,11 +120,10 @@ def _medir_sintesis(db: Session, proyecto_id: str, rec: EstadoDelArte,
             # Que falle una métrica no debe impedir guardar el estado del arte:
             # mide sobre el resultado, no forma parte de él.
             valor, detalle = None, {"error": str(exc)[:200]}
-        db.add(Metrica(
-            id=str(uuid.uuid4()), proyecto_id=proyecto_id, ambito="proyecto",
-            referencia_id=rec.id, codigo=codigo, valor=valor, detalle=detalle,
-        ))
+        medidas.append(escritura.metrica(proyecto_id, "proyecto", rec.id,
+                                         codigo, valor, detalle))
         salida[codigo] = {"valor": valor, "detalle": detalle}
+    escritura.metricas(db, medidas)
     return salida
 
 @router.get("/{proyecto_id}/estado_arte/latest")
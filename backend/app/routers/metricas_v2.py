@@ -29,7 +29,9 @@ from app.models.proyecto import Proyecto
 from app.models.resultado_brecha import ResultadoBrecha
 from app.models.run import Run, EstadoRun
 from app.models.run_item import RunItem
-from app.services import limitador, registro_api, verificacion
+from app.services import (
+    cache_embeddings, cache_extraccion, limitador, registro_api, verificacion,
+)
 from app.services.metricas import distribucion as D
 from app.services.metricas.catalogo import CATALOGO, ficha
 
@@ -372,6 +374,11 @@ def _consumo(db: Session, proyecto_id: str | None):
     salida["fuente"] = fuente
     salida["generaciones_fallidas"] = fallidas
     salida["embeddings_ventana"] = embeddings
+    # Peticiones de embedding que no se hicieron porque el vector ya estaba.
+    # Son de este proceso: el trabajador lleva su propia cuenta.
+    salida["cache_embeddings"] = cache_embeddings.cache.estadisticas()
+    # Lecturas de PDF ahorradas, con el mismo alcance.
+    salida["cache_extraccion"] = cache_extraccion.cache.estadisticas()
     # Se declara explicitamente el alcance del recuento. Un contador que se
     # presenta como exacto sin serlo lleva a decisiones equivocadas, que es
     # justo el problema que este proyecto vino a corregir.
@@ -9,7 +9,7 @@ from app.dependencias import proyecto_propio
 from app.models.proyecto import Proyecto
 from app.models.articulo import Articulo
 from app.models.run import Run, EstadoRun
-from app.models.run_item import RunItem, EstadoRunItem
+from app.services import cola
 
 router = APIRouter(prefix="/proyectos", tags=["pipeline"])
 
@@ -34,7 +34,8 @@ def analizar_todo(
     análisis puede cerrar el navegador.
 
     La indexación también se movió al trabajador: es la otra parte lenta, y
-    dejarla aquí habría mantenido el problema a medias.
+    dejarla aquí habría mantenido el problema a medias. Casi siempre está ya
+    hecha, desde la subida: esos artículos entran en `enriquecido`.
     """
     arts = db.query(Articulo).filter(Articulo.proyecto_id == proyecto.id).all()
     if not arts:
@@ -66,13 +67,7 @@ def analizar_todo(
     ))
     db.flush()
 
-    for a in arts:
-        db.add(RunItem(
-            id=str(uuid.uuid4()),
-            run_id=run_id,
-            articulo_id=a.id,
-            estado=EstadoRunItem.pendiente,
-        ))
+    cola.encolar(db, run_id, [a.id for a in arts])
     db.commit()
 
     return {
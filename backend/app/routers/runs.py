@@ -20,15 +20,16 @@ from app.models.rag_log import RagLog
 from app.models.metrica import Metrica, AMBITO_BRECHA, AMBITO_ARTICULO
 from app.models.embedding_doc import EmbeddingDoc
 
-from app.services import almacenamiento, cola
+from app.services import (
+    almacenamiento, cache_extraccion, cola, escritura, ingesta, precarga_contextos,
+)
 from app.services.gemini_service import analyze
-from app.services.embedding_service import recuperar_contexto, construir_consulta
+from app.services.embedding_service import construir_consulta
 from app.services.document_structure import extraer_abstract
 from app.services.metricas import niveles as N
 from app.services.metricas import sintesis as S
 from app.services.verificacion import verificar
 
-from app.utils.text_extractor import extraer_con_diagnostico
 
 # Retiradas de este pipeline: validate_breach_with_rag, auto_validate,
 # shannon_entropy_bits_and_norm, find_duplicate_breach y lexical_density.
@@ -38,18 +39,11 @@ from app.utils.text_extractor import extraer_con_diagnostico
 # app/services/metricas/.
 
 
-def _metrica(db, proyecto_id: str, ambito: str, referencia_id: str, codigo: str,
+def _metrica(filas: list, proyecto_id: str, ambito: str, referencia_id: str, codigo: str,
              valor: float | None, detalle: dict | None = None) -> None:
-    """Registra una medición en el almacén genérico de métricas."""
-    db.add(Metrica(
-        id=str(uuid.uuid4()),
-        proyecto_id=proyecto_id,
-        ambito=ambito,
-        referencia_id=referencia_id,
-        codigo=codigo,
-        valor=None if valor is None else float(valor),
-        detalle=detalle,
-    ))
+    """Anota una medición; se escriben todas juntas con `escritura.metricas`."""
+    filas.append(escritura.metrica(proyecto_id, ambito, referencia_id, codigo,
+                                   valor, detalle))
 
 
 def _metricas_de_lote(db, run) -> None:
@@ -79,11 +73,13 @@ def _metricas_de_lote(db, run) -> None:
     if len(brechas) < 2:
         return
 
+    medidas: list = []
     valor, detalle = N.n3_1_discriminabilidad(brechas)
-    _metrica(db, run.proyecto_id, "run", run.id, "N3.1", valor, detalle)
+    _metrica(medidas, run.proyecto_id, "run", run.id, "N3.1", valor, detalle)
 
     valor, detalle = N.n3_4_redundancia(brechas)
-    _metrica(db, run.proyecto_id, "run", run.id, "N3.4", valor, detalle)
+    _metrica(medidas, run.proyecto_id, "run", run.id, "N3.4", valor, detalle)
+    escritura.metricas(db, medidas)
 
 
 def _registrar_metricas(db, art, rb, res, texto, recuperados, ruta_pdf) -> None:
@@ -96,14 +92,15 @@ def _registrar_metricas(db, art, rb, res, texto, recuperados, ruta_pdf) -> None:
     """
     brecha_txt = res.get("brecha", "") or ""
     resumen_txt = (res.get("resumen") or "").strip()
+    filas: list = []
 
     # --- N1: calidad de la recuperación ---
-    _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, "N1.2",
+    _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, "N1.2",
              N.n1_2_cobertura_seccional(recuperados),
              {"secciones": sorted({r["seccion"] for r in recuperados})})
 
     vectores = N.vectores_de(db, [r["embedding_id"] for r in recuperados])
-    _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, "N1.3",
+    _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, "N1.3",
              N.n1_3_diversidad_contexto(vectores),
              {"n_fragmentos": len(vectores)})
 
@@ -113,23 +110,23 @@ def _registrar_metricas(db, art, rb, res, texto, recuperados, ruta_pdf) -> None:
     # medicion que no se hizo no es una medicion con resultado cero.
     ver = verificar(brecha_txt, recuperados)
     if ver.disponible:
-        _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, "N2.1", ver.fidelidad,
+        _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, "N2.1", ver.fidelidad,
                  {"sin_respaldo": [a.texto for a in ver.evidenciales
                                    if not a.respaldada][:10]})
-        _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, "N2.2", ver.trazabilidad)
-        _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, "N2.4",
+        _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, "N2.2", ver.trazabilidad)
+        _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, "N2.4",
                  ver.equilibrio_evidencial)
-    _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, "N2.verificada",
+    _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, "N2.verificada",
              1.0 if ver.disponible else 0.0, ver.resumen())
 
     # --- N5.2: cuantas veces el reclasificador sobrescribe al modelo ---
     tipo_modelo = res.get("tipo_modelo")
-    _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, "N5.2",
+    _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, "N5.2",
              S.n5_2_efecto_reclasificador(tipo_modelo, res.get("tipo_brecha")),
              {"tipo_modelo": tipo_modelo, "tipo_final": res.get("tipo_brecha")})
 
     # --- N3: especificidad ---
-    _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, "N3.2", N.n3_2_densidad_anclajes(brecha_txt))
+    _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, "N3.2", N.n3_2_densidad_anclajes(brecha_txt))
 
     # El IDF necesita un corpus amplio para distinguir lo raro de lo frecuente.
     # Calculado sobre los ocho fragmentos recuperados, casi todos los términos
@@ -138,7 +135,7 @@ def _registrar_metricas(db, art, rb, res, texto, recuperados, ruta_pdf) -> None:
     corpus = [t for (t,) in db.query(EmbeddingDoc.texto)
               .join(Articulo, Articulo.id == EmbeddingDoc.articulo_id)
               .filter(Articulo.proyecto_id == art.proyecto_id).all()]
-    _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, "N3.3",
+    _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, "N3.3",
              N.n3_3_contenido_informativo(brecha_txt, corpus),
              {"tamano_corpus": len(corpus)})
 
@@ -149,12 +146,13 @@ def _registrar_metricas(db, art, rb, res, texto, recuperados, ruta_pdf) -> None:
                           ("N4.1c", m4.rouge1_f1), ("N4.1d", m4.rouge2_f1),
                           ("N4.1e", m4.rougeL_f1), ("N4.2", m4.similitud_semantica),
                           ("N4.4", m4.densidad_lexica)):
-        _metrica(db, art.proyecto_id, AMBITO_BRECHA, rb.id, codigo, valor,
+        _metrica(filas, art.proyecto_id, AMBITO_BRECHA, rb.id, codigo, valor,
                  {"referencia_valida": m4.referencia_valida} if codigo == "N4.1a" else None)
 
-    _metrica(db, art.proyecto_id, AMBITO_ARTICULO, art.id, "N4.ref",
+    _metrica(filas, art.proyecto_id, AMBITO_ARTICULO, art.id, "N4.ref",
              1.0 if m4.referencia_valida else 0.0,
              {"motivo": m4.motivo, "chars_abstract": len(abstract or "")})
+    escritura.metricas(db, filas)
 
     if resumen_txt:
         db.add(ResultadoResumen(
@@ -200,15 +198,7 @@ def crear_run(
     db.add(r)
     db.flush()
 
-    for a in arts:
-        db.add(
-            RunItem(
-                id=str(uuid.uuid4()),
-                run_id=run_id,
-                articulo_id=a.id,
-                estado=EstadoRunItem.pendiente,
-            )
-        )
+    cola.encolar(db, run_id, [a.id for a in arts])
     db.commit()
 
     return RunOut.model_construct(
@@ -277,7 +267,7 @@ def run_activo(
         # siempre y nada lo delata. Decirlo aquí evita que parezca lentitud.
         "en_marcha": db.query(RunItem.id).filter(
             RunItem.run_id == run.id,
-            RunItem.estado == EstadoRunItem.en_proceso).first() is not None,
+            RunItem.estado.in_(cola.ESTADOS_EN_CURSO)).first() is not None,
         "error_msg": run.error_msg,
     }
 
@@ -331,14 +321,8 @@ class FalloDefinitivo(Exception):
     """
 
 
-def procesar_item(db: Session, run: Run, item: RunItem) -> None:
-    """Analiza un artículo y deja el ítem en `analizado`.
-
-    No decide qué hacer con los fallos: los deja salir. Quien lo llama —el
-    trabajador o el endpoint— sabe si conviene reintentar, y esa decisión no
-    debería estar enterrada aquí.
-    """
-    run_id = run.id
+def _archivo_del_item(db: Session, item: RunItem):
+    """El artículo del ítem, su PDF más reciente y la ruta para abrirlo."""
     art = db.query(Articulo).filter(Articulo.id == item.articulo_id).first()
     if not art:
         raise FalloDefinitivo("El artículo ya no existe.")
@@ -359,9 +343,13 @@ def procesar_item(db: Session, run: Run, item: RunItem) -> None:
         ruta_pdf = almacenamiento.ruta_local(arc.ruta)
     except almacenamiento.ClaveInvalida as e:
         raise FalloDefinitivo("Referencia de archivo no válida: %s" % e) from None
+    return art, arc, ruta_pdf
 
-    diag = extraer_con_diagnostico(ruta_pdf)
-    texto = diag.texto
+
+def _extraer(arc: Archivo, ruta_pdf: str):
+    """Texto y diagnóstico N0 del PDF; FalloDefinitivo si no es utilizable."""
+    # Casi siempre ya leido: al subirlo o al indexarlo (app/services/cache_extraccion.py).
+    diag = cache_extraccion.extraer(ruta_pdf, huella=arc.hash_sha256)
     if not diag.utilizable:
         from app.services.ocr_fallback import ocr_disponible
         ok_ocr, motivo_ocr = ocr_disponible()
@@ -371,6 +359,55 @@ def procesar_item(db: Session, run: Run, item: RunItem) -> None:
         # El diagnóstico N0 sustituye al escueto "Texto insuficiente": ahora el
         # usuario sabe por qué falló y si es recuperable.
         raise FalloDefinitivo(" | ".join(motivos))
+    return diag
+
+
+def ingerir_item(db: Session, run: Run, item: RunItem, soltar: bool = True) -> None:
+    """Primera etapa: texto, fragmentos y embeddings del artículo.
+
+    El ítem pasa por `extraido` (u `ocr`) y termina en `enriquecido`, con un
+    commit en cada paso para que el avance se vea mientras se embebe. Con
+    `soltar` vuelve a la cola para que el análisis lo tome cualquier
+    trabajador; sin él, quien lo ingirió lo sigue teniendo y lo analiza a
+    continuación.
+
+    Casi nunca hace falta: la ingesta empieza al subir el PDF
+    (app/services/ingesta.py) y los artículos ya indexados entran en la
+    ejecución en `enriquecido`.
+    """
+    art, arc, ruta_pdf = _archivo_del_item(db, item)
+    diag = _extraer(arc, ruta_pdf)
+    item.estado = EstadoRunItem.ocr if diag.metodo == "ocr" else EstadoRunItem.extraido
+    db.commit()
+
+    # Idempotente: lo ya indexado no se vuelve a pagar, así que un reintento
+    # no repite el gasto.
+    if ingesta.indexar(db, art.id) == 0:
+        raise FalloDefinitivo(
+            "No se pudo indexar el artículo: sin archivo o sin texto.")
+    if soltar:
+        cola.soltar_ingerido(db, item)
+    else:
+        item.estado = EstadoRunItem.enriquecido
+        db.commit()
+
+
+def procesar_item(db: Session, run: Run, item: RunItem) -> None:
+    """Analiza un artículo y deja el ítem en `analizado`.
+
+    Si el artículo aún no está indexado, hace antes la ingesta
+    (`ingerir_item`) sin soltarlo. El trabajador las separa: ingiere, suelta
+    y el análisis lo toma quien quede libre.
+
+    No decide qué hacer con los fallos: los deja salir. Quien lo llama —el
+    trabajador o el endpoint— sabe si conviene reintentar, y esa decisión no
+    debería estar enterrada aquí.
+    """
+    run_id = run.id
+    if not ingesta.indexados(db, [item.articulo_id]):
+        ingerir_item(db, run, item, soltar=False)
+    art, arc, ruta_pdf = _archivo_del_item(db, item)
+    texto = _extraer(arc, ruta_pdf).texto
 
     pr = db.query(Proyecto).filter(Proyecto.id == run.proyecto_id).first()
     contexto = {
@@ -380,24 +417,13 @@ def procesar_item(db: Session, run: Run, item: RunItem) -> None:
         "objetivo": pr.objetivo,
     }
 
-    # --- Paso 0: indexar si hace falta ---
-    # La indexación estaba en `analizar_todo`, dentro de la petición HTTP, y
-    # es la otra parte lenta. Aquí es idempotente: lo ya indexado no se vuelve
-    # a pagar, así que un reintento no repite el gasto.
-    ya_indexado = (db.query(EmbeddingDoc.id)
-                     .filter(EmbeddingDoc.articulo_id == art.id).first())
-    if not ya_indexado:
-        from app.services.embedding_service import index_articulo
-
-        if index_articulo(db, art.id) == 0:
-            raise FalloDefinitivo(
-                "No se pudo indexar el artículo: sin archivo o sin texto.")
-
     # --- Paso 1: recuperar fragmentos por relevancia ---
     # Antes se usaba get_top_chunks(), que devolvía los primeros ocho
     # fragmentos del documento: el modelo solo veía resumen e introducción
-    # y nunca método, resultados ni discusión (M-10).
-    recuperados = recuperar_contexto(db, art.id, contexto, k=8)
+    # y nunca método, resultados ni discusión (M-10). Se recupera a la vez el
+    # de los siguientes artículos de la ejecución: comparten consulta.
+    recuperados = precarga_contextos.recuperar(db, run_id, run.proyecto_id,
+                                               art.id, contexto, k=8)
     support = [r["texto"] for r in recuperados]
 
     # Trazabilidad: qué fragmentos se usaron en este análisis.
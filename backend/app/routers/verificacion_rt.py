@@ -14,8 +14,6 @@ brecha en lugar de dos.
 
 from __future__ import annotations
 
-import uuid
-
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
@@ -28,28 +26,43 @@ from app.models.proyecto import Proyecto
 from app.models.resultado_brecha import ResultadoBrecha
 from app.models.run import Run
 from app.models.run_item import RunItem
+from app.services import escritura
 from app.services.verificacion import verificar
 
 router = APIRouter(prefix="/proyectos", tags=["verificacion"])
 
 
-def _fragmentos_de(db: Session, rb: ResultadoBrecha) -> list[dict]:
+def _ids_de(rb: ResultadoBrecha) -> list[str]:
+    hits = rb.rag_hits if isinstance(rb.rag_hits, list) else []
+    return [h.get("embedding_id") for h in hits
+            if isinstance(h, dict) and h.get("embedding_id")]
+
+
+def _textos_de(db: Session, brechas: list[ResultadoBrecha]) -> dict:
+    """Texto y seccion de los fragmentos de todas las brechas, de una vez.
+
+    Antes se pedian por brecha y fila completa, vector incluido, dentro del
+    bucle: una consulta por articulo del analisis para leer dos columnas.
+    """
+    ids = list(dict.fromkeys(i for rb in brechas for i in _ids_de(rb)))
+    por_id = {}
+    for ini in range(0, len(ids), 500):
+        for f in (db.query(EmbeddingDoc.id, EmbeddingDoc.texto, EmbeddingDoc.seccion)
+                  .filter(EmbeddingDoc.id.in_(ids[ini:ini + 500]))):
+            por_id[f.id] = f
+    return por_id
+
+
+def _fragmentos_de(rb: ResultadoBrecha, por_id: dict) -> list[dict]:
     """Reconstruye los fragmentos que se usaron al generar la brecha.
 
     rag_hits guarda los identificadores y la seccion, no el texto, para no
-    duplicar contenido; el texto se recupera de embedding_doc.
+    duplicar contenido; el texto se recupera de embedding_doc (`_textos_de`).
     """
-    hits = rb.rag_hits if isinstance(rb.rag_hits, list) else []
-    ids = [h.get("embedding_id") for h in hits
-           if isinstance(h, dict) and h.get("embedding_id")]
-    if not ids:
-        return []
-    filas = db.query(EmbeddingDoc).filter(EmbeddingDoc.id.in_(ids)).all()
-    por_id = {f.id: f for f in filas}
     # Se respeta el orden original: es el que vio el modelo al redactar.
     salida = []
-    for h in hits:
-        f = por_id.get(h.get("embedding_id"))
+    for i in _ids_de(rb):
+        f = por_id.get(i)
         if f:
             salida.append({"texto": f.texto, "seccion": f.seccion or "otro"})
     return salida
@@ -85,6 +98,9 @@ def verificar_proyecto(rehacer: bool = False,
                          Metrica.codigo == "N2.verificada",
                          Metrica.valor == 1.0).all()}
 
+    por_id = _textos_de(db, [rb for rb, _art in filas
+                             if rehacer or rb.id not in ya_hechas])
+
     resultados = []
     verificadas = 0
     for rb, art in filas:
@@ -92,7 +108,7 @@ def verificar_proyecto(rehacer: bool = False,
             resultados.append({"articulo": art.titulo, "estado": "ya verificada"})
             continue
 
-        fragmentos = _fragmentos_de(db, rb)
+        fragmentos = _fragmentos_de(rb, por_id)
         if not fragmentos:
             resultados.append({
                 "articulo": art.titulo,
@@ -110,10 +126,11 @@ def verificar_proyecto(rehacer: bool = False,
                  Metrica.codigo.in_(["N2.1", "N2.2", "N2.4", "N2.verificada"]))
          .delete(synchronize_session=False))
 
+        medidas = []
+
         def _add(codigo, valor, detalle=None):
-            db.add(Metrica(id=str(uuid.uuid4()), proyecto_id=proyecto_id,
-                           ambito=AMBITO_BRECHA, referencia_id=rb.id,
-                           codigo=codigo, valor=valor, detalle=detalle))
+            medidas.append(escritura.metrica(proyecto_id, AMBITO_BRECHA, rb.id,
+                                             codigo, valor, detalle))
 
         if v.disponible:
             _add("N2.1", v.fidelidad,
@@ -123,6 +140,7 @@ def verificar_proyecto(rehacer: bool = False,
             _add("N2.4", v.equilibrio_evidencial)
             verificadas += 1
         _add("N2.verificada", 1.0 if v.disponible else 0.0, v.resumen())
+        escritura.metricas(db, medidas)
         db.commit()
 
         resultados.append({
@@ -22,15 +22,24 @@ de rastrear `open()` por el proyecto.
 La carpeta por usuario no es organizacion: es que el aislamiento entre
 cuentas valga tambien en el disco. Con todos los PDF en el mismo directorio,
 un error al construir un nombre podia servir el archivo de otra persona.
+
+Las subidas se escriben por trozos (`Escritura`): la subida leia el PDF
+entero en memoria para calcular su sha256 y guardarlo, y varias subidas a la
+vez de escaneos de 50 MB disparaban la memoria del servidor. Cada trozo va a
+un temporal en `STORAGE_DIR/_subidas` y actualiza el sha256; al terminar, el
+temporal se renombra a su clave —en el mismo disco, asi que el archivo
+aparece entero o no aparece— o se descarta si el PDF ya estaba.
 """
 
 from __future__ import annotations
 
+import hashlib
 import os
 import re
+import tempfile
 import uuid
 
-from app.config import STORAGE_DIR
+from app.config import MAX_SUBIDA_MB, STORAGE_DIR
 
 # Solo lo que puede aparecer en una clave legitima. Se comprueba en lugar de
 # confiar: una clave con `..` permitiria leer cualquier fichero de la maquina,
@@ -39,10 +48,17 @@ from app.config import STORAGE_DIR
 CLAVE_VALIDA = re.compile(r"^[0-9a-fA-F-]{36}/[0-9a-fA-F-]{36}\.pdf$")
 
 
+MAX_SUBIDA_BYTES = MAX_SUBIDA_MB * 1024 * 1024
+
+
 class ClaveInvalida(ValueError):
     """La clave no tiene la forma esperada y no se va a tocar el disco."""
 
 
+class ArchivoDemasiadoGrande(ValueError):
+    """El archivo pasa del tamano maximo; no se ha guardado nada."""
+
+
 def _raiz() -> str:
     return os.path.abspath(STORAGE_DIR)
 
@@ -64,6 +80,69 @@ def guardar(clave: str, datos: bytes) -> str:
     return clave
 
 
+class Escritura:
+    """Un archivo que se recibe por trozos, con su sha256 y su tamano.
+
+    Uso:
+        with almacenamiento.Escritura() as esc:
+            for trozo in ...:
+                esc.escribir(trozo)       # ArchivoDemasiadoGrande si se pasa
+            if ya_estaba(esc.huella):
+                return ...                # al salir se descarta el temporal
+            esc.confirmar(clave)
+
+    Ocupa en memoria lo que un trozo, sea cual sea el tamano del archivo.
+    """
+
+    def __init__(self, max_bytes: int | None = None):
+        self.max_bytes = MAX_SUBIDA_BYTES if max_bytes is None else max_bytes
+        self.bytes = 0
+        self._sha = hashlib.sha256()
+        carpeta = os.path.join(_raiz(), "_subidas")
+        os.makedirs(carpeta, exist_ok=True)
+        fd, self._ruta = tempfile.mkstemp(dir=carpeta, suffix=".parcial")
+        self._f = os.fdopen(fd, "wb")
+
+    def escribir(self, trozo: bytes) -> None:
+        self.bytes += len(trozo)
+        if self.max_bytes and self.bytes > self.max_bytes:
+            raise ArchivoDemasiadoGrande(
+                "El archivo pasa de %d MB." % (self.max_bytes // (1024 * 1024)))
+        self._sha.update(trozo)
+        self._f.write(trozo)
+
+    @property
+    def huella(self) -> str:
+        return self._sha.hexdigest()
+
+    def confirmar(self, clave: str) -> str:
+        """Pone el archivo bajo su clave, de una vez, y devuelve la clave."""
+        if not CLAVE_VALIDA.match(clave):
+            raise ClaveInvalida("Clave con formato inesperado: %r" % clave)
+        destino = os.path.join(_raiz(), *clave.split("/"))
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        self._f.close()
+        os.replace(self._ruta, destino)
+        self._ruta = None
+        return clave
+
+    def descartar(self) -> None:
+        self._f.close()
+        if self._ruta is not None:
+            try:
+                os.remove(self._ruta)
+            except FileNotFoundError:
+                pass
+            self._ruta = None
+
+    def __enter__(self) -> "Escritura":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        # Sin confirmar —un duplicado, un error, una subida cortada— no queda nada.
+        self.descartar()
+
+
 def ruta_local(clave_o_ruta: str) -> str:
     """Un camino del sistema de ficheros que se puede abrir.
 
@@ -0,0 +1,211 @@
+# app/services/cache_embeddings.py
+"""
+Vectores ya pedidos al modelo, para no pedirlos dos veces.
+
+Lo que se embebe se repite mucho. La consulta de recuperacion se construye
+con el contexto del proyecto y es la misma para todos sus articulos, pero se
+embebia una vez por articulo. Y reindexar volvia a pedir todos los
+fragmentos aunque su texto no hubiera cambiado: tras ajustar solo el solape,
+o tras reetiquetar secciones, casi todos son identicos. En modo real cada
+texto gasta cuota por minuto y espera su turno en `limitador_embeddings`,
+para obtener un vector que ya se tenia.
+
+`_embed_texts` consulta aqui antes de llamar y solo pide lo que falta.
+
+Dos niveles, consultados en orden:
+
+- **En memoria**, por proceso y con descarte por antiguedad de uso. Acierta
+  con la consulta en todos los articulos de una ejecucion salvo el primero.
+- **En la base** (`cache_embedding`). Sobrevive a reinicios y se comparte
+  entre el servidor y los trabajadores. Se lee y se escribe con una sesion
+  propia y corta, como el registro de llamadas: una consulta a la cache no
+  debe arrastrar ni confirmar la transaccion de quien la pide, y si falla
+  solo se pierde el atajo.
+
+La clave es (modelo, dimension, sha256 del texto normalizado). El modelo y
+la dimension van en la clave porque el mismo texto da vectores distintos con
+otro modelo o truncado a otra longitud, y mezclarlos seria silencioso.
+
+En modo simulado la capa de la base esta apagada por defecto: esos vectores
+no cuestan nada y solo llenarian la tabla.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from app.services.vectores import desempaquetar, empaquetar
+
+# Vectores que se guardan en memoria por proceso. A 768 dimensiones son unos
+# 3 KB cada uno: 4096 ocupan unos 12 MB. Los fragmentos de una indexacion
+# pasan tambien por aqui, asi que conviene que quepa al menos un articulo.
+CACHE_EMBEDDINGS_N = int(os.getenv("CACHE_EMBEDDINGS_N", "4096"))
+
+_MODO = os.getenv("GEMINI_MODE", "mock").lower()
+PERSISTENTE = os.getenv(
+    "CACHE_EMBEDDINGS_BD", "1" if _MODO == "real" else "0"
+) not in ("0", "false", "False")
+
+# Huellas por consulta IN. Cada una son 64 caracteres: 500 dejan la
+# sentencia en unos 35 KB, muy por debajo de max_allowed_packet.
+LOTE = 500
+
+Clave = Tuple[str, int, str]
+
+
+def normalizar_texto(texto: str | None) -> str:
+    """Texto tal como se compara: sin espacios de mas.
+
+    Los saltos de linea y espacios dobles dependen del extractor y no del
+    contenido; dos extracciones del mismo PDF que solo difieran en eso deben
+    reconocerse como el mismo texto.
+    """
+    return " ".join((texto or "").split())
+
+
+def huella(texto: str | None) -> str:
+    return hashlib.sha256(normalizar_texto(texto).encode("utf-8")).hexdigest()
+
+
+class CacheEmbeddings:
+    """Vectores por (modelo, dimension, huella), en memoria y en la base."""
+
+    def __init__(self, capacidad: int = CACHE_EMBEDDINGS_N):
+        self.capacidad = max(0, capacidad)
+        self._memoria: "OrderedDict[Clave, np.ndarray]" = OrderedDict()
+        self._cerrojo = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_bd = 0
+        self.fallos = 0
+
+    # ------------------------------------------------------------- memoria
+    def _recordar(self, clave: Clave, vector: np.ndarray) -> None:
+        if not self.capacidad:
+            return
+        with self._cerrojo:
+            self._memoria[clave] = vector
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.capacidad:
+                self._memoria.popitem(last=False)
+
+    # ---------------------------------------------------------- consultas
+    def buscar(self, modelo: str, dimension: int,
+               huellas: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Los vectores que ya se tienen, por huella. Faltan los que no."""
+        encontrados: Dict[str, np.ndarray] = {}
+        pendientes = []
+        with self._cerrojo:
+            for h in dict.fromkeys(huellas):
+                v = self._memoria.get((modelo, dimension, h))
+                if v is None:
+                    pendientes.append(h)
+                else:
+                    self._memoria.move_to_end((modelo, dimension, h))
+                    encontrados[h] = v
+        self.aciertos_memoria += len(encontrados)
+
+        if pendientes and PERSISTENTE:
+            de_bd = _leer(modelo, dimension, pendientes)
+            for h, v in de_bd.items():
+                self._recordar((modelo, dimension, h), v)
+            encontrados.update(de_bd)
+            self.aciertos_bd += len(de_bd)
+            pendientes = [h for h in pendientes if h not in de_bd]
+
+        self.fallos += len(pendientes)
+        return encontrados
+
+    def guardar(self, modelo: str, dimension: int,
+                vectores: Dict[str, Iterable[float]]) -> None:
+        """Anota vectores recien calculados. Nunca lanza excepcion."""
+        if not vectores:
+            return
+        arreglos = {h: desempaquetar(empaquetar(v)) for h, v in vectores.items()}
+        for h, v in arreglos.items():
+            self._recordar((modelo, dimension, h), v)
+        if PERSISTENTE:
+            _escribir(modelo, dimension, arreglos)
+
+    def vaciar(self) -> None:
+        """Olvida la copia en memoria. La tabla no se toca."""
+        with self._cerrojo:
+            self._memoria.clear()
+
+    def estadisticas(self) -> dict:
+        consultas = self.aciertos_memoria + self.aciertos_bd + self.fallos
+        return {
+            "ambito": "este proceso, desde que arranco",
+            "en_memoria": len(self._memoria),
+            "capacidad": self.capacidad,
+            "persistente": PERSISTENTE,
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_bd": self.aciertos_bd,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(
+                (self.aciertos_memoria + self.aciertos_bd) / consultas, 4
+            ) if consultas else None,
+        }
+
+
+# ------------------------------------------------------------------ la base
+def _leer(modelo: str, dimension: int, huellas) -> Dict[str, np.ndarray]:
+    try:
+        from app.database import SessionLocal
+        from app.models.cache_embedding import CacheEmbedding as CE
+
+        s = SessionLocal()
+        try:
+            salida = {}
+            for ini in range(0, len(huellas), LOTE):
+                filas = (s.query(CE.huella, CE.vector)
+                         .filter(CE.modelo == modelo, CE.dimension == dimension,
+                                 CE.huella.in_(huellas[ini:ini + LOTE])).all())
+                for h, datos in filas:
+                    v = desempaquetar(datos)
+                    if len(v):
+                        salida[h] = v
+            return salida
+        finally:
+            s.close()
+    except Exception:
+        # Sin base no hay atajo, pero tampoco error: se pide a la API.
+        return {}
+
+
+def _escribir(modelo: str, dimension: int, vectores: Dict[str, np.ndarray]) -> None:
+    try:
+        from sqlalchemy import insert
+
+        from app.database import SessionLocal
+        from app.models.cache_embedding import CacheEmbedding as CE
+
+        s = SessionLocal()
+        try:
+            # Solo las que faltan: dos procesos pueden calcular el mismo
+            # texto a la vez, y el segundo no debe fallar por ello.
+            ya = set()
+            huellas = list(vectores)
+            for ini in range(0, len(huellas), LOTE):
+                ya.update(h for (h,) in s.query(CE.huella).filter(
+                    CE.modelo == modelo, CE.dimension == dimension,
+                    CE.huella.in_(huellas[ini:ini + LOTE])))
+            filas = [{"modelo": modelo, "dimension": dimension, "huella": h,
+                      "vector": empaquetar(v)}
+                     for h, v in vectores.items() if h not in ya]
+            if filas:
+                s.execute(insert(CE).prefix_with("IGNORE", dialect="mysql"), filas)
+                s.commit()
+        finally:
+            s.close()
+    except Exception:
+        # Deliberado, como en registro_api: la cache es un atajo, no un dato.
+        pass
+
+
+cache = CacheEmbeddings()
@@ -0,0 +1,208 @@
+# app/services/cache_extraccion.py
+"""
+Texto extraido de cada PDF, para no leerlo mas de una vez.
+
+El mismo PDF se leia en cada paso que necesitaba su texto: al subirlo, para
+el titulo y el DOI; al indexarlo; al analizarlo, para el diagnostico N0; y
+en scripts/reetiquetar_secciones.py e indexar_proyecto.py. Con un PDF
+digital son uno o dos segundos cada vez; con pdfminer o con OCR, decenas.
+El resultado es siempre el mismo: solo depende del archivo, del extractor y
+del limite de caracteres.
+
+`extraer` devuelve el mismo `DiagnosticoExtraccion` que
+`extraer_con_diagnostico`, pero solo lee el PDF si no lo tiene:
+
+- **En memoria**, los ultimos `CACHE_EXTRACCION_N`, por proceso. Indexar y
+  analizar un articulo van seguidos en el mismo trabajador.
+- **En la base** (`cache_extraccion`), comprimido. Se comparte entre el
+  servidor, que lo lee al subir el PDF, y los trabajadores. Sesion propia y
+  corta, como la cache de embeddings: si falla solo se pierde el atajo.
+
+La clave es (sha256 del PDF, `VERSION_EXTRACTOR`, max_chars). Al cambiar la
+extraccion o la limpieza se sube la version y los PDF se vuelven a leer.
+
+Los resultados no utilizables no se guardan en la base: suelen ser PDF
+escaneados sin OCR instalado, y deben volver a intentarse cuando lo este.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Tuple
+
+from app.utils.text_extractor import (
+    VERSION_EXTRACTOR,
+    DiagnosticoExtraccion,
+    extraer_con_diagnostico,
+)
+
+# Extracciones que se guardan en memoria por proceso. Con el limite por
+# defecto de 120 000 caracteres, 16 son menos de 4 MB.
+CACHE_EXTRACCION_N = int(os.getenv("CACHE_EXTRACCION_N", "16"))
+PERSISTENTE = os.getenv("CACHE_EXTRACCION_BD", "1") not in ("0", "false", "False")
+
+MAX_CHARS = 120_000
+
+Clave = Tuple[str, str, int]
+
+
+def huella_archivo(ruta: str) -> str:
+    """sha256 del archivo, el mismo que se guarda en `archivo.hash_sha256`."""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _copia(d: DiagnosticoExtraccion) -> DiagnosticoExtraccion:
+    """Los llamadores pueden anadir avisos: no deben tocar el de la cache."""
+    return DiagnosticoExtraccion(**{**asdict(d), "secciones": set(d.secciones),
+                                    "avisos": list(d.avisos)})
+
+
+class CacheExtraccion:
+    """Extracciones por (huella, version, max_chars), en memoria y en la base."""
+
+    def __init__(self, capacidad: int = CACHE_EXTRACCION_N):
+        self.capacidad = max(0, capacidad)
+        self._memoria: "OrderedDict[Clave, DiagnosticoExtraccion]" = OrderedDict()
+        self._cerrojo = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_bd = 0
+        self.fallos = 0
+
+    def _recordar(self, clave: Clave, d: DiagnosticoExtraccion) -> None:
+        if not self.capacidad:
+            return
+        with self._cerrojo:
+            self._memoria[clave] = d
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.capacidad:
+                self._memoria.popitem(last=False)
+
+    def buscar(self, huella: str, max_chars: int = MAX_CHARS) -> DiagnosticoExtraccion | None:
+        """La extraccion ya hecha de ese PDF, o None. No lee el archivo."""
+        clave = (huella, VERSION_EXTRACTOR, max_chars)
+        with self._cerrojo:
+            d = self._memoria.get(clave)
+            if d is not None:
+                self._memoria.move_to_end(clave)
+        if d is not None:
+            self.aciertos_memoria += 1
+            return _copia(d)
+        d = _leer(clave) if PERSISTENTE else None
+        if d is None:
+            self.fallos += 1
+            return None
+        self.aciertos_bd += 1
+        self._recordar(clave, d)
+        return _copia(d)
+
+    def guardar(self, huella: str, max_chars: int, d: DiagnosticoExtraccion) -> None:
+        """Anota una extraccion recien hecha. Nunca lanza excepcion."""
+        clave = (huella, VERSION_EXTRACTOR, max_chars)
+        d = _copia(d)
+        if PERSISTENTE and d.utilizable:
+            _escribir(clave, d)
+        self._recordar(clave, d)
+
+    def extraer(self, ruta: str, max_chars: int = MAX_CHARS,
+                huella: str | None = None) -> DiagnosticoExtraccion:
+        """Texto y diagnostico del PDF; solo lo lee si no se tiene ya.
+
+        `huella` es el sha256 del archivo. Quien tiene la fila de `archivo`
+        lo pasa y se ahorra volver a leer el PDF para calcularlo.
+        """
+        huella = huella or huella_archivo(ruta)
+        d = self.buscar(huella, max_chars)
+        if d is None:
+            d = extraer_con_diagnostico(ruta, max_chars=max_chars)
+            self.guardar(huella, max_chars, d)
+        return d
+
+    def vaciar(self) -> None:
+        """Olvida la copia en memoria. La tabla no se toca."""
+        with self._cerrojo:
+            self._memoria.clear()
+
+    def estadisticas(self) -> dict:
+        consultas = self.aciertos_memoria + self.aciertos_bd + self.fallos
+        return {
+            "ambito": "este proceso, desde que arranco",
+            "en_memoria": len(self._memoria),
+            "capacidad": self.capacidad,
+            "persistente": PERSISTENTE,
+            "version_extractor": VERSION_EXTRACTOR,
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_bd": self.aciertos_bd,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(
+                (self.aciertos_memoria + self.aciertos_bd) / consultas, 4
+            ) if consultas else None,
+        }
+
+
+# ------------------------------------------------------------------ la base
+def _leer(clave: Clave) -> DiagnosticoExtraccion | None:
+    try:
+        from app.database import SessionLocal
+        from app.models.cache_extraccion import CacheExtraccion as CX
+
+        s = SessionLocal()
+        try:
+            fila = (s.query(CX.texto, CX.diagnostico)
+                    .filter(CX.huella == clave[0], CX.version == clave[1],
+                            CX.max_chars == clave[2]).first())
+        finally:
+            s.close()
+        if fila is None:
+            return None
+        campos = dict(fila.diagnostico)
+        campos["secciones"] = set(campos.get("secciones") or ())
+        return DiagnosticoExtraccion(texto=zlib.decompress(fila.texto).decode("utf-8"),
+                                     **campos)
+    except Exception:
+        # Sin base, o una fila de un formato que ya no encaja: se lee el PDF.
+        return None
+
+
+def _escribir(clave: Clave, d: DiagnosticoExtraccion) -> None:
+    try:
+        from sqlalchemy import insert
+
+        from app.database import SessionLocal
+        from app.models.cache_extraccion import CacheExtraccion as CX
+
+        diagnostico = asdict(d)
+        del diagnostico["texto"]
+        diagnostico["secciones"] = sorted(d.secciones)
+        s = SessionLocal()
+        try:
+            # IGNORE: el servidor y un trabajador pueden leer el mismo PDF a
+            # la vez, y el segundo no debe fallar por ello.
+            s.execute(insert(CX).prefix_with("IGNORE", dialect="mysql"), [{
+                "huella": clave[0], "version": clave[1], "max_chars": clave[2],
+                "texto": zlib.compress(d.texto.encode("utf-8"), 6),
+                "diagnostico": diagnostico,
+            }])
+            s.commit()
+        finally:
+            s.close()
+    except Exception:
+        # Deliberado, como en cache_embeddings: la cache es un atajo, no un dato.
+        pass
+
+
+cache = CacheExtraccion()
+
+
+def extraer(ruta: str, max_chars: int = MAX_CHARS,
+            huella: str | None = None) -> DiagnosticoExtraccion:
+    """`extraer_con_diagnostico` a traves de la cache del proceso."""
+    return cache.extraer(ruta, max_chars=max_chars, huella=huella)
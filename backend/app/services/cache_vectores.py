@@ -0,0 +1,524 @@
+# app/services/cache_vectores.py
+"""
+Vectores de cada proyecto en memoria, listos para multiplicar.
+
+Cada recuperacion de contexto volvia a pedir a la base todos los fragmentos
+del articulo y a reconstruir con ellos listas de Python. Entre un articulo y
+el siguiente de la misma ejecucion no cambia nada, asi que ese trabajo se
+repetia entero para obtener lo mismo.
+
+Aqui se guarda, por proyecto, una matriz con los vectores ya normalizados y,
+en paralelo, los identificadores, articulos, secciones y posiciones de cada
+fila. Se carga una vez y, a partir de ahi, puntuar un articulo es una
+multiplicacion de matriz por vector.
+
+El texto de los fragmentos no entra en la matriz: es lo que mas pesa y solo
+hace falta el de los pocos que se eligen. Se pide despues, por identificador.
+
+Dos cosas la mantienen correcta y acotada:
+
+- **Invalidacion.** Quien escribe o borra fragmentos incrementa
+  `proyecto.generacion_vectores`. Cada proceso compara la generacion con la
+  de su copia antes de usarla —como mucho una vez cada `REVALIDAR_SEG`—, de
+  modo que lo que indexa el trabajador lo ve tambien el servidor web, sin
+  que ninguno tenga que avisar al otro.
+- **Presupuesto de memoria.** Se descartan primero los proyectos usados hace
+  mas tiempo hasta quedar por debajo de `CACHE_VECTORES_MB`. El servidor y
+  cada trabajador tienen su propia copia, y ninguno debe crecer sin limite.
+
+Con `VECTORES_INT8` la matriz se guarda cuantizada (app/services/
+cuantizacion.py), en la cuarta parte de memoria. Sus puntuaciones son
+aproximadas: sirven para elegir candidatos, y `repuntuar` vuelve a puntuar
+con el vector completo, leido de la base, solo a los que pueden ganar.
+
+Con `BUSQUEDA_PREFIJO_DIM` la primera pasada usa solo las primeras columnas
+de cada vector, renormalizadas. El modelo de embeddings se entrena para que
+ese prefijo sea por si mismo un embedding valido (Matryoshka), asi que
+basta para preseleccionar; los candidatos se repuntuan con todas sus
+dimensiones, que en este caso ya estan en memoria.
+
+Con `VECTORES_MMAP` los vectores no se piden a la base: se mapea el archivo
+del proyecto (app/services/vectores_mmap.py) y la matriz es una vista suya,
+compartida con el resto de procesos. A la base solo se le piden los
+identificadores, secciones y posiciones, y los vectores que el archivo no
+tenga.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Set
+
+import numpy as np
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.models.articulo import Articulo
+from app.models.embedding_doc import EmbeddingDoc
+from app.models.proyecto import Proyecto
+from app.services import cuantizacion, vectores_mmap
+from app.services.indice_ann import mejores
+from app.services.vectores import completar_desde_json, desempaquetar
+
+# Memoria maxima por proceso. Un proyecto de mil articulos con unos cuarenta
+# fragmentos cada uno ocupa en torno a 120 MB a 768 dimensiones.
+CACHE_VECTORES_MB = int(os.getenv("CACHE_VECTORES_MB", "256"))
+
+# Cada cuanto se comprueba que la copia sigue vigente. Es una consulta por
+# clave primaria, barata, pero hacerla en cada busqueda la pondria en el
+# camino de todas. Dentro del mismo proceso la invalidacion es inmediata.
+REVALIDAR_SEG = float(os.getenv("CACHE_VECTORES_REVALIDAR_SEG", "2"))
+
+# Matriz en int8 en lugar de float32. Cuesta una consulta por busqueda para
+# leer los vectores completos de los candidatos, a cambio de que cada
+# proyecto ocupe la cuarta parte: compensa cuando los proyectos no caben en
+# CACHE_VECTORES_MB y se estaban recargando de la base una y otra vez.
+VECTORES_INT8 = os.getenv("VECTORES_INT8", "0") not in ("0", "false", "False")
+
+# Candidatos que se vuelven a puntuar con el vector completo, por cada
+# resultado pedido, y como minimo. Con menos, alguno de los mejores puede
+# quedar fuera por el error de la cuantizacion.
+INT8_CANDIDATOS = int(os.getenv("VECTORES_INT8_CANDIDATOS", "4"))
+INT8_MIN_CANDIDATOS = 32
+
+# Dimensiones del prefijo con que se preselecciona, y candidatos por cada
+# resultado pedido. 0 la desactiva. Tiene sentido con vectores anchos
+# (EMBED_DIM=3072): recorrer el proyecto cuesta lo que el prefijo, no lo
+# que el vector. Cuanto mas corto el prefijo, mas candidatos necesita; con
+# 256 dimensiones y 16 por resultado se recupera en torno al 96 % del top-k
+# exacto (scripts/medir_busqueda_prefijo.py).
+PREFIJO_DIM = int(os.getenv("BUSQUEDA_PREFIJO_DIM", "0"))
+PREFIJO_CANDIDATOS = int(os.getenv("BUSQUEDA_PREFIJO_CANDIDATOS", "16"))
+
+
+@dataclass
+class MatrizProyecto:
+    """Los vectores de un proyecto y lo que describe a cada fila."""
+
+    proyecto_id: str
+    generacion: int
+    ids: np.ndarray                 # identificador de cada fragmento
+    articulos: np.ndarray           # articulo al que pertenece
+    secciones: np.ndarray           # seccion, u "otro"
+    ordenes: np.ndarray             # chunk_orden
+    # float32, filas de norma 1; o su version cuantizada con VECTORES_INT8.
+    matriz: np.ndarray | cuantizacion.Cuantizada
+    por_articulo: Dict[str, np.ndarray] = field(default_factory=dict)
+    revisada: float = 0.0
+    bytes: int = 0
+    # Primeras PREFIJO_DIM columnas de `matriz`, renormalizadas y contiguas.
+    # Solo con BUSQUEDA_PREFIJO_DIM y la matriz en float32.
+    prefijo: np.ndarray | None = None
+    # Particion IVF de las filas (app/services/indice_ann.py). Solo se
+    # construye para proyectos grandes, la primera vez que hace falta.
+    particion: Any = None
+    # (clave, Particion) de las filas entre los centroides del usuario, para
+    # buscar en varios proyectos a la vez (indice_ann.Cuantizador).
+    comun: Any = None
+    # Version de los embeddings de las filas ("modelo/dim"): la consulta debe
+    # embeberse con ella. None si el proyecto aun no tiene.
+    version: str | None = None
+
+    def filas_de(self, articulo_id: str) -> np.ndarray:
+        """Filas del articulo, en su orden de aparicion en el documento."""
+        return self.por_articulo.get(articulo_id, np.empty(0, dtype=np.int64))
+
+
+def normalizar(consulta) -> np.ndarray:
+    """Vector de consulta con norma 1, para comparar contra la matriz."""
+    q = np.asarray(consulta, dtype=np.float32)
+    n = float(np.linalg.norm(q))
+    return q / n if n else q
+
+
+def ajustar(consulta: np.ndarray, ancho: int) -> np.ndarray:
+    """La consulta recortada o rellenada con ceros hasta `ancho`."""
+    q = consulta[:ancho]
+    if len(q) < ancho:
+        q = np.pad(q, (0, ancho - len(q)))
+    return q
+
+
+def es_aproximada(m: MatrizProyecto) -> bool:
+    """Si `puntuar` solo preselecciona y hay que llamar despues a `repuntuar`."""
+    return m.prefijo is not None or isinstance(m.matriz, cuantizacion.Cuantizada)
+
+
+def puntuar(m: MatrizProyecto, filas: np.ndarray, consulta: np.ndarray) -> np.ndarray:
+    """Coseno de la consulta normalizada contra unas filas de la matriz.
+
+    Si las dimensiones no coinciden se compara el tramo comun, igual que
+    hacia el coseno fila a fila. Con la matriz cuantizada, o con prefijo, es
+    aproximado.
+    """
+    if m.prefijo is not None:
+        return m.prefijo[filas] @ normalizar(ajustar(consulta, m.prefijo.shape[1]))
+    q = ajustar(consulta, m.matriz.shape[1])
+    if es_aproximada(m):
+        return m.matriz.puntuar(filas, q)
+    return m.matriz[filas] @ q
+
+
+def candidatos(m: MatrizProyecto, top_k: int) -> int:
+    """Cuantos hay que preseleccionar para devolver `top_k` exactos."""
+    if not es_aproximada(m):
+        return top_k
+    factor = PREFIJO_CANDIDATOS if m.prefijo is not None else INT8_CANDIDATOS
+    return max(factor * top_k, INT8_MIN_CANDIDATOS)
+
+
+def exactos(db: Session, m: MatrizProyecto, filas: np.ndarray) -> np.ndarray:
+    """Vectores completos y normalizados de unas filas, en su orden.
+
+    Con la matriz en float32 son sus filas. Cuantizada, se leen de la base
+    en una consulta; si alguno ya no esta —se reindexo entre tanto— se usa
+    su version aproximada en lugar de fallar.
+    """
+    if not isinstance(m.matriz, cuantizacion.Cuantizada):
+        return m.matriz[filas]
+    ancho = m.matriz.shape[1]
+    ids = [m.ids[f] for f in filas]
+    vectores: Dict[str, np.ndarray] = {}
+    for ini in range(0, len(ids), 500):
+        for fid, datos in (db.query(EmbeddingDoc.id, EmbeddingDoc.vector)
+                           .filter(EmbeddingDoc.id.in_(ids[ini:ini + 500]))):
+            vectores[fid] = desempaquetar(datos)
+    completar_desde_json(db, vectores)
+    salida = np.asarray(m.matriz[filas], dtype=np.float32).reshape(len(filas), ancho)
+    for i, fid in enumerate(ids):
+        v = vectores.get(fid)
+        if v is not None and len(v):
+            salida[i] = normalizar(ajustar(np.asarray(v, dtype=np.float32), ancho))
+    return salida
+
+
+def repuntuar(db: Session, m: MatrizProyecto, filas: np.ndarray, scores: np.ndarray,
+              consulta: np.ndarray, top_k: int):
+    """Las `top_k` mejores filas, con su puntuacion exacta.
+
+    `scores` son las de `puntuar`. Con la matriz en float32 ya son exactas y
+    basta quedarse con las mejores; cuantizada o con prefijo, se
+    preseleccionan `candidatos` y solo esas se puntuan con el vector
+    completo.
+    """
+    if es_aproximada(m):
+        elegidas = mejores(scores, candidatos(m, top_k))
+        filas = filas[elegidas]
+        scores = exactos(db, m, filas) @ ajustar(consulta, m.matriz.shape[1])
+    elegidas = mejores(scores, top_k)
+    return filas[elegidas], scores[elegidas]
+
+
+def _generacion(db: Session, proyecto_id: str) -> int:
+    return int(db.query(Proyecto.generacion_vectores)
+               .filter(Proyecto.id == proyecto_id).scalar() or 0)
+
+
+def _matriz(vectores) -> np.ndarray:
+    """Los vectores como filas de norma 1, rellenas con ceros al mas ancho."""
+    ancho = max((len(v) for v in vectores), default=0)
+    matriz = np.zeros((len(vectores), ancho), dtype=np.float32)
+    for i, v in enumerate(vectores):
+        matriz[i, :len(v)] = v
+    normas = np.linalg.norm(matriz, axis=1)
+    normas[normas == 0] = 1.0
+    matriz /= normas[:, None]
+    return matriz
+
+
+def prefijo_de(matriz: np.ndarray, dim: int) -> np.ndarray:
+    """Las primeras `dim` columnas, con cada fila de nuevo de norma 1.
+
+    Se copian a una matriz propia: recorrer una vista con salto de fila
+    ancho costaria casi lo mismo que recorrer la matriz entera.
+    """
+    prefijo = np.ascontiguousarray(matriz[:, :dim], dtype=np.float32)
+    normas = np.linalg.norm(prefijo, axis=1)
+    normas[normas == 0] = 1.0
+    prefijo /= normas[:, None]
+    return prefijo
+
+
+def _cuantizados(db: Session, filas) -> Dict[str, cuantizacion.Cuantizada]:
+    """Vector int8 de cada fila; los que no lo tienen se cuantizan aqui.
+
+    Son los indexados antes de que existiera la columna. Solo de ellos se
+    transfiere el vector completo.
+    """
+    salida = {}
+    for f in filas:
+        c = cuantizacion.desempaquetar(f.vector_int8)
+        if c is not None:
+            salida[f.id] = c
+    faltan = {f.id: None for f in filas if f.id not in salida}
+    for ini in range(0, len(faltan), 500):
+        tramo = list(faltan)[ini:ini + 500]
+        for fid, datos in (db.query(EmbeddingDoc.id, EmbeddingDoc.vector)
+                           .filter(EmbeddingDoc.id.in_(tramo))):
+            faltan[fid] = desempaquetar(datos)
+    completar_desde_json(db, faltan)
+    for fid, v in faltan.items():
+        if v is not None and len(v):
+            salida[fid] = cuantizacion.cuantizar(_matriz([v]))
+    return salida
+
+
+def _desde_disco(db: Session, proyecto_id: str, filas):
+    """Filas y matriz tomando los vectores del archivo mapeado.
+
+    `filas` llegan de la base ordenadas por articulo y posicion, sin vector.
+    Un articulo sale entero del archivo o entero de la base, para que sus
+    filas sigan siendo un tramo contiguo. Los del archivo se ordenan como
+    estan en el: si son todas sus filas seguidas, la matriz es una vista del
+    archivo y no se copia nada; si no —quedan fragmentos borrados en medio,
+    o falta alguno—, se copian las que hacen falta, que siguen viniendo de
+    la cache de paginas y no de la base.
+    """
+    mapa = vectores_mmap.abrir(proyecto_id)
+    posicion = mapa.filas if mapa is not None else {}
+
+    grupos, de_base = [], []
+    for ini, fin in _tramos([f.articulo_id for f in filas]):
+        grupo = filas[ini:fin]
+        if all(f.id in posicion for f in grupo):
+            grupos.append(grupo)
+        else:
+            de_base.extend(grupo)
+    grupos.sort(key=lambda g: posicion[g[0].id])
+    en_disco = [f for g in grupos for f in g]
+    orden = np.array([posicion[f.id] for f in en_disco], dtype=np.int64)
+
+    vectores = {}
+    if de_base:
+        ids = [f.id for f in de_base]
+        for ini in range(0, len(ids), 500):
+            for fid, datos in (db.query(EmbeddingDoc.id, EmbeddingDoc.vector)
+                               .filter(EmbeddingDoc.id.in_(ids[ini:ini + 500]))):
+                vectores[fid] = desempaquetar(datos)
+        completar_desde_json(db, vectores)
+        de_base = [f for f in de_base if len(vectores.get(f.id, ()))]
+
+    if not de_base:
+        if len(orden) and (np.diff(orden) == 1).all():
+            return en_disco, mapa.matriz[orden[0]:orden[-1] + 1]
+        if mapa is not None:
+            return en_disco, np.asarray(mapa.matriz[orden], dtype=np.float32)
+    base = _matriz([vectores[f.id] for f in de_base])
+    ancho = max(base.shape[1], mapa.matriz.shape[1] if en_disco else 0)
+    matriz = np.zeros((len(en_disco) + len(base), ancho), dtype=np.float32)
+    if en_disco:
+        matriz[:len(en_disco), :mapa.matriz.shape[1]] = mapa.matriz[orden]
+    matriz[len(en_disco):, :base.shape[1]] = base
+    return en_disco + de_base, matriz
+
+
+def _tramos(valores):
+    """Inicio y fin de cada serie de valores iguales consecutivos."""
+    ini = 0
+    for i in range(1, len(valores) + 1):
+        if i == len(valores) or valores[i] != valores[ini]:
+            yield ini, i
+            ini = i
+
+
+def _cargar(db: Session, proyecto_id: str) -> MatrizProyecto:
+    generacion, version = (db.query(Proyecto.generacion_vectores, Proyecto.version_embeddings)
+                           .filter(Proyecto.id == proyecto_id).first() or (0, None))
+    generacion = int(generacion or 0)
+    columnas = [EmbeddingDoc.id, EmbeddingDoc.articulo_id,
+                EmbeddingDoc.seccion, EmbeddingDoc.chunk_orden]
+    if VECTORES_INT8:
+        columnas.append(EmbeddingDoc.vector_int8)
+    elif not vectores_mmap.VECTORES_MMAP:
+        columnas.append(EmbeddingDoc.vector)
+    consulta = (db.query(*columnas)
+                .join(Articulo, Articulo.id == EmbeddingDoc.articulo_id)
+                .filter(Articulo.proyecto_id == proyecto_id))
+    if version:
+        # Solo los vectores de la version del proyecto: durante una migracion
+        # conviven con los de otra, y compararlos no significa nada. Las
+        # filas sin etiquetar se toman por de la version del proyecto.
+        consulta = consulta.filter(or_(EmbeddingDoc.version.is_(None),
+                                       EmbeddingDoc.version == version))
+    filas = consulta.order_by(EmbeddingDoc.articulo_id, EmbeddingDoc.chunk_orden).all()
+    if VECTORES_INT8:
+        cuantizados = _cuantizados(db, filas)
+        filas = [f for f in filas if f.id in cuantizados]
+        matriz = cuantizacion.apilar(
+            [cuantizados[f.id] for f in filas],
+            max((cuantizados[f.id].shape[1] for f in filas), default=0))
+    elif vectores_mmap.VECTORES_MMAP:
+        filas, matriz = _desde_disco(db, proyecto_id, filas)
+    else:
+        vectores = {f.id: desempaquetar(f.vector) for f in filas}
+        completar_desde_json(db, vectores)
+        filas = [f for f in filas if len(vectores[f.id])]
+        matriz = _matriz([vectores[f.id] for f in filas])
+
+    n = len(filas)
+    prefijo = None
+    if (not isinstance(matriz, cuantizacion.Cuantizada)
+            and 0 < PREFIJO_DIM < matriz.shape[1]):
+        prefijo = prefijo_de(matriz, PREFIJO_DIM)
+
+    articulos = np.array([f.articulo_id for f in filas], dtype=object)
+    por_articulo: Dict[str, np.ndarray] = {}
+    if n:
+        # Las filas vienen ordenadas por articulo y posicion: cada articulo
+        # es un tramo contiguo.
+        cortes = np.flatnonzero(articulos[1:] != articulos[:-1]) + 1
+        for tramo in np.split(np.arange(n), cortes):
+            por_articulo[articulos[tramo[0]]] = tramo
+
+    # Las cadenas se estiman aparte: un arreglo de objetos solo guarda los
+    # punteros, y lo que ocupa de verdad son los objetos a los que apuntan.
+    cadenas = 3 * 90 * n
+    return MatrizProyecto(
+        proyecto_id=proyecto_id,
+        generacion=generacion,
+        ids=np.array([f.id for f in filas], dtype=object),
+        articulos=articulos,
+        secciones=np.array([f.seccion or "otro" for f in filas], dtype=object),
+        ordenes=np.array([f.chunk_orden for f in filas], dtype=np.int32),
+        matriz=matriz,
+        por_articulo=por_articulo,
+        revisada=time.monotonic(),
+        # Mapeada, la matriz la comparten todos los procesos y no es de
+        # este: no cuenta para su presupuesto.
+        bytes=int((0 if isinstance(matriz, np.memmap) else matriz.nbytes) + 4 * n + cadenas
+                  + (prefijo.nbytes if prefijo is not None else 0)),
+        prefijo=prefijo,
+        version=version,
+    )
+
+
+class CacheVectores:
+    """Matrices por proyecto, con descarte por antiguedad de uso."""
+
+    def __init__(self, presupuesto_mb: int = CACHE_VECTORES_MB):
+        self.presupuesto = max(0, presupuesto_mb) * 1024 * 1024
+        self._entradas: "OrderedDict[str, MatrizProyecto]" = OrderedDict()
+        # Articulo -> proyecto, solo de los proyectos que estan en la cache:
+        # se olvida con su matriz, y asi no crece sin limite.
+        self._proyecto_de: Dict[str, str] = {}
+        self._articulos: Dict[str, Set[str]] = {}
+        self._cerrojo = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, db: Session, proyecto_id: str) -> MatrizProyecto:
+        """La matriz del proyecto, cargandola si no esta o ya no vale."""
+        with self._cerrojo:
+            m = self._entradas.get(proyecto_id)
+            if m is not None:
+                self._entradas.move_to_end(proyecto_id)
+
+        if m is not None:
+            ahora = time.monotonic()
+            if ahora - m.revisada < REVALIDAR_SEG:
+                self.aciertos += 1
+                return m
+            if _generacion(db, proyecto_id) == m.generacion:
+                m.revisada = ahora
+                self.aciertos += 1
+                return m
+
+        # La carga va fuera del cerrojo: puede tardar, y mientras tanto los
+        # demas proyectos deben poder seguir consultandose.
+        self.fallos += 1
+        m = _cargar(db, proyecto_id)
+        self._guardar(m)
+        return m
+
+    def _guardar(self, m: MatrizProyecto) -> None:
+        if m.bytes > self.presupuesto:
+            # No cabe ni sola: se usa esta vez y no se guarda, en lugar de
+            # vaciar la cache entera para nada.
+            return
+        with self._cerrojo:
+            self._entradas[m.proyecto_id] = m
+            self._entradas.move_to_end(m.proyecto_id)
+            for a in m.por_articulo:
+                self._anotar(a, m.proyecto_id)
+            total = sum(e.bytes for e in self._entradas.values())
+            while total > self.presupuesto and len(self._entradas) > 1:
+                pid, viejo = self._entradas.popitem(last=False)
+                self._olvidar(pid)
+                total -= viejo.bytes
+
+    # Las dos siguientes, con el cerrojo tomado.
+    def _anotar(self, articulo_id: str, proyecto_id: str) -> None:
+        self._proyecto_de[articulo_id] = proyecto_id
+        self._articulos.setdefault(proyecto_id, set()).add(articulo_id)
+
+    def _olvidar(self, proyecto_id: str) -> None:
+        for a in self._articulos.pop(proyecto_id, ()):
+            self._proyecto_de.pop(a, None)
+
+    def proyectos_de(self, db: Session, articulo_ids) -> Dict[str, str]:
+        """Proyecto de cada articulo. Un articulo nunca cambia de proyecto.
+
+        Los que no se conocen todavia se piden en una sola consulta; los que
+        no existen no aparecen en el resultado. Solo se recuerdan los de
+        proyectos cuya matriz esta en la cache.
+        """
+        with self._cerrojo:
+            conocidos = {a: self._proyecto_de[a] for a in articulo_ids
+                         if a in self._proyecto_de}
+        faltan = [a for a in articulo_ids if a not in conocidos]
+        for ini in range(0, len(faltan), 500):
+            filas = (db.query(Articulo.id, Articulo.proyecto_id)
+                     .filter(Articulo.id.in_(faltan[ini:ini + 500])).all())
+            with self._cerrojo:
+                for aid, pid in filas:
+                    if pid is not None:
+                        conocidos[aid] = pid
+                        if pid in self._entradas:
+                            self._anotar(aid, pid)
+        return conocidos
+
+    def proyecto_de(self, db: Session, articulo_id: str) -> str | None:
+        return self.proyectos_de(db, [articulo_id]).get(articulo_id)
+
+    def invalidar(self, proyecto_id: str) -> None:
+        with self._cerrojo:
+            self._entradas.pop(proyecto_id, None)
+            self._olvidar(proyecto_id)
+
+    def vaciar(self) -> None:
+        with self._cerrojo:
+            self._entradas.clear()
+            self._proyecto_de.clear()
+            self._articulos.clear()
+
+    def estadisticas(self) -> dict:
+        with self._cerrojo:
+            return {
+                "proyectos": len(self._entradas),
+                "bytes": sum(e.bytes for e in self._entradas.values()),
+                "presupuesto": self.presupuesto,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+            }
+
+
+cache = CacheVectores()
+
+
+def registrar_cambio(db: Session, proyecto_id: str | None) -> None:
+    """Anota que los fragmentos del proyecto cambiaron.
+
+    Debe llamarse dentro de la misma transaccion que el cambio: el resto de
+    procesos lo vera al confirmarse, en su siguiente revalidacion. La copia
+    de este proceso se descarta en el acto.
+    """
+    if not proyecto_id:
+        return
+    db.execute(update(Proyecto)
+               .where(Proyecto.id == proyecto_id)
+               .values(generacion_vectores=Proyecto.generacion_vectores + 1))
+    cache.invalidar(proyecto_id)
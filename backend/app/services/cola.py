@@ -16,11 +16,21 @@ Lo que faltaba no era la cola, sino tres cosas que esta capa aporta:
 Todo se apoya en `SELECT ... FOR UPDATE SKIP LOCKED`, que es exactamente la
 herramienta que MySQL ofrece para esto: el que llega segundo no espera al
 primero, se lleva otra fila.
+
+Cada articulo pasa por dos etapas, y su estado dice por donde va:
+
+    pendiente -> extraido | ocr -> enriquecido -> analizado
+                 (ingesta: texto, fragmentos, embeddings)   (generacion)
+
+La ingesta suele estar hecha antes de crear la ejecucion: empieza al subir el
+PDF (app/services/ingesta.py), y los articulos ya indexados entran en la
+cola directamente en `enriquecido`. Lo que queda es generar.
 """
 
 from __future__ import annotations
 
 import logging
+import uuid
 from datetime import datetime, timedelta
 
 from sqlalchemy import func, or_, select
@@ -45,6 +55,39 @@ ABANDONO = timedelta(minutes=15)
 ESTADOS_TERMINADOS = (EstadoRunItem.analizado, EstadoRunItem.guardado,
                       EstadoRunItem.fallido)
 
+# Con un trabajador encima: tomado, o a mitad de la ingesta.
+ESTADOS_EN_CURSO = (EstadoRunItem.en_proceso, EstadoRunItem.extraido,
+                    EstadoRunItem.ocr)
+
+
+def _disponible(limite: datetime):
+    """Lo que se puede tomar: lo que espera y lo abandonado por alguien.
+
+    Un `enriquecido` con `tomado_en` lo sigue teniendo quien lo ingirio para
+    analizarlo a continuacion (`process_next`); sin marca, espera el analisis.
+    """
+    return or_(
+        RunItem.estado == EstadoRunItem.pendiente,
+        (RunItem.estado == EstadoRunItem.enriquecido)
+        & (RunItem.tomado_en.is_(None) | (RunItem.tomado_en < limite)),
+        # Tomado por alguien que no ha vuelto: se considera abandonado.
+        RunItem.estado.in_(ESTADOS_EN_CURSO) & (RunItem.tomado_en < limite),
+    )
+
+
+def encolar(db: Session, run_id: str, articulo_ids: list[str]) -> None:
+    """Crea los items de la ejecucion; los ya indexados, listos para analizar."""
+    from app.services.ingesta import indexados
+
+    listos = indexados(db, articulo_ids)
+    for aid in articulo_ids:
+        db.add(RunItem(
+            id=str(uuid.uuid4()),
+            run_id=run_id,
+            articulo_id=aid,
+            estado=EstadoRunItem.enriquecido if aid in listos else EstadoRunItem.pendiente,
+        ))
+
 
 def tomar_pendiente(db: Session, run_id: str | None = None) -> RunItem | None:
     """Reserva un articulo y lo devuelve, o None si no hay ninguno.
@@ -56,17 +99,14 @@ def tomar_pendiente(db: Session, run_id: str | None = None) -> RunItem | None:
     """
     limite = datetime.now() - ABANDONO
 
-    condiciones = or_(
-        RunItem.estado == EstadoRunItem.pendiente,
-        # Tomado por alguien que no ha vuelto: se considera abandonado.
-        (RunItem.estado == EstadoRunItem.en_proceso)
-        & (RunItem.tomado_en < limite),
-    )
-
+    # La ingesta va antes que el analisis: con todo indexado, la precarga de
+    # contextos (precarga_contextos.py) sirve para toda la ejecucion y no se
+    # invalida cada vez que se indexa un articulo mas.
     consulta = (
         select(RunItem)
-        .where(condiciones, RunItem.intentos < MAX_INTENTOS)
-        .order_by(RunItem.creado_en.asc())
+        .where(_disponible(limite), RunItem.intentos < MAX_INTENTOS)
+        .order_by((RunItem.estado == EstadoRunItem.enriquecido).asc(),
+                  RunItem.creado_en.asc())
         .limit(1)
         .with_for_update(skip_locked=True)
     )
@@ -78,7 +118,7 @@ def tomar_pendiente(db: Session, run_id: str | None = None) -> RunItem | None:
         db.rollback()
         return None
 
-    reintento = item.estado == EstadoRunItem.en_proceso
+    reintento = item.tomado_en is not None
     item.estado = EstadoRunItem.en_proceso
     item.tomado_en = datetime.now()
     item.intentos = (item.intentos or 0) + 1
@@ -112,6 +152,19 @@ def devolver(db: Session, item: RunItem, motivo: str) -> None:
     db.commit()
 
 
+def soltar_ingerido(db: Session, item: RunItem) -> None:
+    """Deja en la cola, para el analisis, un articulo recien ingerido.
+
+    Terminar una etapa no es un intento fallido: se devuelve el que se conto
+    al tomarlo, y el analisis dispone de todos los suyos.
+    """
+    item.estado = EstadoRunItem.enriquecido
+    item.tomado_en = None
+    item.intentos = max(0, (item.intentos or 0) - 1)
+    item.error_msg = None
+    db.commit()
+
+
 def quedan_pendientes(db: Session, run_id: str) -> bool:
     """Si la ejecucion tiene algo por hacer todavia.
 
@@ -126,11 +179,8 @@ def quedan_pendientes(db: Session, run_id: str) -> bool:
 
 def hay_trabajo(db: Session) -> bool:
     """Si queda algo por tomar en cualquier ejecucion."""
-    limite = datetime.now() - ABANDONO
     return db.query(RunItem.id).filter(
-        or_(RunItem.estado == EstadoRunItem.pendiente,
-            (RunItem.estado == EstadoRunItem.en_proceso)
-            & (RunItem.tomado_en < limite)),
+        _disponible(datetime.now() - ABANDONO),
         RunItem.intentos < MAX_INTENTOS,
     ).first() is not None
 
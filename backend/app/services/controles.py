@@ -30,8 +30,10 @@ from typing import Any, Callable, Dict, List, Sequence
 
 from sqlalchemy.orm import Session
 
-from app.models.embedding_doc import EmbeddingDoc
-from app.services.embedding_service import recuperar_contexto, _embed_texts, _cos
+from app.services import cache_vectores
+from app.services.embedding_service import (
+    recuperar_contexto, recuperar_contextos, _embed_consulta, _embed_texts, _cos,
+)
 
 PASA = "pasa"
 FALLA = "falla"
@@ -92,25 +94,26 @@ def jaccard_conjuntos(a: Sequence[str], b: Sequence[str]) -> float:
 
 
 def _puntuar_todos(db: Session, articulo_id: str, contexto: dict) -> Dict[str, float]:
-    """Puntuación de relevancia de cada fragmento bajo un contexto dado."""
+    """Puntuación de relevancia de cada fragmento bajo un contexto dado.
+
+    Sale de la matriz del proyecto en memoria (app/services/cache_vectores.py):
+    cada control pedía a la base los vectores del artículo, y C1 lo hace dos
+    veces seguidas para el mismo.
+    """
     from app.services.embedding_service import construir_consulta
-    import json
 
-    docs = db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == articulo_id).all()
-    if not docs:
+    proyecto_id = cache_vectores.cache.proyecto_de(db, articulo_id)
+    if proyecto_id is None:
+        return {}
+    m = cache_vectores.cache.obtener(db, proyecto_id)
+    filas = m.filas_de(articulo_id)
+    if not len(filas):
         return {}
-    q = _embed_texts([construir_consulta(contexto)])[0]
-    salida: Dict[str, float] = {}
-    for d in docs:
-        vec = d.embedding
-        if isinstance(vec, str):
-            try:
-                vec = json.loads(vec)
-            except Exception:
-                vec = []
-        if vec:
-            salida[d.id] = _cos(q, vec)
-    return salida
+    q = cache_vectores.normalizar(_embed_consulta(construir_consulta(contexto),
+                                                  version=m.version))
+    vectores = cache_vectores.exactos(db, m, filas)
+    scores = vectores @ cache_vectores.ajustar(q, vectores.shape[1])
+    return {fid: float(s) for fid, s in zip(m.ids[filas], scores)}
 
 
 def barajar_oraciones(texto: str, semilla: int = 20260810) -> str:
@@ -215,8 +218,8 @@ def c3_articulo_ajeno(
     artículo ajeno no es claramente menor, el sistema no puede saber cuándo
     debe abstenerse.
     """
-    rp = recuperar_contexto(db, articulo_pertinente, contexto, k=k)
-    ra = recuperar_contexto(db, articulo_ajeno, contexto, k=k)
+    r = recuperar_contextos(db, [articulo_pertinente, articulo_ajeno], contexto, k=k)
+    rp, ra = r[articulo_pertinente], r[articulo_ajeno]
     if not rp or not ra:
         return ResultadoControl(
             "C3", "Artículo ajeno al tema", "recuperacion", NO_CONCLUYENTE,
@@ -249,8 +252,8 @@ def c4_duplicado_exacto(
 
     Una divergencia aquí no es riqueza analítica: es inestabilidad.
     """
-    ra = recuperar_contexto(db, articulo_a, contexto, k=k)
-    rb = recuperar_contexto(db, articulo_b, contexto, k=k)
+    r = recuperar_contextos(db, [articulo_a, articulo_b], contexto, k=k)
+    ra, rb = r[articulo_a], r[articulo_b]
     if not ra or not rb:
         return ResultadoControl(
             "C4", "Duplicado exacto", "recuperacion", NO_CONCLUYENTE,
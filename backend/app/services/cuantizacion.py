@@ -0,0 +1,143 @@
+# app/services/cuantizacion.py
+"""
+Vectores cuantizados a int8, para puntuar con la cuarta parte de memoria.
+
+La matriz de un proyecto en memoria (app/services/cache_vectores.py) ocupa
+cuatro bytes por dimension: a 768 dimensiones, un proyecto de mil articulos
+son mas de cien megabytes por proceso, y el servidor y cada trabajador
+tienen su propia copia. Para elegir candidatos no hace falta tanta
+precision.
+
+Cada vector, ya normalizado, se guarda como un byte con signo por dimension
+mas dos float32 propios: un centro y una escala. El valor de cada dimension
+se recupera como `centro + escala * codigo`. Con escala y centro por vector,
+y no globales, un vector de valores pequenos no pierde resolucion por
+compartirla con otro de valores grandes.
+
+El producto con una consulta no necesita reconstruir el vector:
+
+    v . q = escala * (codigos . q) + centro * suma(q)
+
+El error que introduce es del orden de una milesima en el coseno. Basta para
+que los mejores esten entre los candidatos, pero no para devolver
+puntuaciones ni desempatar: por eso los candidatos se vuelven a puntuar con
+su vector completo, que se lee de la base solo para ellos.
+
+Se calcula al indexar y se guarda en `embedding_doc.vector_int8`, de modo
+que cargar un proyecto en este modo no transfiere los vectores completos.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+FORMATO = np.dtype("<f4")
+CABECERA = 2 * FORMATO.itemsize     # centro y escala, delante de los codigos
+
+# Filas que se convierten a float32 de una vez al puntuar: acota la memoria
+# temporal a unos 25 MB a 768 dimensiones.
+TRAMO = 8192
+
+
+@dataclass
+class Cuantizada:
+    """Matriz de vectores int8, cada fila con su centro y su escala.
+
+    Se indexa como una matriz de NumPy por filas y devuelve las filas
+    reconstruidas en float32, de modo que quien solo lee filas sueltas
+    —el indice IVF, la diversificacion— puede usarla sin saber que lo es.
+    """
+
+    codigos: np.ndarray             # int8, n x dimension
+    centros: np.ndarray             # float32, uno por fila
+    escalas: np.ndarray             # float32, uno por fila
+
+    @property
+    def shape(self):
+        return self.codigos.shape
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codigos.nbytes + self.centros.nbytes + self.escalas.nbytes)
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    def __getitem__(self, filas) -> np.ndarray:
+        c = self.codigos[filas].astype(np.float32)
+        if c.ndim == 1:
+            return self.centros[filas] + self.escalas[filas] * c
+        return self.centros[filas][:, None] + self.escalas[filas][:, None] * c
+
+    def puntuar(self, filas: np.ndarray, consulta: np.ndarray) -> np.ndarray:
+        """Producto aproximado de unas filas por una consulta del mismo ancho."""
+        q = np.asarray(consulta, dtype=np.float32)
+        salida = np.empty(len(filas), dtype=np.float32)
+        for ini in range(0, len(filas), TRAMO):
+            tramo = filas[ini:ini + TRAMO]
+            salida[ini:ini + TRAMO] = self.codigos[tramo].astype(np.float32) @ q
+        salida *= self.escalas[filas]
+        salida += self.centros[filas] * np.float32(q.sum())
+        return salida
+
+
+def cuantizar(matriz: np.ndarray) -> Cuantizada:
+    """Cuantiza cada fila entre su minimo y su maximo."""
+    m = np.asarray(matriz, dtype=np.float32)
+    if m.ndim == 1:
+        m = m[None, :]
+    if not m.shape[1]:
+        return Cuantizada(np.zeros(m.shape, dtype=np.int8),
+                          np.zeros(len(m), dtype=np.float32),
+                          np.ones(len(m), dtype=np.float32))
+    bajo, alto = m.min(axis=1), m.max(axis=1)
+    centros = ((alto + bajo) / 2).astype(np.float32)
+    escalas = ((alto - bajo) / 254).astype(np.float32)
+    # Un vector constante no tiene rango: cualquier escala lo representa.
+    escalas[escalas == 0] = 1.0
+    codigos = np.rint((m - centros[:, None]) / escalas[:, None])
+    return Cuantizada(np.clip(codigos, -127, 127).astype(np.int8), centros, escalas)
+
+
+def empaquetar(vector: Sequence[float]) -> bytes:
+    """Bytes de `embedding_doc.vector_int8`: centro, escala y codigos."""
+    c = cuantizar(np.asarray(vector, dtype=np.float32))
+    cabecera = np.array([c.centros[0], c.escalas[0]], dtype=FORMATO)
+    return cabecera.tobytes() + c.codigos[0].tobytes()
+
+
+def desempaquetar(datos: bytes | None) -> Cuantizada | None:
+    """Vector de una fila a partir de los bytes guardados, o None si no hay."""
+    if not datos or len(datos) <= CABECERA:
+        return None
+    centro, escala = np.frombuffer(datos[:CABECERA], dtype=FORMATO)
+    return Cuantizada(np.frombuffer(datos[CABECERA:], dtype=np.int8)[None, :],
+                      np.array([centro], dtype=np.float32),
+                      np.array([escala], dtype=np.float32))
+
+
+def apilar(filas: Sequence[Cuantizada], ancho: int) -> Cuantizada:
+    """Una matriz con las filas dadas, rellenas con ceros hasta `ancho`.
+
+    Un codigo cero no vale cero sino el centro de su fila, asi que las filas
+    mas estrechas se reconstruyen, se rellenan y se cuantizan de nuevo. Solo
+    ocurre con vectores de otra dimension que los demas, que no deberian
+    convivir en un proyecto.
+    """
+    n = len(filas)
+    codigos = np.zeros((n, ancho), dtype=np.int8)
+    centros = np.zeros(n, dtype=np.float32)
+    escalas = np.ones(n, dtype=np.float32)
+    for i, f in enumerate(filas):
+        if f.shape[1] != ancho:
+            v = np.zeros(ancho, dtype=np.float32)
+            r = f[0][:ancho]
+            v[:len(r)] = r
+            f = cuantizar(v)
+        codigos[i] = f.codigos[0]
+        centros[i] = f.centros[0]
+        escalas[i] = f.escalas[0]
+    return Cuantizada(codigos, centros, escalas)
@@ -1,6 +1,10 @@
 # app/services/embedding_service.py
-import os, uuid, json
-from typing import List, Tuple, Dict, Any
+import hashlib, itertools, os, re, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Tuple, Dict, Any, Sequence
+
+import numpy as np
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
@@ -9,7 +13,8 @@ from sqlalchemy.orm import Session
 from app.models.embedding_doc import EmbeddingDoc
 from app.models.archivo import Archivo
 from app.models.articulo import Articulo
-from app.utils.text_extractor import extract_full_text, extraer_con_diagnostico
+from app.models.proyecto import Proyecto
+from app.utils import text_extractor
 from app.utils.chunker import split_into_chunks, fragmentar
 from app.services.document_structure import (
     detectar_secciones,
@@ -18,6 +23,11 @@ from app.services.document_structure import (
 )
 from app.services.limitador import con_reintentos, limitador_embeddings
 from app.services.registro_api import OP_EMBEDDING, anotar
+from app.services.vectores import completar_desde_json, desempaquetar, empaquetar
+from app.services import (
+    cache_embeddings, cache_extraccion, cache_vectores, cuantizacion, escritura,
+    indice_ann, indice_lexico, lotes_embeddings, vectores_mmap,
+)
 
 # Tamaño de fragmento. Se hace configurable porque incide directamente en la
 # cuota: cada fragmento es un texto embebido y el nivel gratuito los cuenta de
@@ -35,11 +45,19 @@ API_KEY = os.getenv("GEMINI_API_KEY", "")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "gemini-embedding-001").replace("models/", "")
 
 # El modelo entrega 3072 dimensiones por defecto. Se reducen a 768 porque los
-# vectores se guardan como JSON en MySQL y la búsqueda recorre todos los
-# fragmentos en memoria: cuadruplicar el tamaño penaliza sin necesidad. El
+# vectores se guardan en MySQL y la búsqueda recorre todos los fragmentos en
+# memoria: cuadruplicar el tamaño penaliza sin necesidad. El
 # modelo admite truncado por diseño, así que la pérdida de calidad es menor.
+# Para guardar el vector completo, EMBED_DIM=3072 junto con
+# BUSQUEDA_PREFIJO_DIM (app/services/cache_vectores.py): la búsqueda recorre
+# solo el prefijo y usa las 3072 dimensiones para ordenar a los candidatos.
 EMBED_DIM = int(os.getenv("EMBED_DIM", "768"))
 
+# Lotes de embeddings en vuelo a la vez (ver `_pedir_embeddings`). Con el
+# nivel gratuito el limitador frena igual; con uno de pago, cada hilo mas
+# es una latencia menos por minuto. 1 vuelve a enviarlos de uno en uno.
+EMBED_CONCURRENCIA = max(1, int(os.getenv("EMBED_CONCURRENCIA", "4")))
+
 MOCK_DIM = EMBED_DIM
 _client = None
 
@@ -72,29 +90,169 @@ def _mock_embed(text: str, dim: int = MOCK_DIM) -> list[float]:
     parecido obtienen vectores parecidos, así que el coseno se comporta de
     forma sensata en las pruebas.
     """
-    import hashlib, math, re
+    return _mock_embed_lote([text], dim)[0].tolist()
+
+
+# Posición y signo de cada palabra en el embedding simulado, por dimensión.
+# Calcular un MD5 por palabra y sumar en un bucle de Python hacía que, en
+# modo simulado, indexar miles de PDF sintéticos estuviera limitado por
+# `_mock_embed`. Con la tabla cada palabra se resume una sola vez, en un
+# entero: posición * 2 + 1 si el signo es negativo.
+_TABLA_MOCK: Dict[int, Dict[str, int]] = {}
+_TABLA_MOCK_MAX = 1_000_000
+_RE_PALABRA = re.compile(r"\w+")
+# Textos por bincount: acota la matriz temporal (textos x dim).
+_LOTE_MOCK = 512
+
+
+def _codigo_mock(tabla: Dict[str, int], tok: str, dim: int) -> int:
+    h = hashlib.md5(tok.encode("utf-8")).digest()
+    codigo = (int.from_bytes(h[:4], "big") % dim) * 2 + h[4] % 2
+    if len(tabla) < _TABLA_MOCK_MAX:
+        tabla[tok] = codigo
+    return codigo
+
+
+def _mock_embed_lote(textos: Sequence[str], dim: int = MOCK_DIM) -> np.ndarray:
+    """Los embeddings simulados de varios textos, una fila por texto (float64).
+
+    Da exactamente los mismos valores que la versión de una palabra cada
+    vez: los acumulados son enteros y se suman sin error, y la norma y la
+    división son las mismas operaciones IEEE. Así los vectores simulados que
+    ya hay guardados y los que esperan las pruebas siguen valiendo.
+    """
+    tabla = _TABLA_MOCK.setdefault(dim, {})
+    salida = np.zeros((len(textos), dim), dtype=np.float64)
+    for ini in range(0, len(textos), _LOTE_MOCK):
+        trozo = [_RE_PALABRA.findall((t or "").lower()) for t in textos[ini:ini + _LOTE_MOCK]]
+        palabras = list(itertools.chain.from_iterable(trozo))
+        if not palabras:
+            continue
+        codigos = list(map(tabla.get, palabras))
+        if None in codigos:
+            codigos = [_codigo_mock(tabla, tok, dim) if c is None else c
+                       for tok, c in zip(palabras, codigos)]
+        codigos = np.array(codigos, dtype=np.int64)
+        filas = np.repeat(np.arange(len(trozo)), [len(toks) for toks in trozo])
+        signos = 1.0 - 2.0 * (codigos & 1)
+        suma = np.bincount(filas * dim + (codigos >> 1), weights=signos,
+                           minlength=len(trozo) * dim).reshape(len(trozo), dim)
+        norma = np.sqrt(np.einsum("ij,ij->i", suma, suma))
+        np.divide(suma, norma[:, None], out=salida[ini:ini + len(trozo)],
+                  where=norma[:, None] > 0)
+    return salida
 
-    vec = [0.0] * dim
-    for tok in re.findall(r"\w+", (text or "").lower()):
-        h = hashlib.md5(tok.encode("utf-8")).digest()
-        idx = int.from_bytes(h[:4], "big") % dim
-        signo = 1.0 if h[4] % 2 == 0 else -1.0
-        vec[idx] += signo
-    norma = math.sqrt(sum(x * x for x in vec))
-    if norma == 0.0:
-        return [0.0] * dim
-    return [x / norma for x in vec]
+
+def _modelo_cache() -> str:
+    """Modelo con el que se anotan los vectores en la cache.
+
+    Los simulados llevan su propio nombre: no deben servirse nunca como si
+    vinieran del modelo real, ni al revés.
+    """
+    return EMBED_MODEL if MODE == "real" else "mock"
+
+
+# ---------------------------
+# Versiones de los embeddings
+# ---------------------------
+def version_actual() -> str:
+    """Versión de los vectores que genera la configuración actual: "modelo/dim"."""
+    return "%s/%d" % (_modelo_cache(), EMBED_DIM)
+
+
+def partir_version(version: str) -> Tuple[str, int]:
+    modelo, _sep, dim = version.rpartition("/")
+    return modelo, int(dim)
+
+
+def version_de(db: Session, proyecto_id: str | None) -> str:
+    """Versión con la que se busca en el proyecto.
+
+    La del proyecto, que no cambia al cambiar EMBED_MODEL o EMBED_DIM: sus
+    fragmentos siguen siendo de la anterior hasta que se migran
+    (app/services/migracion_embeddings.py), y la consulta debe embeberse con
+    el mismo modelo que ellos.
+    """
+    v = None
+    if proyecto_id:
+        v = (db.query(Proyecto.version_embeddings)
+             .filter(Proyecto.id == proyecto_id).scalar())
+    return v or version_actual()
+
+
+def _version_para_indexar(db: Session, proyecto_id: str) -> str:
+    """La versión del proyecto; si aún no tiene, la actual pasa a ser la suya."""
+    v = (db.query(Proyecto.version_embeddings)
+         .filter(Proyecto.id == proyecto_id).scalar())
+    if v:
+        return v
+    v = version_actual()
+    (db.query(Proyecto).filter(Proyecto.id == proyecto_id)
+     .update({Proyecto.version_embeddings: v}, synchronize_session=False))
+    return v
+
+
+class _VersionCambiada(Exception):
+    """El proyecto cambió de versión de embeddings mientras se indexaba."""
+
+
+# Veces que se repite una indexación que coincidió con un cambio de versión.
+# Que pase dos veces seguidas ya es raro; tres sería un error de otro tipo.
+REINTENTOS_VERSION = 3
+
+
+def _registrar_con_version(db: Session, proyecto_id: str, version: str) -> None:
+    """`registrar_cambio`, y comprobar que la versión sigue siendo `version`.
+
+    La versión se lee sin bloqueo antes de embeber, que tarda: bloquear el
+    proyecto durante las llamadas a la API pararía a todos los demás. El
+    bloqueo llega aquí, con el UPDATE de `registrar_cambio`, el mismo que
+    toma `migracion_embeddings.cambiar`. Si el cambio se confirmó entre medias,
+    las filas nuevas son de la versión anterior y nadie las buscaría ni las
+    migraría: se deshace todo y quien llama lo repite.
+    """
+    cache_vectores.registrar_cambio(db, proyecto_id)
+    actual = (db.query(Proyecto.version_embeddings)
+              .filter(Proyecto.id == proyecto_id).scalar())
+    if actual != version:
+        db.rollback()
+        raise _VersionCambiada("%s: %s -> %s" % (proyecto_id, version, actual))
+
+
+def _repetir_si_cambia_la_version(fn, *args, **kwargs):
+    for intento in range(REINTENTOS_VERSION):
+        try:
+            return fn(*args, **kwargs)
+        except _VersionCambiada as e:
+            if intento == REINTENTOS_VERSION - 1:
+                raise RuntimeError("La versión de embeddings no deja de cambiar: %s" % e)
 
 
 # ---------------------------
 # Helpers de embeddings
 # ---------------------------
-def _embed_texts(texts: list[str], batch: int = 32) -> list[list[float]]:
+def _embed_texts(texts: list[str], batch: int | None = None,
+                 version: str | None = None) -> list[list[float]]:
     """Devuelve una lista de vectores (lista de floats) para cada texto.
 
     El SDK nuevo acepta varios textos por llamada, así que se envían por lotes
-    en lugar de uno a uno como hacía la versión anterior.
+    en lugar de uno a uno como hacía la versión anterior. El tamaño de cada
+    lote se ajusta solo (app/services/lotes_embeddings.py); `batch` lo acota.
+
+    Antes de llamar se consulta la cache de embeddings
+    (app/services/cache_embeddings.py) y solo se piden los textos que no
+    están. Reindexar un artículo cuyo texto no cambió —por ejemplo tras
+    ajustar solo el solape, o tras reetiquetar secciones— no gasta cuota, y
+    si cambió en parte solo se pagan los fragmentos nuevos. Un texto repetido
+    dentro de la misma lista también se pide una sola vez.
+
+    `version` ("modelo/dim") elige modelo y dimensión; por omisión, los
+    configurados.
     """
+    modelo, dim = partir_version(version or version_actual())
+    if (modelo == "mock") != (MODE != "real"):
+        raise RuntimeError("Los embeddings %s no pueden generarse con GEMINI_MODE=%s"
+                           % (version, MODE))
     vectors: list[list[float]] = [[] for _ in texts]
 
     # Índices con contenido real; los vacíos conservan su posición.
@@ -102,60 +260,162 @@ def _embed_texts(texts: list[str], batch: int = 32) -> list[list[float]]:
     if not pend:
         raise RuntimeError("No se generaron embeddings")
 
+    huellas = {i: cache_embeddings.huella(t) for i, t in pend}
+    hechos = {h: v.tolist() for h, v in
+              cache_embeddings.cache.buscar(modelo, dim, huellas.values()).items()}
+    # Un texto por huella: los repetidos se piden una vez.
+    faltan = list({huellas[i]: t for i, t in pend if huellas[i] not in hechos}.items())
+
+    nuevos: Dict[str, list[float]] = {}
     if MODE != "real":
-        for i, t in pend:
-            vectors[i] = _mock_embed(t)
-        return vectors
+        if faltan:
+            nuevos = dict(zip((h for h, _t in faltan),
+                              _mock_embed_lote([t for _h, t in faltan], dim)))
+    elif faltan:
+        nuevos = _pedir_embeddings(faltan, batch, modelo, dim)
+    cache_embeddings.cache.guardar(modelo, dim, nuevos)
+    # Con la precisión con que se guardan: el mismo texto debe dar el mismo
+    # vector tanto si acaba de pedirse como si sale de la cache.
+    hechos.update({h: np.asarray(v, dtype=np.float32).tolist() for h, v in nuevos.items()})
+
+    for i, _t in pend:
+        vectors[i] = hechos[huellas[i]]
+
+    if not any(v for v in vectors):
+        raise RuntimeError("No se generaron embeddings")
+    return vectors
+
 
+def _pedir_embeddings(pend: list[tuple[str, str]], batch: int | None = None,
+                      modelo: str | None = None,
+                      dim: int | None = None) -> Dict[str, list[float]]:
+    """Pide a la API los vectores de [(clave, texto)], por lotes.
+
+    Con un plan de pago la cuota por minuto deja de ser el cuello de botella:
+    lo es la latencia de cada peticion, y enviar los lotes de uno en uno
+    dejaba el minuto casi vacio. Se mantienen hasta `EMBED_CONCURRENCIA`
+    lotes en vuelo, cada uno en un hilo, y todos piden permiso al mismo
+    `limitador_embeddings`: el ritmo frente a la cuota no cambia, solo deja
+    de esperarse a la respuesta anterior para emitir la siguiente.
+
+    Cuantos textos lleva cada lote lo decide app/services/lotes_embeddings.py
+    al formarlo; `batch`, si se indica, es un tope adicional.
+
+    Si un lote falla —tras los reintentos de `con_reintentos`— no se
+    empiezan mas y se propaga su error.
+    """
     client = _get_client()
-    for ini in range(0, len(pend), batch):
-        trozo = pend[ini:ini + batch]
-
-        # El SDK agrupa los textos en una sola llamada HTTP, pero el servicio
-        # contabiliza cada texto por separado contra la cuota por minuto. Se
-        # piden tantas fichas como textos, no una por llamada (A-02).
-        limitador_embeddings.adquirir(len(trozo))
-
-        def _llamar(trozo=trozo):
-            try:
-                r = client.models.embed_content(
-                    model=EMBED_MODEL,
-                    contents=[t for _i, t in trozo],
-                    config=types.EmbedContentConfig(output_dimensionality=EMBED_DIM),
-                )
-            except Exception as exc:
-                anotar(OP_EMBEDDING, modelo=EMBED_MODEL, exito=False,
-                       unidades=len(trozo), motivo=str(exc))
-                raise
-            anotar(OP_EMBEDDING, modelo=EMBED_MODEL, exito=True,
-                   unidades=len(trozo))
-            return r
+    modelo, dim = modelo or EMBED_MODEL, dim or EMBED_DIM
+    reparto = lotes_embeddings.Reparto(
+        pend, lotes_embeddings.dimensionador, limitador_embeddings,
+        en_vuelo=EMBED_CONCURRENCIA, techo=batch)
+    salida: Dict[str, list[float]] = {}
+
+    def _trabajar() -> None:
+        try:
+            while (trozo := reparto.siguiente()) is not None:
+                salida.update(_pedir_lote(client, trozo, modelo, dim))
+        except BaseException:
+            reparto.cerrar()
+            raise
+
+    if EMBED_CONCURRENCIA <= 1 or len(pend) <= 1:
+        _trabajar()
+    else:
+        with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCIA,
+                                thread_name_prefix="embeddings") as pool:
+            for f in [pool.submit(_trabajar) for _ in range(EMBED_CONCURRENCIA)]:
+                f.result()
+    return {i: salida[i] for i, _t in pend}
+
+
+def _pedir_lote(client, trozo: list[tuple[str, str]], modelo: str = EMBED_MODEL,
+                dim: int = EMBED_DIM) -> Dict[str, list[float]]:
+    """Una peticion de embeddings, con su permiso y sus reintentos.
 
+    Si el servicio la rechaza por grande se parte en dos mitades.
+    """
+    bytes_ = sum(lotes_embeddings.tamano(t) for _i, t in trozo)
+    # El SDK agrupa los textos en una sola llamada HTTP, pero el servicio
+    # contabiliza cada texto por separado contra la cuota por minuto. Se
+    # piden tantas fichas como textos, no una por llamada (A-02).
+    limitador_embeddings.adquirir(len(trozo))
+
+    def _llamar():
+        inicio = time.monotonic()
+        try:
+            r = client.models.embed_content(
+                model=modelo,
+                contents=[t for _i, t in trozo],
+                config=types.EmbedContentConfig(output_dimensionality=dim),
+            )
+        except Exception as exc:
+            anotar(OP_EMBEDDING, modelo=modelo, exito=False,
+                   unidades=len(trozo), motivo=str(exc), lote_bytes=bytes_,
+                   latencia_ms=int((time.monotonic() - inicio) * 1000))
+            raise
+        segundos = time.monotonic() - inicio
+        anotar(OP_EMBEDDING, modelo=modelo, exito=True,
+               unidades=len(trozo), lote_bytes=bytes_,
+               latencia_ms=int(segundos * 1000))
+        lotes_embeddings.dimensionador.observar(len(trozo), segundos, bytes_)
+        return r
+
+    try:
         resp = con_reintentos(
             _llamar, descripcion="embed_content(%d textos)" % len(trozo))
-        emb = getattr(resp, "embeddings", None) or []
-        if len(emb) != len(trozo):
-            raise RuntimeError(
-                "El servicio devolvió %d embeddings para %d textos"
-                % (len(emb), len(trozo))
-            )
-        for (i, _t), e in zip(trozo, emb):
-            vals = getattr(e, "values", None)
-            if not vals:
-                raise RuntimeError("Formato de embedding desconocido")
-            vectors[i] = list(vals)
+    except Exception as exc:
+        if len(trozo) < 2 or not lotes_embeddings.es_demasiado_grande(exc):
+            raise
+        lotes_embeddings.dimensionador.rechazado(len(trozo), bytes_)
+        # Rechazado sin procesar: no gasta cuota, y cada mitad pedira la suya.
+        limitador_embeddings.liberar(len(trozo))
+        mitad = len(trozo) // 2
+        salida = _pedir_lote(client, trozo[:mitad], modelo, dim)
+        salida.update(_pedir_lote(client, trozo[mitad:], modelo, dim))
+        return salida
 
-    if not any(v for v in vectors):
-        raise RuntimeError("No se generaron embeddings")
-    return vectors
+    emb = getattr(resp, "embeddings", None) or []
+    if len(emb) != len(trozo):
+        raise RuntimeError(
+            "El servicio devolvió %d embeddings para %d textos"
+            % (len(emb), len(trozo))
+        )
+    salida = {}
+    for (i, _t), e in zip(trozo, emb):
+        vals = getattr(e, "values", None)
+        if not vals:
+            raise RuntimeError("Formato de embedding desconocido")
+        salida[i] = list(vals)
+    return salida
+
+
+def _embed_consulta(texto: str, version: str | None = None) -> np.ndarray:
+    """Vector de una consulta, en la versión de los fragmentos contra los que
+    se va a comparar.
+
+    La consulta de recuperación es la misma para todos los artículos de un
+    proyecto; la cache de `_embed_texts` hace que solo se pida la primera
+    vez, sin su petición de cuota ni su espera en el limitador.
+    """
+    return np.asarray(_embed_texts([texto], version=version)[0], dtype=np.float32)
 
-def _cos(a: list[float], b: list[float]) -> float:
-    import math
-    if not a or not b:
+
+def _cos(a, b) -> float:
+    """Coseno entre dos vectores, sean listas o arreglos de NumPy.
+
+    Si las longitudes difieren se compara el tramo común, como hacía la
+    versión anterior con `zip`; las normas se toman sobre el vector entero.
+    """
+    if a is None or b is None or len(a) == 0 or len(b) == 0:
         return 0.0
-    da = math.sqrt(sum(x*x for x in a)) or 1.0
-    db_ = math.sqrt(sum(x*x for x in b)) or 1.0
-    return sum(x*y for x, y in zip(a, b)) / (da * db_)
+    va = np.asarray(a, dtype=np.float64)
+    vb = np.asarray(b, dtype=np.float64)
+    da = float(np.sqrt(va @ va)) or 1.0
+    db_ = float(np.sqrt(vb @ vb)) or 1.0
+    n = min(len(va), len(vb))
+    return float(va[:n] @ vb[:n]) / (da * db_)
+
 
 # ---------------------------
 # Indexación (RAG - fase build)
@@ -171,7 +431,16 @@ def index_articulo(db: Session, articulo_id: str, max_chars: int | None = None,
 
     Con `reindexar=True` se descartan los fragmentos previos y se recalculan,
     que es lo que hace falta al cambiar el tamaño de fragmento o el modelo.
+
+    Si el proyecto cambia de versión de embeddings mientras tanto, se repite
+    con la nueva (`_registrar_con_version`).
     """
+    return _repetir_si_cambia_la_version(
+        _index_articulo, db, articulo_id, max_chars, overlap, reindexar)
+
+
+def _index_articulo(db: Session, articulo_id: str, max_chars: int | None,
+                    overlap: int | None, reindexar: bool) -> int:
     max_chars = CHUNK_CHARS if max_chars is None else max_chars
     overlap = CHUNK_OVERLAP if overlap is None else overlap
 
@@ -184,7 +453,13 @@ def index_articulo(db: Session, articulo_id: str, max_chars: int | None = None,
     if existentes and not reindexar:
         return existentes
     if existentes and reindexar:
+        indice_lexico.quitar_articulo(db, articulo_id)
         db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == articulo_id).delete()
+        art.firma_indice = None
+        art.hash_indice = None
+        # Si el artículo se queda sin fragmentos nuevos, la copia en memoria
+        # tampoco debe seguir teniendo los viejos.
+        cache_vectores.registrar_cambio(db, art.proyecto_id)
         db.flush()
 
     arc: Archivo | None = (
@@ -196,17 +471,13 @@ def index_articulo(db: Session, articulo_id: str, max_chars: int | None = None,
     if not arc:
         return 0
 
-    # `arc.ruta` guarda una clave de almacenamiento, no un camino del disco.
-    from app.services import almacenamiento
-
-    try:
-        ruta_pdf = almacenamiento.ruta_local(arc.ruta)
-    except almacenamiento.ClaveInvalida:
-        return 0
+    version = _version_para_indexar(db, art.proyecto_id)
+    firma = firma_indice(max_chars, overlap, version)
+    copiados = _copiar_de_otro_articulo(db, art, arc.hash_sha256, firma)
+    if copiados:
+        return copiados
 
-    diag = extraer_con_diagnostico(ruta_pdf)
-    texto = diag.texto
-    fragmentos = fragmentar(texto, max_chars=max_chars, overlap=overlap)
+    texto, fragmentos = _fragmentar_archivo(arc, max_chars, overlap)
     if not fragmentos:
         return 0
 
@@ -214,50 +485,474 @@ def index_articulo(db: Session, articulo_id: str, max_chars: int | None = None,
     # para poder exigir cobertura al recuperar contexto (M-10).
     secciones = detectar_secciones(texto)
 
-    vectors = _embed_texts([f.texto for f in fragmentos])
-    count = 0
+    vectors = _embed_texts([f.texto for f in fragmentos], version=version)
+    filas = []
+    nuevos_ids, nuevos_vec, lexico = [], [], {}
     for i, (frag, vec) in enumerate(zip(fragmentos, vectors)):
         if not vec:  # salta fragmentos vacíos si los hubiera
             continue
-        db.add(EmbeddingDoc(
-            id=str(uuid.uuid4()),
-            articulo_id=articulo_id,
-            chunk_orden=i,          # <- requiere columna en modelo/BD
-            texto=frag.texto,
-            embedding=vec,          # <- JSON nativo (no json.dumps)
-            seccion=seccion_en(secciones, frag.inicio),
-            char_inicio=frag.inicio,
-            char_fin=frag.fin,
-        ))
-        count += 1
+        nuevos_ids.append(str(uuid.uuid4()))
+        nuevos_vec.append(cache_vectores.normalizar(vec))
+        lexico[nuevos_ids[-1]] = indice_lexico.terminos(frag.texto)
+        filas.append({
+            "id": nuevos_ids[-1],
+            "articulo_id": articulo_id,
+            "chunk_orden": i,
+            "texto": frag.texto,
+            "vector": empaquetar(vec),
+            "vector_int8": cuantizacion.empaquetar(nuevos_vec[-1]),
+            "seccion": seccion_en(secciones, frag.inicio),
+            "char_inicio": frag.inicio,
+            "char_fin": frag.fin,
+            "n_terminos": sum(lexico[nuevos_ids[-1]].values()),
+            **_etiqueta(version),
+        })
+    # En bloque (app/services/escritura.py): un objeto del ORM por fragmento
+    # era la mayor parte del tiempo de indexar cuando los vectores ya
+    # estaban en la cache de embeddings.
+    count = escritura.insertar(db, EmbeddingDoc, filas)
+    indice_lexico.anadir(db, art.proyecto_id, articulo_id, lexico)
+    art.firma_indice = firma
+    art.hash_indice = arc.hash_sha256
+    _registrar_con_version(db, art.proyecto_id, version)
     db.commit()
+    indice_ann.actualizar_articulo(art.proyecto_id, articulo_id, nuevos_ids, nuevos_vec)
+    vectores_mmap.anadir(art.proyecto_id, nuevos_ids, nuevos_vec)
     return count
 
+
+def _etiqueta(version: str) -> Dict[str, Any]:
+    """Las columnas que dicen de qué versión es el vector de una fila."""
+    modelo, dim = partir_version(version)
+    return {"modelo": modelo, "dimension": dim, "version": version}
+
+
+def _fragmentar_archivo(arc: Archivo, max_chars: int, overlap: int):
+    """Texto del PDF y sus fragmentos; ("", []) si no se puede leer."""
+    # `arc.ruta` guarda una clave de almacenamiento, no un camino del disco.
+    from app.services import almacenamiento
+
+    try:
+        ruta_pdf = almacenamiento.ruta_local(arc.ruta)
+    except almacenamiento.ClaveInvalida:
+        return "", []
+    texto = cache_extraccion.extraer(ruta_pdf, huella=arc.hash_sha256).texto
+    return texto, fragmentar(texto, max_chars=max_chars, overlap=overlap)
+
+
+@dataclass
+class DiferenciaIndice:
+    """Lo que cambia al reindexar un artículo de forma incremental."""
+
+    conservados: int = 0      # fragmentos que siguen, con su vector
+    nuevos: int = 0           # fragmentos que hay que embeber
+    borrados: int = 0         # fragmentos que ya no salen
+    textos_a_pedir: int = 0   # de los nuevos, los que no están en la cache
+
+
+def reindexar_incremental(db: Session, articulo_id: str, max_chars: int | None = None,
+                          overlap: int | None = None,
+                          simular: bool = False) -> DiferenciaIndice:
+    """Reindexa un artículo embebiendo solo los fragmentos que cambian.
+
+    `reindexar=True` en `index_articulo` tira todos los fragmentos y los
+    vuelve a generar. Al cambiar el extractor o los parámetros de
+    `fragmentar`, muchos fragmentos salen idénticos, solo desplazados. Aquí
+    se vuelve a extraer y fragmentar, y cada fragmento nuevo se empareja con
+    uno guardado del mismo texto —el más cercano en posición si hay varios—.
+    Los emparejados conservan su fila, su vector y sus términos; solo se
+    actualizan el orden, los desplazamientos y la sección. Los guardados sin
+    pareja se borran, y solo los nuevos sin pareja se embeben.
+
+    Los fragmentos guardados de otra versión que la del proyecto no se
+    conservan. Con `simular=True` no se escribe nada: el resultado dice cuántos
+    fragmentos se conservarían, se embeberían y se borrarían, y cuántos
+    textos costarían cuota. Como `index_articulo`, se repite si el proyecto
+    cambia de versión a la vez.
+    """
+    return _repetir_si_cambia_la_version(
+        _reindexar_incremental, db, articulo_id, max_chars, overlap, simular)
+
+
+def _reindexar_incremental(db: Session, articulo_id: str, max_chars: int | None,
+                           overlap: int | None, simular: bool) -> DiferenciaIndice:
+    max_chars = CHUNK_CHARS if max_chars is None else max_chars
+    overlap = CHUNK_OVERLAP if overlap is None else overlap
+    dif = DiferenciaIndice()
+
+    art: Articulo | None = db.query(Articulo).filter(Articulo.id == articulo_id).first()
+    if not art:
+        return dif
+    arc: Archivo | None = (
+        db.query(Archivo)
+        .filter(Archivo.articulo_id == articulo_id)
+        .order_by(Archivo.creado_en.desc())
+        .first()
+    )
+    if not arc:
+        return dif
+    texto, fragmentos = _fragmentar_archivo(arc, max_chars, overlap)
+    if not fragmentos:
+        # Un PDF que ya no se puede leer no es motivo para perder el índice.
+        return dif
+
+    version = (version_de(db, art.proyecto_id) if simular
+               else _version_para_indexar(db, art.proyecto_id))
+    firma = firma_indice(max_chars, overlap, version)
+    guardados = (db.query(EmbeddingDoc.id, EmbeddingDoc.texto, EmbeddingDoc.chunk_orden,
+                          EmbeddingDoc.char_inicio, EmbeddingDoc.char_fin,
+                          EmbeddingDoc.seccion, EmbeddingDoc.version)
+                 .filter(EmbeddingDoc.articulo_id == articulo_id).all())
+    por_texto: Dict[str, list] = {}
+    for g in guardados:
+        if g.version in (None, version):
+            por_texto.setdefault(_huella_exacta(g.texto), []).append(g)
+
+    # Fragmento nuevo -> fila guardada que se conserva (o None).
+    pareja: list = []
+    for frag in fragmentos:
+        candidatos = por_texto.get(_huella_exacta(frag.texto))
+        if not candidatos or not frag.texto.strip():
+            pareja.append(None)
+            continue
+        g = min(candidatos, key=lambda c: abs((c.char_inicio or 0) - frag.inicio))
+        candidatos.remove(g)
+        pareja.append(g)
+    conservados = {g.id for g in pareja if g is not None}
+    huerfanos = [g.id for g in guardados if g.id not in conservados]
+    nuevos = [i for i, (f, g) in enumerate(zip(fragmentos, pareja))
+              if g is None and f.texto.strip()]
+
+    dif.conservados = len(conservados)
+    dif.nuevos = len(nuevos)
+    dif.borrados = len(huerfanos)
+    huellas = {cache_embeddings.huella(fragmentos[i].texto) for i in nuevos}
+    if huellas:
+        dif.textos_a_pedir = len(huellas) - len(
+            cache_embeddings.cache.buscar(*partir_version(version), huellas))
+    if simular:
+        return dif
+
+    secciones = detectar_secciones(texto)
+    movidos = {}
+    for orden, (frag, g) in enumerate(zip(fragmentos, pareja)):
+        if g is None:
+            continue
+        ahora = (orden, frag.inicio, frag.fin, seccion_en(secciones, frag.inicio))
+        if (g.chunk_orden, g.char_inicio, g.char_fin, g.seccion) != ahora:
+            movidos[g.id] = ahora
+    if (not (nuevos or huerfanos or movidos) and art.firma_indice == firma
+            and art.hash_indice == arc.hash_sha256):
+        return dif
+
+    vectors = (_embed_texts([fragmentos[i].texto for i in nuevos], version=version)
+               if nuevos else [])
+    if huerfanos:
+        indice_lexico.quitar_fragmentos(db, huerfanos)
+        for ini in range(0, len(huerfanos), 500):
+            (db.query(EmbeddingDoc)
+             .filter(EmbeddingDoc.id.in_(huerfanos[ini:ini + 500]))
+             .delete(synchronize_session=False))
+    for eid, (orden, inicio, fin, seccion) in movidos.items():
+        (db.query(EmbeddingDoc).filter(EmbeddingDoc.id == eid)
+         .update({EmbeddingDoc.chunk_orden: orden, EmbeddingDoc.char_inicio: inicio,
+                  EmbeddingDoc.char_fin: fin, EmbeddingDoc.seccion: seccion},
+                 synchronize_session=False))
+
+    filas, nuevos_ids, nuevos_vec, lexico = [], [], [], {}
+    for i, vec in zip(nuevos, vectors):
+        frag = fragmentos[i]
+        nuevos_ids.append(str(uuid.uuid4()))
+        nuevos_vec.append(cache_vectores.normalizar(vec))
+        lexico[nuevos_ids[-1]] = indice_lexico.terminos(frag.texto)
+        filas.append({
+            "id": nuevos_ids[-1],
+            "articulo_id": articulo_id,
+            "chunk_orden": i,
+            "texto": frag.texto,
+            "vector": empaquetar(vec),
+            "vector_int8": cuantizacion.empaquetar(nuevos_vec[-1]),
+            "seccion": seccion_en(secciones, frag.inicio),
+            "char_inicio": frag.inicio,
+            "char_fin": frag.fin,
+            "n_terminos": sum(lexico[nuevos_ids[-1]].values()),
+            **_etiqueta(version),
+        })
+    escritura.insertar(db, EmbeddingDoc, filas)
+    indice_lexico.anadir(db, art.proyecto_id, articulo_id, lexico)
+    art.firma_indice = firma
+    art.hash_indice = arc.hash_sha256
+    _registrar_con_version(db, art.proyecto_id, version)
+    db.commit()
+
+    # El índice aproximado sustituye las filas del artículo: necesita también
+    # los vectores de los conservados.
+    todos = (db.query(EmbeddingDoc.id, EmbeddingDoc.vector)
+             .filter(EmbeddingDoc.articulo_id == articulo_id).all())
+    indice_ann.actualizar_articulo(
+        art.proyecto_id, articulo_id, [t.id for t in todos],
+        [cache_vectores.normalizar(desempaquetar(t.vector)) for t in todos])
+    vectores_mmap.anadir(art.proyecto_id, nuevos_ids, nuevos_vec)
+    return dif
+
+
+def _huella_exacta(texto: str | None) -> str:
+    # Sin normalizar, a diferencia de la cache de embeddings: la fila que se
+    # conserva guarda su texto, y debe ser exactamente el del fragmento.
+    return hashlib.sha256((texto or "").encode("utf-8")).hexdigest()
+
+
+def firma_indice(max_chars: int, overlap: int, version: str | None = None) -> str:
+    """Lo que determina los fragmentos de un PDF, además del propio PDF.
+
+    "version/max_chars/overlap/extractor". Con la versión del extractor, un
+    artículo leído con el anterior no dona sus fragmentos tras subirla: la
+    reextracción que fuerza `VERSION_EXTRACTOR` llega también a las copias.
+    """
+    return "%s/%d/%d/%s" % (version or version_actual(), max_chars, overlap,
+                            text_extractor.VERSION_EXTRACTOR)
+
+
+def version_de_firma(firma: str) -> str:
+    """La versión de los vectores de una firma de `firma_indice`."""
+    return firma.rsplit("/", 3)[0]
+
+
+def _copiar_de_otro_articulo(db: Session, art: Articulo, hash_sha256: str,
+                             firma: str) -> int:
+    """Copia los fragmentos de otro artículo del mismo PDF, si lo hay.
+
+    Varios estudiantes trabajan a menudo sobre bibliografía que se solapa, y
+    el mismo PDF acababa extraído, fragmentado y embebido una vez por
+    proyecto. Si otro artículo ya terminó de indexarse a partir de un PDF con
+    el mismo hash y con la misma firma —mismo modelo, dimensión y
+    fragmentación—, sus fragmentos son exactamente los que saldrían aquí: se
+    copian sin abrir el PDF ni llamar a la API.
+
+    El hash es el del PDF del que salieron sus fragmentos (`hash_indice`), no
+    el de cualquiera de sus archivos: un artículo al que se unió otra subida
+    por DOI tiene dos, y sus fragmentos son solo de uno de ellos.
+
+    No revela nada del otro proyecto: quien sube el PDF ya tiene su
+    contenido, y lo único que se copia es lo que se obtiene de él. Ni el
+    artículo de origen ni su proyecto aparecen en la respuesta.
+    """
+    donante = (db.query(Articulo.id)
+               .filter(Articulo.hash_indice == hash_sha256,
+                       Articulo.id != art.id,
+                       Articulo.firma_indice == firma)
+               .first())
+    if donante is None:
+        return 0
+
+    filas = (db.query(EmbeddingDoc.id, EmbeddingDoc.chunk_orden, EmbeddingDoc.texto,
+                      EmbeddingDoc.vector, EmbeddingDoc.seccion,
+                      EmbeddingDoc.char_inicio, EmbeddingDoc.char_fin)
+             .filter(EmbeddingDoc.articulo_id == donante[0])
+             .order_by(EmbeddingDoc.chunk_orden).all())
+    vectores = {f.id: desempaquetar(f.vector) for f in filas}
+    completar_desde_json(db, vectores)
+    filas = [f for f in filas if len(vectores[f.id])]
+    if not filas:
+        return 0
+
+    nuevos_ids = [str(uuid.uuid4()) for _ in filas]
+    lexico = {nid: indice_lexico.terminos(f.texto) for nid, f in zip(nuevos_ids, filas)}
+    escritura.insertar(db, EmbeddingDoc, [
+        {
+            "id": nid,
+            "articulo_id": art.id,
+            "chunk_orden": f.chunk_orden,
+            "texto": f.texto,
+            "vector": empaquetar(vectores[f.id]),
+            "vector_int8": cuantizacion.empaquetar(
+                cache_vectores.normalizar(vectores[f.id])),
+            "seccion": f.seccion,
+            "char_inicio": f.char_inicio,
+            "char_fin": f.char_fin,
+            "n_terminos": sum(lexico[nid].values()),
+            # La firma empieza por la versión: es la del donante.
+            **_etiqueta(version_de_firma(firma)),
+        }
+        for nid, f in zip(nuevos_ids, filas)
+    ])
+    indice_lexico.anadir(db, art.proyecto_id, art.id, lexico)
+    art.firma_indice = firma
+    art.hash_indice = hash_sha256
+    _registrar_con_version(db, art.proyecto_id, version_de_firma(firma))
+    db.commit()
+    normalizados = [cache_vectores.normalizar(vectores[f.id]) for f in filas]
+    indice_ann.actualizar_articulo(art.proyecto_id, art.id, nuevos_ids, normalizados)
+    vectores_mmap.anadir(art.proyecto_id, nuevos_ids, normalizados)
+    return len(filas)
+
 # ---------------------------
 # Búsqueda y recuperación
 # ---------------------------
-def embed_query(db: Session, articulo_ids: List[str], query: str, top_k: int = 5) -> List[Tuple[str, float, str]]:
-    """Devuelve [(embedding_doc_id, score, texto)]"""
-    q_vec = _embed_texts([query])[0]
-
-    q = db.query(EmbeddingDoc)
-    if articulo_ids:
-        q = q.filter(EmbeddingDoc.articulo_id.in_(articulo_ids))
-    docs = q.all()
-
-    scored: List[Tuple[str, float, str]] = []
-    for d in docs:
-        vec = d.embedding
-        # si por algún motivo quedó string, intenta parsear
-        if isinstance(vec, str):
-            try:
-                vec = json.loads(vec)
-            except Exception:
-                vec = []
-        scored.append((d.id, _cos(q_vec, vec), d.texto))
-
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored[:top_k]
+def _textos(db: Session, ids) -> Dict[str, Any]:
+    """Texto y posición de unos fragmentos, en una sola consulta.
+
+    La matriz en memoria no guarda el texto: se pide solo el de los elegidos.
+    Un fragmento borrado entre la puntuación y esta consulta no aparece.
+    """
+    ids = list(ids)
+    salida: Dict[str, Any] = {}
+    for ini in range(0, len(ids), 500):
+        filas = (db.query(EmbeddingDoc.id, EmbeddingDoc.texto,
+                          EmbeddingDoc.char_inicio, EmbeddingDoc.char_fin)
+                 .filter(EmbeddingDoc.id.in_(ids[ini:ini + 500])).all())
+        salida.update((f.id, f) for f in filas)
+    return salida
+
+
+def _vector_consulta(texto: str, version: str | None,
+                     hechos: Dict[Any, np.ndarray]) -> np.ndarray:
+    """La consulta normalizada en esa versión; una vez por versión."""
+    if version not in hechos:
+        hechos[version] = cache_vectores.normalizar(_embed_consulta(texto, version=version))
+    return hechos[version]
+
+
+def _filas(m: cache_vectores.MatrizProyecto, arts: List[str]) -> np.ndarray:
+    filas = [m.filas_de(a) for a in arts]
+    return np.concatenate(filas) if filas else np.empty(0, dtype=np.int64)
+
+
+def _particion_comun(m: cache_vectores.MatrizProyecto,
+                     comun: indice_ann.Cuantizador) -> indice_ann.Particion:
+    """Las filas del proyecto repartidas entre los centroides del usuario."""
+    if m.comun is None or m.comun[0] != comun.clave:
+        p = indice_ann.agrupar(comun.centroides,
+                               indice_ann.asignar(comun.centroides, m.matriz))
+        m.bytes += p.bytes - (m.comun[1].bytes if m.comun is not None else 0)
+        m.comun = (comun.clave, p)
+    return m.comun[1]
+
+
+def _cuantizador_comun(db: Session, por_proyecto: Dict[str, List[str]]
+                       ) -> Tuple["indice_ann.Cuantizador | None", Any]:
+    """Centroides del usuario, y su versión de embeddings, si la búsqueda
+    abarca varios proyectos suyos y entre todos suman `ANN_MIN_FRAGMENTOS`.
+
+    Si no, (None, None): búsqueda exacta, o el índice del proyecto si es
+    grande por sí solo. Los proyectos en otra versión tampoco los usan.
+    """
+    if len(por_proyecto) < 2:
+        return None, None
+    usuarios = {u for (u,) in db.query(Proyecto.usuario_id)
+                .filter(Proyecto.id.in_(list(por_proyecto))).distinct()}
+    if len(usuarios) != 1:
+        return None, None
+    matrices = {pid: cache_vectores.cache.obtener(db, pid) for pid in por_proyecto}
+    por_version: Dict[Any, int] = {}
+    for pid, m in matrices.items():
+        por_version[m.version] = por_version.get(m.version, 0) + len(_filas(m, por_proyecto[pid]))
+    version, total = max(por_version.items(), key=lambda x: x[1])
+    if total < indice_ann.ANN_MIN_FRAGMENTOS:
+        return None, None
+    return indice_ann.cuantizador(
+        usuarios.pop(), version,
+        [m.matriz for m in matrices.values() if m.version == version and len(m.ids)]), version
+
+
+def _por_vector(db: Session, pid: str, arts: List[str], consulta: str,
+                hechos: Dict[Any, np.ndarray], top_k: int,
+                comun: "indice_ann.Cuantizador | None" = None,
+                version_comun: Any = None) -> List[Tuple[str, float]]:
+    """Los `top_k` fragmentos de unos artículos de un proyecto, por coseno.
+
+    Con `comun`, las listas IVF son las de los centroides del usuario
+    (búsqueda en varios proyectos, `_cuantizador_comun`).
+    """
+    m = cache_vectores.cache.obtener(db, pid)
+    filas = _filas(m, arts)
+    if not len(filas):
+        return []
+    q_vec = _vector_consulta(consulta, m.version, hechos)
+    particion = None
+    if comun is not None and m.version == version_comun:
+        particion = _particion_comun(m, comun)
+    elif len(filas) >= indice_ann.ANN_MIN_FRAGMENTOS:
+        # Muchos fragmentos: solo se puntúan los de las listas IVF más
+        # cercanas a la consulta (app/services/indice_ann.py).
+        if m.particion is None:
+            m.particion = indice_ann.particionar(pid, m.ids, m.articulos, m.matriz)
+            m.bytes += m.particion.bytes
+        particion = m.particion
+    if particion is not None:
+        permitidas = np.zeros(len(m.ids), dtype=bool)
+        permitidas[filas] = True
+        filas, scores = indice_ann.buscar(
+            particion, m.matriz, permitidas, q_vec,
+            cache_vectores.candidatos(m, top_k), nprobe=indice_ann.ANN_NPROBE)
+    else:
+        scores = cache_vectores.puntuar(m, filas, q_vec)
+    # Solo pueden ganar los top_k de cada proyecto.
+    ganadoras, scores = cache_vectores.repuntuar(db, m, filas, scores, q_vec, top_k)
+    return sorted(((m.ids[f], float(s)) for f, s in zip(ganadoras, scores)),
+                  key=lambda x: x[1], reverse=True)
+
+
+# Candidatos de cada lista que entran en la fusión de la búsqueda híbrida.
+CANDIDATOS_HIBRIDA = 50
+
+MODOS_BUSQUEDA = ("vector", "hibrido", "lexico")
+
+
+def embed_query(db: Session, articulo_ids: List[str], query: str, top_k: int = 5,
+                modo: str = "vector") -> List[Tuple[str, float, str]]:
+    """Devuelve [(embedding_doc_id, score, texto)]
+
+    Se puntúa contra las matrices en memoria de los proyectos implicados y
+    solo se lee de la base el texto de los `top_k` ganadores. Si las
+    matrices están cuantizadas, o se busca por prefijo, la puntuación en
+    memoria solo preselecciona y la que se devuelve es la del vector
+    completo.
+
+    `modo` elige la puntuación: "vector" es el coseno; "lexico", BM25 sobre
+    el índice invertido (app/services/indice_lexico.py), sin embeber la
+    consulta ni tocar vectores; "hibrido" fusiona las dos listas por rangos
+    y devuelve la puntuación de la fusión.
+    """
+    if modo not in MODOS_BUSQUEDA:
+        raise ValueError("Modo de búsqueda desconocido: %r" % modo)
+    # La consulta se embebe en la versión de cada proyecto, la primera vez
+    # que hace falta.
+    consultas: Dict[Any, np.ndarray] = {}
+
+    if not articulo_ids:
+        articulo_ids = [a for (a,) in db.query(Articulo.id).all()]
+    por_proyecto: Dict[str, List[str]] = {}
+    for aid, pid in cache_vectores.cache.proyectos_de(db, articulo_ids).items():
+        por_proyecto.setdefault(pid, []).append(aid)
+
+    # Varios proyectos: un solo juego de centroides para todos.
+    comun, version_comun = None, None
+    if modo != "lexico":
+        comun, version_comun = _cuantizador_comun(db, por_proyecto)
+
+    puntuados: List[Tuple[str, float]] = []
+    for pid, arts in por_proyecto.items():
+        if modo == "vector":
+            puntuados.extend(_por_vector(db, pid, arts, query, consultas, top_k,
+                                         comun, version_comun))
+            continue
+        lexicos = indice_lexico.mejores(
+            indice_lexico.puntuar(db, pid, query, arts),
+            top_k if modo == "lexico" else CANDIDATOS_HIBRIDA)
+        if modo == "lexico":
+            puntuados.extend(lexicos)
+            continue
+        vectoriales = _por_vector(db, pid, arts, query, consultas, CANDIDATOS_HIBRIDA,
+                                  comun, version_comun)
+        fusion = indice_lexico.fusionar((i for i, _s in vectoriales),
+                                        (i for i, _s in lexicos))
+        puntuados.extend(indice_lexico.mejores(fusion, top_k))
+
+    puntuados.sort(key=lambda x: x[1], reverse=True)
+    puntuados = puntuados[:max(top_k, 0)]
+    textos = _textos(db, (i for i, _s in puntuados))
+    return [(i, s, textos[i].texto) for i, s in puntuados if i in textos]
 
 def get_top_chunks(db: Session, articulo_id: str, k: int = 8) -> list[str]:
     """Primeros k fragmentos en orden de aparición.
@@ -269,7 +964,7 @@ def get_top_chunks(db: Session, articulo_id: str, k: int = 8) -> list[str]:
     depuración; para obtener contexto usar `recuperar_contexto`.
     """
     rows = (
-        db.query(EmbeddingDoc)
+        db.query(EmbeddingDoc.texto)
         .filter(EmbeddingDoc.articulo_id == articulo_id)
         .order_by(EmbeddingDoc.chunk_orden.asc())
         .limit(k)
@@ -296,6 +991,75 @@ def construir_consulta(contexto: Dict[str, Any]) -> str:
     return " ".join(p for p in partes if p)
 
 
+def seleccionar_mmr(
+    relevancia: np.ndarray,
+    vectores: np.ndarray,
+    secciones,
+    k: int = 8,
+    lambda_diversidad: float = 0.7,
+    min_sustantivos: int = 3,
+) -> List[int]:
+    """Índices elegidos por MMR con cuota seccional, en orden de elección.
+
+    `vectores` son las filas ya normalizadas, de modo que la redundancia
+    entre dos fragmentos es su producto escalar. La versión anterior
+    recalculaba, en cada elección y para cada candidato, el coseno contra
+    todos los ya elegidos, normas incluidas. Aquí se mantiene la máxima
+    redundancia de cada candidato y, al elegir uno, basta un producto de la
+    matriz por su vector para actualizarla.
+
+    Elige lo mismo que la versión anterior, empates incluidos: los
+    candidatos se recorren por relevancia descendente con orden estable, y
+    `argmax` se queda con el primero de los máximos, igual que la
+    comparación estricta del bucle.
+    """
+    n = len(relevancia)
+    if not n:
+        return []
+    orden = np.argsort(-np.asarray(relevancia, dtype=np.float64), kind="stable")
+    rel = np.asarray(relevancia, dtype=np.float64)[orden]
+    vec = np.asarray(vectores, dtype=np.float64)[orden]
+    sec = np.asarray(secciones, dtype=object)[orden]
+
+    disponible = np.ones(n, dtype=bool)
+    redundancia = np.full(n, -np.inf)
+    seleccion: List[int] = []
+
+    def _elegir(pool: np.ndarray) -> int | None:
+        """Mejor candidato del pool según relevancia penalizada por redundancia."""
+        if not pool.any():
+            return None
+        if seleccion:
+            val = lambda_diversidad * rel - (1 - lambda_diversidad) * redundancia
+        else:
+            val = rel.copy()
+        val[~pool] = -np.inf
+        return int(np.argmax(val))
+
+    def _tomar(i: int) -> None:
+        seleccion.append(i)
+        disponible[i] = False
+        np.maximum(redundancia, vec @ vec[i], out=redundancia)
+
+    # 1) Cuota seccional: asegura presencia de las secciones sustantivas.
+    disponibles_sustantivas = {s for s in sec if s in SECCIONES_SUSTANTIVAS}
+    for seccion in sorted(disponibles_sustantivas):
+        if len(seleccion) >= min(min_sustantivos, k):
+            break
+        elegido = _elegir(disponible & (sec == seccion))
+        if elegido is not None:
+            _tomar(elegido)
+
+    # 2) El resto por relevancia con diversificación.
+    while len(seleccion) < k:
+        elegido = _elegir(disponible)
+        if elegido is None:
+            break
+        _tomar(elegido)
+
+    return [int(orden[i]) for i in seleccion]
+
+
 def recuperar_contexto(
     db: Session,
     articulo_id: str,
@@ -303,6 +1067,7 @@ def recuperar_contexto(
     k: int = 8,
     lambda_diversidad: float = 0.7,
     min_sustantivos: int = 3,
+    hibrido: bool = False,
 ) -> List[Dict[str, Any]]:
     """Selecciona los fragmentos que se entregarán al modelo.
 
@@ -316,98 +1081,141 @@ def recuperar_contexto(
        y limitaciones, de modo que el ranking no deje fuera las secciones
        donde de verdad se aprecia una brecha.
 
+    Con `hibrido` la relevancia fusiona por rangos el coseno con BM25 sobre
+    los términos de la consulta (app/services/indice_lexico.py), escalada
+    para que el mejor valga 1. Sirve cuando el contexto del proyecto nombra
+    métodos, siglas o conjuntos de datos concretos.
+
     Devuelve una lista de diccionarios con texto, sección y puntuación, apta
-    para registrar trazabilidad además de para construir el prompt.
+    para registrar trazabilidad además de para construir el prompt. Para
+    varios artículos con el mismo contexto, `recuperar_contextos`.
     """
-    docs = (
-        db.query(EmbeddingDoc)
-        .filter(EmbeddingDoc.articulo_id == articulo_id)
-        .order_by(EmbeddingDoc.chunk_orden.asc())
-        .all()
-    )
-    if not docs:
-        return []
+    return recuperar_contextos(
+        db, [articulo_id], contexto, k=k, lambda_diversidad=lambda_diversidad,
+        min_sustantivos=min_sustantivos, hibrido=hibrido,
+    ).get(articulo_id, [])
 
-    consulta = construir_consulta(contexto)
-    q_vec = _embed_texts([consulta])[0]
-
-    candidatos = []
-    for d in docs:
-        vec = d.embedding
-        if isinstance(vec, str):
-            try:
-                vec = json.loads(vec)
-            except Exception:
-                vec = []
-        if not vec:
-            continue
-        candidatos.append({
-            "id": d.id,
-            "texto": d.texto,
-            "seccion": d.seccion or "otro",
-            "orden": d.chunk_orden,
-            "char_inicio": d.char_inicio,
-            "char_fin": d.char_fin,
-            "vector": vec,
-            "score": _cos(q_vec, vec),
-        })
-    if not candidatos:
-        return []
 
-    candidatos.sort(key=lambda c: c["score"], reverse=True)
+def _preseleccion(m, filas: np.ndarray, scores: np.ndarray, k: int,
+                  lexicos: Dict[str, float]) -> np.ndarray:
+    """Posiciones, dentro de `filas`, que pasan a MMR con la matriz aproximada.
 
-    seleccion: List[Dict[str, Any]] = []
-    restantes = list(candidatos)
+    Las mejores por la puntuación aproximada, el mejor de cada sección
+    sustantiva —para que la cuota no dependa del error de la
+    preselección— y los que tienen algún término de la consulta.
+    """
+    cand = set(indice_ann.mejores(scores, cache_vectores.candidatos(m, k)).tolist())
+    secciones = m.secciones[filas]
+    for seccion in set(secciones) & set(SECCIONES_SUSTANTIVAS):
+        de_seccion = np.flatnonzero(secciones == seccion)
+        cand.add(int(de_seccion[np.argmax(scores[de_seccion])]))
+    cand.update(i for i, fid in enumerate(m.ids[filas]) if fid in lexicos)
+    return np.array(sorted(cand), dtype=np.int64)
 
-    def _elegir(pool: list) -> dict | None:
-        """Mejor candidato del pool según relevancia penalizada por redundancia."""
-        mejor, mejor_val = None, None
-        for c in pool:
-            if not seleccion:
-                val = c["score"]
-            else:
-                redundancia = max(_cos(c["vector"], s["vector"]) for s in seleccion)
-                val = lambda_diversidad * c["score"] - (1 - lambda_diversidad) * redundancia
-            if mejor_val is None or val > mejor_val:
-                mejor, mejor_val = c, val
-        return mejor
 
-    # 1) Cuota seccional: asegura presencia de las secciones sustantivas.
-    disponibles_sustantivas = {
-        c["seccion"] for c in restantes if c["seccion"] in SECCIONES_SUSTANTIVAS
-    }
-    for seccion in sorted(disponibles_sustantivas):
-        if len(seleccion) >= min(min_sustantivos, k):
-            break
-        pool = [c for c in restantes if c["seccion"] == seccion]
-        elegido = _elegir(pool)
-        if elegido is not None:
-            seleccion.append(elegido)
-            restantes.remove(elegido)
+def _partir(valores: np.ndarray, tramos: List[np.ndarray]) -> List[np.ndarray]:
+    """Reparte el resultado de una operación sobre tramos concatenados."""
+    return np.split(valores, np.cumsum([len(t) for t in tramos])[:-1])
 
-    # 2) El resto por relevancia con diversificación.
-    while len(seleccion) < k and restantes:
-        elegido = _elegir(restantes)
-        if elegido is None:
-            break
-        seleccion.append(elegido)
-        restantes.remove(elegido)
 
-    # Se devuelve en orden de aparición: el modelo razona mejor con el
-    # documento en su secuencia natural que con un ranking de relevancia.
-    seleccion.sort(key=lambda c: c["orden"])
-    return [
-        {
-            "embedding_id": c["id"],
-            "texto": c["texto"],
-            "seccion": c["seccion"],
-            "orden": c["orden"],
-            "score": round(c["score"], 4),
-            "char_inicio": c["char_inicio"],
-            "char_fin": c["char_fin"],
-        }
-        for c in seleccion
-    ]
+def recuperar_contextos(
+    db: Session,
+    articulo_ids: Sequence[str],
+    contexto: Dict[str, Any],
+    k: int = 8,
+    lambda_diversidad: float = 0.7,
+    min_sustantivos: int = 3,
+    hibrido: bool = False,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """`recuperar_contexto` para varios artículos con el mismo contexto.
+
+    Una corrida analiza todos sus artículos contra la misma consulta, y
+    hacerlo de uno en uno repetía por artículo la embebida de la consulta,
+    la lectura de la matriz, el producto y la consulta de textos. Aquí la
+    consulta se embebe una vez; por proyecto se puntúan en un solo producto
+    las filas de todos sus artículos (y, con la matriz aproximada, se leen
+    en una consulta los vectores completos de todos los candidatos); por
+    artículo solo queda MMR sobre su tramo. Los textos de lo elegido se
+    piden al final, en una consulta para todos.
+
+    Devuelve, por artículo, lo mismo que `recuperar_contexto`. Los que no
+    existen o no tienen fragmentos quedan con lista vacía.
+    """
+    articulo_ids = list(dict.fromkeys(articulo_ids))
+    salida: Dict[str, List[Dict[str, Any]]] = {a: [] for a in articulo_ids}
+    por_proyecto: Dict[str, List[str]] = {}
+    for aid, pid in cache_vectores.cache.proyectos_de(db, articulo_ids).items():
+        por_proyecto.setdefault(pid, []).append(aid)
+
+    consulta = construir_consulta(contexto)
+    consultas: Dict[Any, np.ndarray] = {}
+    elegidos: Dict[str, List[Dict[str, Any]]] = {}
+    for proyecto_id, arts in por_proyecto.items():
+        m = cache_vectores.cache.obtener(db, proyecto_id)
+        propias = {a: m.filas_de(a) for a in arts}
+        arts = [a for a in arts if len(propias[a])]
+        if not arts:
+            continue
+        q_vec = _vector_consulta(consulta, m.version, consultas)
+        lexicos = (indice_lexico.puntuar(db, proyecto_id, consulta, arts)
+                   if hibrido else {})
+
+        tramos = [propias[a] for a in arts]
+        scores = _partir(cache_vectores.puntuar(m, np.concatenate(tramos), q_vec), tramos)
+        if cache_vectores.es_aproximada(m):
+            # Matriz cuantizada o búsqueda por prefijo: MMR trabaja sobre los
+            # candidatos, puntuados y comparados entre sí con el vector
+            # completo.
+            tramos = [t[_preseleccion(m, t, s, k, lexicos)] for t, s in zip(tramos, scores)]
+            vectores = cache_vectores.exactos(db, m, np.concatenate(tramos))
+            q = cache_vectores.ajustar(q_vec, vectores.shape[1])
+            vectores = _partir(vectores, tramos)
+            scores = [v @ q for v in vectores]
+        else:
+            vectores = [m.matriz[t] for t in tramos]
+
+        for aid, filas, vecs, sc in zip(arts, tramos, vectores, scores):
+            if hibrido:
+                ids = m.ids[filas]
+                suyos = {i: lexicos[i] for i in m.ids[propias[aid]] if i in lexicos}
+                fusion = indice_lexico.fusionar(
+                    ids[np.argsort(-sc, kind="stable")],
+                    (i for i, _s in indice_lexico.mejores(suyos, len(suyos))))
+                sc = np.array([fusion[i] for i in ids])
+                sc /= sc.max()
+            posiciones = seleccionar_mmr(sc, vecs, m.secciones[filas],
+                                         k=k, lambda_diversidad=lambda_diversidad,
+                                         min_sustantivos=min_sustantivos)
+            seleccion = [
+                {
+                    "id": m.ids[filas[i]],
+                    "seccion": m.secciones[filas[i]],
+                    "orden": int(m.ordenes[filas[i]]),
+                    "score": float(sc[i]),
+                }
+                for i in posiciones
+            ]
+            # Se devuelve en orden de aparición: el modelo razona mejor con el
+            # documento en su secuencia natural que con un ranking de relevancia.
+            seleccion.sort(key=lambda c: c["orden"])
+            elegidos[aid] = seleccion
+
+    textos = _textos(db, (c["id"] for sel in elegidos.values() for c in sel))
+    for aid, seleccion in elegidos.items():
+        salida[aid] = [
+            {
+                "embedding_id": c["id"],
+                "texto": textos[c["id"]].texto,
+                "seccion": c["seccion"],
+                "orden": c["orden"],
+                "score": round(c["score"], 4),
+                "char_inicio": textos[c["id"]].char_inicio,
+                "char_fin": textos[c["id"]].char_fin,
+            }
+            for c in seleccion
+            if c["id"] in textos
+        ]
+    return salida
 
 def build_rag_context(db: Session, articulo_id: str, k: int = 8, max_chars: int = 3000) -> str:
     """
@@ -0,0 +1,57 @@
+# app/services/escritura.py
+"""
+Inserciones en bloque, sin pasar por la unidad de trabajo del ORM.
+
+`index_articulo` anadia un `EmbeddingDoc` por fragmento y el registro de
+metricas unas veinte `Metrica` por articulo, cada una con `db.add`. Cada
+objeto pasa por el ORM —estado, mapa de identidades, orden de la
+escritura— para filas que nadie vuelve a leer en la misma sesion. Aqui se
+insertan como diccionarios, contra la tabla, con una sentencia por cada
+`LOTE` filas (executemany).
+
+No confirma: las filas van en la transaccion de quien llama, igual que
+iban con `db.add`. Todas las filas de una llamada deben traer las mismas
+claves.
+"""
+
+from __future__ import annotations
+
+import uuid
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.metrica import Metrica
+
+# Filas por sentencia. Acota el tamano del paquete que se envia a MySQL
+# (max_allowed_packet) con fragmentos largos.
+LOTE = 500
+
+
+def insertar(db: Session, modelo, filas: Iterable[Dict[str, Any]], lote: int = LOTE) -> int:
+    """Inserta las filas en la tabla del modelo y devuelve cuantas."""
+    filas = list(filas)
+    tabla = modelo.__table__
+    for ini in range(0, len(filas), lote):
+        db.execute(insert(tabla), filas[ini:ini + lote])
+    return len(filas)
+
+
+def metrica(proyecto_id: str, ambito: str, referencia_id: str, codigo: str,
+            valor: float | None, detalle: dict | None = None) -> Dict[str, Any]:
+    """Una fila de `metrica`, lista para `insertar`."""
+    return {
+        "id": str(uuid.uuid4()),
+        "proyecto_id": proyecto_id,
+        "ambito": ambito,
+        "referencia_id": referencia_id,
+        "codigo": codigo,
+        "valor": None if valor is None else float(valor),
+        "detalle": detalle,
+    }
+
+
+def metricas(db: Session, filas: List[Dict[str, Any]]) -> int:
+    """Inserta filas de `metrica`."""
+    return insertar(db, Metrica, filas)
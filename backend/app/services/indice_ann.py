@@ -0,0 +1,395 @@
+# app/services/indice_ann.py
+"""
+Indice aproximado (IVF) para buscar entre muchos fragmentos.
+
+`/embeddings/search` sin filtro compara la consulta con todos los fragmentos
+de todos los articulos del usuario. Con la matriz en memoria
+(app/services/cache_vectores.py) eso ya es un producto de matriz por vector,
+pero sigue creciendo con el numero de fragmentos: con decenas de proyectos,
+cada busqueda recorre cientos de miles de filas para quedarse con cinco.
+
+Un indice IVF reparte los vectores en listas, una por centroide. Buscar es
+comparar la consulta con los centroides, quedarse con las `ANN_NPROBE` listas
+mas cercanas y puntuar solo los fragmentos de esas listas. Los fragmentos
+candidatos se puntuan con su vector completo, asi que la puntuacion que se
+devuelve es exacta; lo aproximado es solo que un fragmento relevante caiga en
+una lista que no se visita.
+
+IVF y no HNSW: el grafo de HNSW es caro de construir y de mantener al borrar,
+y en NumPy puro su busqueda es un bucle de Python. IVF son dos productos de
+matrices, y anadir o quitar un articulo es reasignar sus filas.
+
+Lo que se persiste, junto a los PDF, es el resultado del entrenamiento: los
+centroides y la lista de cada fragmento. Los vectores no se copian; siguen
+viniendo de MySQL. Si el archivo no esta al dia —otro proceso indexo algo y
+no llego a guardarlo—, los fragmentos que falten se asignan al vuelo y los
+que sobren se ignoran: el archivo ahorra el entrenamiento, pero no decide que
+fragmentos existen.
+
+Por debajo de `ANN_MIN_FRAGMENTOS` no se usa: la busqueda exacta es igual de
+rapida y no pierde nada.
+
+Buscar en todos los proyectos del usuario no usa los indices de cada
+proyecto: con proyectos medianos, unos centroides entrenados con pocos
+fragmentos reparten mal y el recall cae por debajo de 0.8. Se entrena en
+cambio un solo juego de centroides por usuario (`Cuantizador`), con una
+muestra de todos sus proyectos, y las filas de cada proyecto se reparten
+entre esos centroides. La consulta visita las mismas listas en todos: es un
+unico indice IVF cuyas listas estan repartidas entre las matrices de los
+proyectos, y los top-k de cada una se juntan despues.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from app.config import STORAGE_DIR
+
+ANN_MIN_FRAGMENTOS = int(os.getenv("ANN_MIN_FRAGMENTOS", "20000"))
+
+# Listas que se visitan por consulta. Mas listas, mas recall y mas coste; con
+# las listas que se entrenan (raiz de n) 16 recorre en torno a un 5 % de
+# los fragmentos de un proyecto de cien mil.
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+
+# Vueltas de k-medias y tamano de la muestra con que se entrena. Los
+# centroides solo tienen que repartir bien, no ser optimos: una muestra de
+# 64 puntos por lista basta, y entrenar con todo tardaria sin mejorar nada.
+ITERACIONES = 12
+MUESTRA_POR_LISTA = 64
+
+# Si faltan en el archivo mas de esta fraccion de los fragmentos, o el
+# proyecto ha doblado su tamano desde el entrenamiento, se reentrena: los
+# centroides ya no representan bien lo que hay.
+REENTRENAR_FALTANTES = 0.2
+
+
+def _dir_indices() -> str:
+    return os.path.join(os.path.abspath(STORAGE_DIR), "_indices")
+
+
+def _ruta(proyecto_id: str) -> str:
+    # Los identificadores son UUID; se valida igual que las claves de los
+    # PDF porque acaban formando una ruta del disco.
+    if not proyecto_id or any(c not in "0123456789abcdefABCDEF-" for c in proyecto_id):
+        raise ValueError("Identificador de proyecto inesperado: %r" % proyecto_id)
+    return os.path.join(_dir_indices(), "%s.ivf.npz" % proyecto_id)
+
+
+def _ruta_usuario(usuario_id: str, version: str | None) -> str:
+    # Un juego de centroides por version de embeddings: otra dimension u otro
+    # modelo no comparten espacio.
+    _ruta(usuario_id)
+    sufijo = hashlib.sha1((version or "").encode("utf-8")).hexdigest()[:12]
+    return os.path.join(_dir_indices(), "usuario-%s-%s.npz" % (usuario_id, sufijo))
+
+
+def n_listas_para(n: int) -> int:
+    """Listas a entrenar para n fragmentos: la raiz, como es habitual."""
+    return max(1, int(np.sqrt(n)))
+
+
+# --------------------------------------------------------------- entrenamiento
+
+def entrenar(vectores: np.ndarray, n_listas: int, semilla: int = 0) -> np.ndarray:
+    """Centroides por k-medias esfericas sobre una muestra.
+
+    Los vectores llegan normalizados y se compara por producto escalar, asi
+    que los centroides tambien se normalizan en cada vuelta. Basta con que
+    `vectores` se pueda indexar por filas: tambien vale una matriz
+    cuantizada (app/services/cuantizacion.py).
+    """
+    rng = np.random.default_rng(semilla)
+    n = len(vectores)
+    n_listas = max(1, min(n_listas, n))
+    elegidas = np.arange(n)
+    if n > n_listas * MUESTRA_POR_LISTA:
+        elegidas = rng.choice(n, n_listas * MUESTRA_POR_LISTA, replace=False)
+    muestra = np.asarray(vectores[elegidas], dtype=np.float32)
+
+    centroides = muestra[rng.choice(len(muestra), n_listas, replace=False)].astype(np.float32)
+    for _ in range(ITERACIONES):
+        asignadas = np.argmax(muestra @ centroides.T, axis=1)
+        suma = np.zeros_like(centroides)
+        np.add.at(suma, asignadas, muestra)
+        vacias = ~np.isin(np.arange(n_listas), asignadas)
+        # Una lista vacia se vuelve a sembrar con un punto al azar en lugar
+        # de quedarse como centroide muerto.
+        suma[vacias] = muestra[rng.choice(len(muestra), int(vacias.sum()))]
+        normas = np.linalg.norm(suma, axis=1)
+        normas[normas == 0] = 1.0
+        centroides = (suma / normas[:, None]).astype(np.float32)
+    return centroides
+
+
+def asignar(centroides: np.ndarray, vectores: np.ndarray) -> np.ndarray:
+    """Lista de cada vector: la de su centroide mas cercano."""
+    if not len(vectores):
+        return np.empty(0, dtype=np.int32)
+    ancho = centroides.shape[1]
+    salida = np.empty(len(vectores), dtype=np.int32)
+    # Por tramos, para no materializar una matriz n x listas entera.
+    for ini in range(0, len(vectores), 8192):
+        v = np.asarray(vectores[ini:ini + 8192], dtype=np.float32)[:, :ancho]
+        if v.shape[1] < ancho:
+            v = np.pad(v, ((0, 0), (0, ancho - v.shape[1])))
+        salida[ini:ini + 8192] = np.argmax(v @ centroides.T, axis=1)
+    return salida
+
+
+# ----------------------------------------------------------------- persistencia
+
+@dataclass
+class IndiceIVF:
+    """Lo que se guarda en disco: centroides y lista de cada fragmento."""
+
+    centroides: np.ndarray          # float32, listas x dimension
+    ids: np.ndarray                 # identificador de cada fragmento
+    articulos: np.ndarray           # articulo de cada fragmento
+    listas: np.ndarray              # int32, lista de cada fragmento
+    entrenado_con: int              # fragmentos que habia al entrenar
+
+    def quitar_articulo(self, articulo_id: str) -> None:
+        quedan = self.articulos != articulo_id
+        self.ids, self.articulos, self.listas = (
+            self.ids[quedan], self.articulos[quedan], self.listas[quedan])
+
+    def anadir(self, ids: Sequence[str], articulo_id: str, vectores: np.ndarray) -> None:
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=self.ids.dtype)])
+        self.articulos = np.concatenate(
+            [self.articulos, np.full(len(ids), articulo_id, dtype=self.articulos.dtype)])
+        self.listas = np.concatenate([self.listas, asignar(self.centroides, vectores)])
+
+    def guardar(self, proyecto_id: str) -> None:
+        """Escritura atomica: un lector nunca ve un archivo a medias."""
+        ruta = _ruta(proyecto_id)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        buf = io.BytesIO()
+        np.savez(buf, centroides=self.centroides,
+                 ids=self.ids.astype("U"), articulos=self.articulos.astype("U"),
+                 listas=self.listas, entrenado_con=np.int64(self.entrenado_con))
+        temporal = "%s.%d.tmp" % (ruta, os.getpid())
+        with open(temporal, "wb") as f:
+            f.write(buf.getvalue())
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, proyecto_id: str) -> "IndiceIVF | None":
+        try:
+            with np.load(_ruta(proyecto_id), allow_pickle=False) as z:
+                return cls(centroides=z["centroides"], ids=z["ids"],
+                           articulos=z["articulos"], listas=z["listas"],
+                           entrenado_con=int(z["entrenado_con"]))
+        except (OSError, KeyError, ValueError):
+            # Sin archivo, o ilegible: se entrena de nuevo, no se falla.
+            return None
+
+
+def borrar(proyecto_id: str) -> None:
+    try:
+        os.remove(_ruta(proyecto_id))
+    except (OSError, ValueError):
+        pass
+
+
+@dataclass
+class Cuantizador:
+    """Centroides comunes a los proyectos de un usuario."""
+
+    centroides: np.ndarray
+    entrenado_con: int
+    # Cambia con cada entrenamiento: el reparto de las filas de un proyecto
+    # que se hizo con otra clave ya no vale.
+    clave: str
+
+    def guardar(self, ruta: str) -> None:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        buf = io.BytesIO()
+        np.savez(buf, centroides=self.centroides,
+                 entrenado_con=np.int64(self.entrenado_con), clave=np.str_(self.clave))
+        temporal = "%s.%d.tmp" % (ruta, os.getpid())
+        with open(temporal, "wb") as f:
+            f.write(buf.getvalue())
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> "Cuantizador | None":
+        try:
+            with np.load(ruta, allow_pickle=False) as z:
+                return cls(centroides=z["centroides"], clave=str(z["clave"]),
+                           entrenado_con=int(z["entrenado_con"]))
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def _muestra(matrices: Sequence, n_listas: int, semilla: int = 0) -> np.ndarray:
+    """Filas de todas las matrices, de cada una en proporcion a su tamano."""
+    rng = np.random.default_rng(semilla)
+    total = sum(len(m) for m in matrices)
+    objetivo = n_listas * MUESTRA_POR_LISTA
+    partes = []
+    for m in matrices:
+        k = len(m) if total <= objetivo else max(1, round(objetivo * len(m) / total))
+        elegidas = np.sort(rng.choice(len(m), min(k, len(m)), replace=False))
+        partes.append(np.asarray(m[elegidas], dtype=np.float32))
+    return np.concatenate(partes)
+
+
+def cuantizador(usuario_id: str, version: str | None, matrices: Sequence) -> Cuantizador:
+    """Los centroides del usuario para esa version; los entrena si hace falta.
+
+    `matrices` son las de los proyectos en que se busca. Se reentrena si no
+    hay centroides guardados, si no tienen la dimension de las matrices o si
+    los fragmentos han doblado desde el entrenamiento.
+    """
+    ruta = _ruta_usuario(usuario_id, version)
+    total = sum(len(m) for m in matrices)
+    ancho = matrices[0].shape[1]
+    c = Cuantizador.cargar(ruta)
+    if (c is not None and c.centroides.shape[1] == ancho
+            and total <= 2 * max(c.entrenado_con, 1)):
+        return c
+    n_listas = n_listas_para(total)
+    c = Cuantizador(centroides=entrenar(_muestra(matrices, n_listas), n_listas),
+                    entrenado_con=total, clave=uuid.uuid4().hex)
+    try:
+        c.guardar(ruta)
+    except OSError:
+        pass
+    return c
+
+
+# ------------------------------------------------------------------- busqueda
+
+@dataclass
+class Particion:
+    """Las filas de una matriz en memoria, agrupadas por lista."""
+
+    centroides: np.ndarray
+    filas: np.ndarray               # filas de la matriz, ordenadas por lista
+    cortes: np.ndarray              # inicio de cada lista en `filas`
+
+    @property
+    def bytes(self) -> int:
+        return int(self.centroides.nbytes + self.filas.nbytes + self.cortes.nbytes)
+
+
+def particionar(proyecto_id: str, ids: np.ndarray, articulos: np.ndarray,
+                matriz: np.ndarray) -> Particion:
+    """Particion de la matriz de un proyecto, a partir del indice guardado.
+
+    Entrena y guarda uno nuevo si no lo hay o ya no representa al proyecto.
+    """
+    n = len(ids)
+    indice = IndiceIVF.cargar(proyecto_id)
+    listas = np.full(n, -1, dtype=np.int32)
+    if indice is not None and indice.centroides.shape[1] == matriz.shape[1]:
+        posicion = {i: p for p, i in enumerate(indice.ids.tolist())}
+        for fila, i in enumerate(ids.tolist()):
+            p = posicion.get(i)
+            if p is not None:
+                listas[fila] = indice.listas[p]
+        faltan = listas < 0
+        if (faltan.sum() > REENTRENAR_FALTANTES * n
+                or n > 2 * max(indice.entrenado_con, 1)):
+            indice = None
+        elif faltan.any():
+            listas[faltan] = asignar(indice.centroides, matriz[faltan])
+    else:
+        indice = None
+
+    if indice is None:
+        centroides = entrenar(matriz, n_listas_para(n))
+        listas = asignar(centroides, matriz)
+        indice = IndiceIVF(centroides=centroides, ids=ids.astype("U"),
+                           articulos=articulos.astype("U"), listas=listas,
+                           entrenado_con=n)
+        try:
+            indice.guardar(proyecto_id)
+        except OSError:
+            # Sin disco donde guardarlo se sigue buscando igual; solo se
+            # pierde no tener que entrenar la proxima vez.
+            pass
+
+    return agrupar(indice.centroides, listas)
+
+
+def agrupar(centroides: np.ndarray, listas: np.ndarray) -> Particion:
+    """Particion a partir de la lista asignada a cada fila."""
+    filas = np.argsort(listas, kind="stable")
+    cortes = np.searchsorted(listas[filas], np.arange(len(centroides) + 1))
+    return Particion(centroides=centroides, filas=filas, cortes=cortes)
+
+
+def candidatas(p: Particion, consulta: np.ndarray, nprobe: int = ANN_NPROBE) -> np.ndarray:
+    """Filas de las `nprobe` listas cuyo centroide mas se parece a la consulta."""
+    ancho = p.centroides.shape[1]
+    q = consulta[:ancho]
+    if len(q) < ancho:
+        q = np.pad(q, (0, ancho - len(q)))
+    cercania = p.centroides @ q
+    nprobe = min(max(1, nprobe), len(cercania))
+    elegidas = np.argpartition(-cercania, nprobe - 1)[:nprobe]
+    return np.concatenate([p.filas[p.cortes[l]:p.cortes[l + 1]] for l in elegidas])
+
+
+def actualizar_articulo(proyecto_id: str | None, articulo_id: str,
+                        ids: Sequence[str], vectores: Sequence) -> None:
+    """Refleja en el indice guardado los fragmentos nuevos de un articulo.
+
+    Si el proyecto todavia no tiene indice no se crea aqui: se entrenara la
+    primera vez que una busqueda lo necesite. Un fallo al escribir no debe
+    tumbar la indexacion, que ya esta confirmada en la base.
+    """
+    if not proyecto_id:
+        return
+    indice = IndiceIVF.cargar(proyecto_id)
+    if indice is None:
+        return
+    matriz = np.zeros((len(ids), indice.centroides.shape[1]), dtype=np.float32)
+    for i, v in enumerate(vectores):
+        v = np.asarray(v, dtype=np.float32)[:matriz.shape[1]]
+        matriz[i, :len(v)] = v
+    indice.quitar_articulo(articulo_id)
+    indice.anadir(list(ids), articulo_id, matriz)
+    try:
+        indice.guardar(proyecto_id)
+    except OSError:
+        pass
+
+
+def mejores(puntuaciones: np.ndarray, top_k: int) -> np.ndarray:
+    """Posiciones de las `top_k` puntuaciones mas altas, sin orden."""
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if len(puntuaciones) <= top_k:
+        return np.arange(len(puntuaciones))
+    return np.argpartition(-puntuaciones, top_k - 1)[:top_k]
+
+
+def buscar(p: Particion, matriz: np.ndarray, permitidas: np.ndarray,
+           consulta: np.ndarray, top_k: int,
+           nprobe: int = ANN_NPROBE) -> Tuple[np.ndarray, np.ndarray]:
+    """Filas y puntuaciones de los `top_k` mejores entre las permitidas.
+
+    `permitidas` es una mascara booleana sobre las filas de la matriz: el
+    filtro por articulo se aplica a las candidatas antes de puntuar.
+    """
+    filas = candidatas(p, consulta, nprobe)
+    filas = filas[permitidas[filas]]
+    if not len(filas):
+        return filas, np.empty(0, dtype=np.float32)
+    ancho = matriz.shape[1]
+    q = consulta[:ancho]
+    if len(q) < ancho:
+        q = np.pad(q, (0, ancho - len(q)))
+    scores = matriz[filas] @ q
+    elegidas = mejores(scores, top_k)
+    return filas[elegidas], scores[elegidas]
@@ -0,0 +1,181 @@
+# app/services/indice_lexico.py
+"""
+Busqueda por terminos (BM25) y fusion con la busqueda por vectores.
+
+La recuperacion era solo por vectores. Acierta con el sentido de un parrafo,
+pero no con los terminos exactos que un investigador busca de verdad: el
+nombre de un metodo, una sigla, un conjunto de datos. En modo simulado es
+peor, porque el embebedor es un truco de hashing y una sigla rara se diluye
+entre el resto del fragmento.
+
+El indice invertido (`termino_fragmento`) guarda, por proyecto, en que
+fragmentos aparece cada termino de contenido y cuantas veces. Los terminos
+son los de `metricas.texto.tokens_contenido`, la misma definicion de palabra
+de contenido que usan las metricas. Puntuar una consulta es leer las filas
+de sus terminos, sin tocar ningun vector.
+
+`index_articulo` lo mantiene al dia: al indexar un articulo anade sus
+terminos y al reindexarlo quita los anteriores. Los fragmentos indexados
+antes de que existiera se completan con `scripts/indexar_lexico.py`.
+
+La fusion con los vectores es por rangos (reciprocal rank fusion): cada
+lista aporta 1 / (RRF_K + posicion). No compara puntuaciones de escalas
+distintas —un coseno y un BM25 no se pueden sumar—, solo posiciones.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.articulo import Articulo
+from app.models.embedding_doc import EmbeddingDoc
+from app.models.termino_fragmento import TerminoFragmento as TF
+from app.services import escritura
+from app.services.cache_vectores import _generacion
+
+# Parametros habituales de BM25: saturacion de la frecuencia y peso de la
+# longitud del fragmento.
+K1 = 1.2
+B = 0.75
+
+# Constante de la fusion por rangos. 60 es el valor del articulo original y
+# el que usan casi todos los sistemas: aplana la diferencia entre los
+# primeros puestos de cada lista.
+RRF_K = 60
+
+# Lo que cabe en la columna. Un "termino" mas largo es casi siempre una URL
+# o una cadena pegada por el extractor.
+LARGO_TERMINO = 64
+
+# Identificadores por filtro IN.
+LOTE = 500
+
+
+def terminos(texto: str | None) -> Counter:
+    """Terminos de contenido de un texto, con su frecuencia."""
+    # Aqui y no arriba: el paquete de metricas importa embedding_service,
+    # que importa este modulo.
+    from app.services.metricas.texto import tokens_contenido
+
+    return Counter(t[:LARGO_TERMINO] for t in tokens_contenido(texto or ""))
+
+
+# ------------------------------------------------------------ mantenimiento
+def anadir(db: Session, proyecto_id: str, articulo_id: str,
+           fragmentos: Dict[str, Counter]) -> None:
+    """Anade los terminos de unos fragmentos ya insertados.
+
+    No confirma: va en la misma transaccion que los fragmentos, de modo que
+    nadie ve unos sin los otros.
+    """
+    filas = [
+        {"proyecto_id": proyecto_id, "termino": t, "articulo_id": articulo_id,
+         "embedding_id": eid, "frecuencia": n}
+        for eid, conteo in fragmentos.items() for t, n in conteo.items()
+    ]
+    escritura.insertar(db, TF, filas)
+
+
+def quitar_articulo(db: Session, articulo_id: str) -> None:
+    db.query(TF).filter(TF.articulo_id == articulo_id).delete(synchronize_session=False)
+
+
+def quitar_fragmentos(db: Session, ids: Sequence[str]) -> None:
+    for ini in range(0, len(ids), LOTE):
+        db.query(TF).filter(TF.embedding_id.in_(ids[ini:ini + LOTE])).delete(
+            synchronize_session=False)
+
+
+# ------------------------------------------------------------------ BM25
+_estadisticas: Dict[str, Tuple[int, int, float]] = {}
+_cerrojo = threading.Lock()
+
+
+def _longitudes(db: Session, proyecto_id: str) -> Tuple[int, float]:
+    """Fragmentos indexados del proyecto y su longitud media en terminos.
+
+    Se recuerda por generacion de los vectores, que cambia con cada
+    indexacion: la consulta recorre todos los fragmentos del proyecto y no
+    hace falta repetirla en cada busqueda.
+    """
+    generacion = _generacion(db, proyecto_id)
+    with _cerrojo:
+        guardada = _estadisticas.get(proyecto_id)
+    if guardada is not None and guardada[0] == generacion:
+        return guardada[1], guardada[2]
+    n, total = (db.query(func.count(EmbeddingDoc.id), func.sum(EmbeddingDoc.n_terminos))
+                .join(Articulo, Articulo.id == EmbeddingDoc.articulo_id)
+                .filter(Articulo.proyecto_id == proyecto_id,
+                        EmbeddingDoc.n_terminos.isnot(None))
+                .one())
+    n = int(n or 0)
+    media = float(total or 0) / n if n else 0.0
+    with _cerrojo:
+        _estadisticas[proyecto_id] = (generacion, n, media)
+    return n, media
+
+
+def puntuar(db: Session, proyecto_id: str, consulta: str,
+            articulo_ids: Sequence[str] | None = None) -> Dict[str, float]:
+    """BM25 de la consulta contra los fragmentos de un proyecto.
+
+    Devuelve solo los fragmentos con algun termino de la consulta. La
+    frecuencia de documento se cuenta en todo el proyecto aunque se acote a
+    unos articulos, para que un termino raro lo sea igual en cualquier
+    busqueda.
+    """
+    consulta_t = list(terminos(consulta))
+    if not consulta_t:
+        return {}
+    n, media = _longitudes(db, proyecto_id)
+    if not n:
+        return {}
+
+    df = dict(db.query(TF.termino, func.count())
+              .filter(TF.proyecto_id == proyecto_id, TF.termino.in_(consulta_t))
+              .group_by(TF.termino).all())
+    if not df:
+        return {}
+    idf = {t: math.log(1 + (n - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+
+    q = (db.query(TF.embedding_id, TF.termino, TF.frecuencia, EmbeddingDoc.n_terminos)
+         .join(EmbeddingDoc, EmbeddingDoc.id == TF.embedding_id)
+         .filter(TF.proyecto_id == proyecto_id, TF.termino.in_(list(df))))
+    permitidos = None
+    if articulo_ids is not None:
+        if len(articulo_ids) <= LOTE:
+            q = q.filter(TF.articulo_id.in_(list(articulo_ids)))
+        else:
+            permitidos = set(articulo_ids)
+            q = q.add_columns(TF.articulo_id)
+
+    scores: Dict[str, float] = {}
+    for fila in q:
+        if permitidos is not None and fila.articulo_id not in permitidos:
+            continue
+        tf, largo = fila.frecuencia, fila.n_terminos or 0
+        norma = K1 * (1 - B + B * largo / media) if media else K1
+        scores[fila.embedding_id] = (scores.get(fila.embedding_id, 0.0)
+                                     + idf[fila.termino] * tf * (K1 + 1) / (tf + norma))
+    return scores
+
+
+def mejores(scores: Dict[str, float], top_k: int) -> List[Tuple[str, float]]:
+    """Los `top_k` mejores, de mayor a menor; a igualdad, por identificador."""
+    return sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:max(top_k, 0)]
+
+
+# ----------------------------------------------------------------- fusion
+def fusionar(*rankings: Iterable[str], k: int = RRF_K) -> Dict[str, float]:
+    """Reciprocal rank fusion de varias listas ordenadas de identificadores."""
+    salida: Dict[str, float] = {}
+    for ranking in rankings:
+        for posicion, i in enumerate(ranking, start=1):
+            salida[i] = salida.get(i, 0.0) + 1.0 / (k + posicion)
+    return salida
@@ -0,0 +1,287 @@
+# app/services/ingesta.py
+"""
+Ingesta de un PDF recien subido, fuera de la peticion de subida.
+
+`subir_pdf` abria el PDF con PyMuPDF para leer diez paginas, y si faltaba el
+titulo o el DOI lo volvia a leer entero con pdfminer. Todo dentro del
+manejador asincrono: mientras tanto el bucle de eventos no atendia a nadie,
+y la subida tardaba lo que tardara en leerse el PDF. Despues el trabajador
+lo abria otra vez para indexarlo.
+
+Ahora la subida guarda el archivo, crea el articulo y responde. La ingesta
+va despues, en el pool de hilos de Starlette (BackgroundTasks):
+
+- abre el PDF una vez (`leer_documento`) y saca de esa apertura los
+  metadatos, el texto de cada pagina y el diagnostico N0;
+- deja el diagnostico en la cache de extracciones
+  (app/services/cache_extraccion.py), de donde lo toman la indexacion y el
+  analisis sin volver a leer el PDF;
+- completa el titulo y el DOI del articulo que no diera quien lo subio, y
+  si el DOI ya estaba en el proyecto pasa el archivo a ese articulo, como
+  hacia la subida;
+- deja el archivo en `extraido`, `ocr` o `fallido`.
+
+Despues, el trabajador indexa el articulo —fragmentos y embeddings— en cuanto
+el archivo queda en `extraido` u `ocr` (`indexar_siguiente`), sin esperar a
+que alguien pida el analisis. Al crear la ejecucion los articulos ya estan
+indexados y entran en la cola en `enriquecido` (cola.py): analizarlos es solo
+generar.
+
+Si la ingesta no llega a hacerse —el proceso se reinicia antes—, no se
+pierde nada: pasado `ESPERA_SUBIDO` la hace el trabajador, y si no, el
+analisis lee el PDF por su cuenta, como antes.
+
+Un archivo cuyo indexado falla se aparta: se anota el intento y no vuelve a
+tomarse hasta pasado `ESPERA_REINTENTO` (el doble cada vez); tras
+`INTENTOS_INDEXAR` queda en `fallido`. Sin eso, el mas antiguo que fallara
+se tomaba en cada vuelta y las subidas posteriores no se indexaban nunca.
+Las esperas se miden con el reloj de la base, que es el que pone
+`creado_en`.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Iterable, Set, Tuple
+
+import fitz
+from sqlalchemy import exists, func, or_, select
+
+from app.models.archivo import Archivo, EstadoArchivo
+from app.models.articulo import Articulo
+from app.models.embedding_doc import EmbeddingDoc
+from app.models.run_item import RunItem
+from app.services import almacenamiento, cache_extraccion
+from app.utils.text_extractor import CHARS_POR_PAGINA, DiagnosticoExtraccion, leer_documento
+
+log = logging.getLogger(__name__)
+
+DOI_RE = re.compile(r'10\.\d{4,9}/[-._;()/:A-Z0-9]+', re.I)
+
+# Un archivo que sigue en `subido` pasado este tiempo perdio su ingesta en
+# segundo plano: la hace el trabajador.
+ESPERA_SUBIDO = timedelta(minutes=2)
+
+# Indexado en segundo plano que falla: cuantas veces se prueba y cuanto se
+# espera tras el primer fallo (despues, el doble cada vez).
+INTENTOS_INDEXAR = 3
+ESPERA_REINTENTO = timedelta(minutes=5)
+
+# El titulo y el DOI se buscan en el principio del articulo: unas diez
+# paginas, como al subir. Mas adelante solo aparecen los DOI de otros.
+CHARS_CABECERA = 10 * CHARS_POR_PAGINA
+
+
+def titulo_y_doi(metadatos: dict, texto: str) -> Tuple[str | None, str | None]:
+    """Titulo de los metadatos o, si no hay, la primera linea con forma de titulo."""
+    titulo = None
+    t = (metadatos.get("title") or "").strip()
+    if len(t) >= 5:
+        titulo = t[:500]
+
+    cabecera = (texto or "")[:CHARS_CABECERA]
+    m = DOI_RE.search(cabecera)
+    doi = m.group(0) if m else None
+
+    if not titulo:
+        lineas = [l.strip() for l in cabecera.splitlines() if l.strip()]
+        for l in lineas[:80]:
+            if 15 <= len(l) <= 200:
+                titulo = l[:500]
+                break
+    return titulo, doi
+
+
+def _metadatos(ruta: str) -> dict:
+    """Solo los metadatos: abrir el PDF sin leer sus paginas es inmediato."""
+    try:
+        with fitz.open(ruta) as doc:
+            return dict(doc.metadata or {})
+    except Exception:
+        return {}
+
+
+def leer(ruta: str, huella: str) -> Tuple[dict, DiagnosticoExtraccion]:
+    """Metadatos y diagnostico del PDF, leyendolo una vez como mucho."""
+    d = cache_extraccion.cache.buscar(huella, cache_extraccion.MAX_CHARS)
+    if d is not None:
+        return _metadatos(ruta), d
+    doc = leer_documento(ruta, max_chars=cache_extraccion.MAX_CHARS)
+    cache_extraccion.cache.guardar(huella, cache_extraccion.MAX_CHARS, doc.diagnostico)
+    return doc.metadatos, doc.diagnostico
+
+
+def _articulo_recien_creado(db, art: Articulo, arc: Archivo) -> bool:
+    """Si el articulo no tiene mas que este archivo: nada lo usa aun."""
+    return not (
+        db.query(Archivo.id).filter(Archivo.articulo_id == art.id, Archivo.id != arc.id).first()
+        or db.query(EmbeddingDoc.id).filter(EmbeddingDoc.articulo_id == art.id).first()
+        or db.query(RunItem.id).filter(RunItem.articulo_id == art.id).first()
+    )
+
+
+def ingerir(db, archivo_id: str) -> Archivo | None:
+    """Lee el PDF del archivo y completa el archivo y su articulo."""
+    arc = db.get(Archivo, archivo_id)
+    if arc is None:
+        return None
+    try:
+        ruta = almacenamiento.ruta_local(arc.ruta)
+    except almacenamiento.ClaveInvalida:
+        arc.estado = EstadoArchivo.fallido
+        db.commit()
+        return arc
+
+    metadatos, d = leer(ruta, arc.hash_sha256)
+    titulo, doi = titulo_y_doi(metadatos, d.texto)
+
+    art = db.get(Articulo, arc.articulo_id) if arc.articulo_id else None
+    if art is not None:
+        otro = None
+        if doi and not art.doi:
+            otro = (db.query(Articulo)
+                    .filter(Articulo.proyecto_id == arc.proyecto_id,
+                            Articulo.doi == doi, Articulo.id != art.id).first())
+        if otro is not None and _articulo_recien_creado(db, art, arc):
+            # El mismo articulo ya estaba en el proyecto, subido de otro PDF.
+            arc.articulo_id = otro.id
+            db.flush()
+            db.delete(art)
+        else:
+            if doi and not art.doi and otro is None:
+                art.doi = doi
+            if titulo and not art.titulo:
+                art.titulo = titulo
+
+    if d.metodo == "ocr":
+        arc.estado = EstadoArchivo.ocr
+    else:
+        arc.estado = EstadoArchivo.extraido if d.chars_finales else EstadoArchivo.fallido
+    arc.ocr_aplicado = d.metodo == "ocr"
+    db.commit()
+    return arc
+
+
+def ingerir_en_segundo_plano(archivo_id: str) -> None:
+    """Para BackgroundTasks: con sesion propia, y sin dejar escapar errores."""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        ingerir(db, archivo_id)
+    except Exception:  # noqa: BLE001
+        # La subida ya respondio; quien indexe leera el PDF por su cuenta.
+        db.rollback()
+        log.exception("No se pudo ingerir el archivo %s", archivo_id)
+    finally:
+        db.close()
+
+
+# ------------------------------------------------------------- indexacion
+def indexados(db, articulo_ids: Iterable[str]) -> Set[str]:
+    """Los articulos de la lista que ya tienen fragmentos."""
+    ids = list(articulo_ids)
+    if not ids:
+        return set()
+    return {a for (a,) in db.query(EmbeddingDoc.articulo_id)
+            .filter(EmbeddingDoc.articulo_id.in_(ids)).distinct()}
+
+
+def indexar(db, articulo_id: str) -> int:
+    """`index_articulo` con el articulo bloqueado.
+
+    La subida, una ejecucion o dos trabajadores pueden pedir el mismo
+    articulo a la vez; el segundo espera al primero y encuentra los
+    fragmentos hechos en lugar de pagarlos otra vez.
+    """
+    from app.services.embedding_service import index_articulo
+
+    db.query(Articulo.id).filter(Articulo.id == articulo_id).with_for_update().first()
+    n = index_articulo(db, articulo_id)
+    db.commit()  # si ya estaba indexado no hubo commit: suelta el bloqueo
+    return n
+
+
+def _ahora(db) -> datetime:
+    """La hora de la base: `creado_en` la pone el servidor, no este proceso."""
+    return db.execute(select(func.now())).scalar()
+
+
+def _siguiente_por_indexar(db) -> Tuple[str, str] | None:
+    """(archivo, articulo) del archivo subido mas antiguo sin indexar.
+
+    Se bloquea el articulo con SKIP LOCKED: otro trabajador se lleva otro.
+    Los que fallaron y aun estan en espera no cuentan.
+    """
+    ahora = _ahora(db)
+    sin_fragmentos = ~exists().where(EmbeddingDoc.articulo_id == Archivo.articulo_id)
+    listo = Archivo.estado.in_((EstadoArchivo.extraido, EstadoArchivo.ocr))
+    perdido = ((Archivo.estado == EstadoArchivo.subido)
+               & (Archivo.creado_en < ahora - ESPERA_SUBIDO))
+    a_tiempo = or_(Archivo.reintentar_en.is_(None), Archivo.reintentar_en <= ahora)
+    fila = db.execute(
+        select(Archivo.id, Archivo.articulo_id)
+        .join(Articulo, Articulo.id == Archivo.articulo_id)
+        .where(listo | perdido, sin_fragmentos, a_tiempo,
+               Archivo.intentos_indexar < INTENTOS_INDEXAR)
+        .order_by(Archivo.creado_en.asc())
+        .limit(1)
+        .with_for_update(skip_locked=True, of=Articulo)
+    ).first()
+    if fila is None:
+        db.rollback()
+    return fila
+
+
+def _aplazar(db, archivo_id: str, error: Exception) -> None:
+    """Anota un intento fallido y aparta el archivo hasta el siguiente."""
+    db.rollback()
+    arc = db.get(Archivo, archivo_id)
+    if arc is None:
+        return
+    arc.intentos_indexar = (arc.intentos_indexar or 0) + 1
+    if arc.intentos_indexar >= INTENTOS_INDEXAR:
+        arc.estado = EstadoArchivo.fallido
+        log.error("Indexado del archivo %s abandonado tras %d intentos: %s",
+                  archivo_id, arc.intentos_indexar, error)
+    else:
+        arc.reintentar_en = _ahora(db) + ESPERA_REINTENTO * 2 ** (arc.intentos_indexar - 1)
+        log.warning("Indexado del archivo %s fallido (intento %d), se reintentara: %s",
+                    archivo_id, arc.intentos_indexar, error)
+    db.commit()
+
+
+def indexar_siguiente(db) -> bool:
+    """Indexa un PDF subido que aun no lo este. Devuelve si habia alguno.
+
+    Un fallo aparta el archivo (`_aplazar`) y se sigue con los demas; un PDF
+    sin fragmentos queda en `fallido` sin mas intentos. Agotar la cuota
+    diaria no es culpa del archivo: se propaga sin anotarlo.
+    """
+    from app.services.limitador import CuotaDiariaAgotada
+
+    fila = _siguiente_por_indexar(db)
+    if fila is None:
+        return False
+    archivo_id, articulo_id = fila
+    try:
+        _indexar_archivo(db, archivo_id, articulo_id)
+    except CuotaDiariaAgotada:
+        raise
+    except Exception as e:  # noqa: BLE001
+        _aplazar(db, archivo_id, e)
+    return True
+
+
+def _indexar_archivo(db, archivo_id: str, articulo_id: str) -> None:
+    arc = db.get(Archivo, archivo_id)
+    if arc.estado == EstadoArchivo.subido:
+        arc = ingerir(db, archivo_id)
+        if arc.estado == EstadoArchivo.fallido or arc.articulo_id is None:
+            return
+        articulo_id = arc.articulo_id
+    if indexar(db, articulo_id) == 0:
+        arc.estado = EstadoArchivo.fallido
+        db.commit()
@@ -121,6 +121,14 @@ class Limitador:
             esperado += max(0.0, min(espera, 5.0))
         return esperado
 
+    def liberar(self, n: int) -> None:
+        """Devuelve n permisos de una peticion que el servicio no llego a
+        contar, como un lote rechazado por grande. Se quitan las marcas mas
+        recientes."""
+        with self._cerrojo:
+            for _ in range(min(max(0, n), len(self._marcas))):
+                self._marcas.pop()
+
 
 limitador_embeddings = Limitador(LIMITE_EMBEDDINGS_MIN, "embeddings")
 limitador_generacion = Limitador(LIMITE_GENERACION_MIN, "generacion")
@@ -0,0 +1,138 @@
+# app/services/lotes_embeddings.py
+"""
+Tamano de los lotes de embeddings, ajustado sobre la marcha.
+
+Los fragmentos se enviaban de 32 en 32, midieran lo que midieran. Con
+CHUNK_CHARS=1800 un lote de 32 son unos 60 KB y uno de fragmentos cortos
+apenas 5; el lote fijo no atiende ni al tamano de la peticion ni a lo que
+queda libre de cuota en el minuto. Aqui se decide cuantos textos lleva cada
+peticion:
+
+- Se llenan hasta `EMBED_LOTE_BYTES` de texto (UTF-8) o `EMBED_LOTE_MAX`
+  textos, lo que llegue antes. Un texto que por si solo supera el
+  presupuesto va solo.
+- El tope de textos se ajusta con la latencia observada: una peticion mas
+  lenta que `EMBED_LATENCIA_OBJETIVO_SEG` lo reduce a la mitad, y una rapida
+  que fue llena lo sube la mitad, sin pasar de `EMBED_LOTE_MAX`.
+- Nunca se toman mas textos de los que caben en lo que queda de la ventana
+  del limitador (`Limitador.usadas()`), repartido entre los lotes en vuelo:
+  un lote mas grande que el hueco esperaria entero a que se libere, y uno
+  que cabe sale ya.
+- Si el servicio rechaza un lote por grande, se parte en dos y se reintenta
+  cada mitad; el tope de textos y el de bytes bajan a la mitad del lote
+  rechazado, para no volver a tropezar. Los permisos que el lote tomo del
+  limitador se devuelven: el servicio no lo llego a procesar. El tope de
+  bytes vuelve a subir, como el de textos, con peticiones rapidas que lo
+  llenaron; si no, un solo lote rechazado lo dejaba bajo para siempre.
+
+Los tamanos elegidos quedan en `llamada_api` (unidades, lote_bytes y
+latencia_ms) para poder afinar estos valores con datos.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import List, Sequence, Tuple
+
+# batchEmbedContents admite hasta 100 textos por peticion.
+EMBED_LOTE_MAX = max(1, int(os.getenv("EMBED_LOTE_MAX", "100")))
+EMBED_LOTE_BYTES = max(1, int(os.getenv("EMBED_LOTE_BYTES", "64000")))
+EMBED_LATENCIA_OBJETIVO = float(os.getenv("EMBED_LATENCIA_OBJETIVO_SEG", "5"))
+
+# Con el que se empieza: el tamano fijo que habia.
+LOTE_INICIAL = 32
+
+
+def tamano(texto: str) -> int:
+    return len(texto.encode("utf-8"))
+
+
+def es_demasiado_grande(exc: Exception) -> bool:
+    """El servicio rechazo la peticion por su tamano, no por su contenido."""
+    codigo = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if codigo == 413:
+        return True
+    texto = str(exc).lower()
+    return any(m in texto for m in
+               ("too large", "payload size", "request size", "at most 100",
+                "exceeds the maximum", "batch size"))
+
+
+class Dimensionador:
+    """Topes vigentes de textos y bytes por peticion. Seguro entre hilos."""
+
+    def __init__(self, maximo: int = EMBED_LOTE_MAX, presupuesto: int = EMBED_LOTE_BYTES,
+                 objetivo: float = EMBED_LATENCIA_OBJETIVO):
+        self.maximo = max(1, maximo)
+        self.textos = min(LOTE_INICIAL, self.maximo)
+        self.presupuesto = max(1, presupuesto)
+        self.bytes = self.presupuesto
+        self.objetivo = objetivo
+        self._cerrojo = threading.Lock()
+
+    def observar(self, textos: int, segundos: float, bytes_: int = 0) -> None:
+        """Ajusta los topes con la latencia de una peticion.
+
+        Una rapida que llego al tope de textos lo sube; si ocupo al menos la
+        mitad del de bytes, tambien este, sin pasar del configurado.
+        """
+        with self._cerrojo:
+            if segundos > self.objetivo:
+                self.textos = max(1, min(self.textos, textos) // 2)
+            elif segundos < self.objetivo / 2:
+                if textos >= self.textos:
+                    self.textos = min(self.maximo, self.textos + max(1, self.textos // 2))
+                if bytes_ * 2 >= self.bytes:
+                    self.bytes = min(self.presupuesto, self.bytes + max(1, self.bytes // 2))
+
+    def rechazado(self, textos: int, bytes_: int) -> None:
+        """El servicio devolvio un lote por grande."""
+        with self._cerrojo:
+            self.textos = max(1, min(self.textos, textos // 2))
+            self.bytes = max(1, min(self.bytes, bytes_ // 2))
+
+
+class Reparto:
+    """Entrega los lotes de una lista de textos a quien los va a enviar.
+
+    Los lotes se forman al pedirlos, no de antemano: asi cada uno se ajusta a
+    los topes y al hueco del limitador del momento en que sale.
+    """
+
+    def __init__(self, pend: Sequence[Tuple[str, str]], dimensionador: Dimensionador,
+                 limitador, en_vuelo: int = 1, techo: int | None = None):
+        self.pend = pend
+        self.dim = dimensionador
+        self.limitador = limitador
+        self.en_vuelo = max(1, en_vuelo)
+        self.techo = techo
+        self._pos = 0
+        self._cerrado = False
+        self._cerrojo = threading.Lock()
+
+    def cerrar(self) -> None:
+        """No entregar mas lotes: alguno fallo."""
+        self._cerrado = True
+
+    def siguiente(self) -> List[Tuple[str, str]] | None:
+        with self._cerrojo:
+            if self._cerrado or self._pos >= len(self.pend):
+                return None
+            libres = self.limitador.por_minuto - self.limitador.usadas()
+            n = min(self.dim.textos, max(1, libres // self.en_vuelo))
+            if self.techo:
+                n = min(n, self.techo)
+            presupuesto = self.dim.bytes
+            lote, ocupado = [], 0
+            while self._pos < len(self.pend) and len(lote) < n:
+                t = tamano(self.pend[self._pos][1])
+                if lote and ocupado + t > presupuesto:
+                    break
+                lote.append(self.pend[self._pos])
+                ocupado += t
+                self._pos += 1
+            return lote
+
+
+dimensionador = Dimensionador()
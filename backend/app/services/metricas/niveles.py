@@ -12,17 +12,18 @@ evidencial, N4.3 fidelidad del resumen) quedan para el paso siguiente.
 
 from __future__ import annotations
 
-import json
 import math
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Sequence
 
+import numpy as np
 from sqlalchemy.orm import Session
 
 from app.models.embedding_doc import EmbeddingDoc
 from app.services.document_structure import SECCIONES_SUSTANTIVAS
 from app.services.embedding_service import _cos, _embed_texts
 from app.services.metricas import texto as T
+from app.services.vectores import completar_desde_json, desempaquetar
 
 
 # ================================================================= N1
@@ -45,7 +46,7 @@ def n1_3_diversidad_contexto(vectores: Sequence[Sequence[float]]) -> float:
     Un valor bajo indica que el contexto repite la misma idea y desaprovecha
     la ventana del modelo.
     """
-    vs = [v for v in vectores if v]
+    vs = [v for v in vectores if v is not None and len(v)]
     if len(vs) < 2:
         return 0.0
     pares = [
@@ -214,23 +215,21 @@ def n4_calidad_resumen(resumen_generado: str, abstract: str | None) -> MetricasR
 
 
 # ================================================================= agregado
-def vectores_de(db: Session, ids: Sequence[str]) -> List[List[float]]:
-    """Recupera los vectores ya almacenados de unos fragmentos."""
+def vectores_de(db: Session, ids: Sequence[str]) -> List[np.ndarray]:
+    """Recupera los vectores ya almacenados de unos fragmentos.
+
+    Se leen del formato binario, sin pasar por listas de Python; las filas
+    que aún no se han convertido se completan desde el JSON anterior.
+    """
     if not ids:
         return []
-    filas = db.query(EmbeddingDoc).filter(EmbeddingDoc.id.in_(list(ids))).all()
-    por_id = {f.id: f for f in filas}
-    salida: List[List[float]] = []
+    filas = (db.query(EmbeddingDoc.id, EmbeddingDoc.vector)
+             .filter(EmbeddingDoc.id.in_(list(ids))).all())
+    por_id = {f.id: desempaquetar(f.vector) for f in filas}
+    completar_desde_json(db, por_id)
+    salida: List[np.ndarray] = []
     for i in ids:
-        f = por_id.get(i)
-        if not f:
-            continue
-        v = f.embedding
-        if isinstance(v, str):
-            try:
-                v = json.loads(v)
-            except Exception:
-                v = []
-        if v:
+        v = por_id.get(i)
+        if v is not None and len(v):
             salida.append(v)
     return salida
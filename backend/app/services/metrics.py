@@ -1,16 +1,18 @@
 # app/services/metrics.py
 from __future__ import annotations
 from typing import List, Tuple, Optional, Dict
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-import math, json, collections
+import math, collections
 
 from app.models.embedding_doc import EmbeddingDoc
 from app.models.run_item import RunItem
 from app.models.resultado_brecha import ResultadoBrecha
 from app.models.articulo import Articulo
 from app.models.run import Run  # ← para unir por proyecto
-from app.services.embedding_service import _embed_texts  # helper existente
+from app.services.embedding_service import _embed_texts, version_de  # helper existente
 from app.services.text_cleaning import normalize_basic
+from app.services.vectores import completar_desde_json, desempaquetar
 
 # Importar ResultadoResumen (resumen_generado, resumen_referencia, lexical_density, rouge1_*)
 try:
@@ -20,8 +22,8 @@ except Exception:  # pragma: no cover
 
 
 # ---------- utilidades ----------
-def embed_text(text: str) -> List[float]:
-    return _embed_texts([text or ""])[0]
+def embed_text(text: str, version: str | None = None) -> List[float]:
+    return _embed_texts([text or ""], version=version)[0]
 
 
 def cosine(a: List[float], b: List[float]) -> float:
@@ -103,20 +105,23 @@ def validate_breach_with_rag(
     Calcula la similitud media entre la brecha y los embeddings del artículo.
     Devuelve (sim_promedio, rag_hits, val_score).
     """
-    q_vec = embed_text(brecha_text)
-    docs = db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == articulo_id).all()
+    proyecto_id = (db.query(Articulo.proyecto_id)
+                   .filter(Articulo.id == articulo_id).scalar())
+    # La brecha se compara con los fragmentos en la version del proyecto.
+    version = version_de(db, proyecto_id)
+    q_vec = embed_text(brecha_text, version)
+    docs = (db.query(EmbeddingDoc.id, EmbeddingDoc.vector)
+            .filter(EmbeddingDoc.articulo_id == articulo_id,
+                    or_(EmbeddingDoc.version.is_(None), EmbeddingDoc.version == version))
+            .all())
     if not docs:
         return 0.0, 0, 0.0
 
+    vectores = {d.id: desempaquetar(d.vector) for d in docs}
+    completar_desde_json(db, vectores)
     scored: List[float] = []
-    for d in docs:
-        vec = d.embedding
-        if isinstance(vec, str):
-            try:
-                vec = json.loads(vec)
-            except Exception:
-                vec = []
-        scored.append(cosine(q_vec, vec))
+    for vec in vectores.values():
+        scored.append(cosine(q_vec, vec.tolist()))
 
     scored = [s for s in scored if s > 0]
     if not scored:
@@ -443,7 +448,7 @@ def project_indicators(db: Session, proyecto_id: str) -> Dict[str, Dict]:
 
     # ---- Proxies para el PDF/front (claridad visualización & utilidad) ----
     try:
-        have_plots = bool(db.query(EmbeddingDoc).first())
+        have_plots = bool(db.query(EmbeddingDoc.id).first())
     except Exception:
         have_plots = False
     claridad_viz = 1.0 if have_plots else 0.0
@@ -0,0 +1,227 @@
+# app/services/migracion_embeddings.py
+"""
+Migracion de un proyecto a otra version de embeddings, sin cortar el servicio.
+
+Cambiar EMBED_MODEL o EMBED_DIM dejaba los fragmentos ya indexados con
+vectores del modelo anterior y las consultas embebidas con el nuevo: las
+similitudes entre ambos no significan nada, y la unica salida era reindexar
+el proyecto entero de golpe, horas con la cuota gratuita, durante las cuales
+la busqueda no devolvia nada util.
+
+Ahora cada proyecto tiene su version (`proyecto.version_embeddings`) y la
+consulta se embebe con ella. Migrar va en tres pasos:
+
+1. `iniciar` anota la version de destino (`proyecto.version_destino`).
+2. `avanzar` embebe, de `MIGRACION_LOTE` en `MIGRACION_LOTE`, los
+   fragmentos que aun no la tienen y guarda los vectores aparte
+   (`vector_migrado`). Las consultas siguen usando los de `embedding_doc`.
+   Va al paso del limitador: solo toma lo que cabe en el hueco del minuto
+   y se detiene al gastar `MIGRACION_CUOTA_DIA` de la cuota diaria, para
+   no dejar sin embeddings a quien indexa articulos nuevos.
+3. Cuando no queda ninguno, `cambiar` pasa todos los vectores a
+   `embedding_doc` y la version del proyecto en una sola transaccion. Una
+   consulta ve o todo el proyecto en la version anterior o todo en la nueva.
+
+El trabajador (trabajador.py) llama a `avanzar` cuando no tiene analisis que
+hacer; scripts/migrar_embeddings.py la inicia y muestra como va.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Dict
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.articulo import Articulo
+from app.models.embedding_doc import EmbeddingDoc
+from app.models.proyecto import Proyecto
+from app.models.vector_migrado import VectorMigrado
+from app.services import (
+    cache_vectores, cuantizacion, escritura, indice_ann, indice_lexico, registro_api,
+    vectores_mmap,
+)
+from app.services.embedding_service import _embed_texts, partir_version, version_actual
+from app.services.limitador import LIMITE_EMBEDDINGS_DIA, limitador_embeddings
+from app.services.vectores import empaquetar
+
+log = logging.getLogger(__name__)
+
+# Fragmentos por pasada del trabajador.
+MIGRACION_LOTE = max(1, int(os.getenv("MIGRACION_LOTE", "32")))
+# Parte de LIMITE_EMBEDDINGS_DIA que puede gastar la migracion en 24 horas.
+MIGRACION_CUOTA_DIA = float(os.getenv("MIGRACION_CUOTA_DIA", "0.5"))
+
+
+def _sin_migrar(db: Session, proyecto_id: str, destino: str):
+    """Fragmentos del proyecto que aun no tienen vector de `destino`."""
+    return (db.query(EmbeddingDoc.id, EmbeddingDoc.texto)
+            .join(Articulo, Articulo.id == EmbeddingDoc.articulo_id)
+            .outerjoin(VectorMigrado, and_(VectorMigrado.embedding_id == EmbeddingDoc.id,
+                                           VectorMigrado.version == destino))
+            .filter(Articulo.proyecto_id == proyecto_id,
+                    or_(EmbeddingDoc.version.is_(None), EmbeddingDoc.version != destino),
+                    VectorMigrado.embedding_id.is_(None)))
+
+
+def iniciar(db: Session, proyecto_id: str, version: str | None = None) -> str:
+    """Pone el proyecto a migrar a `version` (por omision, la configurada).
+
+    Migrar a la version que ya tiene re-embebe solo los fragmentos que no la
+    llevan; por ejemplo, los de un articulo indexado mientras se cambiaba.
+    """
+    destino = version or version_actual()
+    partir_version(destino)  # que tenga la forma "modelo/dim"
+    (db.query(Proyecto).filter(Proyecto.id == proyecto_id)
+     .update({Proyecto.version_destino: destino}, synchronize_session=False))
+    db.commit()
+    return destino
+
+
+def siguiente_proyecto(db: Session) -> str | None:
+    """Un proyecto con una migracion pendiente, el que lleva mas esperando."""
+    return (db.query(Proyecto.id)
+            .filter(Proyecto.version_destino.isnot(None))
+            .order_by(Proyecto.creado_en).limit(1).scalar())
+
+
+def _cuota_disponible() -> int:
+    """Fragmentos que la migracion puede embeber ahora mismo."""
+    libres = limitador_embeddings.por_minuto - limitador_embeddings.usadas()
+    gastado = registro_api.consumo(horas=24)["embeddings"]
+    return min(libres, int(LIMITE_EMBEDDINGS_DIA * MIGRACION_CUOTA_DIA) - gastado)
+
+
+def avanzar(db: Session, proyecto_id: str, lote: int = MIGRACION_LOTE) -> int:
+    """Embebe un lote en la version de destino. Devuelve cuantos fragmentos.
+
+    Si no queda ninguno, cambia el proyecto de version. 0 quiere decir que
+    no habia nada que hacer o que no queda cuota para la migracion.
+    """
+    destino = (db.query(Proyecto.version_destino)
+               .filter(Proyecto.id == proyecto_id).scalar())
+    if not destino:
+        return 0
+
+    n = min(lote, _cuota_disponible())
+    if n <= 0:
+        return 0
+    filas = _sin_migrar(db, proyecto_id, destino).order_by(EmbeddingDoc.id).limit(n).all()
+    if not filas:
+        cambiar(db, proyecto_id)
+        return 0
+
+    # Un fragmento sin vector en la version nueva se anota igual, con el
+    # vector vacio: si no, `_sin_migrar` lo devolveria en cada pasada, se
+    # volveria a pagar y el proyecto no llegaria a cambiar nunca.
+    llenos = [f for f in filas if (f.texto or "").strip()]
+    vectores = (dict(zip([f.id for f in llenos],
+                         _embed_texts([f.texto for f in llenos], version=destino)))
+                if llenos else {})
+    escritura.insertar(db, VectorMigrado, [_migrado(f.id, destino, vectores.get(f.id))
+                                           for f in filas])
+    db.commit()
+    return len(filas)
+
+
+def _migrado(embedding_id: str, destino: str, v) -> Dict[str, Any]:
+    if not v:
+        return {"embedding_id": embedding_id, "version": destino, "vector": b"",
+                "vector_int8": None}
+    return {"embedding_id": embedding_id, "version": destino, "vector": empaquetar(v),
+            "vector_int8": cuantizacion.empaquetar(cache_vectores.normalizar(v))}
+
+
+def cambiar(db: Session, proyecto_id: str) -> bool:
+    """Pasa el proyecto a la version de destino si ya esta completa.
+
+    Todo en una transaccion, con la fila del proyecto bloqueada: el bloqueo
+    es el mismo que toma `registrar_cambio`, asi que un articulo que se
+    indexa a la vez espera a que termine el cambio, o el cambio a el. Como
+    la indexacion lee la version antes de embeber, sin bloqueo, al tomarlo
+    vuelve a mirarla y, si este cambio se confirmo entre medias, lo repite
+    todo con la nueva (embedding_service._registrar_con_version).
+    """
+    proyecto = (db.query(Proyecto).filter(Proyecto.id == proyecto_id)
+                .with_for_update().one_or_none())
+    destino = proyecto.version_destino if proyecto else None
+    if not destino or _sin_migrar(db, proyecto_id, destino).first() is not None:
+        db.rollback()
+        return False
+
+    anterior = proyecto.version_embeddings
+    modelo, dim = partir_version(destino)
+    articulos = select(Articulo.id).where(Articulo.proyecto_id == proyecto_id)
+    # Los que se quedaron sin vector en la version nueva se quitan: indexados
+    # con ella no tendrian fila (index_articulo salta los vacios).
+    vacios = [i for (i,) in db.query(VectorMigrado.embedding_id)
+              .join(EmbeddingDoc, EmbeddingDoc.id == VectorMigrado.embedding_id)
+              .filter(EmbeddingDoc.articulo_id.in_(articulos),
+                      VectorMigrado.version == destino,
+                      func.length(VectorMigrado.vector) == 0)]
+    if vacios:
+        indice_lexico.quitar_fragmentos(db, vacios)
+        for ini in range(0, len(vacios), 500):
+            lote = vacios[ini:ini + 500]
+            db.query(VectorMigrado).filter(VectorMigrado.embedding_id.in_(lote)) \
+                .delete(synchronize_session=False)
+            db.query(EmbeddingDoc).filter(EmbeddingDoc.id.in_(lote)) \
+                .delete(synchronize_session=False)
+    # MySQL no deja que las subconsultas de un UPDATE lean la tabla que se
+    # actualiza; por eso se filtra por articulo y no por fragmento.
+    preparados = (select(VectorMigrado.embedding_id)
+                  .where(VectorMigrado.version == destino))
+
+    def _columna(c):
+        return (select(c).where(VectorMigrado.embedding_id == EmbeddingDoc.id,
+                                VectorMigrado.version == destino)
+                .scalar_subquery())
+
+    db.execute(update(EmbeddingDoc)
+               .where(EmbeddingDoc.articulo_id.in_(articulos),
+                      EmbeddingDoc.id.in_(preparados))
+               .values(vector=_columna(VectorMigrado.vector),
+                       vector_int8=_columna(VectorMigrado.vector_int8),
+                       modelo=modelo, dimension=dim, version=destino)
+               .execution_options(synchronize_session=False))
+    del_proyecto = select(EmbeddingDoc.id).where(EmbeddingDoc.articulo_id.in_(articulos))
+    db.query(VectorMigrado).filter(VectorMigrado.embedding_id.in_(del_proyecto)) \
+        .delete(synchronize_session=False)
+    # La firma es "version/max_chars/overlap/extractor"
+    # (embedding_service.firma_indice): con la version anterior, reindexar
+    # creeria que los fragmentos estan desfasados. Solo cambia la version; la
+    # fragmentacion y el extractor siguen describiendo los mismos fragmentos,
+    # y una firma de antes de anotar el extractor sigue sin coincidir.
+    if anterior:
+        for art in (db.query(Articulo)
+                    .filter(Articulo.proyecto_id == proyecto_id,
+                            Articulo.firma_indice.like(anterior + "/%"))):
+            art.firma_indice = destino + art.firma_indice[len(anterior):]
+    proyecto.version_embeddings = destino
+    proyecto.version_destino = None
+    cache_vectores.registrar_cambio(db, proyecto_id)
+    db.commit()
+
+    # Los archivos del proyecto tienen los vectores anteriores; la cache los
+    # rehace desde la base en la siguiente consulta.
+    vectores_mmap.borrar(proyecto_id)
+    indice_ann.borrar(proyecto_id)
+    log.info("Proyecto %s migrado de %s a %s.", proyecto_id, anterior, destino)
+    return True
+
+
+def estado(db: Session, proyecto_id: str) -> Dict[str, Any]:
+    """Version activa, la de destino y cuantos fragmentos faltan."""
+    activa, destino = (db.query(Proyecto.version_embeddings, Proyecto.version_destino)
+                       .filter(Proyecto.id == proyecto_id).one())
+    total = (db.query(func.count(EmbeddingDoc.id))
+             .join(Articulo, Articulo.id == EmbeddingDoc.articulo_id)
+             .filter(Articulo.proyecto_id == proyecto_id).scalar())
+    return {
+        "activa": activa,
+        "destino": destino,
+        "fragmentos": int(total or 0),
+        "pendientes": _sin_migrar(db, proyecto_id, destino).count() if destino else 0,
+    }
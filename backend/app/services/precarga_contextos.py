@@ -0,0 +1,108 @@
+# app/services/precarga_contextos.py
+"""
+Contexto de los siguientes articulos de una ejecucion, recuperado por adelantado.
+
+Cada articulo de una ejecucion se analiza con la misma consulta (la del
+contexto del proyecto), y el trabajador los toma de uno en uno. Recuperar
+el contexto de uno solo pagaba entera la embebida de la consulta, el
+producto y la consulta de textos; con `recuperar_contextos` ese trabajo se
+hace una vez para el articulo en curso y los `PRECARGA_ITEMS - 1` siguientes
+pendientes que ya estan indexados.
+
+Lo recuperado se guarda en el proceso junto a la generacion de vectores del
+proyecto. Si entre tanto se indexa o borra algo en el proyecto, la
+generacion cambia y se descarta: nunca se entrega un contexto calculado con
+fragmentos que ya no existen. Cada entrada se entrega una sola vez; un
+reintento del mismo articulo vuelve a recuperar.
+
+Con varios trabajadores, cada uno precarga por su cuenta y alguno calculara
+contextos que acabe analizando otro. Es trabajo perdido, no un error. Por
+eso un articulo que no esta entre los precargados no descarta los demas:
+lo nuevo se suma a lo que ya habia mientras la generacion sea la misma.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.embedding_doc import EmbeddingDoc
+from app.models.run_item import EstadoRunItem, RunItem
+from app.services.cache_vectores import _generacion
+from app.services.embedding_service import construir_consulta, recuperar_contextos
+
+# Articulos por recuperacion, contando el que se esta analizando. 1 la
+# desactiva.
+PRECARGA_ITEMS = int(os.getenv("PRECARGA_ITEMS", "32"))
+
+# Ejecuciones recordadas por proceso. Una ejecucion cancelada a medias no
+# vuelve a pedir lo suyo, y no debe quedarse en memoria para siempre.
+MAX_EJECUCIONES = 16
+
+Recuperados = List[Dict[str, Any]]
+
+_precargados: "OrderedDict[Tuple[str, str], Tuple[int, Dict[str, Recuperados]]]" = OrderedDict()
+_cerrojo = threading.Lock()
+
+
+def _siguientes(db: Session, run_id: str, articulo_id: str, n: int) -> List[str]:
+    """Articulos de los proximos pendientes de la ejecucion que ya tienen fragmentos."""
+    if n <= 0:
+        return []
+    indexado = (db.query(EmbeddingDoc.id)
+                .filter(EmbeddingDoc.articulo_id == RunItem.articulo_id).exists())
+    filas = (db.query(RunItem.articulo_id)
+             .filter(RunItem.run_id == run_id,
+                     RunItem.estado.in_((EstadoRunItem.pendiente, EstadoRunItem.enriquecido)),
+                     RunItem.articulo_id != articulo_id,
+                     indexado)
+             .order_by(RunItem.creado_en.asc())
+             .limit(n).all())
+    return [a for (a,) in filas]
+
+
+def recuperar(db: Session, run_id: str, proyecto_id: str, articulo_id: str,
+              contexto: Dict[str, Any], k: int = 8) -> Recuperados:
+    """Lo mismo que `recuperar_contexto(db, articulo_id, contexto, k)`.
+
+    Lo toma de lo precargado si sigue valido; si no, recupera el de este
+    articulo junto con el de los siguientes de la ejecucion.
+    """
+    clave = (run_id, "%d:%s" % (k, construir_consulta(contexto)))
+    generacion = _generacion(db, proyecto_id)
+    with _cerrojo:
+        guardada = _precargados.get(clave)
+        vigente = guardada is not None and guardada[0] == generacion
+        if vigente and articulo_id in guardada[1]:
+            return guardada[1].pop(articulo_id)
+        ya = set(guardada[1]) if vigente else set()
+
+    # Los que ya estan precargados no se vuelven a recuperar.
+    n = PRECARGA_ITEMS - 1
+    siguientes = [a for a in _siguientes(db, run_id, articulo_id, n + len(ya))
+                  if a not in ya][:n]
+    lote = recuperar_contextos(db, [articulo_id] + siguientes, contexto, k=k)
+    # Solo se guarda lo que tiene contenido: un articulo sin fragmentos
+    # devuelve [] y conviene que su turno lo vuelva a mirar.
+    resto = {a: r for a, r in lote.items() if r and a != articulo_id}
+    with _cerrojo:
+        # Un fallo de este articulo no invalida lo precargado para los demas:
+        # otro trabajador tomo el siguiente, o se salto uno. Con la misma
+        # generacion se suma; con otra, lo guardado ya no vale.
+        guardada = _precargados.get(clave)
+        if guardada is not None and guardada[0] == generacion:
+            guardada[1].update(resto)
+            _precargados.move_to_end(clave)
+        elif resto:
+            _precargados[clave] = (generacion, resto)
+            _precargados.move_to_end(clave)
+            while len(_precargados) > MAX_EJECUCIONES:
+                _precargados.popitem(last=False)
+        else:
+            _precargados.pop(clave, None)
+    return lote.get(articulo_id, [])
+
@@ -31,7 +31,8 @@ REGISTRO_ACTIVO = os.getenv("REGISTRAR_LLAMADAS", "1") not in ("0", "false", "Fa
 def anotar(operacion: str, *, modelo: str | None = None, exito: bool = True,
            unidades: int = 1, motivo: str | None = None,
            tokens_in: int = 0, tokens_out: int = 0,
-           proyecto_id: str | None = None) -> None:
+           proyecto_id: str | None = None, lote_bytes: int | None = None,
+           latencia_ms: int | None = None) -> None:
     """Registra un intento de llamada. Nunca lanza excepcion."""
     if not REGISTRO_ACTIVO:
         return
@@ -50,6 +51,8 @@ def anotar(operacion: str, *, modelo: str | None = None, exito: bool = True,
                 motivo=(motivo or "")[:2000] or None,
                 tokens_in=int(tokens_in or 0),
                 tokens_out=int(tokens_out or 0),
+                lote_bytes=lote_bytes,
+                latencia_ms=latencia_ms,
             ))
             s.commit()
         finally:
@@ -0,0 +1,241 @@
+# app/services/vectores_mmap.py
+"""
+Vectores de cada proyecto en un archivo que todos los procesos mapean.
+
+Sin esto, el servidor y cada trabajador leen de MySQL los vectores de un
+proyecto al arrancar y cada vez que la copia caduca, y cada uno guarda la
+suya: con tres trabajadores el mismo proyecto ocupa cuatro veces la memoria.
+Con `VECTORES_MMAP`, `index_articulo` anade los vectores de cada articulo a
+un archivo por proyecto y la cache (app/services/cache_vectores.py) lo mapea
+con `np.memmap`. Las paginas las comparte el sistema operativo entre todos
+los procesos, y la matriz es una vista del archivo, sin copia.
+
+Junto a los PDF, en `STORAGE_DIR/_vectores`, hay por proyecto:
+
+- `<proyecto>.actual`: la serie vigente y el ancho de las filas.
+- `<proyecto>.<serie>.f32`: filas float32 de norma 1, solo se anade al final.
+- `<proyecto>.<serie>.idx`: una linea `<fragmento> <fila>;` por fila.
+
+MySQL sigue siendo la verdad. El archivo no decide que fragmentos existen:
+la cache pide a la base la lista y solo toma del archivo los vectores de los
+que encuentra en el indice; los que faltan —indexados con la opcion
+apagada, o perdidos en una carrera— se leen de la base como siempre. Lo
+borrado al reindexar se queda en el archivo hasta que se reconstruye
+(`scripts/reconstruir_vectores.py`), que escribe una serie nueva y compacta.
+
+Ningun fallo aqui debe tumbar una indexacion ni una busqueda: todo lo que
+sale mal acaba en leer de la base.
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from app.config import STORAGE_DIR
+
+VECTORES_MMAP = os.getenv("VECTORES_MMAP", "0") not in ("0", "false", "False")
+
+# En Windows, sin esto, os.write traduce los saltos de linea.
+_BINARIO = getattr(os, "O_BINARY", 0)
+
+
+def _dir() -> str:
+    return os.path.join(os.path.abspath(STORAGE_DIR), "_vectores")
+
+
+def _base(proyecto_id: str) -> str:
+    # Como en indice_ann: el identificador acaba formando una ruta del disco.
+    if not proyecto_id or any(c not in "0123456789abcdefABCDEF-" for c in proyecto_id):
+        raise ValueError("Identificador de proyecto inesperado: %r" % proyecto_id)
+    return os.path.join(_dir(), proyecto_id)
+
+
+def _rutas(proyecto_id: str, serie: str) -> Tuple[str, str]:
+    base = "%s.%s" % (_base(proyecto_id), serie)
+    return base + ".f32", base + ".idx"
+
+
+def _vigente(proyecto_id: str) -> Tuple[str, int] | None:
+    """Serie y ancho del archivo vigente, o None si no hay."""
+    try:
+        with open(_base(proyecto_id) + ".actual", encoding="ascii") as f:
+            serie, ancho = f.read().split()
+        return serie, int(ancho)
+    except (OSError, ValueError):
+        return None
+
+
+def _matriz(vectores: Sequence, ancho: int) -> np.ndarray:
+    bloque = np.zeros((len(vectores), ancho), dtype="<f4")
+    for i, v in enumerate(vectores):
+        bloque[i, :len(v)] = v
+    return bloque
+
+
+# ------------------------------------------------------------------ escritura
+def _nueva_serie(proyecto_id: str, ids: Sequence[str], vectores: Sequence,
+                 ancho: int) -> str:
+    """Escribe un archivo completo y lo hace vigente.
+
+    El indicador `.actual` se cambia al final y de forma atomica: un lector
+    ve la serie anterior entera o la nueva entera.
+    """
+    os.makedirs(_dir(), exist_ok=True)
+    serie = uuid.uuid4().hex[:12]
+    f32, idx = _rutas(proyecto_id, serie)
+    with open(f32, "wb") as f:
+        f.write(_matriz(vectores, ancho).tobytes())
+    with open(idx, "w", encoding="ascii", newline="\n") as f:
+        f.writelines("%s %d;\n" % (i, n) for n, i in enumerate(ids))
+    puntero = _base(proyecto_id) + ".actual"
+    temporal = "%s.%d.tmp" % (puntero, os.getpid())
+    with open(temporal, "w", encoding="ascii") as f:
+        f.write("%s %d\n" % (serie, ancho))
+    os.replace(temporal, puntero)
+    return serie
+
+
+def _anadir_filas(f32: str, idx: str, ancho: int, ids: Sequence[str],
+                  bloque: np.ndarray) -> None:
+    """Anade filas al final de una serie ya existente.
+
+    Sin cerrojos: cada archivo se escribe con una sola llamada en modo
+    anadir, y la fila de cada fragmento se deduce de donde acabo la
+    escritura, no de lo que se creia que habia. Si una escritura anterior
+    quedo a medias, se rellena hasta la siguiente fila completa. Si el
+    archivo ya no existe —se reconstruyo entre tanto— no se crea de nuevo:
+    esas filas se leeran de la base.
+    """
+    tam = 4 * ancho
+    datos = bloque.tobytes()
+    fd = os.open(f32, os.O_WRONLY | os.O_APPEND | _BINARIO)
+    try:
+        resto = os.fstat(fd).st_size % tam
+        if resto:
+            os.write(fd, b"\0" * (tam - resto))
+        escritos = os.write(fd, datos)
+        fin = os.lseek(fd, 0, os.SEEK_CUR)
+    finally:
+        os.close(fd)
+    inicio = fin - escritos
+    if escritos != len(datos) or inicio % tam:
+        # Otro proceso escribio a la vez y estas filas no quedaron alineadas.
+        # No se anotan en el indice, asi que nadie las leera.
+        return
+    primera = inicio // tam
+    # El salto inicial separa estas lineas de una que quedara a medias; el
+    # punto y coma final distingue una linea entera de una cortada.
+    lineas = "\n" + "".join("%s %d;\n" % (i, primera + n) for n, i in enumerate(ids))
+    fd = os.open(idx, os.O_WRONLY | os.O_APPEND | _BINARIO)
+    try:
+        os.write(fd, lineas.encode("ascii"))
+    finally:
+        os.close(fd)
+
+
+def anadir(proyecto_id: str | None, ids: Sequence[str], vectores: Sequence) -> None:
+    """Anade los vectores, ya normalizados, de los fragmentos nuevos.
+
+    Se llama despues de confirmar en la base. Los vectores mas anchos que el
+    archivo se quedan fuera; los mas estrechos se rellenan con ceros, que no
+    cambian el coseno.
+    """
+    if not VECTORES_MMAP or not proyecto_id or not len(ids):
+        return
+    try:
+        vigente = _vigente(proyecto_id)
+        if vigente is None:
+            _nueva_serie(proyecto_id, ids, vectores,
+                         max(len(v) for v in vectores))
+            return
+        serie, ancho = vigente
+        caben = [n for n, v in enumerate(vectores) if len(v) <= ancho]
+        if caben:
+            _anadir_filas(*_rutas(proyecto_id, serie), ancho,
+                          [ids[n] for n in caben],
+                          _matriz([vectores[n] for n in caben], ancho))
+    except (OSError, ValueError):
+        pass
+
+
+def reconstruir(proyecto_id: str, ids: Sequence[str], vectores: Sequence) -> int:
+    """Sustituye el archivo del proyecto por uno con exactamente estas filas.
+
+    Devuelve las filas escritas. La serie anterior se borra al terminar; un
+    proceso que la tuviera mapeada la sigue leyendo hasta su proxima carga.
+    """
+    if not len(ids):
+        borrar(proyecto_id)
+        return 0
+    serie = _nueva_serie(proyecto_id, ids, vectores, max(len(v) for v in vectores))
+    # Tambien las de dos procesos que crearon el archivo a la vez: solo una
+    # llego a ser la vigente.
+    _quitar(*(r for r in _series(proyecto_id) if ".%s." % serie not in r))
+    return len(ids)
+
+
+def borrar(proyecto_id: str) -> None:
+    """Quita todos los archivos del proyecto."""
+    try:
+        _quitar(_base(proyecto_id) + ".actual", *_series(proyecto_id))
+    except ValueError:
+        pass
+
+
+def _series(proyecto_id: str) -> list:
+    base = glob.escape(_base(proyecto_id))
+    return glob.glob(base + ".*.f32") + glob.glob(base + ".*.idx")
+
+
+def _quitar(*rutas: str) -> None:
+    for ruta in rutas:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+# ------------------------------------------------------------------- lectura
+@dataclass
+class Mapa:
+    """El archivo vigente de un proyecto, mapeado."""
+
+    matriz: np.ndarray              # np.memmap de solo lectura, filas x ancho
+    filas: Dict[str, int]           # fila de cada fragmento
+
+
+def abrir(proyecto_id: str) -> Mapa | None:
+    """El archivo vigente del proyecto, o None si no hay o no se puede leer.
+
+    El indice se lee antes de medir el archivo de vectores: como las filas
+    se escriben antes que su linea del indice, toda linea leida apunta a una
+    fila que ya esta. Una linea a medias se ignora.
+    """
+    vigente = _vigente(proyecto_id)
+    if vigente is None:
+        return None
+    serie, ancho = vigente
+    try:
+        f32, idx = _rutas(proyecto_id, serie)
+        with open(idx, "rb") as f:
+            texto = f.read()
+        n = os.path.getsize(f32) // (4 * ancho)
+        if not n:
+            return None
+        matriz = np.memmap(f32, dtype="<f4", mode="r", shape=(n, ancho))
+    except (OSError, ValueError):
+        return None
+
+    filas: Dict[str, int] = {}
+    for linea in texto.decode("ascii", "replace").splitlines():
+        partes = linea.split()
+        if (len(partes) == 2 and partes[1].endswith(";")
+                and partes[1][:-1].isdigit() and int(partes[1][:-1]) < n):
+            filas[partes[0]] = int(partes[1][:-1])
+    return Mapa(matriz=matriz, filas=filas)
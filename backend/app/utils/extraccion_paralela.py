@@ -0,0 +1,157 @@
+# app/utils/extraccion_paralela.py
+"""
+Extraccion de texto repartida por paginas entre varios procesos.
+
+PyMuPDF recorria las paginas de una en una y pdfminer, cuando hacia falta,
+analizaba el documento entero en un solo hilo. Con una tesis o una revision
+larga eso son varios segundos, sobre todo con pdfminer, y el GIL impide
+repartirlo entre hilos: el trabajo es de CPU.
+
+Aqui las paginas se parten en tramos contiguos y cada tramo va a un proceso
+del pool, que abre el PDF por su cuenta (un `fitz.Document` no se puede
+compartir entre procesos). Los tramos se recogen en orden, asi que el texto
+sale identico al de la lectura en serie:
+
+- Con PyMuPDF se conserva el corte por `max_chars`: se juntan paginas hasta
+  pasar del limite y las demas se descartan; los tramos que aun no han
+  empezado se cancelan.
+- Con pdfminer cada proceso extrae su tramo (`page_numbers`) y los textos se
+  concatenan; cada pagina termina en salto de pagina, como en la lectura
+  entera.
+
+`EXTRACCION_PROCESOS` fija el tamano del pool (por omision, hasta cuatro
+segun los nucleos; 1 lo desactiva). Por debajo de
+`EXTRACCION_PARALELA_DESDE` paginas se lee en serie: arrancar el trabajo en
+otro proceso cuesta mas de lo que se gana. El pool se crea con `spawn` la
+primera vez que hace falta y se reutiliza; `fork` no es seguro desde el pool
+de hilos del servidor.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple
+
+import fitz
+from pdfminer.high_level import extract_text as pdfminer_extract
+
+log = logging.getLogger(__name__)
+
+EXTRACCION_PROCESOS = max(1, int(os.getenv(
+    "EXTRACCION_PROCESOS", str(min(4, os.cpu_count() or 1)))))
+EXTRACCION_PARALELA_DESDE = int(os.getenv("EXTRACCION_PARALELA_DESDE", "24"))
+
+# Tramos por proceso: mas de uno, para que el corte por max_chars pueda
+# cancelar el final del documento sin haberlo leido.
+TRAMOS_POR_PROCESO = 2
+
+_pool: ProcessPoolExecutor | None = None
+_cerrojo = threading.Lock()
+
+
+def _iniciar_proceso() -> None:
+    # Tesseract reparte cada pagina entre todos los nucleos (OpenMP); con
+    # varios procesos haciendo OCR a la vez eso los satura.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def obtener_pool() -> ProcessPoolExecutor:
+    """El pool compartido por la extraccion y el OCR (ocr_fallback.py)."""
+    global _pool
+    with _cerrojo:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACCION_PROCESOS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_iniciar_proceso)
+        return _pool
+
+
+def descartar_pool() -> None:
+    """Tras un fallo del pool (un proceso muerto), el siguiente uso crea otro."""
+    global _pool
+    with _cerrojo:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def en_paralelo(n_paginas: int) -> bool:
+    return EXTRACCION_PROCESOS > 1 and n_paginas >= EXTRACCION_PARALELA_DESDE
+
+
+def tramos(n_paginas: int, partes: int) -> List[Tuple[int, int]]:
+    """[ini, fin) contiguos que cubren las n paginas, como mucho `partes`."""
+    if n_paginas <= 0:
+        return []
+    paso = math.ceil(n_paginas / max(1, partes))
+    return [(i, min(n_paginas, i + paso)) for i in range(0, n_paginas, paso)]
+
+
+# ---------------------------------------------------- lo que corre en el pool
+def _paginas_fitz(pdf_path: str, ini: int, fin: int, max_chars: int) -> List[str]:
+    """Texto de las paginas [ini, fin). Para en cuanto el tramo solo pasa
+    de max_chars: si el tramo lo pasa, el total tambien."""
+    salida, leidos = [], 0
+    with fitz.open(pdf_path) as doc:
+        for i in range(ini, fin):
+            t = doc[i].get_text("text")
+            salida.append(t)
+            leidos += len(t)
+            if leidos > max_chars:
+                break
+    return salida
+
+
+def _texto_pdfminer(pdf_path: str, ini: int, fin: int | None) -> str:
+    # Con `fin` None el tramo llega al final: pdfminer puede contar las
+    # paginas distinto que PyMuPDF en un PDF defectuoso.
+    return pdfminer_extract(pdf_path, page_numbers=range(ini, fin or sys.maxsize)) or ""
+
+
+# ------------------------------------------------------------ desde fuera
+def paginas_pymupdf(pdf_path: str, n_paginas: int, max_chars: int) -> List[str]:
+    """Las paginas que leeria la lectura en serie, en orden, con el mismo corte."""
+    futuros: List[Future] = []
+    try:
+        pool = obtener_pool()
+        futuros = [pool.submit(_paginas_fitz, pdf_path, ini, fin, max_chars)
+                   for ini, fin in tramos(n_paginas, EXTRACCION_PROCESOS * TRAMOS_POR_PROCESO)]
+        salida, leidos = [], 0
+        for f in futuros:
+            for t in f.result():
+                salida.append(t)
+                leidos += len(t)
+                if leidos > max_chars:
+                    return salida
+        return salida
+    except (BrokenProcessPool, OSError) as e:
+        # El pool, no el PDF: un PDF que falla falla igual en serie.
+        log.warning("Extraccion en paralelo fallida (%s); se lee en serie.", e)
+        descartar_pool()
+        return _paginas_fitz(pdf_path, 0, n_paginas, max_chars)
+    finally:
+        for f in futuros:
+            f.cancel()
+
+
+def texto_pdfminer(pdf_path: str, n_paginas: int) -> str:
+    """El texto de pdfminer del documento entero, tramo a tramo."""
+    rangos = tramos(n_paginas, EXTRACCION_PROCESOS)
+    try:
+        pool = obtener_pool()
+        futuros = [pool.submit(_texto_pdfminer, pdf_path, ini,
+                               None if fin == n_paginas else fin)
+                   for ini, fin in rangos]
+        return "".join(f.result() for f in futuros)
+    except (BrokenProcessPool, OSError) as e:
+        log.warning("pdfminer en paralelo fallido (%s); se lee en serie.", e)
+        descartar_pool()
+        return pdfminer_extract(pdf_path) or ""
@@ -12,6 +12,7 @@ from app.services.document_structure import (
     inicio_referencias,
     nombres_detectados,
 )
+from app.utils import extraccion_paralela
 
 # Estimación de caracteres por página de un artículo científico maquetado a
 # doble columna. Sirve para saber si la extracción recuperó lo esperable.
@@ -19,6 +20,16 @@ CHARS_POR_PAGINA = 2600
 
 MAX_PAGINAS = 30
 
+# Por debajo de esto una página no tiene capa de texto: un número de página o
+# una cabecera no cuentan. Es la que se manda al OCR (ocr_fallback.py).
+CHARS_MIN_PAGINA_NATIVA = 50
+
+# Version de la extraccion y la limpieza. Forma parte de la clave de la cache
+# de extracciones (app/services/cache_extraccion.py): hay que subirla al
+# cambiar cualquier cosa que altere el texto o el diagnostico resultante,
+# para que los PDF ya leidos se vuelvan a leer con el extractor nuevo.
+VERSION_EXTRACTOR = "2"
+
 
 def clean_text(txt: str) -> str:
     """Limpieza básica del texto extraído.
@@ -93,34 +104,47 @@ def legibilidad(texto: str, muestra: int = 20000) -> float:
     return min(1.0, (funcionales / len(palabras)) / 0.25)
 
 
-def _extraer_bruto(pdf_path: str, max_chars: int) -> tuple[str, int, str]:
-    """Devuelve (texto_bruto, n_paginas, metodo_usado)."""
-    partes: list[str] = []
-    paginas = 0
-    try:
-        with fitz.open(pdf_path) as doc:
-            paginas = len(doc)
-            for i in range(min(MAX_PAGINAS, paginas)):
-                t = doc[i].get_text("text")
-                if t:
-                    partes.append(t)
-                if sum(len(x) for x in partes) > max_chars:
-                    break
-    except Exception:
-        pass
+@dataclass
+class DocumentoPDF:
+    """Lo que sale de abrir el PDF una vez: metadatos, páginas y diagnóstico."""
 
-    txt = "\n".join(partes)
-    if len(txt.strip()) >= 300:
-        return txt, paginas, "pymupdf"
+    metadatos: dict = field(default_factory=dict)
+    n_paginas: int = 0
+    paginas: list[str] = field(default_factory=list)   # texto nativo, por página leída
+    diagnostico: DiagnosticoExtraccion = field(default_factory=DiagnosticoExtraccion)
 
-    try:
-        txt2 = pdfminer_extract(pdf_path) or ""
-        if len(txt2.strip()) > len(txt.strip()):
-            txt = txt2
-            if len(txt.strip()) >= 300:
-                return txt, paginas, "pdfminer"
-    except Exception:
-        pass
+
+def _completar_bruto(pdf_path: str, paginas: list[str], max_chars: int,
+                     n_paginas: int = 0) -> tuple[str, str]:
+    """Recurre a pdfminer y al OCR si PyMuPDF no sacó texto suficiente.
+
+    Un PDF mixto —escaneado, con una portada digital del repositorio o
+    páginas sueltas con texto— pasa de los 300 caracteres y se quedaba con
+    las pocas páginas nativas. Si a la mitad o más de las páginas leídas les
+    falta la capa de texto, se recurre al OCR, que solo lee esas.
+
+    Devuelve (texto_bruto, metodo_usado).
+    """
+    txt = "\n".join(t for t in paginas if t)
+    sin_texto = sum(1 for t in paginas if len(t.strip()) < CHARS_MIN_PAGINA_NATIVA)
+    mixto = len(paginas) >= 2 and 2 * sin_texto >= len(paginas)
+    if len(txt.strip()) >= 300 and not mixto:
+        return txt, "pymupdf"
+
+    # En un PDF mixto con texto nativo suficiente pdfminer no aporta: tampoco
+    # ve las páginas escaneadas.
+    if len(txt.strip()) < 300:
+        try:
+            if extraccion_paralela.en_paralelo(n_paginas):
+                txt2 = extraccion_paralela.texto_pdfminer(pdf_path, n_paginas)
+            else:
+                txt2 = pdfminer_extract(pdf_path) or ""
+            if len(txt2.strip()) > len(txt.strip()):
+                txt = txt2
+                if len(txt.strip()) >= 300:
+                    return txt, "pdfminer"
+        except Exception:
+            pass
 
     # PDF escaneado: se recurre al OCR (C-04).
     try:
@@ -129,13 +153,48 @@ def _extraer_bruto(pdf_path: str, max_chars: int) -> tuple[str, int, str]:
         try:
             txt3 = ocr_pdf_to_text(pdf_path, max_pages=MAX_PAGINAS, max_chars=max_chars)
             if len(txt3.strip()) > len(txt.strip()):
-                return txt3, paginas, "ocr"
+                return txt3, "ocr"
         except OCRNoDisponible:
             pass
     except Exception:
         pass
 
-    return txt, paginas, ("pymupdf" if txt.strip() else "ninguno")
+    return txt, ("pymupdf" if txt.strip() else "ninguno")
+
+
+def leer_documento(pdf_path: str, max_chars: int = 120_000) -> DocumentoPDF:
+    """Abre el PDF una sola vez y saca de él todo lo que se necesita.
+
+    Al subir un PDF se abría con PyMuPDF para el título y el DOI, y después
+    con pdfminer entero si faltaba alguno; al indexarlo se abría de nuevo
+    para el texto. Aquí los metadatos, el texto de cada página y el
+    diagnóstico salen de la misma apertura. pdfminer y el OCR solo vuelven a
+    leer el archivo cuando PyMuPDF no saca texto suficiente.
+    """
+    doc_pdf = DocumentoPDF()
+    try:
+        with fitz.open(pdf_path) as doc:
+            doc_pdf.metadatos = dict(doc.metadata or {})
+            doc_pdf.n_paginas = len(doc)
+            a_leer = min(MAX_PAGINAS, doc_pdf.n_paginas)
+            # Con muchas paginas se reparten entre procesos
+            # (app/utils/extraccion_paralela.py); cada uno abre el PDF.
+            if not extraccion_paralela.en_paralelo(a_leer):
+                leidos = 0
+                for i in range(a_leer):
+                    t = doc[i].get_text("text")
+                    doc_pdf.paginas.append(t)
+                    leidos += len(t)
+                    if leidos > max_chars:
+                        break
+        if extraccion_paralela.en_paralelo(a_leer):
+            doc_pdf.paginas = extraccion_paralela.paginas_pymupdf(pdf_path, a_leer, max_chars)
+    except Exception:
+        pass
+
+    bruto, metodo = _completar_bruto(pdf_path, doc_pdf.paginas, max_chars, doc_pdf.n_paginas)
+    doc_pdf.diagnostico = _diagnosticar(bruto, doc_pdf.n_paginas, metodo, max_chars)
+    return doc_pdf
 
 
 def extraer_con_diagnostico(pdf_path: str, max_chars: int = 120_000) -> DiagnosticoExtraccion:
@@ -144,7 +203,12 @@ def extraer_con_diagnostico(pdf_path: str, max_chars: int = 120_000) -> Diagnost
     Es la vía completa; `extract_full_text` se mantiene como envoltorio para
     los llamadores que solo necesitan el texto.
     """
-    bruto, paginas, metodo = _extraer_bruto(pdf_path, max_chars)
+    return leer_documento(pdf_path, max_chars=max_chars).diagnostico
+
+
+def _diagnosticar(bruto: str, paginas: int, metodo: str,
+                  max_chars: int) -> DiagnosticoExtraccion:
+    """Limpia el texto bruto y calcula los indicadores N0."""
     d = DiagnosticoExtraccion(paginas=paginas, metodo=metodo)
     d.chars_brutos = len(bruto)
 
@@ -1,5 +1,7 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 
 # -------------------------------
 # Routers
@@ -41,7 +43,12 @@ from app.models.resultado_resumen import ResultadoResumen
 from app.models.rag_log import RagLog
 from app.models.metrica import Metrica
 from app.models.llamada_api import LlamadaAPI
+from app.models.cache_embedding import CacheEmbedding
+from app.models.cache_extraccion import CacheExtraccion
+from app.models.cache_ocr import CacheOCR
+from app.models.termino_fragmento import TerminoFragmento
 from app.models.usuario import Usuario
+from app.models.vector_migrado import VectorMigrado
 
 # -------------------------------
 # CONFIGURACION
@@ -49,6 +56,7 @@ from app.models.usuario import Usuario
 # Se revisa antes que nada: una variable ausente debe impedir arrancar, no
 # aparecer como un error confuso en la primera peticion que la necesite.
 from app import config
+from app.services import almacenamiento
 
 config.revisar()
 
@@ -119,6 +127,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -------------------------------
+# LIMITE DE SUBIDA
+# -------------------------------
+# FastAPI recibe el formulario entero antes de llamar a `subir_pdf`. Con la
+# cabecera Content-Length un PDF demasiado grande se rechaza antes de leer
+# el cuerpo. Sin ella (envio por trozos) se cuentan los bytes segun llegan y
+# se corta en cuanto pasan del limite, antes de que el formulario termine de
+# volcarse al disco. El margen es para los campos del formulario.
+class LimiteSubidas:
+    """Middleware ASGI: 413 para las subidas que pasan de MAX_SUBIDA_MB."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not scope["path"].endswith("/archivos")):
+            return await self.app(scope, receive, send)
+
+        tope = almacenamiento.MAX_SUBIDA_BYTES + 64 * 1024
+        detalle = "El PDF pasa de %d MB." % config.MAX_SUBIDA_MB
+        largo = Headers(scope=scope).get("content-length", "")
+        if largo.isdigit() and int(largo) > tope:
+            respuesta = JSONResponse(status_code=413, content={"detail": detalle})
+            return await respuesta(scope, receive, send)
+
+        recibidos = 0
+
+        async def recibir():
+            nonlocal recibidos
+            mensaje = await receive()
+            if mensaje["type"] == "http.request":
+                recibidos += len(mensaje.get("body", b""))
+                if recibidos > tope:
+                    # FastAPI deja pasar la HTTPException que salga de leer el cuerpo.
+                    raise HTTPException(status_code=413, detail=detalle)
+            return mensaje
+
+        await self.app(scope, recibir, send)
+
+
+app.add_middleware(LimiteSubidas)
+
 # -------------------------------
 # Healthcheck
 # -------------------------------
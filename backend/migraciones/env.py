@@ -29,9 +29,10 @@ from app.database import Base  # noqa: E402
 # Importar los modelos registra sus tablas en el metadata; sin esto,
 # autogenerate creeria que hay que borrarlas todas.
 from app.models import (  # noqa: E402,F401
-    archivo, articulo, articulo_meta, embedding_doc, estado_arte, llamada_api,
-    metrica, proyecto, rag_log, resultado_brecha, resultado_resumen, run,
-    run_item, usuario,
+    archivo, articulo, articulo_meta, cache_embedding, cache_extraccion,
+    cache_ocr, embedding_doc, estado_arte, llamada_api, metrica, proyecto,
+    rag_log, resultado_brecha, resultado_resumen, run, run_item,
+    termino_fragmento, usuario, vector_migrado,
 )
 
 config = context.config
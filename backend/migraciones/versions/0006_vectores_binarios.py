@@ -0,0 +1,96 @@
+"""Vectores en binario
+
+Los embeddings se guardaban como una lista JSON de 768 numeros: unos 15 KB de
+texto por fragmento que cada recuperacion transferia e interpretaba entera.
+`embedding_doc.vector` los guarda como float32 little-endian, unos 3 KB, que
+se leen sin interpretar nada.
+
+La conversion de las filas existentes se hace aqui mismo, por lotes y con
+cada lote en su propia transaccion. Asi no bloquea la tabla mientras dura y,
+si se interrumpe, volver a ejecutarla continua por donde iba: solo toca las
+filas que siguen sin binario. Mientras tanto los lectores aceptan los dos
+formatos, de modo que la aplicacion puede seguir en servicio.
+
+La columna JSON no se borra todavia, solo deja de ser obligatoria. Borrarla
+aqui haria irreversible la migracion y dejaria sin vectores a cualquier
+proceso antiguo que siguiera en marcha durante el despliegue; se retirara en
+una revision posterior, cuando ya no la lea nadie.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Filas por transaccion. Con 15 KB de JSON por fila son unos 7 MB por lote:
+# lo bastante para que la conversion no eternice, y lo bastante poco para no
+# retener candados ni memoria.
+LOTE = 500
+
+
+def _convertir() -> None:
+    cn = op.get_bind()
+    ultimo = ""
+    while True:
+        filas = cn.execute(sa.text(
+            "SELECT id, embedding FROM embedding_doc "
+            "WHERE id > :ultimo AND vector IS NULL AND embedding IS NOT NULL "
+            "ORDER BY id LIMIT :n"), {"ultimo": ultimo, "n": LOTE}).fetchall()
+        if not filas:
+            return
+        cambios = []
+        for fid, valor in filas:
+            try:
+                lista = json.loads(valor) if isinstance(valor, (str, bytes)) else valor
+                datos = np.asarray(lista, dtype="<f4").tobytes()
+            except (TypeError, ValueError):
+                # Un vector ilegible se deja como estaba: los lectores ya lo
+                # tratan como vacio, y convertirlo no lo arreglaria.
+                continue
+            cambios.append({"id": fid, "vector": datos})
+        if cambios:
+            cn.execute(sa.text(
+                "UPDATE embedding_doc SET vector = :vector WHERE id = :id"), cambios)
+        ultimo = filas[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('embedding_doc', sa.Column('vector', sa.LargeBinary(), nullable=True))
+    op.alter_column('embedding_doc', 'embedding',
+               existing_type=mysql.JSON(),
+               nullable=True)
+    # Fuera de la transaccion de la migracion: cada UPDATE por lotes se
+    # confirma al momento en lugar de acumularse hasta el final.
+    with op.get_context().autocommit_block():
+        _convertir()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Las filas escritas despues de la subida solo tienen binario. Se
+    # devuelven a JSON antes de volver a exigir la columna.
+    cn = op.get_bind()
+    filas = cn.execute(sa.text(
+        "SELECT id, vector FROM embedding_doc WHERE embedding IS NULL")).fetchall()
+    for fid, datos in filas:
+        lista = np.frombuffer(datos or b"", dtype="<f4").tolist()
+        cn.execute(sa.text("UPDATE embedding_doc SET embedding = :e WHERE id = :id"),
+                   {"id": fid, "e": json.dumps(lista)})
+    op.alter_column('embedding_doc', 'embedding',
+               existing_type=mysql.JSON(),
+               nullable=False)
+    op.drop_column('embedding_doc', 'vector')
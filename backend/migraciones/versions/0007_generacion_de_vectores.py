@@ -0,0 +1,36 @@
+"""Generacion de los vectores del proyecto
+
+Cada proceso guarda en memoria los vectores de los proyectos que consulta.
+`proyecto.generacion_vectores` aumenta cada vez que se indexan, reindexan o
+borran fragmentos, y es lo que permite a un proceso saber que su copia quedo
+atras por algo que hizo otro: el servidor web no se entera de lo que indexa
+el trabajador si nadie se lo dice.
+
+Un contador y no una marca de tiempo: dos cambios en el mismo segundo darian
+la misma marca, y la copia vieja pasaria por buena.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('proyecto', sa.Column('generacion_vectores', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('proyecto', 'generacion_vectores')
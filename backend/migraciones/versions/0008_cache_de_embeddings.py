@@ -0,0 +1,48 @@
+"""Cache de embeddings
+
+`cache_embedding` guarda cada vector calculado por el modelo con la huella
+del texto que lo produjo. Evita volver a pedir a la API lo que ya se pidio:
+la consulta de recuperacion, identica para todos los articulos de un
+proyecto, y los fragmentos que no cambian al reindexar.
+
+La clave primaria es la propia clave de busqueda; no hace falta un indice
+aparte ni un identificador artificial.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'cache_embedding',
+        sa.Column('modelo', sa.String(length=64), nullable=False),
+        sa.Column('dimension', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('huella', sa.CHAR(length=64), nullable=False),
+        sa.Column('vector', sa.LargeBinary(), nullable=False),
+        sa.Column('creado_en', sa.DateTime(),
+                  server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('modelo', 'dimension', 'huella'),
+        # Como en 0003: explicitos, para no heredar la colacion de la base.
+        mysql_engine='InnoDB',
+        mysql_charset='utf8mb4',
+        mysql_collate='utf8mb4_0900_ai_ci',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('cache_embedding')
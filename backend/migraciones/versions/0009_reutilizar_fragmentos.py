@@ -0,0 +1,51 @@
+"""Reutilizar fragmentos entre proyectos
+
+El mismo articulo se sube a menudo a varios proyectos: varios estudiantes
+trabajan sobre bibliografia que se solapa. Cada copia se extraia, se
+fragmentaba y se embebia de nuevo. Con esto, al indexar un archivo cuyo PDF
+ya esta indexado en otro articulo con la misma configuracion, se copian sus
+fragmentos sin leer el PDF ni llamar a la API.
+
+- `archivo.uq_archivo_hash` era unica en toda la base. La deduplicacion se
+  habia acotado al proyecto en el codigo, pero la restriccion seguia siendo
+  global, asi que subir a un proyecto un PDF que estaba en otro fallaba al
+  insertar. Pasa a ser unica por (proyecto_id, hash_sha256), y el hash
+  conserva un indice propio para buscar el donante.
+- `articulo.firma_indice` anota con que se generaron los fragmentos. Solo
+  se copian los de un articulo con la misma firma.
+
+Si al bajar de revision hay PDF repetidos entre proyectos, la restriccion
+global no se puede restaurar; la bajada falla en ese punto en lugar de
+borrar archivos.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articulo', sa.Column('firma_indice', sa.String(length=120), nullable=True))
+    op.create_index('idx_archivo_hash', 'archivo', ['hash_sha256'], unique=False)
+    op.create_unique_constraint('uq_archivo_proyecto_hash', 'archivo', ['proyecto_id', 'hash_sha256'])
+    op.drop_constraint('uq_archivo_hash', 'archivo', type_='unique')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_unique_constraint('uq_archivo_hash', 'archivo', ['hash_sha256'])
+    op.drop_constraint('uq_archivo_proyecto_hash', 'archivo', type_='unique')
+    op.drop_index('idx_archivo_hash', table_name='archivo')
+    op.drop_column('articulo', 'firma_indice')
@@ -0,0 +1,36 @@
+"""Vectores cuantizados a int8
+
+Con VECTORES_INT8 la cache de vectores guarda cada proyecto cuantizado, en la
+cuarta parte de memoria, y puntua con el vector completo solo a los
+candidatos. La version cuantizada se calcula al indexar y se guarda en
+`embedding_doc.vector_int8`, para que cargar un proyecto no tenga que leer
+ni cuantizar los vectores completos.
+
+Las filas existentes quedan con la columna vacia: la cache las cuantiza al
+cargarlas y reindexar las completa.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('embedding_doc', sa.Column('vector_int8', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('embedding_doc', 'vector_int8')
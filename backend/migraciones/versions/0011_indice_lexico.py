@@ -0,0 +1,60 @@
+"""Indice lexico de los fragmentos
+
+`termino_fragmento` guarda, por proyecto, en que fragmentos aparece cada
+termino de contenido y cuantas veces. Con ella la busqueda hibrida puntua por
+BM25 leyendo solo las filas de los terminos de la consulta.
+`embedding_doc.n_terminos` es la longitud de cada fragmento en terminos,
+que BM25 necesita para no favorecer a los fragmentos largos.
+
+Las filas existentes quedan sin indexar; `scripts/indexar_lexico.py` las
+completa sin llamar a la API.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('embedding_doc', sa.Column('n_terminos', sa.Integer(), nullable=True))
+    op.create_table(
+        'termino_fragmento',
+        sa.Column('proyecto_id', sa.CHAR(length=36), nullable=False),
+        # Binaria: la colacion por defecto no distingue acentos y haria
+        # chocar terminos distintos en la clave primaria.
+        sa.Column('termino', mysql.VARCHAR(length=64, collation='utf8mb4_bin'), nullable=False),
+        sa.Column('articulo_id', sa.CHAR(length=36), nullable=False),
+        sa.Column('embedding_id', sa.CHAR(length=36), nullable=False),
+        sa.Column('frecuencia', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['proyecto_id'], ['proyecto.id'],
+                                ondelete='CASCADE', onupdate='RESTRICT'),
+        sa.ForeignKeyConstraint(['embedding_id'], ['embedding_doc.id'],
+                                ondelete='CASCADE', onupdate='RESTRICT'),
+        sa.PrimaryKeyConstraint('proyecto_id', 'termino', 'articulo_id', 'embedding_id'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8mb4',
+        mysql_collate='utf8mb4_0900_ai_ci',
+    )
+    op.create_index('idx_termino_articulo', 'termino_fragmento', ['articulo_id'], unique=False)
+    op.create_index('idx_termino_embedding', 'termino_fragmento', ['embedding_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_termino_embedding', table_name='termino_fragmento')
+    op.drop_index('idx_termino_articulo', table_name='termino_fragmento')
+    op.drop_table('termino_fragmento')
+    op.drop_column('embedding_doc', 'n_terminos')
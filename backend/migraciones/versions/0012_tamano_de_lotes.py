@@ -0,0 +1,34 @@
+"""Tamano y latencia de cada lote de embeddings
+
+El tamano de los lotes de embeddings se ajusta sobre la marcha
+(app/services/lotes_embeddings.py). Para poder afinar los topes con datos,
+cada llamada anota los bytes de texto enviados y lo que tardo. `unidades`
+ya guardaba los textos por lote.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('llamada_api', sa.Column('lote_bytes', sa.Integer(), nullable=True))
+    op.add_column('llamada_api', sa.Column('latencia_ms', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('llamada_api', 'latencia_ms')
+    op.drop_column('llamada_api', 'lote_bytes')
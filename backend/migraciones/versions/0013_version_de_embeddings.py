@@ -0,0 +1,87 @@
+"""Version de los embeddings por fragmento y por proyecto
+
+`embedding_doc` no decia que modelo ni que dimension habian producido cada
+vector. Al retirar text-embedding-004, o al cambiar EMBED_DIM, convivian en
+un proyecto vectores incomparables y el coseno entre ellos no significaba
+nada. Cada fila lleva ahora `modelo`, `dimension` y `version`
+("modelo/dim"), y cada proyecto la version con la que se busca
+(`version_embeddings`) y, si se esta migrando, a la que va
+(`version_destino`). `vector_migrado` guarda los vectores nuevos hasta que
+el proyecto se cambia de una vez.
+
+Las filas existentes se etiquetan con el modelo de la firma de su articulo
+o, si no la tiene, con el configurado al migrar (EMBED_MODEL, o "mock" en
+modo simulado), y con la dimension que mide su vector. Cada proyecto toma
+la version de sus fragmentos.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0013'
+down_revision: Union[str, Sequence[str], None] = '0012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _modelo_configurado() -> str:
+    # Como embedding_service._modelo_cache, sin importar la aplicacion.
+    if os.getenv("GEMINI_MODE", "mock").lower() != "real":
+        return "mock"
+    return os.getenv("EMBED_MODEL", "gemini-embedding-001").replace("models/", "")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('embedding_doc', sa.Column('modelo', sa.String(length=64), nullable=True))
+    op.add_column('embedding_doc', sa.Column('dimension', sa.Integer(), nullable=True))
+    op.add_column('embedding_doc', sa.Column('version', sa.String(length=80), nullable=True))
+    op.add_column('proyecto', sa.Column('version_embeddings', sa.String(length=80), nullable=True))
+    op.add_column('proyecto', sa.Column('version_destino', sa.String(length=80), nullable=True))
+    op.create_table(
+        'vector_migrado',
+        sa.Column('embedding_id', sa.CHAR(length=36), nullable=False),
+        sa.Column('version', sa.String(length=80), nullable=False),
+        sa.Column('vector', sa.LargeBinary(), nullable=False),
+        sa.Column('vector_int8', sa.LargeBinary(), nullable=True),
+        sa.Column('creado_en', sa.DateTime(),
+                  server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['embedding_id'], ['embedding_doc.id'],
+                                ondelete='CASCADE', onupdate='RESTRICT'),
+        sa.PrimaryKeyConstraint('embedding_id', 'version'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8mb4',
+        mysql_collate='utf8mb4_0900_ai_ci',
+    )
+
+    op.get_bind().execute(sa.text(
+        "UPDATE embedding_doc e JOIN articulo a ON a.id = e.articulo_id "
+        "SET e.modelo = COALESCE(SUBSTRING_INDEX(a.firma_indice, '/', 1), :modelo), "
+        "    e.dimension = LENGTH(e.vector) DIV 4 "
+        "WHERE e.vector IS NOT NULL"
+    ), {"modelo": _modelo_configurado()})
+    op.execute("UPDATE embedding_doc SET version = CONCAT(modelo, '/', dimension) "
+               "WHERE modelo IS NOT NULL")
+    op.execute(
+        "UPDATE proyecto p SET p.version_embeddings = ("
+        "  SELECT MAX(e.version) FROM embedding_doc e "
+        "  JOIN articulo a ON a.id = e.articulo_id WHERE a.proyecto_id = p.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('vector_migrado')
+    op.drop_column('proyecto', 'version_destino')
+    op.drop_column('proyecto', 'version_embeddings')
+    op.drop_column('embedding_doc', 'version')
+    op.drop_column('embedding_doc', 'dimension')
+    op.drop_column('embedding_doc', 'modelo')
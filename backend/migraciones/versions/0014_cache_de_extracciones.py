@@ -0,0 +1,46 @@
+"""Cache de extracciones
+
+`cache_extraccion` guarda el texto limpio de cada PDF, comprimido, y su
+diagnostico de ingesta, por sha256 del archivo, version del extractor y
+limite de caracteres. Cada PDF se lee una vez por version del extractor en
+lugar de una por cada paso que necesita su texto.
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = '0014'
+down_revision: Union[str, Sequence[str], None] = '0013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'cache_extraccion',
+        sa.Column('huella', sa.CHAR(length=64), nullable=False),
+        sa.Column('version', sa.String(length=16), nullable=False),
+        sa.Column('max_chars', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('texto', mysql.MEDIUMBLOB(), nullable=False),
+        sa.Column('diagnostico', mysql.JSON(), nullable=False),
+        sa.Column('creado_en', sa.DateTime(),
+                  server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('huella', 'version', 'max_chars'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8mb4',
+        mysql_collate='utf8mb4_0900_ai_ci',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('cache_extraccion')
@@ -0,0 +1,43 @@
+"""Cache de OCR por pagina
+
+`cache_ocr` guarda el texto que Tesseract saco de cada pagina escaneada, por
+sha256 de la imagen renderizada e idiomas. El OCR de una pagina ya vista no
+se repite aunque llegue en otro PDF o cambie la version del extractor.
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0015'
+down_revision: Union[str, Sequence[str], None] = '0014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'cache_ocr',
+        sa.Column('huella', sa.CHAR(length=64), nullable=False),
+        sa.Column('idioma', sa.String(length=32), nullable=False),
+        sa.Column('dpi', sa.Integer(), nullable=False),
+        sa.Column('texto', sa.Text(), nullable=False),
+        sa.Column('creado_en', sa.DateTime(),
+                  server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('huella', 'idioma'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8mb4',
+        mysql_collate='utf8mb4_0900_ai_ci',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('cache_ocr')
@@ -0,0 +1,35 @@
+"""Reintentos del indexado en segundo plano
+
+`archivo.intentos_indexar` cuenta los intentos fallidos de indexar el PDF
+desde el trabajador, y `archivo.reintentar_en` aplaza el siguiente. Sin
+ellos, un PDF que fallaba siempre volvia a tomarse en cada vuelta, por ser
+el mas antiguo, y ninguna subida posterior llegaba a indexarse.
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0016'
+down_revision: Union[str, Sequence[str], None] = '0015'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('archivo', sa.Column('intentos_indexar', sa.Integer(),
+                                       server_default='0', nullable=False))
+    op.add_column('archivo', sa.Column('reintentar_en', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('archivo', 'reintentar_en')
+    op.drop_column('archivo', 'intentos_indexar')
@@ -0,0 +1,46 @@
+"""PDF del que salieron los fragmentos de cada articulo
+
+`articulo.hash_indice` guarda el sha256 del PDF con el que se indexo el
+articulo. El donante de `_copiar_de_otro_articulo` se buscaba por cualquier
+archivo del articulo con ese hash; desde que la ingesta une por DOI una
+subida a un articulo ya indexado, ese articulo tiene dos PDF y sus
+fragmentos son solo del primero, asi que otro proyecto podia recibir los
+fragmentos de un PDF distinto del que subio.
+
+Solo se rellena en los articulos indexados con un unico archivo, en los que
+no hay duda de donde salieron. Los demas dejan de servir de donante hasta
+que se vuelvan a indexar.
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0017'
+down_revision: Union[str, Sequence[str], None] = '0016'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articulo', sa.Column('hash_indice', sa.CHAR(length=64), nullable=True))
+    op.create_index('idx_articulo_hash_indice', 'articulo', ['hash_indice'], unique=False)
+    op.execute(
+        "UPDATE articulo SET hash_indice = ("
+        "  SELECT MIN(r.hash_sha256) FROM archivo r WHERE r.articulo_id = articulo.id) "
+        "WHERE firma_indice IS NOT NULL "
+        "  AND (SELECT COUNT(*) FROM archivo r WHERE r.articulo_id = articulo.id) = 1"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_articulo_hash_indice', table_name='articulo')
+    op.drop_column('articulo', 'hash_indice')
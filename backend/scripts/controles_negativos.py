@@ -136,7 +136,7 @@ def ejecutar(proyecto_id: str | None) -> int:
 
 def _texto_de(db, articulo_id: str) -> str:
     from app.models.embedding_doc import EmbeddingDoc
-    filas = (db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == articulo_id)
+    filas = (db.query(EmbeddingDoc.texto).filter(EmbeddingDoc.articulo_id == articulo_id)
              .order_by(EmbeddingDoc.chunk_orden).all())
     return " ".join(f.texto for f in filas)
 
@@ -0,0 +1,73 @@
+# scripts/indexar_lexico.py
+"""
+Completa el indice lexico de los fragmentos indexados antes de que existiera.
+
+`index_articulo` anade los terminos de cada fragmento nuevo, pero los que ya
+estaban en la base no tienen ninguno y la busqueda lexica no los encontraria.
+Esto los recorre por articulo, sin llamar a la API: solo lee su texto.
+
+Uso:
+    python scripts/indexar_lexico.py                 # todos los proyectos
+    python scripts/indexar_lexico.py <proyecto_id>   # solo ese
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import warnings  # noqa: E402
+warnings.filterwarnings("ignore")
+
+from sqlalchemy import update  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.models.articulo import Articulo  # noqa: E402
+from app.models.embedding_doc import EmbeddingDoc  # noqa: E402
+from app.services import indice_lexico  # noqa: E402
+from app.services.cache_vectores import registrar_cambio  # noqa: E402
+
+
+def indexar(db, proyecto_id: str | None) -> int:
+    q = (db.query(Articulo.id, Articulo.proyecto_id)
+         .join(EmbeddingDoc, EmbeddingDoc.articulo_id == Articulo.id)
+         .filter(EmbeddingDoc.n_terminos.is_(None))
+         .distinct())
+    if proyecto_id:
+        q = q.filter(Articulo.proyecto_id == proyecto_id)
+    pendientes = q.all()
+    print("%d articulos con fragmentos sin indice lexico." % len(pendientes))
+
+    total = 0
+    for i, (aid, pid) in enumerate(pendientes, start=1):
+        filas = (db.query(EmbeddingDoc.id, EmbeddingDoc.texto)
+                 .filter(EmbeddingDoc.articulo_id == aid,
+                         EmbeddingDoc.n_terminos.is_(None)).all())
+        lexico = {f.id: indice_lexico.terminos(f.texto) for f in filas}
+        indice_lexico.anadir(db, pid, aid, lexico)
+        for fid, conteo in lexico.items():
+            db.execute(update(EmbeddingDoc).where(EmbeddingDoc.id == fid)
+                       .values(n_terminos=sum(conteo.values())))
+        # Cambia la longitud media del proyecto que usa BM25.
+        registrar_cambio(db, pid)
+        db.commit()
+        total += len(filas)
+        print("  [%d/%d] %s  %d fragmentos" % (i, len(pendientes), aid[:8], len(filas)))
+    print("Indexados %d fragmentos." % total)
+    return 0
+
+
+def main() -> int:
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    db = SessionLocal()
+    try:
+        return indexar(db, args[0] if args else None)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
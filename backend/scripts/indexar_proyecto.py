@@ -34,11 +34,11 @@ from app.database import SessionLocal  # noqa: E402
 from app.models.articulo import Articulo  # noqa: E402
 from app.models.embedding_doc import EmbeddingDoc  # noqa: E402
 from app.models.proyecto import Proyecto  # noqa: E402
+from app.services import cache_extraccion  # noqa: E402
 from app.services.embedding_service import (  # noqa: E402
     CHUNK_CHARS, CHUNK_OVERLAP, MODE, index_articulo,
 )
 from app.services.limitador import LIMITE_EMBEDDINGS_MIN  # noqa: E402
-from app.utils.text_extractor import extraer_con_diagnostico  # noqa: E402
 
 
 def listar(db) -> int:
@@ -97,7 +97,7 @@ def indexar(db, proyecto_id: str, reindexar: bool) -> int:
                    .order_by(Archivo.creado_en.desc()).first())
             motivo = "sin archivo asociado"
             if arc:
-                d = extraer_con_diagnostico(arc.ruta)
+                d = cache_extraccion.extraer(arc.ruta, huella=arc.hash_sha256)
                 motivo = "; ".join(d.avisos) or "texto insuficiente"
             print("[%d/%d] %-52s  SIN INDEXAR: %s" % (i, len(arts), etiqueta, motivo[:80]))
             continue
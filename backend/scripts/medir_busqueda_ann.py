@@ -0,0 +1,137 @@
+# scripts/medir_busqueda_ann.py
+"""
+Compara la busqueda con indice IVF frente a la exacta: recall y latencia.
+
+No toca la base: genera vectores agrupados en temas, como los de un corpus
+real, y los normaliza. La verdad de referencia es el top-k exacto de cada
+consulta; el recall@k es la fraccion de ese top-k que devuelve el indice.
+
+Con --proyectos N el corpus se reparte en N proyectos, como la busqueda en
+todos los del usuario: exacta proyecto a proyecto frente a los centroides
+comunes (indice_ann.cuantizador), juntando los top-k de cada proyecto.
+
+Uso:
+    python scripts/medir_busqueda_ann.py                     # 100000 x 768
+    python scripts/medir_busqueda_ann.py <fragmentos> <dimension> [--proyectos N]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+
+from app.services import indice_ann  # noqa: E402
+
+K = 10
+CONSULTAS = 200
+
+
+def corpus(n: int, dim: int, temas: int = 400, semilla: int = 7):
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((temas, dim)).astype(np.float32)
+    tema = rng.integers(0, temas, n)
+    m = centros[tema] + 2.0 * rng.standard_normal((n, dim)).astype(np.float32)
+    m /= np.linalg.norm(m, axis=1)[:, None]
+    q = centros[rng.integers(0, temas, CONSULTAS)] + 2.0 * rng.standard_normal(
+        (CONSULTAS, dim)).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1)[:, None]
+    return m, q
+
+
+def _ms(tiempos) -> str:
+    t = np.asarray(tiempos) * 1000
+    return "p50 %6.2f ms  p95 %6.2f ms" % (np.percentile(t, 50), np.percentile(t, 95))
+
+
+def _por_proyectos(m, consultas, exactos, n_proyectos: int) -> None:
+    cortes = np.linspace(0, len(m), n_proyectos + 1).astype(int)
+    partes = [(ini, m[ini:fin]) for ini, fin in zip(cortes[:-1], cortes[1:])]
+    print("%d proyectos de unos %d fragmentos" % (n_proyectos, len(partes[0][1])))
+
+    tiempos = []
+    for q in consultas:
+        t = time.perf_counter()
+        for _ini, sub in partes:
+            indice_ann.mejores(sub @ q, K)
+        tiempos.append(time.perf_counter() - t)
+    print("exacta          recall 1.000  %s" % _ms(tiempos))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        indice_ann._dir_indices = lambda: tmp
+        t = time.perf_counter()
+        c = indice_ann.cuantizador(str(uuid.uuid4()), "medir", [sub for _i, sub in partes])
+        particiones = [(ini, sub, indice_ann.agrupar(c.centroides,
+                                                     indice_ann.asignar(c.centroides, sub)),
+                        np.ones(len(sub), dtype=bool))
+                       for ini, sub in partes]
+    print("entrenamiento   %d listas comunes en %.1f s"
+          % (len(c.centroides), time.perf_counter() - t))
+
+    for nprobe in (4, 8, 16):
+        aciertos, tiempos = 0, []
+        for q, verdad in zip(consultas, exactos):
+            t = time.perf_counter()
+            filas, scores = [], []
+            for ini, sub, p, todas in particiones:
+                f, sc = indice_ann.buscar(p, sub, todas, q, K, nprobe=nprobe)
+                filas.append(f + ini)
+                scores.append(sc)
+            filas = np.concatenate(filas)
+            elegidas = filas[indice_ann.mejores(np.concatenate(scores), K)]
+            tiempos.append(time.perf_counter() - t)
+            aciertos += len(verdad & set(elegidas.tolist()))
+        print("comun nprobe=%-3d recall %.3f  %s"
+              % (nprobe, aciertos / (K * CONSULTAS), _ms(tiempos)))
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    n_proyectos = 0
+    if "--proyectos" in args:
+        i = args.index("--proyectos")
+        n_proyectos = int(args[i + 1])
+        del args[i:i + 2]
+    n = int(args[0]) if len(args) > 0 else 100000
+    dim = int(args[1]) if len(args) > 1 else 768
+    m, consultas = corpus(n, dim)
+    todas = np.ones(n, dtype=bool)
+
+    print("%d fragmentos, %d dimensiones, %d consultas, k=%d" % (n, dim, CONSULTAS, K))
+    exactos, tiempos = [], []
+    for q in consultas:
+        t = time.perf_counter()
+        s = m @ q
+        exactos.append(set(indice_ann.mejores(s, K).tolist()))
+        tiempos.append(time.perf_counter() - t)
+    print("exacta          recall 1.000  %s" % _ms(tiempos))
+    if n_proyectos:
+        _por_proyectos(m, consultas, exactos, n_proyectos)
+        return 0
+
+    t = time.perf_counter()
+    centroides = indice_ann.entrenar(m, indice_ann.n_listas_para(n))
+    p = indice_ann.agrupar(centroides, indice_ann.asignar(centroides, m))
+    print("entrenamiento   %d listas en %.1f s" % (len(centroides), time.perf_counter() - t))
+
+    for nprobe in (4, 8, 16, 32):
+        aciertos, tiempos = 0, []
+        for q, verdad in zip(consultas, exactos):
+            t = time.perf_counter()
+            filas, _s = indice_ann.buscar(p, m, todas, q, K, nprobe=nprobe)
+            tiempos.append(time.perf_counter() - t)
+            aciertos += len(verdad & set(filas.tolist()))
+        print("ivf nprobe=%-4d recall %.3f  %s"
+              % (nprobe, aciertos / (K * CONSULTAS), _ms(tiempos)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
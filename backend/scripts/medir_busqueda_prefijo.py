@@ -0,0 +1,75 @@
+# scripts/medir_busqueda_prefijo.py
+"""
+Compara la busqueda por prefijo (Matryoshka) con la completa: recall y latencia.
+
+No toca la base. Los vectores se generan agrupados en temas y con la
+varianza de cada dimension decreciente, para imitar lo que hace el
+entrenamiento Matryoshka: concentrar la informacion en las primeras. Con
+vectores sin esa estructura el prefijo es solo una proyeccion al azar y el
+recall seria peor que con los reales. La verdad de referencia es el top-k
+con todas las dimensiones.
+
+Uso:
+    python scripts/medir_busqueda_prefijo.py                 # 20000 x 3072
+    python scripts/medir_busqueda_prefijo.py <fragmentos> <dimension>
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+
+from app.services import cache_vectores, indice_ann  # noqa: E402
+from medir_busqueda_ann import CONSULTAS, K, _ms  # noqa: E402
+
+
+def corpus(n: int, dim: int, temas: int = 400, semilla: int = 7):
+    rng = np.random.default_rng(semilla)
+    peso = (1.0 / np.sqrt(1 + np.arange(dim) / 16)).astype(np.float32)
+    centros = rng.standard_normal((temas, dim)).astype(np.float32)
+
+    def muestra(cuantos):
+        v = centros[rng.integers(0, temas, cuantos)]
+        v = (v + 2.0 * rng.standard_normal((cuantos, dim)).astype(np.float32)) * peso
+        return v / np.linalg.norm(v, axis=1)[:, None]
+
+    return muestra(n), muestra(CONSULTAS)
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 3072
+    m, consultas = corpus(n, dim)
+
+    print("%d fragmentos, %d dimensiones, %d consultas, k=%d" % (n, dim, CONSULTAS, K))
+    exactos, tiempos = [], []
+    for q in consultas:
+        t = time.perf_counter()
+        exactos.append(set(indice_ann.mejores(m @ q, K).tolist()))
+        tiempos.append(time.perf_counter() - t)
+    print("completa             recall 1.000  %s" % _ms(tiempos))
+
+    for dim_prefijo in (128, 256):
+        prefijo = cache_vectores.prefijo_de(m, dim_prefijo)
+        for factor in (4, 8, 16, 32):
+            aciertos, tiempos = 0, []
+            for q, verdad in zip(consultas, exactos):
+                t = time.perf_counter()
+                qp = cache_vectores.normalizar(q[:dim_prefijo])
+                cand = indice_ann.mejores(prefijo @ qp, factor * K)
+                elegidas = cand[indice_ann.mejores(m[cand] @ q, K)]
+                tiempos.append(time.perf_counter() - t)
+                aciertos += len(verdad & set(elegidas.tolist()))
+            print("prefijo %-4d + %2d x k recall %.3f  %s"
+                  % (dim_prefijo, factor, aciertos / (K * CONSULTAS), _ms(tiempos)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# scripts/medir_cache_extraccion.py
+"""
+Compara leer un PDF con servirlo de la cache de extracciones.
+
+Tres casos: la lectura completa (extraer_con_diagnostico), el acierto en la
+base —el que tiene un trabajador cuando el servidor ya leyo el PDF al
+subirlo— y el acierto en memoria del mismo proceso. Se escribe en la base
+configurada (MYSQL_URI) y la fila se borra al terminar.
+
+Uso:
+    python scripts/medir_cache_extraccion.py                  # PDF sintetico de 20 paginas
+    python scripts/medir_cache_extraccion.py <pdf> [repeticiones]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import warnings  # noqa: E402
+warnings.filterwarnings("ignore")
+
+import fitz  # noqa: E402
+import numpy as np  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.models.cache_extraccion import CacheExtraccion as CX  # noqa: E402
+from app.services import cache_extraccion  # noqa: E402
+from app.utils.text_extractor import extraer_con_diagnostico  # noqa: E402
+
+PARRAFO = ("The evaluation of the proposed method was carried out on three data sets "
+           "and the results show that the approach is robust to noise. ") * 6
+
+
+def _pdf_sintetico(paginas: int = 20) -> str:
+    ruta = os.path.join(tempfile.mkdtemp(), "medir.pdf")
+    doc = fitz.open()
+    for i in range(paginas):
+        pag = doc.new_page()
+        titulo = ("%d Methods\n" % i) if i % 4 == 1 else ("%d Results\n" % i)
+        pag.insert_textbox(fitz.Rect(55, 55, 545, 780), titulo + PARRAFO * 5,
+                           fontsize=9, fontname="helv")
+    doc.save(ruta)
+    doc.close()
+    return ruta
+
+
+def _mediana(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        t = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t)
+    return float(np.median(tiempos))
+
+
+def main() -> int:
+    ruta = sys.argv[1] if len(sys.argv) > 1 else _pdf_sintetico()
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    huella = cache_extraccion.huella_archivo(ruta)
+    cache_extraccion.PERSISTENTE = True
+
+    d = extraer_con_diagnostico(ruta)
+    print("%s: %d paginas, %d caracteres (%s)" % (os.path.basename(ruta), d.paginas,
+                                                 d.chars_finales, d.metodo))
+    en_bd = cache_extraccion.CacheExtraccion(capacidad=0)
+    en_memoria = cache_extraccion.CacheExtraccion(capacidad=4)
+    try:
+        en_bd.extraer(ruta, huella=huella)
+        en_memoria.extraer(ruta, huella=huella)
+        for nombre, fn in (
+            ("leer el PDF      ", lambda: extraer_con_diagnostico(ruta)),
+            ("acierto en la base", lambda: en_bd.extraer(ruta, huella=huella)),
+            ("acierto en memoria", lambda: en_memoria.extraer(ruta, huella=huella)),
+            ("huella + memoria ", lambda: en_memoria.extraer(ruta)),
+        ):
+            print("  %s  %8.2f ms" % (nombre, _mediana(fn, repeticiones) * 1e3))
+    finally:
+        db = SessionLocal()
+        db.query(CX).filter(CX.huella == huella).delete()
+        db.commit()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# scripts/medir_cuantizacion.py
+"""
+Compara la matriz int8 con la float32: memoria, recall y latencia.
+
+No toca la base: genera vectores agrupados en temas, como en
+medir_busqueda_ann.py. La verdad de referencia es el top-k exacto en float32.
+Se mide el recall de la puntuacion int8 sola y el de int8 con repuntuacion
+de los candidatos; en el servicio, los vectores de esos candidatos se leen
+de la base con una consulta, que aqui no se cuenta.
+
+Uso:
+    python scripts/medir_cuantizacion.py                     # 100000 x 768
+    python scripts/medir_cuantizacion.py <fragmentos> <dimension>
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+
+from app.services import cuantizacion, indice_ann  # noqa: E402
+from medir_busqueda_ann import CONSULTAS, K, _ms, corpus  # noqa: E402
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 768
+    m, consultas = corpus(n, dim)
+    filas = np.arange(n)
+
+    t = time.perf_counter()
+    c = cuantizacion.cuantizar(m)
+    print("%d fragmentos, %d dimensiones, %d consultas, k=%d" % (n, dim, CONSULTAS, K))
+    print("cuantizar       %.2f s" % (time.perf_counter() - t))
+    print("memoria         float32 %.1f MB  int8 %.1f MB"
+          % (m.nbytes / 2 ** 20, c.nbytes / 2 ** 20))
+
+    exactos, tiempos = [], []
+    for q in consultas:
+        t = time.perf_counter()
+        exactos.append(set(indice_ann.mejores(m @ q, K).tolist()))
+        tiempos.append(time.perf_counter() - t)
+    print("float32         recall 1.000  %s" % _ms(tiempos))
+
+    aciertos, tiempos = 0, []
+    for q, verdad in zip(consultas, exactos):
+        t = time.perf_counter()
+        elegidas = indice_ann.mejores(c.puntuar(filas, q), K)
+        tiempos.append(time.perf_counter() - t)
+        aciertos += len(verdad & set(elegidas.tolist()))
+    print("int8 sola       recall %.3f  %s" % (aciertos / (K * CONSULTAS), _ms(tiempos)))
+
+    for factor in (2, 4, 8):
+        aciertos, tiempos = 0, []
+        for q, verdad in zip(consultas, exactos):
+            t = time.perf_counter()
+            cand = indice_ann.mejores(c.puntuar(filas, q), factor * K)
+            elegidas = cand[indice_ann.mejores(m[cand] @ q, K)]
+            tiempos.append(time.perf_counter() - t)
+            aciertos += len(verdad & set(elegidas.tolist()))
+        print("int8 + %d x k    recall %.3f  %s"
+              % (factor, aciertos / (K * CONSULTAS), _ms(tiempos)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
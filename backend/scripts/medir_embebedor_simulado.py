@@ -0,0 +1,82 @@
+# scripts/medir_embebedor_simulado.py
+"""
+Compara el embedding simulado palabra a palabra con el de en lote.
+
+La carga imita un corpus sintetico: fragmentos de CHUNK_CHARS caracteres
+con un vocabulario de unas 20.000 palabras. La version anterior se copia
+aqui tal cual para medirla; ademas de los tiempos se comprueba que ambas
+dan los mismos bits.
+
+Uso:
+    python scripts/medir_embebedor_simulado.py               # 5000 fragmentos
+    python scripts/medir_embebedor_simulado.py <fragmentos>
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import random
+import re
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from app.services import embedding_service as E  # noqa: E402
+
+
+def _anterior(text: str, dim: int = E.MOCK_DIM) -> list[float]:
+    vec = [0.0] * dim
+    for tok in re.findall(r"\w+", (text or "").lower()):
+        h = hashlib.md5(tok.encode("utf-8")).digest()
+        idx = int.from_bytes(h[:4], "big") % dim
+        signo = 1.0 if h[4] % 2 == 0 else -1.0
+        vec[idx] += signo
+    norma = math.sqrt(sum(x * x for x in vec))
+    if norma == 0.0:
+        return [0.0] * dim
+    return [x / norma for x in vec]
+
+
+def _corpus(n: int) -> list[str]:
+    rng = random.Random(0)
+    vocabulario = ["termino%d" % i for i in range(20000)]
+    textos = []
+    for _ in range(n):
+        palabras = []
+        while sum(len(p) + 1 for p in palabras) < E.CHUNK_CHARS:
+            palabras.append(rng.choice(vocabulario))
+        textos.append(" ".join(palabras))
+    return textos
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    textos = _corpus(n)
+    print("%d fragmentos de %d caracteres, dim %d" % (n, E.CHUNK_CHARS, E.MOCK_DIM))
+
+    t = time.perf_counter()
+    antes = [_anterior(x) for x in textos]
+    t_antes = time.perf_counter() - t
+
+    E._TABLA_MOCK.clear()
+    t = time.perf_counter()
+    E._mock_embed_lote(textos)
+    t_fria = time.perf_counter() - t
+    t = time.perf_counter()
+    ahora = E._mock_embed_lote(textos)
+    t_ahora = time.perf_counter() - t
+
+    iguales = all(a == b for a, b in zip(antes, ahora.tolist()))
+    for nombre, s in (("palabra a palabra", t_antes), ("en lote, tabla fria", t_fria),
+                      ("en lote, tabla hecha", t_ahora)):
+        print("  %-21s %8.0f ms  %7.0f fragmentos/s" % (nombre, s * 1e3, n / s))
+    print("  bits identicos: %s" % ("si" if iguales else "NO"))
+    return 0 if iguales else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# scripts/medir_embeddings_concurrentes.py
+"""
+Mide cuanto tarda en embeberse un articulo segun los lotes en vuelo.
+
+No usa la API: levanta en local un servidor que imita `batchEmbedContents`
+y tarda en responder lo que se le indique, y apunta a el el cliente del SDK.
+Asi se mide solo lo que cambia EMBED_CONCURRENCIA —cuanto de la latencia de
+red se solapa— sin gastar cuota. El limitador se deja sin techo: lo que se
+mide es el caso de un plan de pago, donde la cuota no es lo que frena.
+
+Uso:
+    python scripts/medir_embeddings_concurrentes.py                  # 80 ms
+    python scripts/medir_embeddings_concurrentes.py <latencia_ms> [textos]
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+os.environ.update(GEMINI_MODE="real", GEMINI_API_KEY="clave-de-prueba",
+                  LIMITE_EMBEDDINGS_MIN="1000000", REGISTRAR_LLAMADAS="0")
+
+from google import genai  # noqa: E402
+from google.genai import types  # noqa: E402
+
+from app.services import embedding_service as E  # noqa: E402
+
+LATENCIA = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.08
+TEXTOS = int(sys.argv[2]) if len(sys.argv) > 2 else 320
+
+
+class Falso(BaseHTTPRequestHandler):
+    def do_POST(self):
+        cuerpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        n = len(cuerpo.get("requests", []))
+        time.sleep(LATENCIA)
+        datos = json.dumps({"embeddings": [{"values": [0.1] * E.EMBED_DIM}] * n}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, *_a):
+        pass
+
+
+def main() -> int:
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Falso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    E._client = genai.Client(
+        api_key="clave-de-prueba",
+        http_options=types.HttpOptions(
+            base_url="http://127.0.0.1:%d" % servidor.server_address[1]))
+    pend = [("h%d" % i, "fragmento numero %d" % i) for i in range(TEXTOS)]
+
+    print("%d textos en lotes de 32, %.0f ms por peticion" % (TEXTOS, LATENCIA * 1e3))
+    base = None
+    for hilos in (1, 2, 4, 8):
+        E.EMBED_CONCURRENCIA = hilos
+        t = time.perf_counter()
+        salida = E._pedir_embeddings(pend, 32)
+        t = time.perf_counter() - t
+        assert list(salida) == [h for h, _t in pend]
+        base = base or t
+        print("  %d en vuelo  %7.0f ms  %6.0f textos/s  x%.1f"
+              % (hilos, t * 1e3, TEXTOS / t, base / t))
+    servidor.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# scripts/medir_escritura.py
+"""
+Compara la insercion con objetos del ORM (`db.add`) y en bloque (escritura.py).
+
+Dos cargas, las de un analisis real: los fragmentos de un articulo de 200
+fragmentos al indexarlo, y las metricas de una pasada de 50 articulos (unas
+veinte por articulo). Se escribe en la base configurada (MYSQL_URI), bajo
+un proyecto de usar y tirar que se borra al terminar.
+
+Uso:
+    python scripts/medir_escritura.py               # 5 repeticiones
+    python scripts/medir_escritura.py <repeticiones>
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import uuid
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import warnings  # noqa: E402
+warnings.filterwarnings("ignore")
+
+import numpy as np  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.models.articulo import Articulo  # noqa: E402
+from app.models.embedding_doc import EmbeddingDoc  # noqa: E402
+from app.models.metrica import Metrica  # noqa: E402
+from app.models.proyecto import Proyecto  # noqa: E402
+from app.models.usuario import Usuario  # noqa: E402
+from app.services import cuantizacion, escritura  # noqa: E402
+from app.services.vectores import empaquetar  # noqa: E402
+
+FRAGMENTOS = 200
+ARTICULOS = 50
+METRICAS_POR_ARTICULO = 20
+
+
+def _fragmentos(articulo_id: str):
+    rng = np.random.default_rng(0)
+    texto = "palabra " * 180
+    for i in range(FRAGMENTOS):
+        v = rng.standard_normal(768).astype(np.float32)
+        v /= np.linalg.norm(v)
+        yield {"id": str(uuid.uuid4()), "articulo_id": articulo_id, "chunk_orden": i,
+               "texto": texto, "vector": empaquetar(v),
+               "vector_int8": cuantizacion.empaquetar(v), "seccion": "metodo",
+               "char_inicio": i * 1400, "char_fin": i * 1400 + 1500, "n_terminos": 180}
+
+
+def _metricas(proyecto_id: str):
+    for _a in range(ARTICULOS):
+        ref = str(uuid.uuid4())
+        for c in range(METRICAS_POR_ARTICULO):
+            yield escritura.metrica(proyecto_id, "brecha", ref, "N%d" % c, 0.5,
+                                    {"n": c} if c % 4 == 0 else None)
+
+
+def _medir(modelo, filas, en_bloque: bool) -> float:
+    db = SessionLocal()
+    try:
+        t = time.perf_counter()
+        if en_bloque:
+            escritura.insertar(db, modelo, filas)
+        else:
+            for f in filas:
+                db.add(modelo(**f))
+        db.commit()
+        return time.perf_counter() - t
+    finally:
+        db.close()
+
+
+def main() -> int:
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    db = SessionLocal()
+    uid, pid, aid = (str(uuid.uuid4()) for _ in range(3))
+    db.add(Usuario(id=uid, correo="medir-%s@ejemplo.com" % uid[:8],
+                   contrasena_hash="-", nombre="medir_escritura", activo=True))
+    db.flush()
+    db.add(Proyecto(id=pid, usuario_id=uid, tema_principal="medir_escritura",
+                    objetivo="medir_escritura", n_articulos_objetivo=1,
+                    estado_arte_generado=False))
+    db.flush()
+    db.add(Articulo(id=aid, proyecto_id=pid, titulo="medir_escritura"))
+    db.commit()
+    try:
+        for nombre, modelo, generar in (
+            ("articulo de %d fragmentos" % FRAGMENTOS, EmbeddingDoc,
+             lambda: list(_fragmentos(aid))),
+            ("metricas de %d articulos" % ARTICULOS, Metrica,
+             lambda: list(_metricas(pid))),
+        ):
+            print(nombre)
+            for en_bloque, etiqueta in ((False, "db.add   "), (True, "en bloque")):
+                tiempos = [_medir(modelo, generar(), en_bloque)
+                           for _ in range(repeticiones)]
+                n = len(generar())
+                t = float(np.median(tiempos))
+                print("  %s  %7.1f ms  %8.0f filas/s" % (etiqueta, t * 1e3, n / t))
+    finally:
+        db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == aid).delete()
+        db.query(Metrica).filter(Metrica.proyecto_id == pid).delete()
+        db.query(Articulo).filter(Articulo.id == aid).delete()
+        db.query(Proyecto).filter(Proyecto.id == pid).delete()
+        db.query(Usuario).filter(Usuario.id == uid).delete()
+        db.commit()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# scripts/medir_extraccion_paralela.py
+"""
+Compara la extraccion en serie con la repartida entre procesos
+(app/utils/extraccion_paralela.py), con PyMuPDF y con pdfminer, sobre PDF
+sinteticos de varios tamanos. Comprueba ademas que el texto sea el mismo.
+
+La primera llamada en paralelo arranca el pool (cada proceso importa fitz y
+pdfminer); se hace antes de cronometrar, como pasaria en un servidor que ya
+lleva un rato en marcha.
+
+Uso:
+    python scripts/medir_extraccion_paralela.py                # 30, 100 y 300 paginas
+    python scripts/medir_extraccion_paralela.py <paginas> ...  [--procesos N]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import fitz  # noqa: E402
+from pdfminer.high_level import extract_text as pdfminer_extract  # noqa: E402
+
+from app.utils import extraccion_paralela as P  # noqa: E402
+
+PARRAFO = ("The evaluation of the proposed method was carried out on three data sets "
+           "and the results show that the approach is robust to noise. ") * 30
+SIN_LIMITE = 10 ** 9
+
+
+def _pdf(paginas: int, ruta: str) -> None:
+    doc = fitz.open()
+    for i in range(paginas):
+        doc.new_page().insert_textbox(fitz.Rect(55, 55, 545, 780),
+                                      "%d %s %s" % (i, uuid.uuid4().hex, PARRAFO),
+                                      fontsize=9, fontname="helv")
+    doc.save(ruta)
+    doc.close()
+
+
+def _cronometrar(fn, repeticiones: int = 3):
+    mejor, res = float("inf"), None
+    for _ in range(repeticiones):
+        t = time.perf_counter()
+        res = fn()
+        mejor = min(mejor, time.perf_counter() - t)
+    return mejor, res
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    if "--procesos" in args:
+        i = args.index("--procesos")
+        P.EXTRACCION_PROCESOS = int(args[i + 1])
+        del args[i:i + 2]
+    tamanos = [int(a) for a in args] or [30, 100, 300]
+    print("nucleos: %s   procesos: %d" % (os.cpu_count(), P.EXTRACCION_PROCESOS))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "calentar.pdf")
+        _pdf(P.EXTRACCION_PROCESOS, ruta)
+        P.paginas_pymupdf(ruta, P.EXTRACCION_PROCESOS, SIN_LIMITE)
+        P.texto_pdfminer(ruta, P.EXTRACCION_PROCESOS)
+
+        print("paginas   pymupdf serie  paralelo     pdfminer serie  paralelo   igual")
+        for n in tamanos:
+            ruta = os.path.join(tmp, "p%d.pdf" % n)
+            _pdf(n, ruta)
+            t1, a = _cronometrar(lambda: P._paginas_fitz(ruta, 0, n, SIN_LIMITE))
+            t2, b = _cronometrar(lambda: P.paginas_pymupdf(ruta, n, SIN_LIMITE))
+            t3, c = _cronometrar(lambda: pdfminer_extract(ruta), 1)
+            t4, d = _cronometrar(lambda: P.texto_pdfminer(ruta, n), 1)
+            print("%7d  %11.0f ms %7.0f ms  %13.0f ms %7.0f ms   %s"
+                  % (n, t1 * 1e3, t2 * 1e3, t3 * 1e3, t4 * 1e3,
+                     "si" if a == b and c == d else "NO"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# scripts/medir_memoria_subida.py
+"""
+Memoria que ocupa recibir un PDF en la subida, segun su tamano.
+
+Compara la forma anterior —`await pdf.read()`, sha256 del contenido entero y
+`almacenamiento.guardar`— con la escritura por trozos de
+`almacenamiento.Escritura`. El archivo llega como lo deja Starlette: en un
+temporal del disco detras de un `UploadFile`. Se mide el pico de memoria de
+Python (tracemalloc) mientras se recibe. Escribe en un STORAGE_DIR temporal.
+
+Uso:
+    python scripts/medir_memoria_subida.py              # 5, 20 y 50 MB
+    python scripts/medir_memoria_subida.py <MB> ...
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from starlette.datastructures import UploadFile  # noqa: E402
+
+from app.routers.archivos import TROZO_SUBIDA  # noqa: E402
+from app.services import almacenamiento  # noqa: E402
+
+
+async def _antes(pdf: UploadFile) -> str:
+    data = await pdf.read()
+    huella = hashlib.sha256(data).hexdigest()
+    almacenamiento.guardar(almacenamiento.nueva_clave(str(uuid.uuid4())), data)
+    return huella
+
+
+async def _por_trozos(pdf: UploadFile) -> str:
+    with almacenamiento.Escritura(max_bytes=0) as esc:
+        while trozo := await pdf.read(TROZO_SUBIDA):
+            esc.escribir(trozo)
+        esc.confirmar(almacenamiento.nueva_clave(str(uuid.uuid4())))
+        return esc.huella
+
+
+def _medir(fn, ruta: str) -> tuple[float, float, str]:
+    with open(ruta, "rb") as f:
+        pdf = UploadFile(f, filename="medir.pdf")
+        tracemalloc.start()
+        t = time.perf_counter()
+        huella = asyncio.run(fn(pdf))
+        segundos = time.perf_counter() - t
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return pico / 2 ** 20, segundos, huella
+
+
+def main() -> int:
+    tamanos = [int(a) for a in sys.argv[1:]] or [5, 20, 50]
+    with tempfile.TemporaryDirectory() as tmp:
+        almacenamiento.STORAGE_DIR = os.path.join(tmp, "pdfs")
+        print("   MB   pico antes   pico por trozos   tiempo antes / por trozos")
+        for mb in tamanos:
+            ruta = os.path.join(tmp, "subida.pdf")
+            with open(ruta, "wb") as f:
+                f.write(b"%PDF-1.4\n")
+                for _ in range(mb):
+                    f.write(os.urandom(2 ** 20))
+            m1, t1, h1 = _medir(_antes, ruta)
+            m2, t2, h2 = _medir(_por_trozos, ruta)
+            assert h1 == h2
+            print("%5d  %8.1f MB  %13.1f MB   %10.0f ms / %.0f ms"
+                  % (mb, m1, m2, t1 * 1e3, t2 * 1e3))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
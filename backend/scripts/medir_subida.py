@@ -0,0 +1,97 @@
+# scripts/medir_subida.py
+"""
+Mide lo que tarda en responder la subida de un PDF segun su tamano.
+
+La subida ya no lee el PDF: responde y la ingesta (app/services/ingesta.py)
+va despues. Aqui se separan las dos cosas: la peticion, con la ingesta
+apartada en una lista, y la ingesta, cronometrada aparte. Se escribe en la
+base configurada (MYSQL_URI), bajo una cuenta y un proyecto de usar y tirar
+que se borran al terminar.
+
+Uso:
+    python scripts/medir_subida.py                 # PDF sinteticos de 5, 30 y 100 paginas
+    python scripts/medir_subida.py <paginas> ...
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import uuid
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import warnings  # noqa: E402
+warnings.filterwarnings("ignore")
+
+import fitz  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.models.proyecto import Proyecto  # noqa: E402
+from app.models.usuario import Usuario  # noqa: E402
+from app.services import cache_extraccion, ingesta, seguridad  # noqa: E402
+
+PARRAFO = ("The evaluation of the proposed method was carried out on three data sets "
+           "and the results show that the approach is robust to noise. ") * 30
+
+
+def _pdf(paginas: int) -> bytes:
+    doc = fitz.open()
+    for i in range(paginas):
+        doc.new_page().insert_textbox(fitz.Rect(55, 55, 545, 780),
+                                      "%d %s %s" % (i, uuid.uuid4().hex, PARRAFO),
+                                      fontsize=9, fontname="helv")
+    datos = doc.tobytes()
+    doc.close()
+    return datos
+
+
+def main_() -> int:
+    tamanos = [int(a) for a in sys.argv[1:]] or [5, 30, 100]
+    db = SessionLocal()
+    uid, pid = str(uuid.uuid4()), str(uuid.uuid4())
+    correo, clave = "medir-%s@ejemplo.com" % uid[:8], "contrasena-de-medir"
+    db.add(Usuario(id=uid, correo=correo, contrasena_hash=seguridad.cifrar(clave),
+                   nombre="medir_subida", activo=True))
+    db.flush()
+    db.add(Proyecto(id=pid, usuario_id=uid, tema_principal="medir_subida",
+                    objetivo="medir_subida", n_articulos_objetivo=1,
+                    estado_arte_generado=False))
+    db.commit()
+
+    pendientes = []
+    ingesta_original = ingesta.ingerir_en_segundo_plano
+    ingesta.ingerir_en_segundo_plano = pendientes.append
+    cache_extraccion.PERSISTENTE = False
+    try:
+        cli = TestClient(main.app)
+        r = cli.post("/auth/login", json={"correo": correo, "contrasena": clave})
+        cli.headers.update({"Authorization": "Bearer %s" % r.json()["token"]})
+        print("paginas      KB   subida (respuesta)   ingesta despues")
+        for n in tamanos:
+            datos = _pdf(n)
+            t = time.perf_counter()
+            r = cli.post("/proyectos/%s/archivos" % pid,
+                         files={"pdf": ("medir.pdf", datos, "application/pdf")})
+            t_subida = time.perf_counter() - t
+            assert r.status_code == 200, r.text
+            t = time.perf_counter()
+            ingesta_original(pendientes.pop())
+            t_ingesta = time.perf_counter() - t
+            print("%7d  %6.0f  %12.1f ms  %14.1f ms"
+                  % (n, len(datos) / 1024, t_subida * 1e3, t_ingesta * 1e3))
+    finally:
+        ingesta.ingerir_en_segundo_plano = ingesta_original
+        db.query(Proyecto).filter(Proyecto.id == pid).delete()
+        db.query(Usuario).filter(Usuario.id == uid).delete()
+        db.commit()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_())
@@ -0,0 +1,102 @@
+# scripts/migrar_embeddings.py
+"""
+Pasa proyectos a otra version de embeddings ("modelo/dim") sin dejarlos sin
+busqueda mientras tanto (app/services/migracion_embeddings.py).
+
+Por omision solo se anota el destino: el trabajador va embebiendo los
+fragmentos cuando no tiene analisis pendientes, al paso de la cuota, y
+cambia cada proyecto de version cuando lo tiene completo. Con `--ahora` se
+hace desde aqui, lote a lote, hasta terminar o agotar la parte de la cuota
+diaria reservada a la migracion (MIGRACION_CUOTA_DIA).
+
+Uso:
+    python scripts/migrar_embeddings.py                        # muestra el estado
+    python scripts/migrar_embeddings.py <proyecto_id> [version] [--ahora]
+    python scripts/migrar_embeddings.py --todos [version] [--ahora]
+
+Sin version se migra a la configurada (EMBED_MODEL y EMBED_DIM).
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import warnings  # noqa: E402
+warnings.filterwarnings("ignore")
+
+from app.database import SessionLocal  # noqa: E402
+from app.models.proyecto import Proyecto  # noqa: E402
+from app.services import migracion_embeddings  # noqa: E402
+from app.services.embedding_service import version_actual  # noqa: E402
+
+
+def estado(db) -> None:
+    print("Version configurada: %s" % version_actual())
+    print()
+    proyectos = db.query(Proyecto).order_by(Proyecto.creado_en.desc()).limit(10).all()
+    if not proyectos:
+        print("No hay proyectos.")
+        return
+    for p in proyectos:
+        e = migracion_embeddings.estado(db, p.id)
+        linea = "%s  %-42s  version=%s  fragmentos=%d" % (
+            p.id[:8], (p.tema_principal or "")[:42], e["activa"] or "-", e["fragmentos"])
+        if e["destino"]:
+            linea += "  -> %s (faltan %d)" % (e["destino"], e["pendientes"])
+        print(linea)
+
+
+def migrar_ya(db, proyecto_id: str) -> None:
+    hechos = 0
+    while True:
+        n = migracion_embeddings.avanzar(db, proyecto_id)
+        if not n:
+            break
+        hechos += n
+        print("  %s  %d fragmentos embebidos" % (proyecto_id[:8], hechos))
+    e = migracion_embeddings.estado(db, proyecto_id)
+    if e["destino"]:
+        print("  %s  pendiente: faltan %d; sin cuota reservada para migrar."
+              % (proyecto_id[:8], e["pendientes"]))
+    else:
+        print("  %s  migrado a %s." % (proyecto_id[:8], e["activa"]))
+
+
+def main() -> int:
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    todos = "--todos" in sys.argv
+    db = SessionLocal()
+    try:
+        if not args and not todos:
+            estado(db)
+            print()
+            print("Para migrar: python scripts/migrar_embeddings.py <proyecto_id> [version]")
+            return 0
+        if todos:
+            ids = [p for (p,) in db.query(Proyecto.id).all()]
+            version = args[0] if args else None
+        else:
+            ids = [args[0]]
+            version = args[1] if len(args) > 1 else None
+            if not db.query(Proyecto.id).filter(Proyecto.id == ids[0]).scalar():
+                print("El proyecto no existe.")
+                return 2
+        for pid in ids:
+            destino = migracion_embeddings.iniciar(db, pid, version)
+            print("%s  a migrar a %s" % (pid[:8], destino))
+        if "--ahora" in sys.argv:
+            for pid in ids:
+                migrar_ya(db, pid)
+        else:
+            print("El trabajador (python trabajador.py) lo hara en segundo plano.")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# scripts/reconstruir_vectores.py
+"""
+Reescribe desde la base el archivo de vectores mapeado de cada proyecto.
+
+Con `VECTORES_MMAP`, `index_articulo` anade al archivo los vectores de cada
+articulo que indexa, pero nunca quita nada: lo reindexado se queda dentro
+como filas muertas, y lo indexado con la opcion apagada no esta. Esto lo
+escribe de nuevo con exactamente los fragmentos de la base, en el orden en
+que la cache los recorre, de modo que la matriz vuelve a ser una vista del
+archivo sin copias.
+
+No llama a la API: solo lee vectores. Se puede ejecutar con el servidor y
+los trabajadores en marcha; lo que indexen mientras tanto se leera de la
+base hasta la siguiente reconstruccion.
+
+Uso:
+    python scripts/reconstruir_vectores.py                 # todos los proyectos
+    python scripts/reconstruir_vectores.py <proyecto_id>   # solo ese
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import warnings  # noqa: E402
+warnings.filterwarnings("ignore")
+
+from app.database import SessionLocal  # noqa: E402
+from app.models.articulo import Articulo  # noqa: E402
+from app.models.embedding_doc import EmbeddingDoc  # noqa: E402
+from app.models.proyecto import Proyecto  # noqa: E402
+from app.services import vectores_mmap  # noqa: E402
+from app.services.cache_vectores import normalizar  # noqa: E402
+from app.services.vectores import completar_desde_json, desempaquetar  # noqa: E402
+
+
+def reconstruir(db, proyecto_id: str) -> int:
+    filas = (db.query(EmbeddingDoc.id, EmbeddingDoc.vector)
+             .join(Articulo, Articulo.id == EmbeddingDoc.articulo_id)
+             .filter(Articulo.proyecto_id == proyecto_id)
+             .order_by(EmbeddingDoc.articulo_id, EmbeddingDoc.chunk_orden)
+             .all())
+    vectores = {fid: desempaquetar(datos) for fid, datos in filas}
+    completar_desde_json(db, vectores)
+    ids = [fid for fid, _d in filas if len(vectores[fid])]
+    return vectores_mmap.reconstruir(proyecto_id, ids,
+                                     [normalizar(vectores[i]) for i in ids])
+
+
+def main() -> int:
+    if not vectores_mmap.VECTORES_MMAP:
+        print("VECTORES_MMAP no esta activado: la cache no leeria estos archivos.")
+    db = SessionLocal()
+    try:
+        if len(sys.argv) > 1:
+            proyectos = sys.argv[1:]
+        else:
+            proyectos = [p for (p,) in db.query(Proyecto.id).all()]
+        for pid in proyectos:
+            print("%s  %d fragmentos" % (pid[:8], reconstruir(db, pid)))
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
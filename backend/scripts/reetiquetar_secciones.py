@@ -29,10 +29,11 @@ from app.models.archivo import Archivo  # noqa: E402
 from app.models.articulo import Articulo  # noqa: E402
 from app.models.embedding_doc import EmbeddingDoc  # noqa: E402
 from app.models.proyecto import Proyecto  # noqa: E402
+from app.services import cache_extraccion  # noqa: E402
+from app.services.cache_vectores import registrar_cambio  # noqa: E402
 from app.services.document_structure import (  # noqa: E402
     SECCIONES_SUSTANTIVAS, detectar_secciones, seccion_en,
 )
-from app.utils.text_extractor import extraer_con_diagnostico  # noqa: E402
 
 
 def reetiquetar(db, proyecto_id: str) -> int:
@@ -57,7 +58,7 @@ def reetiquetar(db, proyecto_id: str) -> int:
             print("[%d/%d] %-46s  archivo no disponible" % (i, len(arts), (a.titulo or a.id)[:46]))
             continue
 
-        texto = extraer_con_diagnostico(arc.ruta).texto
+        texto = cache_extraccion.extraer(arc.ruta, huella=arc.hash_sha256).texto
         secciones = detectar_secciones(texto)
 
         antes = {}
@@ -84,6 +85,9 @@ def reetiquetar(db, proyecto_id: str) -> int:
         print("        despues: %s" % ", ".join("%s=%d" % kv for kv in sorted(despues.items())))
         print("        fragmentos en secciones sustantivas: %d -> %d" % (sus_antes, sus_desp))
 
+    if cambiados_total:
+        # La seccion viaja con el vector en la copia en memoria.
+        registrar_cambio(db, proyecto_id)
     db.commit()
     print()
     print("Total reasignados: %d" % cambiados_total)
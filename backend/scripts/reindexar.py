@@ -4,12 +4,21 @@ Descarta los fragmentos indexados de un proyecto para volver a generarlos.
 
 Hace falta cuando cambia el tamano de fragmento o el modelo de embeddings:
 sin esto conviven fragmentos de distinta configuracion en el mismo proyecto y
-las metricas dejan de ser comparables entre articulos.
+las metricas dejan de ser comparables entre articulos. Si solo cambia el
+modelo, scripts/migrar_embeddings.py lo hace sin dejar el proyecto sin
+busqueda mientras tanto.
+
+Con `--incremental` no se borra el proyecto: cada articulo se vuelve a
+extraer y fragmentar con la configuracion actual, se conservan los
+fragmentos cuyo texto no cambia y solo se embeben los nuevos. Con
+`--simular` se informa de lo que haria y de la cuota que gastaria, sin
+tocar nada.
 
 Uso:
     python scripts/reindexar.py                    # muestra el estado
     python scripts/reindexar.py <proyecto_id>      # limpia ese proyecto
     python scripts/reindexar.py <proyecto_id> --si # sin confirmacion
+    python scripts/reindexar.py <proyecto_id> --incremental [--simular]
 """
 
 from __future__ import annotations
@@ -27,7 +36,13 @@ from app.database import SessionLocal  # noqa: E402
 from app.models.articulo import Articulo  # noqa: E402
 from app.models.embedding_doc import EmbeddingDoc  # noqa: E402
 from app.models.proyecto import Proyecto  # noqa: E402
-from app.services.embedding_service import CHUNK_CHARS, CHUNK_OVERLAP  # noqa: E402
+from app.models.termino_fragmento import TerminoFragmento  # noqa: E402
+from app.services import indice_ann, vectores_mmap  # noqa: E402
+from app.services.cache_vectores import registrar_cambio  # noqa: E402
+from app.services.embedding_service import (  # noqa: E402
+    CHUNK_CHARS, CHUNK_OVERLAP, DiferenciaIndice, reindexar_incremental,
+)
+from app.services.limitador import LIMITE_EMBEDDINGS_DIA  # noqa: E402
 
 
 def estado(db) -> None:
@@ -65,21 +80,69 @@ def limpiar(db, proyecto_id: str, confirmado: bool) -> int:
 
     if not confirmado:
         print()
-        print("Se eliminaran esos %d fragmentos. Volver a generarlos consumira" % n)
-        print("aproximadamente esa misma cantidad de peticiones de embedding.")
+        print("Se eliminaran esos %d fragmentos. Volver a generarlos solo" % n)
+        print("consumira peticiones de embedding por los fragmentos cuyo texto")
+        print("cambie: los demas salen de la cache de embeddings.")
         resp = input("Continuar? (s/N): ").strip().lower()
         if resp != "s":
             print("Cancelado.")
             return 1
 
+    # La clave foranea ya los borraria en cascada; explicito, para no
+    # depender de ello.
+    db.query(TerminoFragmento).filter(TerminoFragmento.articulo_id.in_(ids)).delete(
+        synchronize_session=False)
     db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id.in_(ids)).delete(
         synchronize_session=False)
+    # Sin fragmentos ya no hay nada que otro articulo pueda copiar.
+    db.query(Articulo).filter(Articulo.id.in_(ids)).update(
+        {Articulo.firma_indice: None, Articulo.hash_indice: None},
+        synchronize_session=False)
+    # Sin esto el servidor y los trabajadores seguirian recuperando de su
+    # copia en memoria los fragmentos recien borrados.
+    registrar_cambio(db, proyecto_id)
     db.commit()
+    # El entrenamiento del indice aproximado describia los fragmentos que se
+    # acaban de borrar; se rehara en la primera busqueda que lo necesite.
+    indice_ann.borrar(proyecto_id)
+    # Y el archivo de vectores mapeado, que solo tendria filas muertas.
+    vectores_mmap.borrar(proyecto_id)
     print("Eliminados. Al volver a ejecutar el analisis se indexara de nuevo")
     print("con la configuracion actual (%d caracteres)." % CHUNK_CHARS)
     return 0
 
 
+def incremental(db, proyecto_id: str, simular: bool) -> int:
+    arts = (db.query(Articulo.id, Articulo.titulo)
+            .filter(Articulo.proyecto_id == proyecto_id).all())
+    if not arts:
+        print("El proyecto no tiene articulos o no existe.")
+        return 2
+
+    print("%s proyecto %s con %d caracteres y %d de solape:"
+          % ("Simulando" if simular else "Reindexando", proyecto_id[:8],
+             CHUNK_CHARS, CHUNK_OVERLAP))
+    total = DiferenciaIndice()
+    for a in arts:
+        d = reindexar_incremental(db, a.id, simular=simular)
+        print("  %-40s  conservados=%d  nuevos=%d  borrados=%d  a pedir=%d"
+              % ((a.titulo or a.id)[:40], d.conservados, d.nuevos, d.borrados,
+                 d.textos_a_pedir))
+        for campo in ("conservados", "nuevos", "borrados", "textos_a_pedir"):
+            setattr(total, campo, getattr(total, campo) + getattr(d, campo))
+    print()
+    print("Total: %d conservados, %d a embeber, %d a borrar."
+          % (total.conservados, total.nuevos, total.borrados))
+    # La cuota cuenta textos, no peticiones; los que estan en la cache de
+    # embeddings no la gastan.
+    print("Cuota de embeddings: %d textos (%.0f%% del limite diario de %d)."
+          % (total.textos_a_pedir, 100.0 * total.textos_a_pedir / max(1, LIMITE_EMBEDDINGS_DIA),
+             LIMITE_EMBEDDINGS_DIA))
+    if simular:
+        print("Simulacro: no se ha modificado nada.")
+    return 0
+
+
 def main() -> int:
     args = [a for a in sys.argv[1:] if not a.startswith("--")]
     confirmado = "--si" in sys.argv
@@ -90,6 +153,8 @@ def main() -> int:
             print()
             print("Para limpiar: python scripts/reindexar.py <proyecto_id>")
             return 0
+        if "--incremental" in sys.argv:
+            return incremental(db, args[0], "--simular" in sys.argv)
         return limpiar(db, args[0], confirmado)
     finally:
         db.close()
@@ -52,6 +52,48 @@ class TestGuardarYRecuperar:
         assert almacen.borrar(clave) is False
 
 
+class TestEscrituraPorTrozos:
+    """La subida no tiene el PDF entero en memoria: lo escribe por trozos."""
+
+    def _temporales(self, almacen):
+        carpeta = os.path.join(almacen._raiz(), "_subidas")
+        return os.listdir(carpeta) if os.path.isdir(carpeta) else []
+
+    def test_confirmar_pone_el_archivo_bajo_su_clave(self, almacen):
+        import hashlib
+
+        clave = almacen.nueva_clave(str(uuid.uuid4()))
+        with almacen.Escritura() as esc:
+            for trozo in (b"%PDF-1.4 ", b"uno ", b"dos"):
+                esc.escribir(trozo)
+            esc.confirmar(clave)
+        with open(almacen.ruta_local(clave), "rb") as f:
+            assert f.read() == b"%PDF-1.4 uno dos"
+        assert esc.huella == hashlib.sha256(b"%PDF-1.4 uno dos").hexdigest()
+        assert esc.bytes == 16
+        assert self._temporales(almacen) == []
+
+    def test_sin_confirmar_no_queda_nada(self, almacen):
+        with almacen.Escritura() as esc:
+            esc.escribir(b"duplicado")
+        assert self._temporales(almacen) == []
+
+    def test_corta_en_cuanto_pasa_del_maximo(self, almacen):
+        with pytest.raises(almacen.ArchivoDemasiadoGrande):
+            with almacen.Escritura(max_bytes=10) as esc:
+                esc.escribir(b"123456")
+                esc.escribir(b"789012")
+        assert esc.bytes == 12
+        assert self._temporales(almacen) == []
+
+    def test_una_clave_mala_no_se_confirma(self, almacen):
+        with almacen.Escritura() as esc:
+            esc.escribir(b"algo")
+            with pytest.raises(almacen.ClaveInvalida):
+                esc.confirmar("../fuera.pdf")
+        assert self._temporales(almacen) == []
+
+
 class TestClavesPeligrosas:
     """Las claves salen de la base, que se alimenta de lo que sube el usuario.
 
@@ -0,0 +1,76 @@
+# tests/test_busqueda_prefijo.py
+"""Busqueda por prefijo: preselecciona con pocas dimensiones, ordena con todas."""
+
+import numpy as np
+import pytest
+
+from app.services import cache_vectores as C
+
+
+def _matriz(n=3000, dim=256, semilla=4):
+    """Vectores con la energia concentrada al principio, como los Matryoshka."""
+    rng = np.random.default_rng(semilla)
+    m = rng.standard_normal((n, dim)) / np.sqrt(1 + np.arange(dim))
+    return (m / np.linalg.norm(m, axis=1)[:, None]).astype(np.float32)
+
+
+def _proyecto(m, prefijo=None):
+    n = len(m)
+    return C.MatrizProyecto(
+        proyecto_id="p", generacion=0,
+        ids=np.array([str(i) for i in range(n)], dtype=object),
+        articulos=np.array(["a"] * n, dtype=object),
+        secciones=np.array(["otro"] * n, dtype=object),
+        ordenes=np.arange(n, dtype=np.int32), matriz=m, prefijo=prefijo)
+
+
+class TestPrefijo:
+    def test_las_filas_del_prefijo_tienen_norma_1(self):
+        p = C.prefijo_de(_matriz(), 32)
+        assert p.shape[1] == 32 and p.flags["C_CONTIGUOUS"]
+        assert np.allclose(np.linalg.norm(p, axis=1), 1.0, atol=1e-5)
+
+    def test_devuelve_los_mismos_con_la_puntuacion_completa(self):
+        m = _matriz()
+        exacta, aproximada = _proyecto(m), _proyecto(m, C.prefijo_de(m, 64))
+        assert C.es_aproximada(aproximada)
+        filas = np.arange(len(m))
+        q = C.normalizar(m[5] + m[6])
+        esperadas, esperados = C.repuntuar(
+            None, exacta, filas, C.puntuar(exacta, filas, q), q, 5)
+        obtenidas, obtenidos = C.repuntuar(
+            None, aproximada, filas, C.puntuar(aproximada, filas, q), q, 5)
+        assert set(obtenidas.tolist()) == set(esperadas.tolist())
+        assert sorted(obtenidos.tolist()) == pytest.approx(sorted(esperados.tolist()))
+
+
+@pytest.mark.bd
+class TestEnLaBusqueda:
+    @pytest.fixture
+    def prefijo(self, monkeypatch, proyecto_indexado):
+        pid = proyecto_indexado["proyecto_id"]
+        C.cache.invalidar(pid)
+        monkeypatch.setattr(C, "PREFIJO_DIM", 128)
+        yield
+        C.cache.invalidar(pid)
+
+    def test_embed_query_da_lo_mismo(self, db, proyecto_indexado, request):
+        from app.services.embedding_service import embed_query
+
+        arts = [proyecto_indexado["pertinente"], proyecto_indexado["ajeno"]]
+        consulta = "limitaciones de la muestra y trabajo futuro"
+        exacto = embed_query(db, arts, consulta, top_k=5)
+        request.getfixturevalue("prefijo")
+        assert C.cache.obtener(db, proyecto_indexado["proyecto_id"]).prefijo is not None
+        aproximado = embed_query(db, arts, consulta, top_k=5)
+        assert [h[0] for h in aproximado] == [h[0] for h in exacto]
+        assert [h[1] for h in aproximado] == pytest.approx([h[1] for h in exacto], abs=1e-6)
+
+    def test_recuperar_contexto_da_lo_mismo(self, db, proyecto_indexado,
+                                            contexto_propio, request):
+        from app.services.embedding_service import recuperar_contexto
+
+        aid = proyecto_indexado["pertinente"]
+        exacto = recuperar_contexto(db, aid, contexto_propio, k=4)
+        request.getfixturevalue("prefijo")
+        assert recuperar_contexto(db, aid, contexto_propio, k=4) == exacto
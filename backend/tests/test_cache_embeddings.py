@@ -0,0 +1,122 @@
+# tests/test_cache_embeddings.py
+"""Cache de embeddings: un texto ya embebido no vuelve a pedirse."""
+
+import numpy as np
+import pytest
+
+from app.services import cache_embeddings as CE
+
+
+class TestHuella:
+    def test_ignora_los_espacios_de_mas(self):
+        assert CE.huella("uno  dos\n tres ") == CE.huella("uno dos tres")
+
+    def test_distingue_el_contenido(self):
+        assert CE.huella("uno dos") != CE.huella("uno tres")
+
+
+class TestMemoria:
+    def test_guarda_y_devuelve(self):
+        c = CE.CacheEmbeddings(capacidad=4)
+        c.guardar("m", 3, {"h1": [1.0, 0.0, 0.0]})
+        assert np.allclose(c.buscar("m", 3, ["h1"])["h1"], [1.0, 0.0, 0.0])
+
+    def test_el_modelo_y_la_dimension_son_parte_de_la_clave(self):
+        c = CE.CacheEmbeddings(capacidad=4)
+        c.guardar("m", 3, {"h1": [1.0, 0.0, 0.0]})
+        assert c.buscar("otro", 3, ["h1"]) == {}
+        assert c.buscar("m", 2, ["h1"]) == {}
+
+    def test_descarta_el_usado_hace_mas_tiempo(self):
+        c = CE.CacheEmbeddings(capacidad=2)
+        c.guardar("m", 1, {"a": [1.0], "b": [2.0]})
+        c.buscar("m", 1, ["a"])
+        c.guardar("m", 1, {"c": [3.0]})
+        assert set(c.buscar("m", 1, ["a", "b", "c"])) == {"a", "c"}
+
+    def test_cuenta_aciertos_y_fallos(self):
+        c = CE.CacheEmbeddings(capacidad=4)
+        c.guardar("m", 1, {"a": [1.0]})
+        c.buscar("m", 1, ["a", "b"])
+        e = c.estadisticas()
+        assert (e["aciertos_memoria"], e["fallos"]) == (1, 1)
+        assert e["tasa_aciertos"] == 0.5
+
+
+@pytest.mark.bd
+class TestPersistente:
+    def test_sobrevive_a_perder_la_memoria(self, db, monkeypatch):
+        monkeypatch.setattr(CE, "PERSISTENTE", True)
+        c = CE.CacheEmbeddings(capacidad=4)
+        h = CE.huella("texto de la prueba de persistencia %s" % id(c))
+        c.guardar("prueba", 2, {h: [0.5, -0.5]})
+        c.vaciar()
+        try:
+            assert np.allclose(c.buscar("prueba", 2, [h])[h], [0.5, -0.5])
+            assert c.aciertos_bd == 1
+            # Guardar dos veces lo mismo, como dos procesos a la vez, no falla.
+            c.guardar("prueba", 2, {h: [0.5, -0.5]})
+        finally:
+            from app.models.cache_embedding import CacheEmbedding
+            db.query(CacheEmbedding).filter(CacheEmbedding.modelo == "prueba").delete()
+            db.commit()
+
+
+def _contar_embebidos(monkeypatch):
+    """Textos que llegan de verdad al embebedor, sin contar la cache."""
+    from app.services import embedding_service as E
+
+    pedidos = []
+    original = E._mock_embed_lote
+
+    def contando(textos, *a, **kw):
+        pedidos.extend(textos)
+        return original(textos, *a, **kw)
+
+    monkeypatch.setattr(E, "_mock_embed_lote", contando)
+    return pedidos
+
+
+class TestEmbedTexts:
+    def test_solo_pide_lo_que_falta(self, monkeypatch):
+        from app.services.embedding_service import _embed_texts
+
+        pedidos = _contar_embebidos(monkeypatch)
+        CE.cache.vaciar()
+        primera = _embed_texts(["alfa beta", "gamma delta"])
+        segunda = _embed_texts(["alfa  beta", "", "epsilon"])
+        assert pedidos == ["alfa beta", "gamma delta", "epsilon"]
+        assert segunda[0] == primera[0]
+        assert segunda[1] == []
+
+    def test_un_texto_repetido_se_pide_una_vez(self, monkeypatch):
+        from app.services.embedding_service import _embed_texts
+
+        pedidos = _contar_embebidos(monkeypatch)
+        CE.cache.vaciar()
+        v = _embed_texts(["zeta eta", "zeta eta", "theta"])
+        assert pedidos == ["zeta eta", "theta"]
+        assert v[0] == v[1]
+
+
+@pytest.mark.bd
+class TestSinCuota:
+    def test_la_consulta_se_embebe_una_vez_por_proyecto(
+            self, db, proyecto_indexado, contexto_propio, monkeypatch):
+        from app.services.embedding_service import recuperar_contexto
+
+        pedidos = _contar_embebidos(monkeypatch)
+        CE.cache.vaciar()
+        for clave in ("pertinente", "duplicado", "ajeno"):
+            recuperar_contexto(db, proyecto_indexado[clave], contexto_propio, k=4)
+        assert len(pedidos) == 1
+
+    def test_reindexar_un_texto_igual_no_pide_nada(self, db, proyecto_indexado,
+                                                   monkeypatch):
+        from app.services.embedding_service import index_articulo
+
+        index_articulo(db, proyecto_indexado["ajeno"], reindexar=True)
+        pedidos = _contar_embebidos(monkeypatch)
+        n = index_articulo(db, proyecto_indexado["ajeno"], reindexar=True)
+        assert n > 0
+        assert pedidos == []
@@ -0,0 +1,65 @@
+# tests/test_cache_extraccion.py
+"""Cache de extracciones: cada PDF se lee una vez por version del extractor."""
+
+import uuid
+from dataclasses import asdict
+
+import pytest
+
+from app.services import cache_extraccion as CX
+
+
+@pytest.fixture
+def lecturas(monkeypatch):
+    """Cuenta las veces que se lee de verdad el PDF."""
+    leidas = []
+    original = CX.extraer_con_diagnostico
+    monkeypatch.setattr(CX, "extraer_con_diagnostico",
+                        lambda ruta, max_chars: leidas.append(max_chars) or original(ruta, max_chars))
+    return leidas
+
+
+class TestMemoria:
+    @pytest.fixture(autouse=True)
+    def _sin_base(self, monkeypatch):
+        monkeypatch.setattr(CX, "PERSISTENTE", False)
+
+    def test_lee_el_pdf_una_vez(self, pdf_articulo, lecturas):
+        c = CX.CacheExtraccion(capacidad=4)
+        primera = c.extraer(pdf_articulo)
+        segunda = c.extraer(pdf_articulo, huella=CX.huella_archivo(pdf_articulo))
+        assert len(lecturas) == 1
+        assert asdict(primera) == asdict(segunda) and primera.texto
+        assert (c.aciertos_memoria, c.fallos) == (1, 1)
+
+    def test_devuelve_copias(self, pdf_articulo):
+        c = CX.CacheExtraccion(capacidad=4)
+        c.extraer(pdf_articulo).avisos.append("anadido por quien llama")
+        assert "anadido por quien llama" not in c.extraer(pdf_articulo).avisos
+
+    def test_el_limite_y_la_version_son_parte_de_la_clave(self, pdf_articulo, lecturas,
+                                                         monkeypatch):
+        c = CX.CacheExtraccion(capacidad=4)
+        c.extraer(pdf_articulo)
+        assert len(c.extraer(pdf_articulo, max_chars=500).texto) <= 500
+        monkeypatch.setattr(CX, "VERSION_EXTRACTOR", "otra")
+        c.extraer(pdf_articulo)
+        assert lecturas == [CX.MAX_CHARS, 500, CX.MAX_CHARS]
+
+
+@pytest.mark.bd
+def test_se_comparte_a_traves_de_la_base(db, pdf_articulo, lecturas, monkeypatch):
+    from app.models.cache_extraccion import CacheExtraccion
+
+    monkeypatch.setattr(CX, "PERSISTENTE", True)
+    huella = uuid.uuid4().hex * 2
+    try:
+        # Sin memoria: la segunda lectura solo puede venir de la tabla.
+        c = CX.CacheExtraccion(capacidad=0)
+        leido = c.extraer(pdf_articulo, huella=huella)
+        guardado = c.extraer(pdf_articulo, huella=huella)
+        assert len(lecturas) == 1 and c.aciertos_bd == 1
+        assert asdict(guardado) == asdict(leido)
+    finally:
+        db.query(CacheExtraccion).filter(CacheExtraccion.huella == huella).delete()
+        db.commit()
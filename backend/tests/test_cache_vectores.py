@@ -0,0 +1,103 @@
+# tests/test_cache_vectores.py
+"""Vectores en memoria: lo mismo que leer de la base, y sin quedarse atras."""
+
+import numpy as np
+import pytest
+
+from app.services import cache_vectores as C
+
+
+def _matriz(pid: str, filas: int, ancho: int = 4) -> C.MatrizProyecto:
+    matriz = np.full((filas, ancho), ancho ** -0.5, dtype=np.float32)
+    return C.MatrizProyecto(
+        proyecto_id=pid, generacion=0,
+        ids=np.array(["f%d" % i for i in range(filas)], dtype=object),
+        articulos=np.array(["a"] * filas, dtype=object),
+        secciones=np.array(["otro"] * filas, dtype=object),
+        ordenes=np.arange(filas, dtype=np.int32),
+        matriz=matriz, por_articulo={"a-%s" % pid: np.arange(filas)},
+        bytes=matriz.nbytes,
+    )
+
+
+class TestPresupuesto:
+    def test_descarta_el_usado_hace_mas_tiempo(self):
+        cache = C.CacheVectores(presupuesto_mb=1)
+        # 1 MB son 65536 filas de 4 float32: caben dos de 30000, no tres.
+        for pid in ("p1", "p2"):
+            cache._guardar(_matriz(pid, 30000))
+        cache._entradas.move_to_end("p1")     # p1 se ha usado despues
+        cache._guardar(_matriz("p3", 30000))
+        assert set(cache._entradas) == {"p1", "p3"}
+
+    def test_lo_que_no_cabe_no_vacia_la_cache(self):
+        cache = C.CacheVectores(presupuesto_mb=1)
+        cache._guardar(_matriz("p1", 1000))
+        cache._guardar(_matriz("grande", 100000))
+        assert set(cache._entradas) == {"p1"}
+
+    def test_el_proyecto_de_cada_articulo_se_olvida_con_la_matriz(self):
+        cache = C.CacheVectores(presupuesto_mb=1)
+        for pid in ("p1", "p2", "p3"):
+            cache._guardar(_matriz(pid, 30000))
+        assert set(cache._proyecto_de) == {"a-p2", "a-p3"}
+        cache.invalidar("p2")
+        assert cache._proyecto_de == {"a-p3": "p3"}
+
+
+class TestPuntuacion:
+    def test_compara_el_tramo_comun_como_el_coseno(self):
+        from app.services.embedding_service import _cos
+
+        m = _matriz("p", 1, ancho=4)
+        m.matriz[0] = [0.6, 0.8, 0.0, 0.0]
+        for consulta in ([1.0, 2.0], [1.0, 2.0, 3.0, 4.0, 5.0]):
+            s = C.puntuar(m, np.array([0]), C.normalizar(consulta))
+            assert s[0] == pytest.approx(_cos(consulta, [0.6, 0.8, 0.0, 0.0]), abs=1e-6)
+
+
+@pytest.mark.bd
+class TestCoherencia:
+    def test_da_lo_mismo_que_puntuar_fila_a_fila(self, db, proyecto_indexado):
+        from app.models.embedding_doc import EmbeddingDoc
+        from app.services.embedding_service import _cos, _embed_texts, embed_query
+        from app.services.vectores import desempaquetar
+
+        arts = [proyecto_indexado["pertinente"], proyecto_indexado["ajeno"]]
+        consulta = "validacion de la muestra y limitaciones del estudio"
+        q = _embed_texts([consulta])[0]
+        esperado = sorted(
+            ((f.id, _cos(q, desempaquetar(f.vector)))
+             for f in db.query(EmbeddingDoc.id, EmbeddingDoc.vector)
+             .filter(EmbeddingDoc.articulo_id.in_(arts))),
+            key=lambda x: x[1], reverse=True)[:5]
+
+        hits = embed_query(db, arts, consulta, top_k=5)
+        assert [h[0] for h in hits] == [e[0] for e in esperado]
+        assert [h[1] for h in hits] == pytest.approx([e[1] for e in esperado], abs=1e-5)
+        assert all(h[2] for h in hits)
+
+    def test_reindexar_invalida_la_copia(self, db, proyecto_indexado):
+        from app.services.embedding_service import index_articulo
+
+        pid = proyecto_indexado["proyecto_id"]
+        antes = C.cache.obtener(db, pid)
+        index_articulo(db, proyecto_indexado["ajeno"], reindexar=True)
+        despues = C.cache.obtener(db, pid)
+        assert despues is not antes
+        assert despues.generacion > antes.generacion
+        assert set(despues.ids) != set(antes.ids)
+
+    def test_ve_lo_que_cambia_otro_proceso(self, db, proyecto_indexado):
+        """Otro proceso solo deja constancia en la base, no en esta copia."""
+        from sqlalchemy import update
+        from app.models.proyecto import Proyecto
+
+        pid = proyecto_indexado["proyecto_id"]
+        antes = C.cache.obtener(db, pid)
+        db.execute(update(Proyecto).where(Proyecto.id == pid)
+                   .values(generacion_vectores=Proyecto.generacion_vectores + 1))
+        db.commit()
+        assert C.cache.obtener(db, pid) is antes      # aun dentro del plazo
+        antes.revisada -= C.REVALIDAR_SEG + 1
+        assert C.cache.obtener(db, pid) is not antes
@@ -56,6 +56,21 @@ class TestC1PermutacionContexto:
         assert r.valor == pytest.approx(1.0, abs=1e-6)
         assert r.veredicto == FALLA
 
+    def test_puntua_desde_la_matriz_como_el_coseno(self, db, proyecto_indexado,
+                                                  contexto_propio):
+        from app.models.embedding_doc import EmbeddingDoc
+        from app.services.embedding_service import construir_consulta
+        from app.services.vectores import desempaquetar
+
+        aid = proyecto_indexado["pertinente"]
+        p = C._puntuar_todos(db, aid, contexto_propio)
+        q = C._embed_consulta(construir_consulta(contexto_propio))
+        filas = (db.query(EmbeddingDoc.id, EmbeddingDoc.vector)
+                 .filter(EmbeddingDoc.articulo_id == aid).all())
+        assert set(p) == {f.id for f in filas}
+        for f in filas:
+            assert p[f.id] == pytest.approx(C._cos(q, desempaquetar(f.vector)), abs=1e-5)
+
 
 class TestC3ArticuloAjeno:
     def test_distingue_un_articulo_de_otro_dominio(self, db, proyecto_indexado,
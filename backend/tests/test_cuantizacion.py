@@ -0,0 +1,123 @@
+# tests/test_cuantizacion.py
+"""Vectores int8: preseleccionan bien y lo devuelto es exacto."""
+
+import numpy as np
+import pytest
+
+from app.services import cache_vectores as C
+from app.services import cuantizacion as Q
+
+
+def _normalizados(n=500, dim=64, semilla=5):
+    m = np.random.default_rng(semilla).standard_normal((n, dim)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1)[:, None]
+
+
+class TestCuantizar:
+    def test_reconstruye_con_poco_error(self):
+        m = _normalizados()
+        c = Q.cuantizar(m)
+        assert c.codigos.dtype == np.int8
+        assert np.abs(c[np.arange(len(m))] - m).max() < 0.01
+
+    def test_puntua_como_la_matriz_reconstruida(self):
+        m = _normalizados()
+        c = Q.cuantizar(m)
+        filas = np.arange(0, len(m), 3)
+        assert np.allclose(c.puntuar(filas, m[0]), c[filas] @ m[0], atol=1e-5)
+        assert np.abs(c.puntuar(filas, m[0]) - m[filas] @ m[0]).max() < 0.02
+
+    def test_los_bytes_guardan_centro_escala_y_codigos(self):
+        v = _normalizados(n=1)[0]
+        datos = Q.empaquetar(v)
+        assert len(datos) == Q.CABECERA + len(v)
+        assert np.array_equal(Q.desempaquetar(datos)[0], Q.cuantizar(v)[0])
+        assert Q.desempaquetar(None) is None
+
+    def test_un_vector_constante_no_divide_por_cero(self):
+        c = Q.cuantizar(np.full((1, 8), 0.25, dtype=np.float32))
+        assert np.allclose(c[0], 0.25)
+
+    def test_apilar_rellena_con_ceros_de_verdad(self):
+        corto = Q.desempaquetar(Q.empaquetar([0.6, 0.8]))
+        c = Q.apilar([corto], 4)
+        assert np.allclose(c[0], [0.6, 0.8, 0.0, 0.0], atol=0.01)
+
+
+class TestRepuntuar:
+    def test_devuelve_los_mismos_que_la_exacta(self, monkeypatch):
+        m = _normalizados(n=2000)
+        exacta = C.MatrizProyecto(
+            proyecto_id="p", generacion=0,
+            ids=np.array([str(i) for i in range(len(m))], dtype=object),
+            articulos=np.array(["a"] * len(m), dtype=object),
+            secciones=np.array(["otro"] * len(m), dtype=object),
+            ordenes=np.arange(len(m), dtype=np.int32), matriz=m)
+        filas = np.arange(len(m))
+        consulta = m[11] + 0.5 * m[12]
+        consulta /= np.linalg.norm(consulta)
+        esperadas, esperados = C.repuntuar(
+            None, exacta, filas, C.puntuar(exacta, filas, consulta), consulta, 10)
+
+        aproximada = C.MatrizProyecto(**{**exacta.__dict__, "matriz": Q.cuantizar(m)})
+        # Sin base: los vectores completos salen de la matriz original.
+        monkeypatch.setattr(C, "exactos", lambda _db, _m, f: m[f])
+        obtenidas, obtenidos = C.repuntuar(
+            None, aproximada, filas, C.puntuar(aproximada, filas, consulta),
+            consulta, 10)
+        assert set(obtenidas.tolist()) == set(esperadas.tolist())
+        assert sorted(obtenidos.tolist()) == pytest.approx(sorted(esperados.tolist()))
+
+
+@pytest.mark.bd
+class TestEnLaBase:
+    @pytest.fixture
+    def int8(self, monkeypatch, proyecto_indexado):
+        pid = proyecto_indexado["proyecto_id"]
+        C.cache.invalidar(pid)
+        monkeypatch.setattr(C, "VECTORES_INT8", True)
+        yield
+        C.cache.invalidar(pid)
+
+    def test_indexar_guarda_la_version_int8(self, db, proyecto_indexado):
+        from app.models.embedding_doc import EmbeddingDoc
+
+        filas = (db.query(EmbeddingDoc.vector_int8)
+                 .filter(EmbeddingDoc.articulo_id == proyecto_indexado["pertinente"]).all())
+        assert filas and all(Q.desempaquetar(f[0]) is not None for f in filas)
+
+    def test_embed_query_da_lo_mismo(self, db, proyecto_indexado, request):
+        from app.services.embedding_service import embed_query
+
+        arts = [proyecto_indexado["pertinente"], proyecto_indexado["ajeno"]]
+        consulta = "resultados de la validacion con la muestra"
+        exacto = embed_query(db, arts, consulta, top_k=5)
+        request.getfixturevalue("int8")
+        m = C.cache.obtener(db, proyecto_indexado["proyecto_id"])
+        assert C.es_aproximada(m)
+        aproximado = embed_query(db, arts, consulta, top_k=5)
+        assert [h[0] for h in aproximado] == [h[0] for h in exacto]
+        assert [h[1] for h in aproximado] == pytest.approx([h[1] for h in exacto], abs=1e-5)
+
+    def test_recuperar_contexto_da_lo_mismo(self, db, proyecto_indexado,
+                                            contexto_propio, request):
+        from app.services.embedding_service import recuperar_contexto
+
+        aid = proyecto_indexado["pertinente"]
+        exacto = recuperar_contexto(db, aid, contexto_propio, k=4)
+        request.getfixturevalue("int8")
+        aproximado = recuperar_contexto(db, aid, contexto_propio, k=4)
+        assert [c["embedding_id"] for c in aproximado] == \
+               [c["embedding_id"] for c in exacto]
+
+    def test_filas_sin_version_int8_se_cuantizan_al_cargar(
+            self, db, proyecto_indexado, int8):
+        from app.models.embedding_doc import EmbeddingDoc
+
+        aid = proyecto_indexado["ajeno"]
+        (db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == aid)
+         .update({EmbeddingDoc.vector_int8: None}))
+        db.commit()
+        m = C._cargar(db, proyecto_indexado["proyecto_id"])
+        assert len(m.filas_de(aid)) == \
+            db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == aid).count()
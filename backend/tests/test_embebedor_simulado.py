@@ -0,0 +1,50 @@
+# tests/test_embebedor_simulado.py
+"""Embeddings simulados en lote: los mismos bits que palabra a palabra."""
+
+import hashlib
+import math
+import random
+import re
+
+import pytest
+
+from app.services import embedding_service as E
+
+
+def _referencia(text, dim):
+    """La implementacion original, sin tabla ni NumPy."""
+    vec = [0.0] * dim
+    for tok in re.findall(r"\w+", (text or "").lower()):
+        h = hashlib.md5(tok.encode("utf-8")).digest()
+        vec[int.from_bytes(h[:4], "big") % dim] += 1.0 if h[4] % 2 == 0 else -1.0
+    norma = math.sqrt(sum(x * x for x in vec))
+    if norma == 0.0:
+        return [0.0] * dim
+    return [x / norma for x in vec]
+
+
+def _textos():
+    rng = random.Random(7)
+    vocabulario = ["alfa", "Beta", "ñandú", "Straße", "数据", "x_1"] + [
+        "p%d" % i for i in range(2000)]
+    return [" ".join(rng.choice(vocabulario) for _ in range(rng.randint(0, 300)))
+            for _ in range(300)] + ["", None, "   ", "eco eco ECO", "¿?"]
+
+
+@pytest.mark.parametrize("dim", [768, 5])
+def test_identico_a_la_version_palabra_a_palabra(dim, monkeypatch):
+    monkeypatch.setattr(E, "_LOTE_MOCK", 64)
+    textos = _textos()
+    matriz = E._mock_embed_lote(textos, dim)
+    assert matriz.shape == (len(textos), dim)
+    for fila, t in zip(matriz, textos):
+        assert fila.tolist() == _referencia(t, dim)
+    assert E._mock_embed(textos[0], dim) == _referencia(textos[0], dim)
+
+
+def test_la_tabla_no_pasa_del_tope(monkeypatch):
+    monkeypatch.setattr(E, "_TABLA_MOCK", {})
+    monkeypatch.setattr(E, "_TABLA_MOCK_MAX", 10)
+    v = E._mock_embed(" ".join("t%d" % i for i in range(50)), 16)
+    assert len(E._TABLA_MOCK[16]) == 10
+    assert v == _referencia(" ".join("t%d" % i for i in range(50)), 16)
@@ -0,0 +1,90 @@
+# tests/test_embeddings_concurrentes.py
+"""Lotes de embeddings en vuelo a la vez: mismo resultado, mismo orden."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import embedding_service as E
+from app.services import limitador as L
+from app.services import lotes_embeddings
+from app.services import registro_api
+
+
+class ClienteFalso:
+    """Responde a embed_content con el numero de cada texto como vector.
+
+    Los lotes tardan mas cuanto antes van, para que terminen en desorden.
+    """
+
+    def __init__(self, fallar_en=None):
+        self.fallar_en = fallar_en
+        self.en_vuelo = 0
+        self.maximo = 0
+        self.llamadas = 0
+        self._cerrojo = threading.Lock()
+        self.models = SimpleNamespace(embed_content=self.embed_content)
+
+    def embed_content(self, model, contents, config):
+        with self._cerrojo:
+            self.llamadas += 1
+            self.en_vuelo += 1
+            self.maximo = max(self.maximo, self.en_vuelo)
+        try:
+            primero = int(contents[0].split()[1])
+            time.sleep(0.02 / (1 + primero))
+            if self.fallar_en is not None and primero == self.fallar_en:
+                raise ValueError("400 INVALID_ARGUMENT")
+            return SimpleNamespace(embeddings=[
+                SimpleNamespace(values=[float(t.split()[1]), 1.0]) for t in contents])
+        finally:
+            with self._cerrojo:
+                self.en_vuelo -= 1
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    c = ClienteFalso()
+    monkeypatch.setattr(E, "_get_client", lambda: c)
+    monkeypatch.setattr(E, "limitador_embeddings", L.Limitador(10_000))
+    monkeypatch.setattr(registro_api, "REGISTRO_ACTIVO", False)
+    monkeypatch.setattr(E, "EMBED_CONCURRENCIA", 3)
+    monkeypatch.setattr(lotes_embeddings, "dimensionador", lotes_embeddings.Dimensionador())
+    return c
+
+
+def _pendientes(n):
+    return [("h%d" % i, "texto %d" % i) for i in range(n)]
+
+
+def test_conserva_el_orden_con_lotes_en_desorden(cliente):
+    salida = E._pedir_embeddings(_pendientes(40), batch=4)
+    assert list(salida) == ["h%d" % i for i in range(40)]
+    assert all(v == [float(i), 1.0] for i, v in enumerate(salida.values()))
+    assert cliente.llamadas == 10
+    assert 1 < cliente.maximo <= 3
+
+
+def test_con_uno_los_envia_de_uno_en_uno(cliente, monkeypatch):
+    monkeypatch.setattr(E, "EMBED_CONCURRENCIA", 1)
+    assert len(E._pedir_embeddings(_pendientes(12), batch=4)) == 12
+    assert cliente.maximo == 1
+
+
+def test_el_fallo_de_un_lote_se_propaga(cliente):
+    cliente.fallar_en = 8
+    with pytest.raises(ValueError):
+        E._pedir_embeddings(_pendientes(40), batch=4)
+    # Un 400 no es recuperable: con_reintentos no lo repite.
+    assert cliente.llamadas <= 10
+
+
+def test_los_vacios_conservan_su_posicion(cliente, monkeypatch):
+    monkeypatch.setattr(E, "MODE", "real")
+    monkeypatch.setattr(E.cache_embeddings, "cache", E.cache_embeddings.CacheEmbeddings(0))
+    textos = ["texto %d" % i if i % 3 else "  " for i in range(20)]
+    vectores = E._embed_texts(textos, batch=2)
+    for i, v in enumerate(vectores):
+        assert v == ([] if i % 3 == 0 else [float(i), 1.0])
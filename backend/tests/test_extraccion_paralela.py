@@ -0,0 +1,62 @@
+# tests/test_extraccion_paralela.py
+"""Extraccion repartida por paginas: el mismo texto que en serie."""
+
+import fitz
+import pytest
+from pdfminer.high_level import extract_text as pdfminer_extract
+
+from app.utils import extraccion_paralela as P
+from app.utils import text_extractor
+
+
+@pytest.fixture(scope="module")
+def pdf_largo(tmp_path_factory) -> str:
+    ruta = str(tmp_path_factory.mktemp("pdfs") / "largo.pdf")
+    doc = fitz.open()
+    for i in range(30):
+        doc.new_page().insert_textbox(
+            fitz.Rect(55, 55, 545, 780),
+            "Pagina %d\n%s" % (i, "Texto de relleno de la pagina. " * 60),
+            fontsize=9, fontname="helv")
+    doc.save(ruta)
+    doc.close()
+    return ruta
+
+
+@pytest.fixture
+def en_paralelo(monkeypatch):
+    monkeypatch.setattr(P, "EXTRACCION_PROCESOS", 2)
+    monkeypatch.setattr(P, "EXTRACCION_PARALELA_DESDE", 1)
+
+
+class TestTramos:
+    @pytest.mark.parametrize("n, partes", [(1, 4), (7, 3), (30, 4), (30, 8), (5, 10)])
+    def test_cubren_todas_las_paginas_en_orden(self, n, partes):
+        rangos = P.tramos(n, partes)
+        assert len(rangos) <= partes
+        assert [p for ini, fin in rangos for p in range(ini, fin)] == list(range(n))
+
+    def test_sin_paginas_no_hay_tramos(self):
+        assert P.tramos(0, 4) == []
+
+    def test_un_proceso_desactiva_el_reparto(self, monkeypatch):
+        monkeypatch.setattr(P, "EXTRACCION_PROCESOS", 1)
+        assert not P.en_paralelo(1000)
+
+
+@pytest.mark.usefixtures("en_paralelo")
+class TestMismoTexto:
+    @pytest.mark.parametrize("max_chars", [10**9, 5_000, 100])
+    def test_pymupdf_con_el_mismo_corte(self, pdf_largo, max_chars):
+        assert (P.paginas_pymupdf(pdf_largo, 30, max_chars)
+                == P._paginas_fitz(pdf_largo, 0, 30, max_chars))
+
+    def test_pdfminer_por_tramos_es_la_lectura_entera(self, pdf_largo):
+        assert P.texto_pdfminer(pdf_largo, 30) == pdfminer_extract(pdf_largo)
+
+    def test_el_documento_no_cambia(self, pdf_largo, monkeypatch):
+        paralelo = text_extractor.leer_documento(pdf_largo)
+        monkeypatch.setattr(P, "EXTRACCION_PROCESOS", 1)
+        serie = text_extractor.leer_documento(pdf_largo)
+        assert paralelo.paginas == serie.paginas
+        assert paralelo.diagnostico == serie.diagnostico
@@ -0,0 +1,180 @@
+# tests/test_indice_ann.py
+"""Indice IVF: encuentra lo que la busqueda exacta, y se mantiene al dia."""
+
+import uuid
+
+import numpy as np
+import pytest
+
+from app.services import indice_ann as I
+
+
+@pytest.fixture
+def carpeta(tmp_path, monkeypatch):
+    monkeypatch.setattr(I, "_dir_indices", lambda: str(tmp_path))
+    return tmp_path
+
+
+def _corpus(n=4000, dim=32, temas=40, semilla=3):
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((temas, dim))
+    m = centros[rng.integers(0, temas, n)] + 0.8 * rng.standard_normal((n, dim))
+    m = (m / np.linalg.norm(m, axis=1)[:, None]).astype(np.float32)
+    ids = np.array([str(uuid.uuid4()) for _ in range(n)], dtype=object)
+    articulos = np.array(["a%d" % (i // 50) for i in range(n)], dtype=object)
+    return m, ids, articulos, centros
+
+
+class TestBusqueda:
+    def test_recall_frente_a_la_exacta(self, carpeta):
+        m, ids, articulos, centros = _corpus()
+        p = I.particionar(str(uuid.uuid4()), ids, articulos, m)
+        todas = np.ones(len(m), dtype=bool)
+        rng = np.random.default_rng(9)
+        aciertos = 0
+        for c in centros[:20]:
+            q = c + 0.5 * rng.standard_normal(len(c))
+            q = (q / np.linalg.norm(q)).astype(np.float32)
+            verdad = set(I.mejores(m @ q, 10).tolist())
+            filas, _s = I.buscar(p, m, todas, q, 10, nprobe=8)
+            aciertos += len(verdad & set(filas.tolist()))
+        assert aciertos / 200 >= 0.9
+
+    def test_las_puntuaciones_son_exactas(self, carpeta):
+        m, ids, articulos, _c = _corpus(n=500)
+        p = I.particionar(str(uuid.uuid4()), ids, articulos, m)
+        q = m[7]
+        filas, scores = I.buscar(p, m, np.ones(len(m), dtype=bool), q, 5)
+        assert np.allclose(scores, m[filas] @ q)
+        assert 7 in filas.tolist()
+
+    def test_respeta_el_filtro(self, carpeta):
+        m, ids, articulos, _c = _corpus(n=500)
+        p = I.particionar(str(uuid.uuid4()), ids, articulos, m)
+        permitidas = articulos == "a3"
+        filas, _s = I.buscar(p, m, permitidas, m[160], 5, nprobe=len(p.centroides))
+        assert filas.tolist() and all(articulos[f] == "a3" for f in filas)
+
+
+class TestPersistencia:
+    def test_reutiliza_el_entrenamiento(self, carpeta):
+        m, ids, articulos, _c = _corpus(n=1000)
+        pid = str(uuid.uuid4())
+        primera = I.particionar(pid, ids, articulos, m)
+        segunda = I.particionar(pid, ids, articulos, m)
+        assert np.array_equal(primera.centroides, segunda.centroides)
+        assert np.array_equal(primera.filas, segunda.filas)
+
+    def test_asigna_al_vuelo_lo_que_falta_en_el_archivo(self, carpeta):
+        m, ids, articulos, _c = _corpus(n=1000)
+        pid = str(uuid.uuid4())
+        I.particionar(pid, ids[:950], articulos[:950], m[:950])
+        p = I.particionar(pid, ids, articulos, m)
+        assert sorted(p.filas.tolist()) == list(range(1000))
+
+    def test_indexar_un_articulo_actualiza_el_archivo(self, carpeta):
+        m, ids, articulos, _c = _corpus(n=1000)
+        pid = str(uuid.uuid4())
+        I.particionar(pid, ids, articulos, m)
+        nuevos = [str(uuid.uuid4()) for _ in range(3)]
+        I.actualizar_articulo(pid, "a0", nuevos, m[:3])
+        guardado = I.IndiceIVF.cargar(pid)
+        del_a0 = set(guardado.ids[guardado.articulos == "a0"].tolist())
+        assert del_a0 == set(nuevos)
+
+    def test_un_archivo_roto_se_reconstruye(self, carpeta):
+        m, ids, articulos, _c = _corpus(n=300)
+        pid = str(uuid.uuid4())
+        (carpeta / ("%s.ivf.npz" % pid)).write_bytes(b"basura")
+        p = I.particionar(pid, ids, articulos, m)
+        assert len(p.filas) == 300
+
+    def test_rechaza_identificadores_con_ruta(self):
+        with pytest.raises(ValueError):
+            I._ruta("../../etc")
+
+
+class TestCuantizadorComun:
+    def test_un_indice_repartido_entre_proyectos_encuentra_lo_que_uno_solo(self, carpeta):
+        m, ids, articulos, centros = _corpus()
+        partes = [m[:1000], m[1000:2500], m[2500:]]
+        c = I.cuantizador(str(uuid.uuid4()), "modelo/32", partes)
+        particiones = [I.agrupar(c.centroides, I.asignar(c.centroides, p)) for p in partes]
+        rng = np.random.default_rng(1)
+        aciertos = 0
+        for _ in range(30):
+            q = centros[rng.integers(0, len(centros))]
+            q = (q / np.linalg.norm(q)).astype(np.float32)
+            verdad = set(I.mejores(m @ q, 10).tolist())
+            filas, scores = [], []
+            for ini, p, parte in zip((0, 1000, 2500), particiones, partes):
+                f, sc = I.buscar(p, parte, np.ones(len(parte), dtype=bool), q, 10)
+                filas.append(f + ini)
+                scores.append(sc)
+            filas = np.concatenate(filas)
+            aciertos += len(verdad & set(filas[I.mejores(np.concatenate(scores), 10)].tolist()))
+        assert aciertos / 300 >= 0.9
+
+    def test_se_guarda_y_se_reentrena_al_doblar(self, carpeta):
+        m, *_ = _corpus()
+        uid = str(uuid.uuid4())
+        primero = I.cuantizador(uid, "modelo/32", [m[:1000], m[1000:1500]])
+        assert I.cuantizador(uid, "modelo/32", [m[:1500], m[1500:2500]]).clave == primero.clave
+        assert I.cuantizador(uid, "otro/32", [m[:1500]]).clave != primero.clave
+        assert I.cuantizador(uid, "modelo/32", [m[:2000], m[2000:]]).clave != primero.clave
+
+
+@pytest.mark.bd
+class TestEnLaBusqueda:
+    def test_embed_query_da_lo_mismo_visitando_todas_las_listas(
+            self, db, proyecto_indexado, carpeta, monkeypatch):
+        from app.services import cache_vectores
+        from app.services.embedding_service import embed_query
+
+        arts = [proyecto_indexado["pertinente"], proyecto_indexado["ajeno"]]
+        consulta = "resultados de la validacion"
+        exacto = embed_query(db, arts, consulta, top_k=5)
+
+        monkeypatch.setattr(I, "ANN_MIN_FRAGMENTOS", 1)
+        monkeypatch.setattr(I, "ANN_NPROBE", 10 ** 6)
+        cache_vectores.cache.invalidar(proyecto_indexado["proyecto_id"])
+        aproximado = embed_query(db, arts, consulta, top_k=5)
+        cache_vectores.cache.invalidar(proyecto_indexado["proyecto_id"])
+
+        assert [h[0] for h in aproximado] == [h[0] for h in exacto]
+
+    def test_la_busqueda_en_varios_proyectos_usa_los_centroides_del_usuario(
+            self, db, usuario_prueba, proyecto_indexado, carpeta, monkeypatch):
+        from app.models.articulo import Articulo
+        from app.models.proyecto import Proyecto
+        from app.services import cache_vectores
+        from app.services.embedding_service import embed_query
+
+        otro, art = str(uuid.uuid4()), str(uuid.uuid4())
+        db.add(Proyecto(id=otro, usuario_id=usuario_prueba["id"], tema_principal="otro",
+                        objetivo="otro", n_articulos_objetivo=1,
+                        estado_arte_generado=False))
+        db.flush()
+        db.add(Articulo(id=art, proyecto_id=otro, titulo="sin fragmentos"))
+        db.commit()
+        arts = [proyecto_indexado["pertinente"], proyecto_indexado["ajeno"], art]
+        consulta = "resultados de la validacion"
+        cuantizadores = []
+        try:
+            exacto = embed_query(db, arts, consulta, top_k=5)
+            monkeypatch.setattr(I, "ANN_MIN_FRAGMENTOS", 1)
+            monkeypatch.setattr(I, "ANN_NPROBE", 10 ** 6)
+            original = I.cuantizador
+            monkeypatch.setattr(I, "cuantizador",
+                                lambda *a: cuantizadores.append(original(*a)) or cuantizadores[-1])
+            cache_vectores.cache.invalidar(proyecto_indexado["proyecto_id"])
+            aproximado = embed_query(db, arts, consulta, top_k=5)
+            m = cache_vectores.cache.obtener(db, proyecto_indexado["proyecto_id"])
+        finally:
+            cache_vectores.cache.invalidar(proyecto_indexado["proyecto_id"])
+            db.query(Proyecto).filter(Proyecto.id == otro).delete()
+            db.commit()
+
+        assert len(cuantizadores) == 1 and m.comun[0] == cuantizadores[0].clave
+        assert m.particion is None
+        assert [h[0] for h in aproximado] == [h[0] for h in exacto]
@@ -0,0 +1,91 @@
+# tests/test_indice_lexico.py
+"""Indice invertido y busqueda hibrida: terminos exactos sin tocar vectores."""
+
+import pytest
+
+from app.services import indice_lexico as L
+
+
+class TestTerminos:
+    def test_solo_contenido_sin_tildes(self):
+        assert L.terminos("La metodología de la muestra y la Metodologia") == \
+            {"metodologia": 2, "muestra": 1}
+
+    def test_recorta_los_terminos_largos(self):
+        assert max(map(len, L.terminos("x" * 200))) == L.LARGO_TERMINO
+
+
+class TestFusion:
+    def test_premia_aparecer_arriba_en_las_dos_listas(self):
+        f = L.fusionar(["a", "b", "c"], ["b", "d"])
+        assert max(f, key=f.get) == "b"
+        assert f["a"] == pytest.approx(1 / (L.RRF_K + 1))
+
+    def test_mejores_desempata_por_identificador(self):
+        assert L.mejores({"b": 1.0, "a": 1.0, "c": 2.0}, 2) == [("c", 2.0), ("a", 1.0)]
+
+
+@pytest.mark.bd
+class TestEnLaBase:
+    def _postings(self, db, aid):
+        from app.models.termino_fragmento import TerminoFragmento
+
+        return (db.query(TerminoFragmento)
+                .filter(TerminoFragmento.articulo_id == aid).count())
+
+    def test_indexar_anade_terminos_y_longitudes(self, db, proyecto_indexado):
+        from app.models.embedding_doc import EmbeddingDoc
+
+        aid = proyecto_indexado["ajeno"]
+        assert self._postings(db, aid) > 0
+        assert all(n for (n,) in db.query(EmbeddingDoc.n_terminos)
+                   .filter(EmbeddingDoc.articulo_id == aid))
+
+    def test_reindexar_no_duplica(self, db, proyecto_indexado):
+        from app.services.embedding_service import index_articulo
+
+        aid = proyecto_indexado["ajeno"]
+        antes = self._postings(db, aid)
+        index_articulo(db, aid, reindexar=True)
+        assert self._postings(db, aid) == antes
+
+    def test_lexico_no_embebe_la_consulta(self, db, proyecto_indexado, monkeypatch):
+        from app.services import embedding_service as E
+
+        def prohibido(*_a, **_kw):
+            raise AssertionError("la busqueda lexica no debe embeber nada")
+
+        monkeypatch.setattr(E, "_embed_consulta", prohibido)
+        arts = [proyecto_indexado["pertinente"], proyecto_indexado["ajeno"]]
+        hits = E.embed_query(db, arts, "transmisores satelitales", top_k=3, modo="lexico")
+        assert hits and all("transmisores" in t for _i, _s, t in hits)
+
+    def test_hibrido_incluye_el_termino_exacto(self, db, proyecto_indexado):
+        from app.services.embedding_service import embed_query
+
+        arts = [proyecto_indexado["pertinente"], proyecto_indexado["ajeno"]]
+        hits = embed_query(db, arts, "transmisores", top_k=3, modo="hibrido")
+        assert len(hits) == 3
+        assert "transmisores" in hits[0][2]
+
+    def test_modo_desconocido(self, db, proyecto_indexado):
+        from app.services.embedding_service import embed_query
+
+        with pytest.raises(ValueError):
+            embed_query(db, [proyecto_indexado["ajeno"]], "x", modo="otro")
+
+    def test_recuperar_contexto_hibrido(self, db, proyecto_indexado, contexto_propio):
+        from app.services.embedding_service import recuperar_contexto
+
+        r = recuperar_contexto(db, proyecto_indexado["pertinente"], contexto_propio,
+                               k=4, hibrido=True)
+        assert len(r) == 4
+        assert max(c["score"] for c in r) <= 1.0
+
+    def test_endpoint(self, cliente, proyecto_indexado):
+        r = cliente.get("/embeddings/search",
+                        params={"q": "transmisores", "modo": "lexico", "top_k": 2})
+        assert r.status_code == 200, r.text
+        assert r.json() and "transmisores" in r.json()[0]["texto"]
+        assert cliente.get("/embeddings/search",
+                           params={"q": "x", "modo": "otro"}).status_code == 422
@@ -0,0 +1,330 @@
+# tests/test_ingesta.py
+"""Ingesta de un PDF subido: una sola lectura, despues de responder."""
+
+import os
+import uuid
+
+import fitz
+import pytest
+
+from app.services import ingesta
+from app.utils import text_extractor
+
+
+def _pdf_con_doi(doi: str) -> bytes:
+    doc = fitz.open()
+    pag = doc.new_page()
+    pag.insert_textbox(fitz.Rect(55, 55, 545, 780),
+                       "A study of automated gap detection in the literature\n"
+                       "https://doi.org/%s\n%s" % (doi, "Some body text of the article. " * 40),
+                       fontsize=9, fontname="helv")
+    datos = doc.tobytes()
+    doc.close()
+    return datos
+
+
+class TestLectura:
+    def test_abre_el_pdf_una_vez(self, pdf_articulo, monkeypatch):
+        aperturas = []
+        original = text_extractor.fitz.open
+        monkeypatch.setattr(text_extractor.fitz, "open",
+                            lambda *a, **kw: aperturas.append(a) or original(*a, **kw))
+        doc = text_extractor.leer_documento(pdf_articulo)
+        assert len(aperturas) == 1
+        assert doc.n_paginas >= len(doc.paginas) > 0
+        assert doc.diagnostico.texto and doc.diagnostico.metodo == "pymupdf"
+
+    def test_da_el_mismo_diagnostico_que_la_extraccion(self, pdf_articulo):
+        assert (text_extractor.leer_documento(pdf_articulo).diagnostico
+                == text_extractor.extraer_con_diagnostico(pdf_articulo))
+
+
+class TestTituloYDoi:
+    def test_prefiere_el_titulo_de_los_metadatos(self):
+        titulo, doi = ingesta.titulo_y_doi({"title": "Titulo de los metadatos"},
+                                           "Otra linea que podria ser titulo\ndoi 10.1000/xyz.12")
+        assert (titulo, doi) == ("Titulo de los metadatos", "10.1000/xyz.12")
+
+    def test_sin_metadatos_toma_la_primera_linea_con_forma_de_titulo(self):
+        titulo, doi = ingesta.titulo_y_doi({}, "1\nUn titulo suficientemente largo\nmas texto")
+        assert (titulo, doi) == ("Un titulo suficientemente largo", None)
+
+
+@pytest.fixture
+def proyecto_vacio(db, usuario_prueba):
+    from app.models.proyecto import Proyecto
+
+    pid = str(uuid.uuid4())
+    db.add(Proyecto(id=pid, usuario_id=usuario_prueba["id"], tema_principal="ingesta",
+                    objetivo="ingesta", metodologia_txt="DSRM", sector_txt="otro",
+                    n_articulos_objetivo=1, estado_arte_generado=False))
+    db.commit()
+    try:
+        yield pid
+    finally:
+        db.rollback()
+        db.query(Proyecto).filter(Proyecto.id == pid).delete()
+        db.commit()
+
+
+@pytest.mark.bd
+class TestSubida:
+    def test_responde_sin_leer_y_la_ingesta_completa_despues(
+            self, db, cliente, proyecto_vacio, monkeypatch):
+        from app.models.archivo import Archivo, EstadoArchivo
+        from app.models.articulo import Articulo
+        from app.services import cache_extraccion
+
+        pendientes = []
+        monkeypatch.setattr(ingesta, "ingerir_en_segundo_plano", pendientes.append)
+        datos = _pdf_con_doi("10.5555/ingesta.%s" % uuid.uuid4().hex[:8])
+        r = cliente.post("/proyectos/%s/archivos" % proyecto_vacio,
+                         files={"pdf": ("articulo.pdf", datos, "application/pdf")})
+        assert r.status_code == 200, r.text
+        cuerpo = r.json()
+        assert cuerpo["estado"] == "subido" and cuerpo["titulo"] is None
+        assert pendientes == [cuerpo["archivo_id"]]
+
+        monkeypatch.undo()
+        ingesta.ingerir_en_segundo_plano(cuerpo["archivo_id"])
+        db.expire_all()
+        arc = db.get(Archivo, cuerpo["archivo_id"])
+        art = db.get(Articulo, cuerpo["articulo_id"])
+        assert arc.estado == EstadoArchivo.extraido
+        assert art.titulo.startswith("A study of automated gap detection")
+        assert art.doi.startswith("10.5555/ingesta.")
+        # El texto queda para la indexacion.
+        assert cache_extraccion.cache.buscar(arc.hash_sha256) is not None
+
+    def test_un_doi_repetido_va_al_articulo_que_ya_lo_tenia(
+            self, db, cliente, proyecto_vacio):
+        from app.models.archivo import Archivo
+        from app.models.articulo import Articulo
+
+        doi = "10.5555/repetido.%s" % uuid.uuid4().hex[:8]
+        previo = str(uuid.uuid4())
+        db.add(Articulo(id=previo, proyecto_id=proyecto_vacio, titulo="previo", doi=doi))
+        db.commit()
+
+        r = cliente.post("/proyectos/%s/archivos" % proyecto_vacio,
+                         files={"pdf": ("otro.pdf", _pdf_con_doi(doi), "application/pdf")})
+        assert r.status_code == 200, r.text
+        db.expire_all()
+        # TestClient ejecuta las tareas de fondo antes de devolver la respuesta.
+        assert db.get(Archivo, r.json()["archivo_id"]).articulo_id == previo
+        assert db.get(Articulo, r.json()["articulo_id"]) is None
+
+    def test_un_pdf_demasiado_grande_se_rechaza(self, cliente, proyecto_vacio, monkeypatch):
+        from app.services import almacenamiento
+
+        monkeypatch.setattr(almacenamiento, "MAX_SUBIDA_BYTES", 256)
+        r = cliente.post("/proyectos/%s/archivos" % proyecto_vacio,
+                         files={"pdf": ("grande.pdf", _pdf_con_doi("10.5555/grande"),
+                                        "application/pdf")})
+        assert r.status_code == 413
+
+    def test_un_duplicado_no_deja_copia_en_el_disco(
+            self, db, cliente, proyecto_vacio, monkeypatch):
+        from app.models.archivo import Archivo
+        from app.services import almacenamiento
+
+        monkeypatch.setattr(ingesta, "ingerir_en_segundo_plano", lambda _id: None)
+        datos = _pdf_con_doi("10.5555/dup.%s" % uuid.uuid4().hex[:8])
+        url = "/proyectos/%s/archivos" % proyecto_vacio
+        primero = cliente.post(url, files={"pdf": ("a.pdf", datos, "application/pdf")}).json()
+        segundo = cliente.post(url, files={"pdf": ("b.pdf", datos, "application/pdf")}).json()
+        assert segundo["archivo_id"] == primero["archivo_id"]
+
+        arc = db.get(Archivo, primero["archivo_id"])
+        carpeta = os.path.dirname(almacenamiento.ruta_local(arc.ruta))
+        assert os.listdir(carpeta).count(os.path.basename(arc.ruta)) == 1
+        assert os.listdir(os.path.join(almacenamiento._raiz(), "_subidas")) == []
+
+    def test_si_el_alta_falla_no_queda_el_pdf(
+            self, db, cliente, proyecto_vacio, usuario_prueba, monkeypatch):
+        from app.models.archivo import Archivo
+        from app.routers import archivos
+        from app.services import almacenamiento
+
+        def roto(**kw):
+            raise RuntimeError("la base se cayo")
+
+        monkeypatch.setattr(archivos, "Archivo", roto)
+        carpeta = os.path.join(almacenamiento._raiz(), usuario_prueba["id"])
+        antes = set(os.listdir(carpeta)) if os.path.isdir(carpeta) else set()
+        datos = _pdf_con_doi("10.5555/roto.%s" % uuid.uuid4().hex[:8])
+        with pytest.raises(RuntimeError):
+            cliente.post("/proyectos/%s/archivos" % proyecto_vacio,
+                         files={"pdf": ("roto.pdf", datos, "application/pdf")})
+        assert set(os.listdir(carpeta)) == antes
+        assert db.query(Archivo).filter(Archivo.proyecto_id == proyecto_vacio).count() == 0
+
+
+def test_sin_content_length_la_subida_se_corta_al_pasar_del_maximo(monkeypatch):
+    """Un envio por trozos no se vuelca entero antes de comprobar el tamano."""
+    import asyncio
+
+    from fastapi import HTTPException
+
+    import main
+    from app.services import almacenamiento
+
+    monkeypatch.setattr(almacenamiento, "MAX_SUBIDA_BYTES", 256)
+    trozo = b"x" * (16 * 1024)
+    recibidos = []
+
+    async def receive():
+        recibidos.append(trozo)
+        return {"type": "http.request", "body": trozo, "more_body": len(recibidos) < 64}
+
+    async def app(scope, receive, send):
+        # Como el formulario de Starlette: lee hasta que no hay mas cuerpo.
+        while (await receive()).get("more_body"):
+            pass
+
+    scope = {"type": "http", "method": "POST", "path": "/proyectos/p/archivos",
+             "headers": [(b"transfer-encoding", b"chunked")]}
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(main.LimiteSubidas(app)(scope, receive, None))
+    assert e.value.status_code == 413
+    # 256 B + 64 KB de margen: se corta en el quinto trozo de los 64.
+    assert len(recibidos) == 5
+
+
+@pytest.fixture
+def articulo_con_pdf(db, proyecto_vacio, pdf_articulo):
+    """Un articulo con su PDF, subido pero sin indexar."""
+    from app.models.archivo import Archivo, EstadoArchivo
+    from app.models.articulo import Articulo
+    from app.services.cache_extraccion import huella_archivo
+
+    aid, fid = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add(Articulo(id=aid, proyecto_id=proyecto_vacio, titulo="con pdf"))
+    db.flush()
+    db.add(Archivo(id=fid, proyecto_id=proyecto_vacio, articulo_id=aid, nombre="a.pdf",
+                   ruta=pdf_articulo, hash_sha256=huella_archivo(pdf_articulo),
+                   estado=EstadoArchivo.extraido))
+    db.commit()
+    try:
+        yield aid
+    finally:
+        from app.models.embedding_doc import EmbeddingDoc
+        from app.models.run import Run
+        from app.models.run_item import RunItem
+
+        db.rollback()
+        rids = [r for (r,) in db.query(Run.id).filter(Run.proyecto_id == proyecto_vacio)]
+        if rids:
+            from app.models.rag_log import RagLog
+            from app.models.resultado_brecha import ResultadoBrecha
+
+            items = [i for (i,) in db.query(RunItem.id).filter(RunItem.run_id.in_(rids))]
+            db.query(ResultadoBrecha).filter(ResultadoBrecha.run_item_id.in_(items)).delete(
+                synchronize_session=False)
+            db.query(RagLog).filter(RagLog.run_id.in_(rids)).delete(synchronize_session=False)
+            db.query(RunItem).filter(RunItem.run_id.in_(rids)).delete(synchronize_session=False)
+            db.query(Run).filter(Run.id.in_(rids)).delete(synchronize_session=False)
+        db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == aid).delete()
+        db.query(Archivo).filter(Archivo.id == fid).delete()
+        db.query(Articulo).filter(Articulo.id == aid).delete()
+        db.commit()
+
+
+@pytest.mark.bd
+class TestIngestaEnCola:
+    def test_el_trabajador_indexa_lo_subido_sin_esperar_al_analisis(
+            self, db, articulo_con_pdf):
+        from app.services.ingesta import indexados
+        from trabajador import _indexar_subidos
+
+        assert not indexados(db, [articulo_con_pdf])
+        # Se toma el mas antiguo primero: puede haber otros de pruebas previas.
+        vueltas = 0
+        while _indexar_subidos(db):
+            vueltas += 1
+            assert vueltas < 50
+        assert vueltas >= 1
+        assert indexados(db, [articulo_con_pdf]) == {articulo_con_pdf}
+
+    def test_lo_ya_indexado_entra_en_la_ejecucion_listo_para_analizar(
+            self, db, cliente, proyecto_vacio, articulo_con_pdf):
+        from app.models.run_item import EstadoRunItem, RunItem
+
+        ingesta.indexar(db, articulo_con_pdf)
+        r = cliente.post("/proyectos/%s/runs" % proyecto_vacio)
+        assert r.status_code == 200, r.text
+        item = db.query(RunItem).filter(RunItem.run_id == r.json()["id"]).one()
+        assert item.estado == EstadoRunItem.enriquecido
+
+    def test_sin_indexar_se_ingiere_y_vuelve_a_la_cola_para_el_analisis(
+            self, db, cliente, proyecto_vacio, articulo_con_pdf):
+        from app.models.run_item import EstadoRunItem, RunItem
+        from trabajador import _procesar_uno
+
+        r = cliente.post("/proyectos/%s/runs" % proyecto_vacio)
+        rid = r.json()["id"]
+        item = db.query(RunItem).filter(RunItem.run_id == rid).one()
+        assert item.estado == EstadoRunItem.pendiente
+
+        assert _procesar_uno(db) is True
+        db.expire_all()
+        item = db.get(RunItem, item.id)
+        assert item.estado == EstadoRunItem.enriquecido
+        # Terminar la ingesta no gasta intentos, ni deja el item tomado.
+        assert item.intentos == 0 and item.tomado_en is None
+
+        assert _procesar_uno(db) is True
+        db.expire_all()
+        assert db.get(RunItem, item.id).estado == EstadoRunItem.analizado
+
+    def test_un_pdf_que_falla_no_bloquea_a_los_siguientes(
+            self, db, proyecto_vacio, articulo_con_pdf, monkeypatch):
+        from datetime import timedelta
+
+        from app.models.archivo import Archivo, EstadoArchivo
+        from app.models.articulo import Articulo
+        from app.services import embedding_service
+        from app.services.ingesta import indexados
+
+        # Un PDF que falla al indexar, subido antes que el bueno.
+        malo, fmalo = str(uuid.uuid4()), str(uuid.uuid4())
+        db.add(Articulo(id=malo, proyecto_id=proyecto_vacio, titulo="roto"))
+        db.flush()
+        bueno = db.query(Archivo).filter(Archivo.articulo_id == articulo_con_pdf).one()
+        db.add(Archivo(id=fmalo, proyecto_id=proyecto_vacio, articulo_id=malo,
+                       nombre="roto.pdf", ruta=bueno.ruta, hash_sha256="0" * 64,
+                       estado=EstadoArchivo.extraido,
+                       creado_en=bueno.creado_en - timedelta(days=365)))
+        db.commit()
+        indexar = embedding_service.index_articulo
+
+        def index_articulo(db, articulo_id, *a, **k):
+            if articulo_id == malo:
+                raise RuntimeError("PDF ilegible")
+            return indexar(db, articulo_id, *a, **k)
+
+        monkeypatch.setattr(embedding_service, "index_articulo", index_articulo)
+        try:
+            assert ingesta.indexar_siguiente(db) is True
+            db.expire_all()
+            arc = db.get(Archivo, fmalo)
+            assert arc.intentos_indexar == 1 and arc.reintentar_en is not None
+            vueltas = 0
+            while ingesta.indexar_siguiente(db):
+                vueltas += 1
+                assert vueltas < 50
+            assert indexados(db, [articulo_con_pdf, malo]) == {articulo_con_pdf}
+
+            # Pasada la espera se reintenta; al tercer fallo queda en fallido.
+            for _ in range(ingesta.INTENTOS_INDEXAR - 1):
+                db.get(Archivo, fmalo).reintentar_en = None
+                db.commit()
+                assert ingesta.indexar_siguiente(db) is True
+            db.expire_all()
+            assert db.get(Archivo, fmalo).estado == EstadoArchivo.fallido
+            assert ingesta.indexar_siguiente(db) is False
+        finally:
+            db.rollback()
+            db.query(Archivo).filter(Archivo.id == fmalo).delete()
+            db.query(Articulo).filter(Articulo.id == malo).delete()
+            db.commit()
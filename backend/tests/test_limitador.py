@@ -83,6 +83,14 @@ class TestLimitador:
         assert time.monotonic() - inicio < 1.0
         assert lim.usadas() == 10
 
+    def test_liberar_devuelve_el_hueco(self):
+        lim = L.Limitador(por_minuto=10)
+        lim.adquirir(10)
+        lim.liberar(4)
+        assert lim.usadas() == 6
+        lim.liberar(50)
+        assert lim.usadas() == 0
+
     def test_la_ventana_se_purga_con_el_tiempo(self, reloj):
         lim = L.Limitador(por_minuto=5)
         lim.adquirir(5)
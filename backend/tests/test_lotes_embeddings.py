@@ -0,0 +1,116 @@
+# tests/test_lotes_embeddings.py
+"""Lotes de embeddings a la medida del texto, la latencia y la cuota."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import embedding_service as E
+from app.services import limitador as L
+from app.services import lotes_embeddings as B
+from app.services import registro_api
+
+
+def _pend(n, largo=10):
+    return [("h%d" % i, "%d " % i + "x" * largo) for i in range(n)]
+
+
+def _lotes(reparto):
+    salida = []
+    while (lote := reparto.siguiente()) is not None:
+        salida.append(len(lote))
+    return salida
+
+
+class TestReparto:
+    def test_llena_hasta_el_presupuesto_de_bytes(self):
+        dim = B.Dimensionador(maximo=100, presupuesto=1000)
+        r = B.Reparto(_pend(10, largo=300), dim, L.Limitador(10_000))
+        assert _lotes(r) == [3, 3, 3, 1]
+
+    def test_un_texto_mayor_que_el_presupuesto_va_solo(self):
+        dim = B.Dimensionador(maximo=100, presupuesto=100)
+        r = B.Reparto(_pend(3, largo=500), dim, L.Limitador(10_000))
+        assert _lotes(r) == [1, 1, 1]
+
+    def test_no_toma_mas_de_lo_que_cabe_en_la_ventana(self):
+        lim = L.Limitador(20)
+        lim.adquirir(14)
+        r = B.Reparto(_pend(40), B.Dimensionador(), lim, en_vuelo=2)
+        assert r.siguiente() and len(r.siguiente()) == 3
+
+    def test_respeta_el_techo_y_se_cierra(self):
+        r = B.Reparto(_pend(40), B.Dimensionador(), L.Limitador(10_000), techo=5)
+        assert len(r.siguiente()) == 5
+        r.cerrar()
+        assert r.siguiente() is None
+
+
+class TestDimensionador:
+    def test_crece_si_va_rapido_y_lleno_y_encoge_si_va_lento(self):
+        dim = B.Dimensionador(maximo=40, objetivo=1.0)
+        dim.observar(32, 0.1)
+        assert dim.textos == 40
+        dim.observar(10, 0.1)          # no fue lleno: no dice nada
+        assert dim.textos == 40
+        dim.observar(40, 3.0)
+        assert dim.textos == 20
+
+    def test_un_rechazo_baja_los_dos_topes(self):
+        dim = B.Dimensionador(presupuesto=64000)
+        dim.rechazado(32, 80000)
+        assert (dim.textos, dim.bytes) == (16, 40000)
+
+    def test_el_tope_de_bytes_se_recupera_tras_un_rechazo(self):
+        dim = B.Dimensionador(presupuesto=64000, objetivo=1.0)
+        dim.rechazado(32, 80000)
+        dim.observar(16, 0.1, bytes_=1000)   # lote pequeno: no dice nada
+        assert dim.bytes == 40000
+        for _ in range(3):
+            dim.observar(16, 0.1, bytes_=dim.bytes)
+        assert dim.bytes == 64000
+
+
+class ErrorFalso(Exception):
+    def __init__(self, mensaje, code):
+        super().__init__(mensaje)
+        self.code = code
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    """Rechaza por grande cualquier lote de mas de tres textos."""
+    lotes = []
+
+    def embed_content(model, contents, config):
+        lotes.append(len(contents))
+        if len(contents) > 3:
+            raise ErrorFalso("400 INVALID_ARGUMENT. Request payload size exceeds the limit", 400)
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[float(len(t))])
+                                           for t in contents])
+
+    monkeypatch.setattr(E, "_get_client",
+                        lambda: SimpleNamespace(models=SimpleNamespace(embed_content=embed_content)))
+    monkeypatch.setattr(E, "limitador_embeddings", L.Limitador(10_000))
+    monkeypatch.setattr(E, "EMBED_CONCURRENCIA", 1)
+    monkeypatch.setattr(B, "dimensionador", B.Dimensionador(maximo=16))
+    monkeypatch.setattr(registro_api, "REGISTRO_ACTIVO", False)
+    return lotes
+
+
+def test_parte_el_lote_que_el_servicio_rechaza_por_grande(cliente):
+    pend = _pend(16)
+    salida = E._pedir_embeddings(pend)
+    assert list(salida) == [h for h, _t in pend]
+    assert all(v == [float(len(t))] for (_h, t), v in zip(pend, salida.values()))
+    assert cliente[:4] == [16, 8, 4, 2]
+    assert B.dimensionador.textos <= 8
+    # Los lotes rechazados devuelven sus permisos: solo cuentan los servidos.
+    assert E.limitador_embeddings.usadas() == 16
+
+
+def test_otros_errores_no_se_parten(cliente, monkeypatch):
+    monkeypatch.setattr(B, "es_demasiado_grande", lambda exc: False)
+    with pytest.raises(ErrorFalso):
+        E._pedir_embeddings(_pend(8))
+    assert cliente == [8]
@@ -0,0 +1,191 @@
+# tests/test_migracion_embeddings.py
+"""Migrar un proyecto a otra version de embeddings sin cortar la busqueda."""
+
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.bd
+
+# Otra dimension del embebedor simulado: en modo mock es lo unico que puede
+# cambiar de version.
+DESTINO = "mock/384"
+
+
+@pytest.fixture
+def proyecto(db, usuario_prueba, proyecto_indexado):
+    """Un proyecto propio con el PDF del pertinente, indexado en la version actual."""
+    from app.models.archivo import Archivo, EstadoArchivo
+    from app.models.articulo import Articulo
+    from app.models.proyecto import Proyecto
+    from app.services.embedding_service import index_articulo
+
+    origen = (db.query(Archivo)
+              .filter(Archivo.articulo_id == proyecto_indexado["pertinente"]).one())
+    pid, aid = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add(Proyecto(id=pid, usuario_id=usuario_prueba["id"], tema_principal="migracion",
+                    objetivo="migracion", metodologia_txt="DSRM", sector_txt="otro",
+                    n_articulos_objetivo=1, estado_arte_generado=False))
+    db.flush()
+    db.add(Articulo(id=aid, proyecto_id=pid, titulo="migracion"))
+    db.flush()
+    db.add(Archivo(id=str(uuid.uuid4()), proyecto_id=pid, articulo_id=aid,
+                   nombre="migracion.pdf", ruta=origen.ruta,
+                   hash_sha256=uuid.uuid4().hex * 2, bytes=0,
+                   estado=EstadoArchivo.extraido))
+    db.commit()
+    index_articulo(db, aid, max_chars=900, overlap=150)
+    try:
+        yield {"proyecto_id": pid, "articulo_id": aid}
+    finally:
+        db.rollback()
+        db.query(Proyecto).filter(Proyecto.id == pid).delete()
+        db.commit()
+
+
+def _ancho(db, pid):
+    from app.services import cache_vectores
+
+    return cache_vectores.cache.obtener(db, pid).matriz.shape
+
+
+def test_busca_en_la_anterior_hasta_completar_y_luego_cambia(db, proyecto):
+    from app.models.articulo import Articulo
+    from app.models.embedding_doc import EmbeddingDoc
+    from app.models.vector_migrado import VectorMigrado
+    from app.services import migracion_embeddings as M
+    from app.services.embedding_service import (
+        embed_query, firma_indice, version_actual, version_de)
+
+    pid, aid = proyecto["proyecto_id"], proyecto["articulo_id"]
+    anterior = version_actual()
+    n, ancho = _ancho(db, pid)
+    assert version_de(db, pid) == anterior
+
+    M.iniciar(db, pid, DESTINO)
+    assert M.avanzar(db, pid, lote=2) == 2
+    # A medias: se sigue buscando con los vectores de siempre.
+    assert version_de(db, pid) == anterior and _ancho(db, pid) == (n, ancho)
+    assert embed_query(db, [aid], "evaluacion de modelos", top_k=3)
+    assert M.estado(db, pid)["pendientes"] == n - 2
+
+    while M.avanzar(db, pid, lote=8):
+        pass
+    e = M.estado(db, pid)
+    assert (e["activa"], e["destino"], e["pendientes"]) == (DESTINO, None, 0)
+    filas = db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == aid).all()
+    assert {(f.version, f.dimension, len(f.vector)) for f in filas} == {(DESTINO, 384, 384 * 4)}
+    assert db.query(VectorMigrado).count() == 0
+    firma = db.query(Articulo.firma_indice).filter(Articulo.id == aid).scalar()
+    assert firma.startswith(DESTINO + "/")
+    assert firma == firma_indice(900, 150, DESTINO)
+
+    assert _ancho(db, pid) == (n, 384)
+    resultados = embed_query(db, [aid], "evaluacion de modelos", top_k=3)
+    assert len(resultados) == 3 and all(-1 <= s <= 1 for _i, s, _t in resultados)
+
+
+def test_sin_cuota_reservada_no_embebe(db, proyecto, monkeypatch):
+    from app.models.vector_migrado import VectorMigrado
+    from app.services import migracion_embeddings as M
+
+    pid = proyecto["proyecto_id"]
+    monkeypatch.setattr(M, "MIGRACION_CUOTA_DIA", 0.0)
+    M.iniciar(db, pid, DESTINO)
+    assert M.avanzar(db, pid) == 0
+    assert db.query(VectorMigrado).count() == 0
+    assert M.estado(db, pid)["destino"] == DESTINO
+
+
+def test_un_fragmento_sin_vector_no_detiene_la_migracion(db, proyecto, monkeypatch):
+    from app.models.embedding_doc import EmbeddingDoc
+    from app.models.termino_fragmento import TerminoFragmento
+    from app.models.vector_migrado import VectorMigrado
+    from app.services import migracion_embeddings as M
+
+    pid, aid = proyecto["proyecto_id"], proyecto["articulo_id"]
+    n = db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == aid).count()
+    vacio = (db.query(EmbeddingDoc.id, EmbeddingDoc.texto)
+             .filter(EmbeddingDoc.articulo_id == aid).order_by(EmbeddingDoc.id).first())
+    original, pedidos = M._embed_texts, []
+
+    def sin_uno(textos, **kw):
+        pedidos.extend(textos)
+        vectores = original(textos, **kw)
+        return [[] if t == vacio.texto else v for t, v in zip(textos, vectores)]
+
+    monkeypatch.setattr(M, "_embed_texts", sin_uno)
+    M.iniciar(db, pid, DESTINO)
+    for _ in range(n + 2):
+        if not M.avanzar(db, pid, lote=8):
+            break
+    e = M.estado(db, pid)
+    assert (e["activa"], e["destino"], e["pendientes"]) == (DESTINO, None, 0)
+    # Cada texto se pidio una sola vez, tambien el que no dio vector.
+    assert len(pedidos) == n
+    assert db.get(EmbeddingDoc, vacio.id) is None
+    assert db.query(EmbeddingDoc).filter(EmbeddingDoc.articulo_id == aid).count() == n - 1
+    assert db.query(TerminoFragmento).filter(
+        TerminoFragmento.embedding_id == vacio.id).count() == 0
+    assert db.query(VectorMigrado).count() == 0
+
+
+def test_la_busqueda_ignora_fragmentos_de_otra_version(db, proyecto):
+    from app.models.embedding_doc import EmbeddingDoc
+    from app.services.cache_vectores import registrar_cambio
+
+    pid, aid = proyecto["proyecto_id"], proyecto["articulo_id"]
+    n, _ancho_ = _ancho(db, pid)
+    uno = (db.query(EmbeddingDoc.id).filter(EmbeddingDoc.articulo_id == aid)
+           .limit(1).scalar())
+    db.query(EmbeddingDoc).filter(EmbeddingDoc.id == uno).update(
+        {EmbeddingDoc.version: "otro-modelo/10"}, synchronize_session=False)
+    registrar_cambio(db, pid)
+    db.commit()
+    assert _ancho(db, pid)[0] == n - 1
+
+
+def test_un_articulo_indexado_durante_el_cambio_queda_en_la_nueva(db, proyecto, monkeypatch):
+    """El cambio se confirma mientras el articulo se embebe: sus filas no
+    pueden quedarse en la version anterior, que ya nadie busca ni migra."""
+    from app.database import SessionLocal
+    from app.models.archivo import Archivo, EstadoArchivo
+    from app.models.articulo import Articulo
+    from app.models.embedding_doc import EmbeddingDoc
+    from app.models.proyecto import Proyecto
+    from app.services import embedding_service as E
+
+    pid = proyecto["proyecto_id"]
+    ruta = (db.query(Archivo.ruta)
+            .filter(Archivo.articulo_id == proyecto["articulo_id"]).scalar())
+    aid = str(uuid.uuid4())
+    db.add(Articulo(id=aid, proyecto_id=pid, titulo="durante el cambio"))
+    db.flush()
+    db.add(Archivo(id=str(uuid.uuid4()), proyecto_id=pid, articulo_id=aid,
+                   nombre="durante.pdf", ruta=ruta, hash_sha256=uuid.uuid4().hex * 2,
+                   bytes=0, estado=EstadoArchivo.extraido))
+    db.commit()
+
+    embeber, versiones = E._embed_texts, []
+
+    def _embed_texts(textos, batch=None, version=None):
+        versiones.append(version)
+        if len(versiones) == 1:
+            # Otro proceso completa la migracion (cambiar) en este momento.
+            otra = SessionLocal()
+            try:
+                otra.query(Proyecto).filter(Proyecto.id == pid).update(
+                    {Proyecto.version_embeddings: DESTINO}, synchronize_session=False)
+                otra.commit()
+            finally:
+                otra.close()
+        return embeber(textos, batch, version)
+
+    monkeypatch.setattr(E, "_embed_texts", _embed_texts)
+    n = E.index_articulo(db, aid, max_chars=900, overlap=150)
+
+    assert n and len(versiones) == 2 and versiones[1] == DESTINO != versiones[0]
+    filas = db.query(EmbeddingDoc.version).filter(EmbeddingDoc.articulo_id == aid).all()
+    assert {v for (v,) in filas} == {DESTINO}
+    assert (db.query(Articulo.firma_indice).filter(Articulo.id == aid).scalar()
+            .startswith(DESTINO + "/"))
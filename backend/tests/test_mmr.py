@@ -0,0 +1,87 @@
+# tests/test_mmr.py
+"""MMR vectorizado: elige exactamente lo mismo que el bucle original."""
+
+import numpy as np
+import pytest
+
+from app.services.document_structure import SECCIONES_SUSTANTIVAS
+from app.services.embedding_service import _cos, seleccionar_mmr
+
+SECCIONES = sorted(SECCIONES_SUSTANTIVAS) + ["introduccion", "otro"]
+
+
+def _referencia(relevancia, vectores, secciones, k, lambda_diversidad, min_sustantivos):
+    """El algoritmo tal como estaba en `recuperar_contexto`."""
+    candidatos = [{"i": i, "score": float(relevancia[i]), "vector": vectores[i],
+                   "seccion": secciones[i]} for i in range(len(relevancia))]
+    candidatos.sort(key=lambda c: c["score"], reverse=True)
+    seleccion, restantes = [], list(candidatos)
+
+    def _elegir(pool):
+        mejor, mejor_val = None, None
+        for c in pool:
+            if not seleccion:
+                val = c["score"]
+            else:
+                redundancia = max(_cos(c["vector"], s["vector"]) for s in seleccion)
+                val = lambda_diversidad * c["score"] - (1 - lambda_diversidad) * redundancia
+            if mejor_val is None or val > mejor_val:
+                mejor, mejor_val = c, val
+        return mejor
+
+    disponibles = {c["seccion"] for c in restantes if c["seccion"] in SECCIONES_SUSTANTIVAS}
+    for seccion in sorted(disponibles):
+        if len(seleccion) >= min(min_sustantivos, k):
+            break
+        elegido = _elegir([c for c in restantes if c["seccion"] == seccion])
+        if elegido is not None:
+            seleccion.append(elegido)
+            restantes.remove(elegido)
+    while len(seleccion) < k and restantes:
+        elegido = _elegir(restantes)
+        if elegido is None:
+            break
+        seleccion.append(elegido)
+        restantes.remove(elegido)
+    return [c["i"] for c in seleccion]
+
+
+def _caso(semilla, n, dim=32):
+    rng = np.random.default_rng(semilla)
+    vectores = rng.standard_normal((n, dim))
+    vectores /= np.linalg.norm(vectores, axis=1)[:, None]
+    consulta = rng.standard_normal(dim)
+    relevancia = vectores @ (consulta / np.linalg.norm(consulta))
+    secciones = [SECCIONES[j] for j in rng.integers(0, len(SECCIONES), n)]
+    return relevancia, vectores, secciones
+
+
+class TestEquivalencia:
+    @pytest.mark.parametrize("semilla", range(20))
+    @pytest.mark.parametrize("k,min_sus", [(8, 3), (4, 6), (12, 0)])
+    def test_elige_lo_mismo_que_el_bucle(self, semilla, k, min_sus):
+        rel, vec, sec = _caso(semilla, n=5 + 3 * semilla)
+        assert (seleccionar_mmr(rel, vec, sec, k=k, min_sustantivos=min_sus)
+                == _referencia(rel, vec, sec, k, 0.7, min_sus))
+
+    def test_desempata_como_el_bucle(self):
+        """Con relevancias iguales gana el que aparece antes."""
+        vec = np.eye(4)
+        rel = np.array([0.5, 0.5, 0.5, 0.5])
+        sec = ["otro"] * 4
+        assert seleccionar_mmr(rel, vec, sec, k=3) == _referencia(rel, vec, sec, 3, 0.7, 3)
+
+    def test_fragmentos_repetidos(self):
+        vec = np.repeat(np.eye(3), 2, axis=0)
+        rel = np.array([0.9, 0.9, 0.5, 0.5, 0.1, 0.1])
+        sec = ["metodo", "metodo", "resultados", "otro", "otro", "discusion"]
+        assert seleccionar_mmr(rel, vec, sec, k=4) == _referencia(rel, vec, sec, 4, 0.7, 3)
+
+
+class TestLimites:
+    def test_sin_candidatos(self):
+        assert seleccionar_mmr(np.empty(0), np.empty((0, 4)), [], k=8) == []
+
+    def test_pide_mas_de_los_que_hay(self):
+        rel, vec, sec = _caso(1, n=3)
+        assert sorted(seleccionar_mmr(rel, vec, sec, k=8)) == [0, 1, 2]
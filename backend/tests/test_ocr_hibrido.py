@@ -0,0 +1,138 @@
+# tests/test_ocr_hibrido.py
+"""OCR solo de las paginas escaneadas, a poca resolucion si basta.
+
+Tesseract no tiene por que estar instalado donde corren las pruebas: aqui se
+sustituye `image_to_string` y se comprueba que paginas se le mandan y a que
+resolucion.
+"""
+
+import uuid
+
+import fitz
+import pytest
+
+from app.services import ocr_fallback
+from app.utils import extraccion_paralela, text_extractor
+
+PROSA = ("The results of the study show that the method is robust and that it "
+         "can be applied to the analysis of the literature in a reproducible way. ") * 3
+NATIVO = "Texto nativo de la pagina %d. " * 8
+
+
+@pytest.fixture(scope="module")
+def pdf_mixto(tmp_path_factory) -> str:
+    """Paginas 0 y 3 con texto; 1 y 2 solo imagen, como un escaneo."""
+    ruta = str(tmp_path_factory.mktemp("pdfs") / "mixto.pdf")
+    doc = fitz.open()
+    for i in range(4):
+        pag = doc.new_page()
+        if i in (0, 3):
+            pag.insert_textbox(fitz.Rect(55, 55, 545, 780), NATIVO.replace("%d", str(i)),
+                               fontsize=9, fontname="helv")
+        else:
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), False)
+            pix.set_rect(pix.irect, (200 + i, 200, 200))
+            pag.insert_image(fitz.Rect(55, 55, 545, 780), pixmap=pix)
+    doc.save(ruta)
+    doc.close()
+    return ruta
+
+
+@pytest.fixture
+def tesseract(monkeypatch):
+    """Anota el ancho de cada imagen; a baja resolucion devuelve ruido."""
+    anchos = []
+
+    def leer(img, lang=None):
+        anchos.append(img.width)
+        return PROSA if img.width > 1500 else "xq zzv lmn " * 10
+
+    monkeypatch.setattr(ocr_fallback, "ocr_disponible", lambda: (True, ""))
+    monkeypatch.setattr(ocr_fallback.pytesseract, "image_to_string", leer)
+    monkeypatch.setattr(ocr_fallback, "OCR_CACHE_BD", False)
+    monkeypatch.setattr(extraccion_paralela, "EXTRACCION_PROCESOS", 1)
+    return anchos
+
+
+class TestPaginas:
+    def test_solo_las_paginas_sin_texto_van_al_ocr(self):
+        assert ocr_fallback.paginas_sin_texto(["texto " * 20, "", " 3 \n", "mas " * 20]) == [1, 2]
+
+    def test_conserva_el_texto_nativo_y_el_orden(self, pdf_mixto, tesseract):
+        txt = ocr_fallback.ocr_pdf_to_text(pdf_mixto)
+        # Dos paginas, cada una a 150 DPI y otra vez a 300.
+        assert len(tesseract) == 4
+        assert txt.index("pagina 0") < txt.index("The results") < txt.index("pagina 3")
+        assert txt.count("The results of the study") == 2 * 3
+
+    def test_corta_en_max_chars(self, pdf_mixto, tesseract):
+        txt = ocr_fallback.ocr_pdf_to_text(pdf_mixto, max_chars=300)
+        assert len(txt) <= 300 and len(tesseract) == 2
+
+
+class TestResolucion:
+    def test_repite_a_300_si_no_se_lee_bien(self, pdf_mixto, tesseract):
+        assert ocr_fallback._ocr_pagina(pdf_mixto, 1, "spa+eng", 150, 300) == PROSA
+        assert tesseract[0] < 1500 < tesseract[1]
+
+    def test_si_se_lee_bien_no_repite(self, pdf_mixto, tesseract):
+        assert ocr_fallback._ocr_pagina(pdf_mixto, 1, "spa+eng", 200, 300) == PROSA
+        assert len(tesseract) == 1
+
+
+class TestDisparo:
+    @pytest.fixture
+    def ocr(self, monkeypatch):
+        llamadas = []
+        monkeypatch.setattr(ocr_fallback, "ocr_pdf_to_text",
+                            lambda ruta, **kw: llamadas.append(ruta) or PROSA * 20)
+        return llamadas
+
+    def test_un_pdf_mixto_pasa_por_el_ocr(self, ocr):
+        portada = "Repositorio institucional. Descargado el 3 de marzo. " * 10
+        txt, metodo = text_extractor._completar_bruto("x.pdf", [portada, "", "", ""], 120_000)
+        assert metodo == "ocr" and ocr == ["x.pdf"]
+
+    def test_un_pdf_digital_no(self, ocr):
+        txt, metodo = text_extractor._completar_bruto("x.pdf", [NATIVO] * 4, 120_000)
+        assert metodo == "pymupdf" and ocr == []
+
+
+def test_la_cache_se_consulta_y_escribe_una_vez_por_documento(pdf_mixto, tesseract,
+                                                               monkeypatch):
+    """Las huellas vuelven al proceso que pide el OCR; el pool no toca la base."""
+    leidas, escritas = [], []
+    monkeypatch.setattr(ocr_fallback, "OCR_CACHE_BD", True)
+    monkeypatch.setattr(ocr_fallback, "_leer", lambda h, lang: leidas.append(h) or {})
+    monkeypatch.setattr(ocr_fallback, "_escribir",
+                        lambda textos, lang, dpi: escritas.append((dict(textos), dpi)))
+    ocr_fallback.ocr_pdf_to_text(pdf_mixto)
+    assert len(leidas) == 1 and len(leidas[0]) == 2 and None not in leidas[0]
+    # Se guarda el texto final, el de la segunda pasada, bajo la huella a 150.
+    assert escritas == [({h: PROSA for h in leidas[0]}, 150)]
+
+
+@pytest.mark.bd
+def test_una_pagina_ya_leida_no_vuelve_a_tesseract(pdf_mixto, tesseract, monkeypatch):
+    monkeypatch.setattr(ocr_fallback, "OCR_CACHE_BD", True)
+    # Un idioma que no existe: ninguna fila previa de la cache coincide.
+    lang = "prueba-%s" % uuid.uuid4().hex[:8]
+    primera = ocr_fallback.ocr_pdf_to_text(pdf_mixto, lang=lang)
+    llamadas = len(tesseract)
+    assert ocr_fallback.ocr_pdf_to_text(pdf_mixto, lang=lang) == primera
+    assert primera.count("The results of the study") == 2 * 3
+    assert len(tesseract) == llamadas == 4
+
+
+@pytest.mark.bd
+def test_una_pagina_que_falla_no_se_guarda(pdf_mixto, tesseract, monkeypatch):
+    monkeypatch.setattr(ocr_fallback, "OCR_CACHE_BD", True)
+    lang = "prueba-%s" % uuid.uuid4().hex[:8]
+
+    def roto(img, lang=None):
+        raise RuntimeError("tesseract se cayo")
+
+    monkeypatch.setattr(ocr_fallback.pytesseract, "image_to_string", roto)
+    ocr_fallback.ocr_pdf_to_text(pdf_mixto, lang=lang)
+    huellas = ocr_fallback._huellas(pdf_mixto, [1, 2], 150)
+    assert ocr_fallback._leer(huellas, lang) == {}
@@ -0,0 +1,91 @@
+# tests/test_recuperar_contextos.py
+"""Recuperacion de varios articulos a la vez: lo mismo que de uno en uno."""
+
+import pytest
+
+from app.services import embedding_service as E
+from app.services import precarga_contextos as P
+
+CLAVES = ("pertinente", "duplicado", "ajeno")
+
+
+@pytest.mark.bd
+class TestLote:
+    @pytest.mark.parametrize("hibrido", [False, True])
+    def test_igual_que_de_uno_en_uno(self, db, proyecto_indexado, contexto_propio, hibrido):
+        arts = [proyecto_indexado[c] for c in CLAVES]
+        lote = E.recuperar_contextos(db, arts + ["inexistente-0000"], contexto_propio,
+                                     k=4, hibrido=hibrido)
+        for a in arts:
+            assert lote[a] == E.recuperar_contexto(db, a, contexto_propio, k=4,
+                                                   hibrido=hibrido)
+            assert lote[a]
+        assert lote["inexistente-0000"] == []
+
+    def test_embebe_la_consulta_una_vez(self, db, proyecto_indexado, contexto_propio,
+                                        monkeypatch):
+        llamadas = []
+        original = E._embed_consulta
+        monkeypatch.setattr(E, "_embed_consulta",
+                            lambda q, **kw: llamadas.append(q) or original(q, **kw))
+        E.recuperar_contextos(db, [proyecto_indexado[c] for c in CLAVES],
+                              contexto_propio, k=4)
+        assert len(llamadas) == 1
+
+
+@pytest.mark.bd
+class TestPrecarga:
+    @pytest.fixture
+    def lotes(self, monkeypatch, proyecto_indexado):
+        """Cuenta las recuperaciones y hace de los otros dos los siguientes."""
+        pedidos = []
+        original = P.recuperar_contextos
+
+        def contar(db, articulos, *a, **kw):
+            pedidos.append(list(articulos))
+            return original(db, articulos, *a, **kw)
+
+        monkeypatch.setattr(P, "recuperar_contextos", contar)
+        monkeypatch.setattr(P, "_siguientes", lambda db, run_id, aid, n: [
+            proyecto_indexado[c] for c in CLAVES if proyecto_indexado[c] != aid][:n])
+        monkeypatch.setattr(P, "_precargados", type(P._precargados)())
+        return pedidos
+
+    def test_los_siguientes_salen_de_lo_precargado(self, db, proyecto_indexado,
+                                                   contexto_propio, lotes):
+        pid = proyecto_indexado["proyecto_id"]
+        for c in CLAVES:
+            r = P.recuperar(db, "run-prueba", pid, proyecto_indexado[c], contexto_propio, k=4)
+            assert r == E.recuperar_contexto(db, proyecto_indexado[c], contexto_propio, k=4)
+        assert len(lotes) == 1 and len(lotes[0]) == 3
+
+    def test_un_cambio_en_el_proyecto_la_descarta(self, db, proyecto_indexado,
+                                                  contexto_propio, lotes):
+        from app.services import cache_vectores
+
+        pid = proyecto_indexado["proyecto_id"]
+        P.recuperar(db, "run-prueba", pid, proyecto_indexado["pertinente"],
+                    contexto_propio, k=4)
+        cache_vectores.registrar_cambio(db, pid)
+        db.commit()
+        P.recuperar(db, "run-prueba", pid, proyecto_indexado["ajeno"],
+                    contexto_propio, k=4)
+        assert len(lotes) == 2
+
+    def test_un_articulo_no_precargado_no_descarta_los_demas(
+            self, db, proyecto_indexado, contexto_propio, lotes, monkeypatch):
+        """Otro trabajador tomo el siguiente: lo precargado para el resto sigue."""
+        pid = proyecto_indexado["proyecto_id"]
+        monkeypatch.setattr(P, "PRECARGA_ITEMS", 2)
+        P.recuperar(db, "run-prueba", pid, proyecto_indexado["pertinente"],
+                    contexto_propio, k=4)
+        assert lotes[-1][1] == proyecto_indexado["duplicado"]
+        # El ajeno no estaba precargado: se recupera con el siguiente que falta.
+        P.recuperar(db, "run-prueba", pid, proyecto_indexado["ajeno"],
+                    contexto_propio, k=4)
+        assert proyecto_indexado["duplicado"] not in lotes[-1]
+        r = P.recuperar(db, "run-prueba", pid, proyecto_indexado["duplicado"],
+                        contexto_propio, k=4)
+        assert len(lotes) == 2
+        assert r == E.recuperar_contexto(db, proyecto_indexado["duplicado"],
+                                         contexto_propio, k=4)
@@ -69,6 +69,17 @@ class TestAnotar:
         fila = db.query(LlamadaAPI).filter(LlamadaAPI.motivo == marca).first()
         assert fila.unidades == 32
 
+    def test_anota_el_tamano_del_lote(self, db, limpiar):
+        from app.models.llamada_api import LlamadaAPI
+
+        marca = "lote-%s" % uuid.uuid4()
+        limpiar.append(marca)
+        R.anotar(R.OP_EMBEDDING, unidades=12, lote_bytes=21000, latencia_ms=340,
+                 motivo=marca)
+        db.commit()
+        fila = db.query(LlamadaAPI).filter(LlamadaAPI.motivo == marca).first()
+        assert (fila.lote_bytes, fila.latencia_ms) == (21000, 340)
+
 
 class TestConsumo:
     def test_separa_generaciones_de_embeddings(self, db, limpiar):
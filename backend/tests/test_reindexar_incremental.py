@@ -0,0 +1,105 @@
+# tests/test_reindexar_incremental.py
+"""Reindexar embebiendo solo los fragmentos que cambian."""
+
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.bd
+
+
+@pytest.fixture
+def articulo(db, usuario_prueba, proyecto_indexado):
+    """Un proyecto propio con el PDF del pertinente, ya indexado."""
+    from app.models.archivo import Archivo, EstadoArchivo
+    from app.models.articulo import Articulo
+    from app.models.proyecto import Proyecto
+    from app.services.embedding_service import index_articulo
+
+    origen = (db.query(Archivo)
+              .filter(Archivo.articulo_id == proyecto_indexado["pertinente"]).one())
+    pid, aid = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add(Proyecto(id=pid, usuario_id=usuario_prueba["id"], tema_principal="incremental",
+                    objetivo="incremental", metodologia_txt="DSRM", sector_txt="otro",
+                    n_articulos_objetivo=1, estado_arte_generado=False))
+    db.flush()
+    db.add(Articulo(id=aid, proyecto_id=pid, titulo="incremental"))
+    db.flush()
+    db.add(Archivo(id=str(uuid.uuid4()), proyecto_id=pid, articulo_id=aid,
+                   nombre="incremental.pdf", ruta=origen.ruta,
+                   hash_sha256=uuid.uuid4().hex * 2, bytes=0,
+                   estado=EstadoArchivo.extraido))
+    db.commit()
+    index_articulo(db, aid, max_chars=900, overlap=150)
+    try:
+        yield aid
+    finally:
+        db.rollback()
+        db.query(Proyecto).filter(Proyecto.id == pid).delete()
+        db.commit()
+
+
+def _filas(db, aid):
+    from app.models.embedding_doc import EmbeddingDoc
+
+    return (db.query(EmbeddingDoc.id, EmbeddingDoc.chunk_orden, EmbeddingDoc.texto,
+                     EmbeddingDoc.char_inicio, EmbeddingDoc.char_fin)
+            .filter(EmbeddingDoc.articulo_id == aid)
+            .order_by(EmbeddingDoc.chunk_orden).all())
+
+
+def _contar_embebidos(monkeypatch):
+    from app.services import embedding_service as E
+
+    pedidos = []
+    original = E._embed_texts
+    monkeypatch.setattr(E, "_embed_texts",
+                        lambda textos, *a, **kw: pedidos.extend(textos) or original(textos, *a, **kw))
+    return pedidos
+
+
+def test_sin_cambios_no_toca_nada(db, articulo, monkeypatch):
+    from app.services.embedding_service import reindexar_incremental
+
+    antes = _filas(db, articulo)
+    pedidos = _contar_embebidos(monkeypatch)
+    dif = reindexar_incremental(db, articulo, max_chars=900, overlap=150)
+    assert (dif.conservados, dif.nuevos, dif.borrados) == (len(antes), 0, 0)
+    assert pedidos == [] and _filas(db, articulo) == antes
+
+
+def test_el_simulacro_informa_sin_escribir(db, articulo):
+    from app.services.embedding_service import reindexar_incremental
+
+    antes = _filas(db, articulo)
+    dif = reindexar_incremental(db, articulo, max_chars=900, overlap=100, simular=True)
+    assert dif.conservados + dif.borrados == len(antes)
+    assert dif.nuevos > 0 and dif.textos_a_pedir <= dif.nuevos
+    assert dif.conservados > 0
+    assert _filas(db, articulo) == antes
+
+
+def test_conserva_lo_que_coincide_y_embebe_lo_demas(db, articulo, monkeypatch):
+    from app.models.archivo import Archivo
+    from app.models.termino_fragmento import TerminoFragmento
+    from app.services import embedding_service as E
+
+    antes = {f.texto: f.id for f in _filas(db, articulo)}
+    simulado = E.reindexar_incremental(db, articulo, max_chars=900, overlap=100, simular=True)
+    pedidos = _contar_embebidos(monkeypatch)
+    dif = E.reindexar_incremental(db, articulo, max_chars=900, overlap=100)
+    assert dif == simulado
+    assert len(pedidos) == dif.nuevos
+
+    # Las mismas filas que una indexacion desde cero con estos parametros.
+    arc = db.query(Archivo).filter(Archivo.articulo_id == articulo).one()
+    _texto, esperados = E._fragmentar_archivo(arc, 900, 100)
+    despues = _filas(db, articulo)
+    assert [(f.chunk_orden, f.texto, f.char_inicio, f.char_fin) for f in despues] == \
+           [(i, g.texto, g.inicio, g.fin) for i, g in enumerate(esperados)]
+    assert sum(antes.get(f.texto) == f.id for f in despues) == dif.conservados
+
+    ids = [f.id for f in despues]
+    assert not (db.query(TerminoFragmento)
+                .filter(TerminoFragmento.articulo_id == articulo,
+                        TerminoFragmento.embedding_id.notin_(ids)).count())
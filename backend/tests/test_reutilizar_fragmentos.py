@@ -0,0 +1,177 @@
+# tests/test_reutilizar_fragmentos.py
+"""El mismo PDF en otro proyecto se indexa copiando, sin leerlo ni embeberlo."""
+
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.bd
+
+
+@pytest.fixture
+def otro_proyecto(db, usuario_prueba, proyecto_indexado):
+    """Un segundo proyecto con un articulo cuyo archivo es el del pertinente."""
+    from app.models.archivo import Archivo, EstadoArchivo
+    from app.models.articulo import Articulo
+    from app.models.proyecto import Proyecto
+
+    origen = (db.query(Archivo)
+              .filter(Archivo.articulo_id == proyecto_indexado["pertinente"]).one())
+    pid, aid = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add(Proyecto(id=pid, usuario_id=usuario_prueba["id"], tema_principal="otro",
+                    objetivo="otro", metodologia_txt="DSRM", sector_txt="otro",
+                    n_articulos_objetivo=1, estado_arte_generado=False))
+    db.flush()
+    db.add(Articulo(id=aid, proyecto_id=pid, titulo="copia"))
+    db.flush()
+    db.add(Archivo(id=str(uuid.uuid4()), proyecto_id=pid, articulo_id=aid,
+                   nombre="copia.pdf", ruta=origen.ruta,
+                   hash_sha256=origen.hash_sha256, bytes=0,
+                   estado=EstadoArchivo.extraido))
+    db.commit()
+    try:
+        yield {"proyecto_id": pid, "articulo_id": aid}
+    finally:
+        db.rollback()
+        db.query(Proyecto).filter(Proyecto.id == pid).delete()
+        db.commit()
+
+
+def _sin_leer_ni_embeber(monkeypatch):
+    from app.services import embedding_service as E
+
+    def prohibido(*_a, **_kw):
+        raise AssertionError("no deberia leerse el PDF ni embeberse nada")
+
+    monkeypatch.setattr(E.cache_extraccion, "extraer", prohibido)
+    monkeypatch.setattr(E, "_embed_texts", prohibido)
+
+
+class TestCopia:
+    def test_copia_los_fragmentos_sin_leer_ni_embeber(
+            self, db, proyecto_indexado, otro_proyecto, monkeypatch):
+        from app.models.embedding_doc import EmbeddingDoc
+        from app.services.embedding_service import index_articulo
+
+        _sin_leer_ni_embeber(monkeypatch)
+        n = index_articulo(db, otro_proyecto["articulo_id"])
+
+        def filas(aid):
+            return (db.query(EmbeddingDoc.chunk_orden, EmbeddingDoc.texto,
+                             EmbeddingDoc.vector, EmbeddingDoc.seccion)
+                    .filter(EmbeddingDoc.articulo_id == aid)
+                    .order_by(EmbeddingDoc.chunk_orden).all())
+
+        origen = filas(proyecto_indexado["pertinente"])
+        assert n == len(origen) > 0
+        assert [tuple(f) for f in filas(otro_proyecto["articulo_id"])] == \
+               [tuple(f) for f in origen]
+
+    def test_la_copia_se_recupera_como_un_indexado(
+            self, db, proyecto_indexado, otro_proyecto, contexto_propio):
+        from app.services.embedding_service import index_articulo, recuperar_contexto
+
+        index_articulo(db, otro_proyecto["articulo_id"])
+        r = recuperar_contexto(db, otro_proyecto["articulo_id"], contexto_propio, k=4)
+        assert len(r) == 4
+
+    def test_otra_fragmentacion_no_se_copia(self, db, proyecto_indexado,
+                                            otro_proyecto, monkeypatch):
+        """Con otra firma los fragmentos saldrian distintos: se indexa de verdad."""
+        from app.models.articulo import Articulo
+        from app.services import embedding_service as E
+
+        leidos = []
+        original = E.cache_extraccion.extraer
+        monkeypatch.setattr(E.cache_extraccion, "extraer",
+                            lambda ruta, **kw: leidos.append(ruta) or original(ruta, **kw))
+        n = E.index_articulo(db, otro_proyecto["articulo_id"],
+                             max_chars=E.CHUNK_CHARS + 123)
+        assert n > 0 and leidos
+        art = db.get(Articulo, otro_proyecto["articulo_id"])
+        assert art.firma_indice == E.firma_indice(E.CHUNK_CHARS + 123, E.CHUNK_OVERLAP)
+
+
+    def test_con_otro_extractor_no_se_copia(self, db, proyecto_indexado,
+                                            otro_proyecto, monkeypatch):
+        """Tras subir VERSION_EXTRACTOR, la copia traeria la extraccion vieja."""
+        from app.models.articulo import Articulo
+        from app.services import embedding_service as E
+
+        leidos = []
+        original = E.cache_extraccion.extraer
+        monkeypatch.setattr(E.cache_extraccion, "extraer",
+                            lambda ruta, **kw: leidos.append(ruta) or original(ruta, **kw))
+        monkeypatch.setattr(E.text_extractor, "VERSION_EXTRACTOR", "otra")
+        assert E.index_articulo(db, otro_proyecto["articulo_id"]) > 0 and leidos
+        art = db.get(Articulo, otro_proyecto["articulo_id"])
+        assert art.firma_indice.endswith("/otra")
+
+
+class TestDonante:
+    def test_un_articulo_con_dos_pdf_solo_dona_el_que_indexo(
+            self, db, usuario_prueba, proyecto_indexado, pdf_articulo, pdf_ajeno):
+        """Tras unir por DOI otra subida a un articulo ya indexado, ese articulo
+        tiene dos archivos y sus fragmentos siguen siendo los del primero."""
+        from app.models.archivo import Archivo, EstadoArchivo
+        from app.models.articulo import Articulo
+        from app.models.embedding_doc import EmbeddingDoc
+        from app.models.proyecto import Proyecto
+        from app.services.embedding_service import index_articulo
+
+        h_articulo, h_ajeno = uuid.uuid4().hex * 2, uuid.uuid4().hex * 2
+        p1, p2 = str(uuid.uuid4()), str(uuid.uuid4())
+        donante, copia, otra = (str(uuid.uuid4()) for _ in range(3))
+        for pid in (p1, p2):
+            db.add(Proyecto(id=pid, usuario_id=usuario_prueba["id"], tema_principal="donante",
+                            objetivo="donante", metodologia_txt="DSRM", sector_txt="otro",
+                            n_articulos_objetivo=1, estado_arte_generado=False))
+        db.flush()
+        for aid, pid in ((donante, p1), (copia, p2), (otra, p2)):
+            db.add(Articulo(id=aid, proyecto_id=pid, titulo="donante"))
+        db.flush()
+
+        def archivo(aid, pid, ruta, h):
+            db.add(Archivo(id=str(uuid.uuid4()), proyecto_id=pid, articulo_id=aid,
+                           nombre="x.pdf", ruta=ruta, hash_sha256=h, bytes=0,
+                           estado=EstadoArchivo.extraido))
+            db.commit()
+
+        def textos(aid):
+            return [t for (t,) in db.query(EmbeddingDoc.texto)
+                    .filter(EmbeddingDoc.articulo_id == aid)
+                    .order_by(EmbeddingDoc.chunk_orden)]
+
+        try:
+            archivo(donante, p1, pdf_articulo, h_articulo)
+            index_articulo(db, donante)
+            # Lo que hace la ingesta al encontrar el DOI en el articulo ya indexado.
+            archivo(donante, p1, pdf_ajeno, h_ajeno)
+
+            archivo(copia, p2, pdf_ajeno, h_ajeno)
+            assert index_articulo(db, copia) > 0
+            assert textos(copia) == textos(proyecto_indexado["ajeno"]) != textos(donante)
+
+            # El PDF del que si salieron sus fragmentos se sigue copiando.
+            archivo(otra, p2, pdf_articulo, h_articulo)
+            index_articulo(db, otra)
+            assert textos(otra) == textos(donante)
+            assert db.get(Articulo, otra).hash_indice == h_articulo
+        finally:
+            db.rollback()
+            db.query(Proyecto).filter(Proyecto.id.in_([p1, p2])).delete(
+                synchronize_session=False)
+            db.commit()
+
+
+class TestSubida:
+    def test_el_mismo_pdf_puede_estar_en_dos_proyectos(self, db, proyecto_indexado,
+                                                       otro_proyecto):
+        """La restriccion de unicidad era global y rechazaba esta insercion."""
+        from app.models.archivo import Archivo
+
+        h = (db.query(Archivo.hash_sha256)
+             .filter(Archivo.articulo_id == otro_proyecto["articulo_id"]).scalar())
+        proyectos = {p for (p,) in db.query(Archivo.proyecto_id)
+                     .filter(Archivo.hash_sha256 == h)}
+        assert {proyecto_indexado["proyecto_id"], otro_proyecto["proyecto_id"]} <= proyectos
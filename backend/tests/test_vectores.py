@@ -0,0 +1,78 @@
+# tests/test_vectores.py
+"""Vectores en binario: lo que se guarda se lee igual, y ocupa menos."""
+
+import json
+
+import numpy as np
+import pytest
+
+from app.services import vectores as V
+
+
+class TestFormato:
+    def test_ida_y_vuelta(self):
+        original = [0.125, -0.5, 0.333, 1e-6]
+        leido = V.desempaquetar(V.empaquetar(original))
+        assert leido.dtype == np.float32
+        assert np.allclose(leido, original, atol=1e-7)
+
+    def test_ocupa_cuatro_bytes_por_dimension(self):
+        """El motivo del cambio: 768 dimensiones son unos 3 KB, no 15."""
+        vec = np.random.default_rng(1).standard_normal(768)
+        datos = V.empaquetar(vec)
+        assert len(datos) == 768 * 4
+        assert len(datos) < len(json.dumps(vec.tolist())) / 4
+
+    def test_el_orden_de_bytes_no_depende_de_la_maquina(self):
+        """Una base copiada entre arquitecturas debe seguir leyendose igual."""
+        assert V.empaquetar([1.0]) == b"\x00\x00\x80\x3f"
+
+    def test_vacio_da_un_vector_vacio(self):
+        assert len(V.desempaquetar(None)) == 0
+        assert len(V.desempaquetar(b"")) == 0
+
+
+class TestFormatoAnterior:
+    def test_lee_la_lista_json(self):
+        assert np.allclose(V.desde_json([0.5, -0.25]), [0.5, -0.25])
+
+    def test_lee_la_cadena_json(self):
+        assert np.allclose(V.desde_json("[0.5, -0.25]"), [0.5, -0.25])
+
+    def test_un_json_ilegible_no_revienta(self):
+        """Como antes: un fragmento ilegible cuenta como vacio."""
+        assert len(V.desde_json("{no es json")) == 0
+        assert len(V.desde_json(None)) == 0
+
+
+@pytest.mark.bd
+class TestIndexacion:
+    def test_los_fragmentos_nuevos_se_guardan_en_binario(self, db, proyecto_indexado):
+        from app.models.embedding_doc import EmbeddingDoc
+        from app.services.embedding_service import EMBED_DIM
+
+        filas = (db.query(EmbeddingDoc.vector, EmbeddingDoc.embedding)
+                 .filter(EmbeddingDoc.articulo_id == proyecto_indexado["pertinente"])
+                 .all())
+        assert filas
+        for vector, embedding in filas:
+            assert embedding is None
+            assert len(V.desempaquetar(vector)) == EMBED_DIM
+
+    def test_una_fila_sin_convertir_se_sigue_leyendo(self, db, proyecto_indexado):
+        """Durante la migracion conviven los dos formatos."""
+        from app.models.embedding_doc import EmbeddingDoc
+
+        fila = (db.query(EmbeddingDoc)
+                .filter(EmbeddingDoc.articulo_id == proyecto_indexado["pertinente"])
+                .first())
+        vector = V.desempaquetar(fila.vector).copy()
+        vectores = {fila.id: None}
+        fila.embedding, fila.vector = vector.tolist(), None
+        db.commit()
+        try:
+            V.completar_desde_json(db, vectores)
+            assert np.allclose(vectores[fila.id], vector)
+        finally:
+            fila.embedding, fila.vector = None, V.empaquetar(vector)
+            db.commit()
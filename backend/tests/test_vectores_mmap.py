@@ -0,0 +1,115 @@
+# tests/test_vectores_mmap.py
+"""Vectores en un archivo mapeado: lo mismo que leerlos de la base."""
+
+import uuid
+
+import numpy as np
+import pytest
+
+from app.services import cache_vectores as C
+from app.services import vectores_mmap as V
+
+PID = str(uuid.uuid4())
+
+
+@pytest.fixture
+def carpeta(tmp_path, monkeypatch):
+    monkeypatch.setattr(V, "_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(V, "VECTORES_MMAP", True)
+    return tmp_path
+
+
+def _vectores(n, ancho=8, semilla=0):
+    v = np.random.default_rng(semilla).standard_normal((n, ancho)).astype(np.float32)
+    return list(v / np.linalg.norm(v, axis=1)[:, None])
+
+
+class TestArchivo:
+    def test_anade_y_mapea(self, carpeta):
+        a, b = _vectores(3), _vectores(2, semilla=1)
+        V.anadir(PID, ["a0", "a1", "a2"], a)
+        V.anadir(PID, ["b0", "b1"], b)
+        m = V.abrir(PID)
+        assert isinstance(m.matriz, np.memmap)
+        assert m.filas == {"a0": 0, "a1": 1, "a2": 2, "b0": 3, "b1": 4}
+        assert np.array_equal(m.matriz[3:], np.stack(b))
+
+    def test_apagado_no_escribe(self, carpeta, monkeypatch):
+        monkeypatch.setattr(V, "VECTORES_MMAP", False)
+        V.anadir(PID, ["a0"], _vectores(1))
+        assert V.abrir(PID) is None
+
+    def test_rellena_los_estrechos_y_omite_los_anchos(self, carpeta):
+        V.anadir(PID, ["a0"], _vectores(1))
+        V.anadir(PID, ["corto", "largo"], [np.ones(4, np.float32), np.ones(16, np.float32)])
+        m = V.abrir(PID)
+        assert "largo" not in m.filas
+        assert np.array_equal(m.matriz[m.filas["corto"]], [1, 1, 1, 1, 0, 0, 0, 0])
+
+    def test_una_escritura_a_medias_no_desalinea(self, carpeta):
+        V.anadir(PID, ["a0"], _vectores(1))
+        serie, _ancho = V._vigente(PID)
+        f32, idx = V._rutas(PID, serie)
+        with open(f32, "ab") as f:
+            f.write(b"\1\2\3")                  # fila rota
+        with open(idx, "ab") as f:
+            f.write(b"roto 9")                  # linea sin terminar
+        b = _vectores(1, semilla=3)
+        V.anadir(PID, ["b0"], b)
+        m = V.abrir(PID)
+        assert set(m.filas) == {"a0", "b0"}
+        assert np.array_equal(m.matriz[m.filas["b0"]], b[0])
+
+    def test_reconstruir_compacta_y_borra_la_serie_anterior(self, carpeta):
+        V.anadir(PID, ["a0", "a1"], _vectores(2))
+        vieja, _ancho = V._vigente(PID)
+        V.reconstruir(PID, ["a1"], _vectores(2)[1:])
+        m = V.abrir(PID)
+        assert m.filas == {"a1": 0}
+        assert not list(carpeta.glob("*%s*" % vieja))
+        V.borrar(PID)
+        assert V.abrir(PID) is None and not list(carpeta.iterdir())
+
+
+@pytest.mark.bd
+class TestEnLaCache:
+    @pytest.fixture
+    def mapeado(self, carpeta, monkeypatch, db, proyecto_indexado):
+        pid = proyecto_indexado["proyecto_id"]
+        C.cache.invalidar(pid)
+        exacta = C.cache.obtener(db, pid)
+        monkeypatch.setattr(V, "VECTORES_MMAP", True)
+        yield pid, exacta
+        C.cache.invalidar(pid)
+
+    def _por_id(self, m):
+        return {i: np.asarray(m.matriz[f]) for f, i in enumerate(m.ids)}
+
+    def test_la_matriz_es_una_vista_del_archivo(self, db, mapeado):
+        pid, exacta = mapeado
+        V.reconstruir(pid, list(exacta.ids), [exacta.matriz[i] for i in range(len(exacta.ids))])
+        C.cache.invalidar(pid)
+        m = C.cache.obtener(db, pid)
+        assert isinstance(m.matriz, np.memmap)
+        assert m.bytes < exacta.bytes
+        esperado = self._por_id(exacta)
+        assert all(np.array_equal(v, esperado[i]) for i, v in self._por_id(m).items())
+        for a, filas in exacta.por_articulo.items():
+            assert list(m.ids[m.filas_de(a)]) == list(exacta.ids[filas])
+
+    def test_lo_que_falta_sale_de_la_base(self, db, mapeado, proyecto_indexado,
+                                          contexto_propio):
+        from app.services.embedding_service import recuperar_contexto
+
+        pid, exacta = mapeado
+        aid = proyecto_indexado["pertinente"]
+        antes = recuperar_contexto(db, aid, contexto_propio, k=4)
+        fuera = set(exacta.ids[exacta.filas_de(aid)])
+        ids = [i for i in exacta.ids if i not in fuera]
+        V.reconstruir(pid, ids, [exacta.matriz[f] for f, i in enumerate(exacta.ids)
+                                 if i not in fuera])
+        C.cache.invalidar(pid)
+        m = C.cache.obtener(db, pid)
+        assert not isinstance(m.matriz, np.memmap)
+        assert len(m.ids) == len(exacta.ids)
+        assert recuperar_contexto(db, aid, contexto_propio, k=4) == antes
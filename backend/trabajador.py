@@ -1,5 +1,5 @@
 """
-Proceso que vacia la cola de analisis.
+Proceso que vacia la cola de analisis e indexa los PDF subidos.
 
 Se ejecuta aparte del servidor web:
 
@@ -67,8 +67,8 @@ def _procesar_uno(db) -> bool:
     """Toma un articulo y lo analiza. Devuelve si habia alguno."""
     from app.models.run import Run
     from app.models.run_item import EstadoRunItem
-    from app.routers.runs import FalloDefinitivo, procesar_item
-    from app.services import cola
+    from app.routers.runs import FalloDefinitivo, ingerir_item, procesar_item
+    from app.services import cola, ingesta
     from app.services.limitador import CuotaDiariaAgotada
 
     item = cola.tomar_pendiente(db)
@@ -85,12 +85,18 @@ def _procesar_uno(db) -> bool:
         return True
 
     cola.marcar_en_progreso(db, run)
-    log.info("Analizando el articulo %s (ejecucion %s, intento %d)",
-             item.articulo_id, run.id[:8], item.intentos)
+    # Dos etapas: sin fragmentos, se ingiere y se devuelve a la cola en
+    # `enriquecido`; el analisis lo toma despues este u otro trabajador.
+    if ingesta.indexados(db, [item.articulo_id]):
+        etapa, accion = procesar_item, "Analizando"
+    else:
+        etapa, accion = ingerir_item, "Ingiriendo"
+    log.info("%s el articulo %s (ejecucion %s, intento %d)",
+             accion, item.articulo_id, run.id[:8], item.intentos)
 
     inicio = time.monotonic()
     try:
-        procesar_item(db, run, item)
+        etapa(db, run, item)
         log.info("  hecho en %.1f s", time.monotonic() - inicio)
 
     except FalloDefinitivo as e:
@@ -123,6 +129,56 @@ def _procesar_uno(db) -> bool:
     return True
 
 
+def _indexar_subidos(db) -> bool:
+    """Indexa un PDF recien subido, antes de que nadie pida analizarlo.
+
+    Va detras de las ejecuciones, que tienen a alguien esperando, y delante
+    de la migracion de embeddings, que no corre prisa.
+    """
+    from app.services import ingesta
+    from app.services.limitador import CuotaDiariaAgotada
+
+    try:
+        return ingesta.indexar_siguiente(db)
+    except CuotaDiariaAgotada:
+        db.rollback()
+        raise
+    except Exception as e:  # noqa: BLE001
+        # Los fallos de un archivo ya los aparta `indexar_siguiente`; lo que
+        # llega aqui es de la base, y se prueba otra vez en la vuelta siguiente.
+        db.rollback()
+        log.error("No se pudo indexar un PDF subido: %s", e)
+        return False
+
+
+def _migrar_embeddings(db) -> bool:
+    """Sin analisis pendientes, avanza la migracion de embeddings de un proyecto.
+
+    Va detras del analisis a proposito: migrar no corre prisa, y la cuota que
+    gasta es la misma que necesita quien espera un resultado.
+    """
+    from app.services import migracion_embeddings
+    from app.services.limitador import CuotaDiariaAgotada
+
+    pid = migracion_embeddings.siguiente_proyecto(db)
+    if pid is None:
+        return False
+    try:
+        n = migracion_embeddings.avanzar(db, pid)
+    except CuotaDiariaAgotada:
+        db.rollback()
+        raise
+    except Exception as e:  # noqa: BLE001
+        # Lo ya migrado queda guardado; el lote se repite en la vuelta
+        # siguiente.
+        db.rollback()
+        log.error("No se pudo avanzar la migracion del proyecto %s: %s", pid, e)
+        return False
+    if n:
+        log.info("Migracion de embeddings: %d fragmentos del proyecto %s.", n, pid[:8])
+    return n > 0
+
+
 def _cerrar_terminadas(db) -> None:
     """Cierra las ejecuciones cuyos articulos estan todos resueltos.
 
@@ -174,7 +230,7 @@ def main() -> int:
     while not _parar:
         db = SessionLocal()
         try:
-            hubo = _procesar_uno(db)
+            hubo = _procesar_uno(db) or _indexar_subidos(db) or _migrar_embeddings(db)
             _cerrar_terminadas(db)
         except CuotaDiariaAgotada:
             db.close()